@@ -0,0 +1,94 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+Compare reloading everything (what update_cache used to do every 15 seconds) with the change log:
+update_cache when nothing changed, and update_cache after 1 vote, for databases of different sizes.
+Run it from the root of the repository: python -m benchmarks.bench_change_log
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import disnake.ext.commands  # noqa: F401  (the problems module needs this to be imported first)
+
+from helpful_modules import problems_module
+from helpful_modules.problems_module.codec import encode_ids, encode_json
+
+
+async def time_calls(func, num_calls: int):
+    samples = []
+    for _ in range(num_calls):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def run(cache, num_problems: int, num_calls: int):
+    await cache.start()
+    async with cache._sqlite_pool.writer() as conn:
+        await conn.executemany(
+            "INSERT INTO problems (guild_id, problem_id, question, answers, voters, solvers, author, extra_stuff) "
+            "VALUES (?,?,?,?,?,?,?,?)",
+            [
+                (None, i, f"What is {i}+{i}?", encode_json([str(2 * i)]), encode_ids([]), encode_ids([]), 1,
+                 "{'type': 'BaseProblem'}")
+                for i in range(num_problems)
+            ],
+        )
+    full = await time_calls(cache.full_resync, 3)
+    unchanged = await time_calls(cache.update_cache, num_calls)
+
+    user_ids = iter(range(num_calls))
+
+    async def vote_and_update():
+        await cache.add_vote(0, next(user_ids))
+        await cache.update_cache()
+
+    changed = await time_calls(vote_and_update, num_calls)
+    print(
+        f"{num_problems:>8} problems: full reload {full:.1f} ms, "
+        f"update_cache (nothing changed) {unchanged:.3f} ms, vote + update_cache {changed:.3f} ms"
+    )
+    await cache.close()
+
+
+def main(sizes, num_calls: int):
+    for num_problems in sizes:
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache = problems_module.MathProblemCache(
+                mysql_username="",
+                mysql_password="",
+                mysql_db_ip="",
+                mysql_db_name="",
+                use_sqlite=True,
+                db_name=os.path.join(tempdir, "bench.db"),
+                update_cache_by_default_when_requesting=False,
+            )
+            asyncio.run(run(cache, num_problems, num_calls))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-1])
+    parser.add_argument("--problems", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+    main(args.problems, args.calls)
@@ -0,0 +1,135 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+Compare pickle (what the cache used to store) with the codec in helpful_modules/problems_module/codec.py:
+the size of the BLOB columns of the problems table, the size of the database file, the time it takes to decode
+the columns of every row and the time it takes to load every problem with cache_all_problems
+(only for the codec: the cache doesn't unpickle rows any more, see migrations.py).
+Run it from the root of the repository: python -m benchmarks.bench_codec
+"""
+import argparse
+import asyncio
+import os
+import pickle
+import random
+import tempfile
+import time
+
+import disnake.ext.commands  # noqa: F401  (the problems module needs this to be imported first)
+
+from helpful_modules import problems_module
+from helpful_modules.problems_module.codec import decode, encode_ids, encode_json
+
+# name -> (encoder of the answers, encoder of the voters and solvers, decoder, whether the cache can load the rows)
+ENCODINGS = {
+    "pickle": (pickle.dumps, pickle.dumps, pickle.loads, False),
+    "codec": (encode_json, encode_ids, decode, True),
+}
+
+
+def make_rows(num_problems: int, num_users: int):
+    rng = random.Random(0)
+    user_id = lambda: rng.randrange(10**17, 10**18)  # noqa: E731  (Discord ids are 18 digits long)
+    return [
+        (
+            None,
+            i,
+            f"What is {i}+{i}?",
+            [str(2 * i), f"{2 * i}.0"],
+            user_id(),
+            [user_id() for _ in range(num_users)],
+            [user_id() for _ in range(num_users)],
+        )
+        for i in range(num_problems)
+    ]
+
+
+async def run(cache, db_name: str, rows, encode_answers, encode_users, decoder, loadable: bool):
+    try:
+        return await _run(cache, db_name, rows, encode_answers, encode_users, decoder, loadable)
+    finally:
+        await cache.close()  # Otherwise the connection threads keep the process alive if something fails
+
+
+async def _run(cache, db_name: str, rows, encode_answers, encode_users, decoder, loadable: bool):
+    await cache.start()
+    encoded = [
+        (guild_id, problem_id, question, encode_answers(answers), author, encode_users(voters), encode_users(solvers),
+         "{'type': 'BaseProblem'}")
+        for guild_id, problem_id, question, answers, author, voters, solvers in rows
+    ]
+    blob_bytes = sum(len(row[3]) + len(row[5]) + len(row[6]) for row in encoded)
+    async with cache._sqlite_pool.writer() as conn:
+        await conn.executemany(
+            "INSERT INTO problems (guild_id, problem_id, question, answers, author, voters, solvers, extra_stuff) "
+            "VALUES (?,?,?,?,?,?,?,?)",
+            encoded,
+        )
+    async with cache._sqlite_pool.writer() as conn:
+        await conn.commit()
+        await conn.execute("VACUUM")
+
+    async with cache._sqlite_pool.reader() as conn:
+        cursor = await conn.execute("SELECT answers, voters, solvers FROM problems")
+        fetched = await cursor.fetchall()
+    start = time.perf_counter()
+    for row in fetched:
+        decoder(row["answers"])
+        decoder(row["voters"])
+        decoder(row["solvers"])
+    decode_time = time.perf_counter() - start
+
+    load_time = None
+    if loadable:
+        start = time.perf_counter()
+        await cache.cache_all_problems()
+        load_time = time.perf_counter() - start
+    return blob_bytes, os.path.getsize(db_name), decode_time, load_time
+
+
+def main(num_problems: int, num_users: int):
+    rows = make_rows(num_problems, num_users)
+    print(f"{num_problems} problems, {num_users} voters and {num_users} solvers in each BLOB")
+    with tempfile.TemporaryDirectory() as tempdir:
+        for name, (encode_answers, encode_users, decoder, loadable) in ENCODINGS.items():
+            db_name = os.path.join(tempdir, f"{name}.db")
+            cache = problems_module.MathProblemCache(
+                mysql_username="",
+                mysql_password="",
+                mysql_db_ip="",
+                mysql_db_name="",
+                use_sqlite=True,
+                db_name=db_name,
+                update_cache_by_default_when_requesting=False,
+            )
+            blob_bytes, file_size, decode_time, load_time = asyncio.run(
+                run(cache, db_name, rows, encode_answers, encode_users, decoder, loadable)
+            )
+            load = "-" if load_time is None else f"{load_time:.3f} s"
+            print(
+                f"{name:>7}: BLOB columns {blob_bytes / 2**20:.2f} MiB, database {file_size / 2**20:.2f} MiB, "
+                f"decoding {decode_time:.3f} s, cache_all_problems {load}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-1])
+    parser.add_argument("--problems", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=5, help="The number of voters (and solvers) of each problem")
+    args = parser.parse_args()
+    main(args.problems, args.users)
@@ -0,0 +1,118 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+Measure the memory allocated by a full reload of the problems (cache_all_problems), now that every problem refers to
+the cache through one shared weak reference (MathProblemCache.handle), and the way it used to be:
+a shallow copy of the whole cache object for every problem.
+Run it from the root of the repository: python -m benchmarks.bench_full_reload
+"""
+import argparse
+import asyncio
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from copy import copy
+
+import disnake.ext.commands  # noqa: F401  (the problems module needs this to be imported first)
+
+from helpful_modules import problems_module
+from helpful_modules.problems_module.cache.problem_index import ProblemIndex
+from helpful_modules.problems_module.codec import encode_ids, encode_json
+
+
+class CopyingCache(problems_module.MathProblemCache):
+    """Gives every problem its own copy of the cache object, like the cache used to"""
+
+    @property
+    def handle(self):
+        return copy(self)
+
+    @handle.setter
+    def handle(self, value):
+        pass
+
+
+async def fill(cache, num_problems: int):
+    async with cache._sqlite_pool.writer() as conn:
+        await conn.executemany(
+            "INSERT INTO problems (guild_id, problem_id, question, answers, voters, solvers, author, extra_stuff) "
+            "VALUES (?,?,?,?,?,?,?,?)",
+            [
+                (None, i, f"What is {i}+{i}?", encode_json([str(2 * i)]), encode_ids([]), encode_ids([]), 1,
+                 "{'type': 'BaseProblem'}")
+                for i in range(num_problems)
+            ],
+        )
+
+
+async def measure(cache):
+    """Reload every problem into an empty cache. Return the time it took (in ms), the number of blocks and the bytes
+    that are still allocated afterwards, and the peak memory usage during the reload (in bytes)"""
+    cache.guild_problems = {}
+    cache.problem_index = ProblemIndex()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    await cache.cache_all_problems()
+    elapsed = (time.perf_counter() - start) * 1000
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in diff)
+    size = sum(stat.size_diff for stat in diff)
+    return elapsed, blocks, size, peak
+
+
+async def run(cache, num_problems: int, name: str):
+    await cache.start()
+    await fill(cache, num_problems)
+    await cache.cache_all_problems()  # Open the connections first, so that they aren't counted
+    elapsed, blocks, size, peak = await measure(cache)
+    print(
+        f"{name:>23}: {elapsed:8.1f} ms, {blocks:>9,} blocks ({size / num_problems:7.0f} bytes per problem) "
+        f"kept, peak {peak / 2**20:7.1f} MiB"
+    )
+    await cache.close()
+
+
+def main(num_problems: int):
+    print(f"Full reload of {num_problems} problems:")
+    for name, cls in (("a copy of the cache", CopyingCache), ("MathProblemCache.handle", problems_module.MathProblemCache)):
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache = cls(
+                mysql_username="",
+                mysql_password="",
+                mysql_db_ip="",
+                mysql_db_name="",
+                use_sqlite=True,
+                db_name=os.path.join(tempdir, "bench.db"),
+                update_cache_by_default_when_requesting=False,
+            )
+            asyncio.run(run(cache, num_problems, name))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-1])
+    parser.add_argument("--problems", type=int, default=50_000)
+    args = parser.parse_args()
+    main(args.problems)
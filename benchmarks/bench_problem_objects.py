@@ -0,0 +1,103 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+Compare the problem objects (with __slots__, and a UserIdSet for the voters and the solvers) with the problems that
+the bot used to have (a __dict__, and lists): the memory used by each problem when there are a lot of them,
+and the time it takes to check whether a user solved a problem (is_solver).
+Run it from the root of the repository: python -m benchmarks.bench_problem_objects
+"""
+import argparse
+import gc
+import random
+import timeit
+import tracemalloc
+import warnings
+
+import disnake.ext.commands  # noqa: F401  (the problems module needs this to be imported first)
+
+from helpful_modules.problems_module import BaseProblem
+from helpful_modules.problems_module.user_id_set import UserIdSet
+
+
+class DictProblem:
+    """A problem like the ones the bot used to have: the same attributes, in a __dict__, with lists"""
+
+    def __init__(self, question, id, author, guild_id, voters, solvers, answers):
+        self.type = "BaseProblem"
+        self.question = question
+        self.id = id
+        self.guild_id = guild_id
+        self.voters = voters
+        self.solvers = solvers
+        self.author = author
+        self._cache = None
+        self.answers = answers
+        self.tolerance = None
+
+
+def make_problem(cls, rng: random.Random, i: int, num_users: int):
+    user_id = lambda: rng.randrange(10**17, 10**18)  # noqa: E731  (Discord ids are 18 digits long)
+    return cls(
+        question=f"What is {i}+{i}?",
+        id=i,
+        author=user_id(),
+        guild_id=None,
+        voters=[user_id() for _ in range(num_users)],
+        solvers=[user_id() for _ in range(num_users)],
+        answers=[str(2 * i)],
+    )
+
+
+def bytes_per_problem(cls, num_problems: int, num_users: int) -> float:
+    """Return the memory allocated by num_problems problems, divided by num_problems"""
+    rng = random.Random(0)
+    gc.collect()
+    tracemalloc.start()
+    problems = [make_problem(cls, rng, i, num_users) for i in range(num_problems)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del problems
+    return size / num_problems
+
+
+def membership_time(container, user_id, number: int) -> float:
+    """Return the time that `user_id in container` takes, in nanoseconds"""
+    return timeit.timeit(lambda: user_id in container, number=number) / number * 1e9
+
+
+def main(num_problems: int, num_users: int, number: int):
+    warnings.simplefilter("ignore")  # The problems don't have a cache
+    print(f"Memory ({num_problems} problems, {num_users} voters and {num_users} solvers each):")
+    for name, cls in (("__dict__ and lists", DictProblem), ("__slots__ and UserIdSet", BaseProblem)):
+        print(f"{name:>24}: {bytes_per_problem(cls, num_problems, num_users):.0f} bytes per problem")
+
+    print(f"Checking whether a user solved a problem ({number} times, the user didn't solve it):")
+    for num_solvers in (1, 10, 100, 1000, 10000):
+        solvers = list(range(num_solvers))
+        as_list = membership_time(solvers, -1, number)
+        as_set = membership_time(UserIdSet(solvers), -1, number)
+        print(f"{num_solvers:>6} solvers: list {as_list:8.0f} ns, UserIdSet {as_set:8.0f} ns")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-1])
+    parser.add_argument("--problems", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=2, help="The number of voters (and solvers) of each problem")
+    parser.add_argument("--number", type=int, default=100_000, help="The number of membership checks that are timed")
+    args = parser.parse_args()
+    main(args.problems, args.users, args.number)
@@ -0,0 +1,96 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+Count how many rows of the problems table convert_row_to_problem decodes per second, for every problem type,
+and compare it with the old way (extra_stuff stored as a Python repr, parsed twice, and copied into 3 dictionaries).
+Run it from the root of the repository: python -m benchmarks.bench_problem_rows
+"""
+import argparse
+import time
+
+import disnake.ext.commands  # noqa: F401  (the problems module needs this to be imported first)
+import orjson
+
+from helpful_modules.problems_module import BaseProblem, ComputationalProblem, LinearAlgebraProblem
+from helpful_modules.problems_module.base_problem import PROBLEM_TYPES, dump_extra_stuff
+from helpful_modules.problems_module.codec import decode, encode_ids, encode_json
+from helpful_modules.problems_module.parse_problem import convert_row_to_problem
+
+CACHE = object()  # Any cache: BaseProblem warns when there is no cache, and that would be timed too
+
+PROBLEMS = [
+    BaseProblem(question="What is 1+1?", answers=["2"], id=1, author=5, cache=CACHE),
+    ComputationalProblem(question="What is pi?", answers=["3.14159"], id=2, author=5, tolerance=0.001, cache=CACHE),
+    LinearAlgebraProblem(
+        question="Solve the system", answers=["1 2 3"], id=3, author=5,
+        coeffs=[[1, 2, 3], [4, 5, 6], [7, 8, 10]], equal_to=[14, 32, 53], cache=CACHE,
+    ),
+]
+
+
+def make_row(problem: BaseProblem, extra_stuff: str) -> dict:
+    return {
+        "guild_id": None,
+        "problem_id": problem.id,
+        "question": problem.question,
+        "answers": encode_json(problem.answers),
+        "voters": encode_ids([845751152901750824, 1234]),
+        "solvers": encode_ids([5678]),
+        "author": problem.author,
+        "extra_stuff": extra_stuff,
+    }
+
+
+def old_convert_row_to_problem(row: dict, cache=None):
+    """What convert_row_to_problem and BaseProblem.from_row used to do"""
+    extra_stuff = orjson.loads(row["extra_stuff"].replace("'", '"'))
+    cls = PROBLEM_TYPES[extra_stuff["type"]]
+    our_row = dict()
+    our_row.update(row)
+    del our_row["problem_id"]
+    our_row["id"] = row["problem_id"]
+    our_row["answers"] = decode(row["answers"])
+    our_row["voters"] = decode(row["voters"])
+    our_row["solvers"] = decode(row["solvers"])
+    our_row.update(orjson.loads(row.get("extra_stuff", "{}").replace("'", '"')))
+    del our_row["extra_stuff"]
+    return cls.from_dict(our_row, cache=cache)
+
+
+def rows_per_second(func, row: dict, num_rows: int) -> float:
+    start = time.perf_counter()
+    for _ in range(num_rows):
+        func(row, cache=CACHE)
+    return num_rows / (time.perf_counter() - start)
+
+
+def main(num_rows: int):
+    for problem in PROBLEMS:
+        old_row = make_row(problem, str(problem.get_extra_stuff()))
+        new_row = make_row(problem, dump_extra_stuff(problem.get_extra_stuff()))
+        assert convert_row_to_problem(new_row, cache=CACHE) == old_convert_row_to_problem(old_row, cache=CACHE)
+        old = rows_per_second(old_convert_row_to_problem, old_row, num_rows)
+        new = rows_per_second(convert_row_to_problem, new_row, num_rows)
+        print(f"{type(problem).__name__:>21}: {old:>9,.0f} rows/s before, {new:>9,.0f} rows/s now ({new / old:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-1])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    main(args.rows)
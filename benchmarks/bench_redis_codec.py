@@ -0,0 +1,115 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+Compare the ways RedisCache can encode its values, for each type of entity: str() of the dictionary (what it used to
+store), plain JSON, and the codec in helpful_modules/problems_module/codec.py (JSON, and msgpack if it is installed).
+For each of them, it prints the average size of a value and how many values can be encoded and decoded per second.
+Run it from the root of the repository: python -m benchmarks.bench_redis_codec
+"""
+import argparse
+import ast
+import random
+import time
+
+import disnake.ext.commands  # noqa: F401  (the problems module needs this to be imported first)
+import orjson
+
+from helpful_modules.problems_module import BaseProblem
+from helpful_modules.problems_module.cache_rewrite_with_redis.rediscache import _loads, _problem_record
+from helpful_modules.problems_module.codec import VALUE_ENCODERS, msgpack
+
+FORMATS = {
+    "str(dict)": (lambda value: str(value).encode(), lambda data: ast.literal_eval(data.decode())),
+    "plain JSON": (orjson.dumps, orjson.loads),
+    **{f"codec {name}": (encode, _loads) for name, encode in VALUE_ENCODERS.items()},
+}
+if msgpack is None:
+    del FORMATS["codec msgpack"]
+
+
+def make_entities(num: int, num_users: int):
+    rng = random.Random(0)
+    user_id = lambda: rng.randrange(10**17, 10**18)  # noqa: E731  (Discord ids are 18 digits long)
+    check = orjson.dumps({"type": "administrator", "user_ids": [user_id() for _ in range(num_users)]}).decode()
+    return {
+        "problem": [
+            _problem_record(
+                BaseProblem(question=f"What is {i}+{i}?", answers=[str(2 * i)], id=i, guild_id=str(user_id()), author=user_id())
+            )
+            for i in range(num)
+        ],
+        "quiz": [
+            {
+                "id": i,
+                "authors": [user_id() for _ in range(num_users)],
+                "problems": [{"question": f"What is {j}+{j}?", "answers": [str(2 * j)], "id": j} for j in range(5)],
+                "submissions": [],
+                "description": {"description": "A quiz", "license": "GPLv3"},
+            }
+            for i in range(num)
+        ],
+        "user data": [{"user_id": user_id(), "trusted": False, "blacklisted": False} for _ in range(num)],
+        "guild data": [
+            {
+                "guild_id": user_id(),
+                "blacklisted": 0,
+                "can_create_problems_check": check,
+                "can_create_quizzes_check": check,
+                "mods_check": check,
+            }
+            for _ in range(num)
+        ],
+        "appeal": [
+            {
+                "user_id": user_id(),
+                "appeal_msg": "Please unblacklist me",
+                "timestamp": 1700000000 + i,
+                "appeal_num": i,
+                "special_id": user_id(),
+                "appeal_type": "BLACKLIST_APPEAL",
+            }
+            for i in range(num)
+        ],
+    }
+
+
+def main(num: int, num_users: int):
+    print(f"{num} values of each type, {num_users} user ids in each list of ids")
+    for entity_type, values in make_entities(num, num_users).items():
+        print(f"{entity_type}:")
+        for name, (encode, decode) in FORMATS.items():
+            start = time.perf_counter()
+            encoded = [encode(value) for value in values]
+            encode_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for data in encoded:
+                decode(data)
+            decode_time = time.perf_counter() - start
+            size = sum(map(len, encoded)) / len(encoded)
+            print(
+                f"{name:>14}: {size:7.1f} bytes, encoding {num / encode_time:10.0f}/s, "
+                f"decoding {num / decode_time:10.0f}/s"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-1])
+    parser.add_argument("--values", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=5, help="The number of authors of a quiz (and of users in a check)")
+    args = parser.parse_args()
+    main(args.values, args.users)
@@ -0,0 +1,134 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+Compare opening a new aiosqlite connection for every query (what the cache used to do)
+with the pooled connections of MathProblemCache, by timing get_problem.
+Run it from the root of the repository: python -m benchmarks.bench_sqlite_pool
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import aiosqlite
+import disnake.ext.commands  # noqa: F401  (the problems module needs this to be imported first)
+
+from helpful_modules import problems_module
+from helpful_modules.dict_factory import dict_factory
+from helpful_modules.problems_module.codec import encode_ids, encode_json
+from helpful_modules.problems_module.parse_problem import convert_row_to_problem
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+async def get_problem_with_a_new_connection(db_name: str, problem_id: int, cache):
+    """The old way: open (and close) a connection for each query"""
+    async with aiosqlite.connect(db_name) as conn:
+        conn.row_factory = dict_factory
+        cursor = await conn.cursor()
+        await cursor.execute("SELECT * FROM problems WHERE problem_id = ?", (problem_id,))
+        rows = list(await cursor.fetchall())
+        await conn.commit()
+        return convert_row_to_problem(rows[0], cache=cache)
+
+
+async def time_calls(func, ids):
+    samples = []
+    for problem_id in ids:
+        start = time.perf_counter()
+        await func(problem_id)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples, connections):
+    print(
+        f"{name:>20}: {connections / len(samples):.2f} connections/command, "
+        f"p50 {statistics.median(samples):.3f} ms, p99 {percentile(samples, 99):.3f} ms"
+    )
+
+
+async def run(cache, db_name: str, num_problems: int, num_calls: int):
+    try:
+        await _run(cache, db_name, num_problems, num_calls)
+    finally:
+        await cache.close()  # Otherwise the connection threads keep the process alive if something fails
+
+
+async def _run(cache, db_name: str, num_problems: int, num_calls: int):
+    await cache.start()
+    async with cache._sqlite_pool.writer() as conn:
+        await conn.executemany(
+            "INSERT INTO problems (guild_id, problem_id, question, answers, voters, solvers, author, extra_stuff) "
+            "VALUES (?,?,?,?,?,?,?,?)",
+            [
+                (None, i, f"What is {i}+{i}?", encode_json([]), encode_ids([]), encode_ids([]), 1,
+                 "{'type': 'BaseProblem'}")
+                for i in range(num_problems)
+            ],
+        )
+    ids = [i % num_problems for i in range(num_calls)]
+
+    connections = 0
+    real_connect = aiosqlite.connect
+
+    def counting_connect(*args, **kwargs):
+        nonlocal connections
+        connections += 1
+        return real_connect(*args, **kwargs)
+
+    aiosqlite.connect = counting_connect
+    try:
+        before = await time_calls(
+            lambda problem_id: get_problem_with_a_new_connection(db_name, problem_id, cache), ids
+        )
+    finally:
+        aiosqlite.connect = real_connect
+    report("connection per call", before, connections)
+
+    opened_before = cache._sqlite_pool.connections_opened
+    after = await time_calls(lambda problem_id: cache.get_problem(None, problem_id), ids)
+    report("pooled connections", after, cache._sqlite_pool.connections_opened - opened_before)
+
+
+def main(num_problems: int, num_calls: int):
+    with tempfile.TemporaryDirectory() as tempdir:
+        db_name = os.path.join(tempdir, "bench.db")
+        cache = problems_module.MathProblemCache(
+            mysql_username="",
+            mysql_password="",
+            mysql_db_ip="",
+            mysql_db_name="",
+            use_sqlite=True,
+            db_name=db_name,
+            update_cache_by_default_when_requesting=False,
+        )
+        asyncio.run(run(cache, db_name, num_problems, num_calls))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[-1])
+    parser.add_argument("--problems", type=int, default=1000)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.problems, args.calls)
@@ -6,7 +6,7 @@ from disnake.ext import commands, tasks
 
 from helpful_modules import checks, problems_module, the_documentation_file_loader
 from helpful_modules.custom_bot import TheDiscordMathProblemBot
-from helpful_modules.problems_module import GuildData, MathProblemCache
+from helpful_modules.problems_module import MathProblemCache
 from helpful_modules.threads_or_useful_funcs import get_log
 
 from .helper_cog import HelperCog
@@ -29,9 +29,7 @@ class GuildConfigCog(HelperCog):
             return await inter.send("This is not a valid check!")
 
         # TODO: Refactor - don't use setattr
-        data = await self.cache.get_guild_data(
-            guild_id=inter.guild_id, default=GuildData.default(inter.guild_id)
-        )
+        data = await self.bot.ctx_for(inter).guild_data()
         try:
             check = getattr(data, cache_name)  # Get the check
             role_permissions = role.permissions  # Cache the permissions
@@ -61,15 +59,14 @@ class GuildConfigCog(HelperCog):
         self, inter: disnake.GuildCommandInteraction
     ) -> bool:
         """Make sure that only trusted users or guild owners or guild mods can run this command only in guilds!"""
+        ctx = self.bot.ctx_for(inter)  # Shared with the other checks
         return (
             inter.guild_id is not None
             and inter.guild is not None  # This is a guild!
             and (
-                await self.bot.is_trusted(inter.author)
+                await ctx.is_trusted()
                 or inter.guild.owner_id == inter.author.id
-                or await self.user_passes_guild_mod_check(
-                    guild=inter.guild, author=inter.author
-                )
+                or (await ctx.guild_data()).mod_check.check_for_user_passage(inter.author)
             )
         )
 
@@ -110,9 +107,7 @@ class GuildConfigCog(HelperCog):
         if permission not in Permissions.VALID_FLAGS:
             return await inter.send("Invalid permission!")
 
-        data = await self.cache.get_guild_data(
-            inter.guild.id, default=GuildData.default()
-        )
+        data = await self.bot.ctx_for(inter).guild_data()
         data.mod_check.permissions_needed.append(permission)
         await self.cache.set_guild_data(data=data)
         await inter.send("This has been updated!")
@@ -128,9 +123,7 @@ class GuildConfigCog(HelperCog):
         Remove a required permission from the list of required permissions to meet the mod check!
         Warning: If you remove all required permissions, then ANYBODY can act as a moderator in your server in regards to this bot!
         """
-        data = await self.cache.get_guild_data(
-            inter.guild_id, default=problems_module.GuildData.default(inter.guild_id)
-        )
+        data = await self.bot.ctx_for(inter).guild_data()
         try:
             data.mod_check.permissions_needed.remove(permission)
         except (ValueError, TypeError) as t:
@@ -146,10 +139,7 @@ class GuildConfigCog(HelperCog):
         """/guild_config modify_mod_check add_whitelisted_user [user: User]
         Add a user to the whitelisted users part of the mod check - this will fail if the user is already whitelisted
         """
-        data = await self.cache.get_guild_data(
-            inter.guild_id,
-            default=problems_module.GuildData.default(guild_id=inter.guild_id),
-        )
+        data = await self.bot.ctx_for(inter).guild_data()
         if user.id in data.mod_check.whitelisted_users:
             return await inter.send("This user is already whitelisted!")
         data.mod_check.whitelisted_users.append(user.id)
@@ -167,10 +157,7 @@ class GuildConfigCog(HelperCog):
         # I have no way of telling whether the user is in the server - because I don't have the members intent
         # This doesn't seem like a valid reason that Discord would give me this intent
         # so I have to work around it
-        data = await self.cache.get_guild_data(
-            inter.guild_id,
-            default=problems_module.GuildData.default(guild_id=inter.guild_id),
-        )
+        data = await self.bot.ctx_for(inter).guild_data()
         try:
             data.mod_check.whitelisted_users.remove(
                 user.id
@@ -190,10 +177,7 @@ class GuildConfigCog(HelperCog):
         Add a blacklisted user to the mod check, which prevents this user from interacting as a mod with this bot, even if they meet all other requirements
         """  # noqa: E401
 
-        data = await self.cache.get_guild_data(
-            inter.guild_id,
-            default=problems_module.GuildData.default(guild_id=inter.guild_id),
-        )
+        data = await self.bot.ctx_for(inter).guild_data()
         data.blacklisted_users.append(user.id)
         await self.cache.set_guild_data(inter.guild_id, data=data)
         await inter.send(
@@ -207,9 +191,7 @@ class GuildConfigCog(HelperCog):
         """/guild_config modify_mod_check remove_blacklisted_user [user: User]
         Attempt to remove a blacklisted user from the list of blacklisted users, and don't do anything if the user is not blacklisted
         """
-        data = await self.cache.get_guild_data(
-            inter.guild_id, default=problems_module.GuildData.default()
-        )
+        data = await self.bot.ctx_for(inter).guild_data()
         try:
             data.mod_check.blacklisted_users.remove(user.id)
             await self.cache.set_guild_data(inter.guild_id, data=data)
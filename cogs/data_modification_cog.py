@@ -28,7 +28,6 @@ from helpful_modules.custom_embeds import SimpleEmbed, SuccessEmbed, ErrorEmbed
 from helpful_modules.threads_or_useful_funcs import file_version_of_item
 from .helper_cog import HelperCog
 import io
-import copy
 import json
 import asyncio
 PAGE_SIZE = 3000
@@ -138,25 +137,13 @@ class DataModificationCog(HelperCog):
 
             await _extra_data["cache"].delete_all_by_user_id(interaction.user.id)
             if _extra_data["delete_votes"]:
-                problems_to_remove_votes_for = await _extra_data[
-                    "cache"
-                ].get_problems_by_func(
-                    func=lambda prob, user_id: user_id in prob.voters,  # prob: problem
-                    args=[interaction.user.id],
-                )
-                for problem in problems_to_remove_votes_for:
-                    problem.voters.remove(interaction.user.id)
-                    await problem.update_self()
+                await _extra_data["cache"].delete_all_votes_by_user_id(
+                    interaction.user.id
+                )  # One DELETE, instead of rewriting every problem they voted for
             if _extra_data["delete_solves"]:
-                problems_to_remove_solves_for = await _extra_data[
-                    "cache"
-                ].get_problems_by_func(
-                    func=lambda problem, user_id: user_id in problem.solvers,
-                    args=[interaction.user.id],
-                )  # Get all the problems the user voted for
-                for problem in problems_to_remove_solves_for:
-                    problem.solvers.remove(interaction.user.id)
-                    await problem.update_self()
+                await _extra_data["cache"].delete_all_solves_by_user_id(
+                    interaction.user.id
+                )
 
             await interaction.send(**kwargs)
             Self.disable()
@@ -175,7 +162,7 @@ class DataModificationCog(HelperCog):
             return
 
         _extra_data = {
-            "cache": copy.copy(self.bot.cache),
+            "cache": self.bot.cache,
             "delete_votes": delete_votes,
             "delete_solves": delete_solves,
         }
@@ -217,11 +204,11 @@ class DataModificationCog(HelperCog):
         """
         raw_data = await self.cache.get_all_by_author_id(author.id)
         problems_user_voted_for = await self.cache.get_problems_by_func(
-            func=lambda problem, user_id: user_id in problem.voters, args=(author,)
+            func=problems_module.Q(voter_contains=author.id)
         )
         # self.bot.log.trace("Getting problems user voted & solved.")
         problems_user_solved = await self.cache.get_problems_by_func(
-            func=lambda problem, user_id: user_id in problem.solvers, args=(author,)
+            func=problems_module.Q(solver_contains=author.id)
         )
         user_data: problems_module.UserData = await self.bot.cache.get_user_data(
             user_id=author.id,
@@ -225,6 +225,30 @@ class DeveloperCommands(HelperCog):
             "Use Slash Commands": "✅" if my_permissions.use_slash_commands else "❌",
         }
         debug_dict["Do I have the correct permissions?"] = correct_permissions
+        problem_cache_stats = self.bot.cache.problem_lru.stats()
+        debug_dict["Problem cache"] = {
+            "Cached problems": f"{problem_cache_stats['size']}/{problem_cache_stats['max_size']}",
+            "Hits": problem_cache_stats["hits"],
+            "Misses": problem_cache_stats["misses"],
+            "Hit rate": f"{problem_cache_stats['hit_rate']:.1%}",
+            "Evictions": problem_cache_stats["evictions"],
+        }
+        user_data_cache_stats = self.bot.cache.user_data_lru.stats()
+        debug_dict["User data cache"] = {
+            "Cached users": f"{user_data_cache_stats['size']}/{user_data_cache_stats['max_size']}",
+            "Hit rate": f"{user_data_cache_stats['hit_rate']:.1%}",
+        }
+        memory_budget = getattr(self.bot.cache, "memory_budget", None)  # The Redis cache doesn't have one
+        if memory_budget is not None:
+            memory_stats = memory_budget.stats()
+            budget = "no limit" if memory_stats["max_bytes"] is None else f"{memory_stats['max_bytes'] / 2**20:.1f} MiB"
+            debug_dict["Cache memory (approximate)"] = {
+                "Usage": f"{memory_stats['usage'] / 2**20:.1f} MiB / {budget}",
+                "Quizzes": f"{memory_stats.get('quizzes_usage', 0) / 2**20:.1f} MiB",
+                "Guilds with cached problems": memory_stats["guilds"],
+                "Evictions": memory_stats["evictions"],
+                "Evicted": f"{memory_stats['evicted_bytes'] / 2**20:.1f} MiB",
+            }
         if raw:
             await inter.send(str(debug_dict), ephemeral=send_ephermally)
             return
@@ -321,12 +345,7 @@ class DeveloperCommands(HelperCog):
         """/remove_trusted_user [user: User]
         Remove a trusted user. You must be a trusted user to do this.
         There is also a 10-minute cooldown to prevent raids!"""
-        my_user_data = await self.cache.get_user_data(
-            inter.author.id,
-            default=problems_module.UserData(
-                user_id=inter.author.id, trusted=False, blacklisted=False
-            ),
-        )
+        my_user_data = await self.bot.ctx_for(inter).user_data()
         if not my_user_data.trusted:
             await inter.send(
                 embed=ErrorEmbed("You aren't a trusted user!"), ephemeral=True
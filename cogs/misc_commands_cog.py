@@ -294,7 +294,7 @@ class MiscCommandsCog(HelperCog):
             )
             return
         vote_threshold = int(threshold)  # Probably unnecessary
-        for problem in await self.bot.cache.get_global_problems():
+        for problem in list((await self.bot.cache.get_global_problems()).values()):
             if (
                 problem.get_num_voters() >= vote_threshold
             ):  # Delete the problem if the number of votes the problem has is above the new threshold.
@@ -31,7 +31,6 @@ from helpful_modules.custom_bot import TheDiscordMathProblemBot
 from helpful_modules.custom_embeds import ErrorEmbed, SuccessEmbed
 from helpful_modules.problem_generator import generate_arithmetic_problem, generate_linear_algebra_problem
 
-from helpful_modules.threads_or_useful_funcs import generate_new_id
 from .helper_cog import HelperCog
 
 PROBLEM_GENERATORS = [generate_arithmetic_problem, generate_linear_algebra_problem]
@@ -77,22 +76,11 @@ class ProblemGenerationCog(HelperCog):
             return await inter.send(
                 embed=ErrorEmbed("You can only create a positive number of problems")
             )
-        for i in range(num_new_problems_to_generate):  # basic problems for now.... :(
-            print(i)
-            # TODO: linear equations, etc
-
-            while True:
-                problem_id = generate_new_id()
-                try:
-                    already_existing_problem=await self.cache.get_problem(None, problem_id)
-                    print(already_existing_problem)
-                except problems_module.ProblemNotFound:
-                    break
-
-            problem_generator = random.choice(PROBLEM_GENERATORS)
-            problem = problem_generator()
-            print(problem)
-            await self.cache.add_problem(problem_id, problem)
+        # basic problems for now.... :(
+        # TODO: linear equations, etc
+        # The ids are random 53-bit numbers (see generate_new_id), and add_problems checks that none of them already exist
+        problems = [random.choice(PROBLEM_GENERATORS)() for _ in range(num_new_problems_to_generate)]
+        await self.cache.add_problems(problems)  # 1 transaction for every problem
 
         try:
             await self.cache.bgsave(schedule=True)
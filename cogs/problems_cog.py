@@ -29,7 +29,7 @@ from helpful_modules.custom_bot import TheDiscordMathProblemBot
 from helpful_modules.custom_embeds import ErrorEmbed, SimpleEmbed, SuccessEmbed
 from helpful_modules.problems_module import *
 from helpful_modules.threads_or_useful_funcs import generate_new_id
-from helpful_modules.paginator_view import PaginatorView
+from helpful_modules.paginator_view import KeysetPaginatorView
 from .helper_cog import HelperCog
 
 # TODO: implement /edit_problem remove_answer (but only for authors. Warn the user and confirm using buttons if they are removing the last answer of a problem)
@@ -312,36 +312,27 @@ class ProblemsCog(HelperCog):
         List all problem ids. If show_only_guild_problems is true, then only ids of guild problems will be shown. Otherwise, only problem ids of problems that are global will be shown.
         """
         if show_only_guild_problems:
-            guild_id = inter.guild.id
+            guild_id = inter.guild_id
             if guild_id is None:
                 await inter.send(
                     "Run this command in a Discord server or set show_only_guild_problems to False!",
                     ephemeral=True,
                 )
                 return
-            if show_only_guild_problems:
-                guild_problems = await self.bot.cache.get_guild_problems(
-                    inter.guild
-                )  # TODO: could be lists
+        else:
+            guild_id = None
 
-            else:
-                guild_problems = await self.bot.cache.get_problems_by_func(
-                    func=lambda problem, guild_id: problem.guild_id == guild_id,
-                    args=[inter.guild.id],
-                )
-            thing_to_write = [str(problem) for problem in guild_problems]
-            await inter.send(
-                embed=SuccessEmbed(
-                    "\n".join(thing_to_write)[:1950], successTitle="Problem IDs:"
-                )
-            )
+        view = await KeysetPaginatorView.create(
+            user_id=inter.author.id,
+            fetch_page=lambda key: self._fetch_problems_page(
+                [guild_id], key, 100, lambda problems: "\n".join(str(problem.id) for problem in problems)
+            ),
+        )
+        if not view.text:
+            await inter.send(embed=ErrorEmbed("There are no problems!"))
             return
+        await inter.send(embed=view.create_embed(), view=view)
 
-        global_problems = await self.bot.cache.get_global_problems()
-        if isinstance(global_problems, dict):
-            global_problems = global_problems.values()
-        thing_to_write = "\n".join([str(problem.id) for problem in global_problems])
-        await inter.send(embed=SuccessEmbed(thing_to_write))
     @commands.cooldown(1, 5, commands.BucketType.user)
     @commands.slash_command(
         name="list_all_problems",
@@ -402,18 +393,48 @@ class ProblemsCog(HelperCog):
         # if not showSolvedProblems and False not in [inter.author.id in mathProblems[id]["solvers"] for id in mathProblems.keys()] or (show_guild_problems and (show_only_guild_problems and (guildMathProblems[inter.guild.id] == {}) or False not in [inter.author.id in guildMathProblems[guild_id][id]["solvers"] for id in guildMathProblems[guild_id].keys()])) or show_guild_problems and not show_only_guild_problems and False not in [inter.author.id in mathProblems[id]["solvers"] for id in mathProblems.keys()] and False not in [inter.author.id in guildMathProblems[guild_id][id]["solvers"] for id in guildMathProblems[guild_id].keys()]:
         # await inter.send("You solved all the problems! You should add a new one.", ephemeral=True)
         # return
-        pages = []
-        for guild_id in guilds_to_append_from:
-            await self.cache.cache_all_problems()
-            for problem in (await self.cache.get_problems_by_guild_id(guild_id, replace_cache=False)).values():
+        view = await KeysetPaginatorView.create(
+            user_id=inter.author.id,
+            fetch_page=lambda key: self._fetch_problems_page(
+                guilds_to_append_from,
+                key,
+                1,  # One problem per page, because a problem can be almost as long as an embed
+                lambda problems: problems[0].__str__(vote_threshold=self.bot.vote_threshold),
                 # the user solved the problem, so don't show it
-                if not show_solved_problems and problem.is_solver(inter.author):
-                    continue
-                pages.append(problem.__str__(vote_threshold=self.bot.vote_threshold))
-        if len(pages) == 0:
+                exclude_solved_by=None if show_solved_problems else inter.author.id,
+            ),
+        )
+        if not view.text:
             await inter.send(embed=ErrorEmbed("No problems match the filter..."))
             return
-        await inter.send(view=PaginatorView(user_id = inter.author.id, pages=pages))
+        await inter.send(embed=view.create_embed(), view=view)
+
+    async def _fetch_problems_page(
+        self,
+        guild_ids: typing.List[typing.Optional[int]],
+        key: typing.Optional[typing.Tuple[int, typing.Optional[int]]],
+        limit: int,
+        render: typing.Callable[[typing.List[problems_module.BaseProblem]], str],
+        exclude_solved_by: typing.Optional[int] = None,
+    ) -> typing.Tuple[str, typing.Optional[typing.Tuple[int, typing.Optional[int]]]]:
+        """Fetch a page of problems for a KeysetPaginatorView. The problems of guild_ids[0] come first, then the problems of guild_ids[1]...
+        key is (the index of the guild in guild_ids, the id of the last problem of the previous page).
+        Return the rendered page (an empty string if there are no more problems) and the key of the next page"""
+        index, after = key if key is not None else (0, None)
+        while index < len(guild_ids):
+            # One more problem than the page needs, to know whether this guild has another page
+            problems = await self.cache.get_problems_page(
+                guild_ids[index], after, limit + 1, exclude_solved_by=exclude_solved_by
+            )
+            if problems:
+                if len(problems) > limit:
+                    problems = problems[:limit]
+                    next_key = (index, problems[-1].id)
+                else:
+                    next_key = (index + 1, None) if index + 1 < len(guild_ids) else None
+                return render(problems), next_key
+            index, after = index + 1, None
+        return "", None
 
     @commands.slash_command(
         name="delallbotproblems",
@@ -550,12 +571,9 @@ class ProblemsCog(HelperCog):
 
         while True:
             problem_id = generate_new_id()
-            if problem_id not in [
-                problem.id
-                for problem in await self.cache.get_problems_by_func(
-                    func=lambda problem: True
-                )  # Get everything
-            ]:  # Make sure this id isn't already used!
+            if not await self.cache.get_problems_by_func(
+                func=problems_module.Q(id=problem_id)
+            ):  # Make sure this id isn't already used!
                 break  # Break the loop if the problem isn't already used
         if guild_question:
             # If this is a guild question, set the guild id
@@ -754,8 +772,7 @@ class ProblemsCog(HelperCog):
                 ),
                 ephemeral=True,
             )
-            problem.solvers.append(inter.author.id)
-            await self.cache.update_problem(problem, problem.id)
+            await self.bot.cache.add_solve(problem.id, inter.author.id)
 
             return
 
@@ -793,36 +810,45 @@ class ProblemsCog(HelperCog):
                 else None,  # If it's a guild problem, set the guild id to the guild_id, otherwise set it to None
                 problem_id=int(problem_id),  # Will probably have to change
             )  # Get the problem
-            if problem.is_voter(
-                inter.author
-            ):  # You can't vote for a problem you already voted for!
-                await inter.send(
-                    embed=ErrorEmbed(
-                        "You have already voted for the deletion of this problem!"
-                    ),
-                    ephemeral=True,
-                )
-                return  # Exit the command
         except problems_module.ProblemNotFound:
             await inter.send(  # The problem doesn't exist
                 embed=ErrorEmbed("This problem doesn't exist!"), ephemeral=True
             )
             return
-        problem.voters.append(inter.author.id)
-        await self.cache.update_problem(problem.id, problem)
+        # Vote, count the votes and delete the problem if it reached the vote threshold, all at once
+        try:
+            result = await self.bot.cache.add_vote_and_count(
+                problem, inter.author.id, vote_threshold=self.bot.vote_threshold
+            )
+        except problems_module.ProblemNotFound:  # It was deleted in the meantime
+            await inter.send(
+                embed=ErrorEmbed("This problem doesn't exist!"), ephemeral=True
+            )
+            return
+        except problems_module.WriteConflictException:  # The problem kept being changed while we voted
+            await inter.send(
+                embed=ErrorEmbed(
+                    "This problem is being changed right now, so your vote wasn't counted. Please try again!"
+                ),
+                ephemeral=True,
+            )
+            return
+        if not result.changed:  # You can't vote for a problem you already voted for!
+            await inter.send(
+                embed=ErrorEmbed(
+                    "You have already voted for the deletion of this problem!"
+                ),
+                ephemeral=True,
+            )
+            return  # Exit the command
+        num_votes = result.num_votes
         string_to_print = "You successfully voted for the problem's deletion! As long as this problem is not deleted, you can always un-vote. There are "
-        string_to_print += f"{problem.get_num_voters()}/{self.bot.vote_threshold} votes on this problem!"  # Tell the user how many votes there are now
+        string_to_print += f"{num_votes}/{self.bot.vote_threshold} votes on this problem!"  # Tell the user how many votes there are now
         await inter.send(
             embed=SuccessEmbed(string_to_print, title="You Successfully Voted"),
             ephemeral=True,
         )
-        if (
-            problem.get_num_voters() >= self.bot.vote_threshold
-        ):  # Has it passed the vote threshold?
-            # If it did, delete the problem
-            await self.bot.cache.remove_problem(
-                guild_id=problem.guild_id, problem_id=problem.id
-            )  # Remove the problem, after it passes the vote threshold
+        if result.deleted:  # Has it passed the vote threshold? (If it did, it was deleted)
             await inter.send(  # May cause problems in a DM
                 embed=SimpleEmbed(
                     "This problem has surpassed the threshold and has been deleted!"
@@ -867,28 +893,26 @@ class ProblemsCog(HelperCog):
                 inter.guild.id if is_guild_problem else None,
                 problem_id=int(problem_id),
             )  # Get the problem!
-            if not problem.is_voter(
-                inter.author
-            ):  # You can't un-vote unless you are voting
-                await inter.send(
-                    embed=ErrorEmbed(
-                        "You can't un-vote because you are not voting for the deletion of this problem!"
-                    ),
-                    ephemeral=True,
-                )
-                return
         except problems_module.ProblemNotFound:
             await inter.send(  # The problem doesn't exist, get_problem will raise ProblemNotFound
                 embed=ErrorEmbed("This problem doesn't exist!"), ephemeral=True
             )
             return
-        problem.voters.remove(inter.author.id)  # Remove the user id from problem
-        await problem.update_self()  # Save the changes to the database.
+        result = await self.bot.cache.remove_vote_and_count(problem.id, inter.author.id)
+        if not result.changed:  # You can't un-vote unless you are voting
+            await inter.send(
+                embed=ErrorEmbed(
+                    "You can't un-vote because you are not voting for the deletion of this problem!"
+                ),
+                ephemeral=True,
+            )
+            return
+        num_votes = result.num_votes
 
         successMessage = f"You successfully un-voted for the problem's deletion!" + (
             "As long as this problem is not deleted, you can always un-vote."
             + (
-                "There are {problem.get_num_voters()}/{self.bot.vote_threshold} votes on this problem!"
+                f"There are {num_votes}/{self.bot.vote_threshold} votes on this problem!"
             )
         )
         await inter.send(
@@ -936,29 +960,13 @@ class ProblemsCog(HelperCog):
                     )
                     return
                 elif not inter.author.guild_permissions.administrator:
-                    user_data: problems_module.UserData = (
-                        await self.bot.cache.get_user_data(
-                            user_id=inter.author.id,
-                            default=UserData(
-                                user_id=inter.author.id,
-                                trusted=False,
-                                blacklisted=False,
-                            ),
-                        )
-                    )
+                    user_data: problems_module.UserData = await self.bot.ctx_for(inter).user_data()
                     if not user_data.trusted:
                         await inter.send("Insufficient permissions.")
                         return
                 can_delete = True
             else:
-                user_data: problems_module.UserData = (
-                    await self.bot.cache.get_user_data(
-                        user_id=inter.author.id,
-                        default=UserData(
-                            user_id=inter.author.id, trusted=False, blacklisted=False
-                        ),
-                    )
-                )
+                user_data: problems_module.UserData = await self.bot.ctx_for(inter).user_data()
                 if not user_data.trusted:
                     await inter.send("Insufficient permissions.")
                     return
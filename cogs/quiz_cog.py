@@ -187,13 +187,9 @@ JSON error: {e}"""
                     guild_id=guild_id,
                 )
             )
-        already_existing_quiz_ids = [
-            quiz.id
-            for quiz in await self.cache.get_quizzes_by_func(func=lambda quiz: True)
-        ]
         while True:
             id = generate_new_id()
-            if id not in already_existing_quiz_ids:
+            if not await self.cache.get_quizzes_by_func(func=problems_module.Q(id=id)):
                 break
 
         quiz_to_create = Quiz(
@@ -215,13 +211,9 @@ JSON error: {e}"""
         """
 
         # TODO: only some people can create quizzes
-        already_existing_quiz_ids = [
-            quiz.id
-            for quiz in await self.cache.get_quizzes_by_func(func=lambda quiz: True)
-        ]
         while True:
             id = generate_new_id()
-            if id not in already_existing_quiz_ids:
+            if not await self.cache.get_quizzes_by_func(func=problems_module.Q(id=id)):
                 break
         quiz = Quiz(
             id=id,
@@ -454,12 +446,7 @@ JSON error: {e}"""
                 can_delete = True
 
             if not can_delete:
-                user_data: UserData = await self.bot.cache.get_user_data(
-                    user_id=inter.author.id,
-                    default=UserData(
-                        trusted=False, blacklisted=False, user_id=inter.author.id
-                    ),
-                )
+                user_data: UserData = await self.bot.ctx_for(inter).user_data()
                 if user_data.trusted:
                     can_delete = True
 
@@ -179,13 +179,9 @@ class CreatingQuizzesCommandsCog(HelperCog):
                     guild_id=guild_id,
                 )
             )
-        already_existing_quiz_ids = [
-            _quiz.id
-            for _quiz in await self.cache.get_quizzes_by_func(func=lambda _quiz: True)
-        ]
         while True:
             id = generate_new_id()
-            if id not in already_existing_quiz_ids:
+            if not await self.cache.get_quizzes_by_func(func=problems_module.Q(id=id)):
                 break
 
         quiz_to_create = Quiz(
@@ -211,13 +207,9 @@ class CreatingQuizzesCommandsCog(HelperCog):
 
         # TODO: only some people can create quizzes
         warnings.warn("This command has been deprecated", DeprecationWarning)
-        already_existing_quiz_ids = [
-            quiz.id
-            for quiz in await self.cache.get_quizzes_by_func(func=lambda quiz: True)
-        ]
         while True:
             id = generate_new_id()
-            if id not in already_existing_quiz_ids:
+            if not await self.cache.get_quizzes_by_func(func=problems_module.Q(id=id)):
                 break
         quiz = Quiz(
             id=id,
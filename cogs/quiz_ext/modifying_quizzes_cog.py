@@ -261,12 +261,7 @@ class ModifyingQuizzesCog(HelperCog):
                 can_delete = True
 
             if not can_delete:
-                user_data: UserData = await self.bot.cache.get_user_data(
-                    user_id=inter.author.id,
-                    default=UserData(
-                        trusted=False, blacklisted=False, user_id=inter.author.id
-                    ),
-                )
+                user_data: UserData = await self.bot.ctx_for(inter).user_data()
                 if user_data.trusted:
                     can_delete = True
 
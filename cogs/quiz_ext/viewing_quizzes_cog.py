@@ -52,14 +52,12 @@ class ViewingQuizzesCog(HelperCog):
         self, inter: disnake.ApplicationCommandInteraction, quiz_id
     ) -> bool:
         can_view_quiz: bool = False
-        if await self.bot.is_trusted(inter.author):
+        if await self.bot.ctx_for(inter).is_trusted():
             # Trusted users are global moderators, so they can view quizzes
             can_view_quiz = True
             return True
         else:
-            data = await self.cache.get_guild_data(
-                inter.guild.id, default=problems_module.GuildData.default()
-            )
+            data = await self.bot.ctx_for(inter).guild_data()
             if data.mod_check.check_for_user_passage(inter.author):
                 # Mods can view quizzes
                 can_view_quiz = True
@@ -199,20 +197,13 @@ class ViewingQuizzesCog(HelperCog):
                 else:
                     # Are they a mod?
                     if inter.guild.id is not None:
-                        data: problems_module.GuildData = (
-                            await self.bot.cache.get_guild_data(
-                                inter.guild.id,
-                                default=problems_module.GuildData.default(
-                                    guild_id=inter.guild.id
-                                ),
-                            )
-                        )
+                        data: problems_module.GuildData = await self.bot.ctx_for(inter).guild_data()
                         if data.mod_check.check_for_user_passage(inter.author):
                             # They're a mod!
                             allowed = True
 
                     if not allowed:
-                        if await self.bot.is_trusted(inter.author):
+                        if await self.bot.ctx_for(inter).is_trusted():
                             allowed = True
             if not allowed:
                 await inter.send(
@@ -232,7 +223,7 @@ class ViewingQuizzesCog(HelperCog):
                         )
                     allowed = False
 
-                if await self.bot.is_trusted(inter.author):
+                if await self.bot.ctx_for(inter).is_trusted():
                     allowed = True
         try:
             quiz: Quiz = await self.cache.get_quiz(quiz_id)
@@ -350,7 +341,7 @@ class ViewingQuizzesCog(HelperCog):
 
         allowed = False
 
-        if raw and await self.bot.is_trusted(inter.author):
+        if raw and await self.bot.ctx_for(inter).is_trusted():
             allowed = True
         # get the quiz
         try:
@@ -372,7 +363,7 @@ class ViewingQuizzesCog(HelperCog):
                         allowed = True
 
                 if allowed is False:
-                    if await self.bot.is_trusted(inter.author):
+                    if await self.bot.ctx_for(inter).is_trusted():
                         allowed = True
 
         try:
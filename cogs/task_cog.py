@@ -46,9 +46,9 @@ class TaskCog(HelperCog):
         if not isinstance(inter.bot, TheDiscordMathProblemBot):
             raise TypeError("The bot instance must be an instance of TheDiscordMathProblemBot")
         # Check if the guild is blacklisted and notify before leaving
-        if await inter.bot.is_guild_blacklisted(inter.guild):
+        if await inter.bot.ctx_for(inter).is_guild_blacklisted():  # A set lookup
             await inter.send("Your guild is blacklisted - so I am leaving this guild")
-            await inter.bot.notify_guild_on_guild_leave_because_guild_blacklist()
+            await inter.bot.notify_guild_on_guild_leave_because_guild_blacklist(inter.guild)
 
     # Task to report any failed tasks
     @tasks.loop(seconds=15)
@@ -68,9 +68,11 @@ class TaskCog(HelperCog):
     @tasks.loop(minutes=15)
     async def leaving_blacklisted_guilds_task(self):
         """Leave guilds that are blacklisted"""
-        for guild in self.bot.guilds:
-            if await self.bot.is_guild_blacklisted(guild):
-                await self.bot.notify_guild_on_guild_leave_because_guild_blacklist(guild)
+        # Reload the blacklisted guild ids in case another process changed them, then only look at the guilds we're in
+        blacklisted_guild_ids = await self.cache.refresh_blacklisted_guild_ids()
+        guilds = {guild.id: guild for guild in self.bot.guilds}
+        for guild_id in guilds.keys() & blacklisted_guild_ids:
+            await self.bot.notify_guild_on_guild_leave_because_guild_blacklist(guilds[guild_id])
 
     # Task to update cache
     @tasks.loop(seconds=15)
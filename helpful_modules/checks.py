@@ -4,7 +4,6 @@ import disnake
 from disnake.ext import commands
 
 from .custom_bot import TheDiscordMathProblemBot
-from .problems_module.user_data import UserData
 from .StatsTrack import CommandStats, CommandUsage, StreamWrapperStorer
 
 bot = None
@@ -57,7 +56,7 @@ def trusted_users_only():
             raise CustomCheckFailure("Bot is None")
         if not isinstance(inter.bot, TheDiscordMathProblemBot):
             raise TypeError("Uh oh; inter.bot isn't TheDiscordMathProblemBot")
-        if await inter.bot.is_trusted(inter.author):
+        if await inter.bot.ctx_for(inter).is_trusted():
             return True
 
         raise NotTrustedUser(
@@ -76,7 +75,7 @@ def administrator_or_trusted_users_only():
         else:
             if not isinstance(inter.bot, TheDiscordMathProblemBot):
                 raise TypeError("Uh oh")
-            if await inter.bot.is_trusted(inter.author):
+            if await inter.bot.ctx_for(inter).is_trusted():
                 return True
 
         raise CustomCheckFailure(
@@ -104,11 +103,7 @@ def is_not_blacklisted():
                 "Uh oh! We can't check whether people are denylisted if the bot is just an instance of disnake.ext.commands.Bot"
             )
 
-        user_data: UserData = await inter.bot.cache.get_user_data(
-            user_id=inter.author.id,
-            default=UserData(user_id=inter.author.id, trusted=False, blacklisted=False),
-        )
-        if user_data.blacklisted:
+        if await inter.bot.ctx_for(inter).is_blacklisted():
             raise BlacklistedException(
                 "You are denylisted from the bot!"
                 "To appeal, you must use /appeal"
@@ -126,7 +121,7 @@ def guild_not_blacklisted():
         """The actual check"""
         if not isinstance(inter.bot, TheDiscordMathProblemBot):
             raise TypeError("Uh oh! inter.bot isn't TheDiscordMathProblemBot")
-        if await inter.bot.is_guild_blacklisted(inter.guild):
+        if await inter.bot.ctx_for(inter).is_guild_blacklisted():
             await inter.send(
                 "This guild has just been blacklisted -- therefore I'm leaving."
                 f"However, my source code is available at {inter.bot.constants.SOURCE_CODE_LINK}",
@@ -160,7 +155,9 @@ def has_privileges(**privileges_required):
                 return True
             raise CustomCheckFailure("You don't have the permissions required!")
         if await inter.bot.cache.user_meets_permissions_required_to_use_command(
-            inter.author.id, privileges_required
+            inter.author.id,
+            privileges_required,
+            user_data=await inter.bot.ctx_for(inter).user_data(),  # Already loaded by the other checks
         ):
             return True
         raise CustomCheckFailure("You don't have the required privileges!")
@@ -174,7 +171,7 @@ def guild_owners_or_trusted_users_only():
     async def predicate(inter: disnake.ApplicationCommandInteraction):
         if not isinstance(inter.bot, TheDiscordMathProblemBot):
             raise TypeError("Uh oh - inter.bot isn't TheDiscordMathProblemBot")
-        if await inter.bot.is_trusted(inter.author):
+        if await inter.bot.ctx_for(inter).is_trusted():
             return True  # Trusted users can run this
         if inter.guild is None:
             raise commands.CheckFailure(
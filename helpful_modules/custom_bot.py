@@ -14,16 +14,22 @@ import helpful_modules
 from helpful_modules import problems_module
 from helpful_modules.constants_loader import BotConstants
 from helpful_modules.problems_module.cache import MathProblemCache
+from helpful_modules.problems_module.cache.lru import LRUCache
 from helpful_modules.restart_the_bot import RestartTheBot
 
 from ._error_logging import log_error
 from .FileDictionaryReader import AsyncFileDict
+from .interaction_context import InteractionContext
 from .StatsTrack import CommandStats, CommandUsage, StreamWrapperStorer
 from .threads_or_useful_funcs import modified_async_wrap
 
 WAIT = True
 TIME_TO_WAIT = 25
 ANNOUNCEMENTS_CHANNEL = 960725589260652588
+# The events after which an interaction's InteractionContext isn't needed any more
+INTERACTION_DONE_EVENTS = tuple(
+    f"on_{kind}_command_{outcome}" for kind in ("slash", "user", "message") for outcome in ("completion", "error")
+)
 
 
 class TheDiscordMathProblemBot(disnake.ext.commands.Bot):
@@ -70,6 +76,11 @@ class TheDiscordMathProblemBot(disnake.ext.commands.Bot):
         # self.blacklisted_users = kwargs.get("blacklisted_users", [])
         self.closing_things = []
         self.support_server = None
+        # The InteractionContext of the interactions that are running, by interaction id.
+        # It's dropped when the command completes (or fails); the TTL only bounds how long it's kept if neither happens
+        self._interaction_contexts = LRUCache(max_size=10000, ttl=10)
+        for event in INTERACTION_DONE_EVENTS:
+            self.add_listener(self.drop_ctx, event)
 
     def get_task(self, task_name):
         return self.tasks[task_name]
@@ -90,6 +101,17 @@ class TheDiscordMathProblemBot(disnake.ext.commands.Bot):
         self.timeStarted = time.time()
         await self._on_ready_func(self)
 
+    async def setup_hook(self) -> None:
+        """Set up what the bot needs before it connects to Discord.
+        The tables are created now (and the rows that are still pickled are re-encoded); the cached problems and quizzes
+        are loaded in the background, so the bot doesn't have to wait for every row to be read"""
+        await self.cache.start(warm=True)
+
+    async def login(self, token: str) -> None:
+        # disnake doesn't have a setup hook, but start() always logs in before connecting
+        await super().login(token)
+        await self.setup_hook()
+
     def owns_and_is_trusted(self, user: disnake.User):
         if not hasattr(self, "owner_id") or not self.owner_id or self.owner_id is None:
             return False
@@ -139,6 +161,20 @@ class TheDiscordMathProblemBot(disnake.ext.commands.Bot):
         else:
             raise TypeError()
 
+    def ctx_for(self, inter: disnake.Interaction) -> InteractionContext:
+        """Return the InteractionContext of this interaction. Every check (and the command) gets the same one,
+        so the user data and the guild data are only loaded once per interaction"""
+        ctx = self._interaction_contexts.get(inter.id)
+        if ctx is None:
+            ctx = InteractionContext(self, inter)
+            self._interaction_contexts.put(inter.id, ctx)
+        return ctx
+
+    async def drop_ctx(self, inter: disnake.Interaction, *args) -> None:
+        """Forget the InteractionContext of this interaction (called when it completes), so that nothing that runs
+        later (like a component callback) uses the user data and the guild data it loaded"""
+        self._interaction_contexts.invalidate(inter.id)
+
     async def is_trusted(
         self, user: typing.Union[disnake.User, disnake.Member]
     ) -> bool:
@@ -171,11 +207,7 @@ class TheDiscordMathProblemBot(disnake.ext.commands.Bot):
         return await self.is_blacklisted_by_guild_id(guild.id)
 
     async def is_blacklisted_by_guild_id(self, guild_id: int) -> bool:
-        data: GuildData = await self.cache.get_guild_data(
-            guild_id=guild_id,
-            default=problems_module.GuildData.default(guild_id=guild_id),
-        )
-        return data.blacklisted
+        return await self.cache.is_guild_id_blacklisted(guild_id)
 
     async def notify_guild_on_guild_leave_because_guild_blacklist(
             self, guild: disnake.Guild
@@ -0,0 +1,72 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import typing
+
+import disnake
+
+from .problems_module.GuildData import GuildData
+from .problems_module.user_data import UserData
+
+
+class InteractionContext:
+    """The user data of the author of an interaction and the guild data of its guild.
+    Each of them is loaded the first time it is needed, and then shared by every check and the command itself.
+    Get it with bot.ctx_for(inter). It's dropped when the command completes, so it's never reused by a later interaction.
+    Call invalidate() after changing the author's user data or the guild's data during the interaction."""
+
+    def __init__(self, bot, inter: disnake.Interaction):
+        self.bot = bot
+        self.user_id: int = inter.author.id
+        self.guild_id: typing.Optional[int] = inter.guild_id
+        self._user_data: typing.Optional[UserData] = None
+        self._guild_data: typing.Optional[GuildData] = None
+
+    async def user_data(self) -> UserData:
+        """The user data of the author (the default user data if they don't have any)"""
+        if self._user_data is None:
+            self._user_data = await self.bot.cache.get_user_data(
+                user_id=self.user_id,
+                default=UserData(user_id=self.user_id, trusted=False, blacklisted=False),
+            )
+        return self._user_data
+
+    async def guild_data(self) -> typing.Optional[GuildData]:
+        """The guild data of the guild (None if the interaction didn't happen in a guild)"""
+        if self.guild_id is None:
+            return None
+        if self._guild_data is None:
+            self._guild_data = await self.bot.cache.get_guild_data(
+                guild_id=self.guild_id, default=GuildData.default(guild_id=self.guild_id)
+            )
+        return self._guild_data
+
+    async def is_trusted(self) -> bool:
+        return (await self.user_data()).trusted
+
+    async def is_blacklisted(self) -> bool:
+        return (await self.user_data()).blacklisted
+
+    async def is_guild_blacklisted(self) -> bool:
+        # The cache keeps the ids of the blacklisted guilds, so the guild data doesn't have to be loaded
+        return self.guild_id is not None and await self.bot.is_blacklisted_by_guild_id(self.guild_id)
+
+    def invalidate(self) -> None:
+        """Forget what has been loaded, so that it's loaded again the next time it's needed"""
+        self._user_data = None
+        self._guild_data = None
@@ -23,7 +23,7 @@ from .my_modals import MyModal
 from .custom_embeds import ErrorEmbed
 import os
 from .checks import always_succeeding_check_unwrapped
-from typing import List
+from typing import Any, Awaitable, Callable, List, Tuple
 
 class PaginatorView(disnake.ui.View):
     user_id: int
@@ -227,3 +227,96 @@ class PaginatorView(disnake.ui.View):
                     "You didn't send an answer fast enough. You only have **15 seconds**. Please try again."
                 )
             )
+
+
+class KeysetPaginatorView(disnake.ui.View):
+    """Like PaginatorView, but each page is fetched when it is shown, so only one page is ever in memory.
+    fetch_page(key) returns the text of the page that starts at key (None for the first page)
+    and the key of the next page (None if there is no next page)."""
+
+    user_id: int
+    page_num: int
+
+    def __init__(
+        self,
+        user_id: int,
+        fetch_page: Callable[[Any], Awaitable[Tuple[str, Any]]],
+        first_page: str,
+        next_key: Any,
+        *args,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.user_id = user_id
+        self.fetch_page = fetch_page
+        self.page_num = 0
+        self.page_keys = [None]  # The keys of the pages that have been shown
+        self.text = first_page
+        self.next_key = next_key
+        self.next_page_button.disabled = next_key is None
+
+    @classmethod
+    async def create(cls, user_id: int, fetch_page: Callable[[Any], Awaitable[Tuple[str, Any]]], **kwargs) -> "KeysetPaginatorView":
+        """Fetch the first page and make the view"""
+        text, next_key = await fetch_page(None)
+        return cls(user_id, fetch_page, text, next_key, **kwargs)
+
+    async def interaction_check(self, interaction: disnake.Interaction) -> bool:
+        return interaction.author.id == self.user_id
+
+    async def _show_page(self, page_num: int, inter: disnake.MessageInteraction) -> None:
+        text, next_key = await self.fetch_page(self.page_keys[page_num])
+        if not text and page_num > 0:  # The previous page was the last one after all
+            del self.page_keys[page_num:]
+            self.next_key = None
+            self.next_page_button.disabled = True
+            await inter.edit_original_response(view=self)
+            await inter.send("This is the last page", ephemeral=True)
+            return
+        self.text, self.next_key = text, next_key
+        self.page_num = page_num
+        self.next_page_button.disabled = next_key is None
+        await inter.edit_original_response(view=self, embed=self.create_embed())
+
+    @disnake.ui.button(emoji="⬅")
+    async def prev_page_button(
+        self: "KeysetPaginatorView", button: disnake.ui.Button, inter: disnake.MessageInteraction
+    ) -> None:
+        await inter.response.defer()
+        if inter.author.id != self.user_id:
+            await inter.send(
+                "You can not interact with this because it is not yours", ephemeral=True
+            )
+            return
+        if self.page_num == 0:
+            await inter.send("This is the first page", ephemeral=True)
+            return
+        await self._show_page(self.page_num - 1, inter)
+
+    @disnake.ui.button(emoji="➡️")
+    async def next_page_button(
+        self: "KeysetPaginatorView", _: disnake.ui.Button, inter: disnake.MessageInteraction
+    ) -> None:
+        await inter.response.defer()
+        if inter.author.id != self.user_id:
+            await inter.send(
+                "You can not interact with this because it is not yours", ephemeral=True
+            )
+            return
+        if self.next_key is None:
+            await inter.send("This is the last page", ephemeral=True)
+            return
+        if self.page_num + 1 == len(self.page_keys):
+            self.page_keys.append(self.next_key)
+        await self._show_page(self.page_num + 1, inter)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+
+    def create_embed(self):
+        return disnake.Embed(
+            title=f"Page {self.page_num + 1}:",
+            description=self.text,
+            color=disnake.Color.from_rgb(50, 50, 255),
+        )
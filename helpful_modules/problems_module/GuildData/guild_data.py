@@ -52,9 +52,9 @@ class GuildData:
                 f"I expected guild_id to be an int, but I got a {guild_id.__class__.name__} instead!"
             )
         self.guild_id = guild_id
-        if not isinstance(guild_id, bool):
+        if not isinstance(blacklisted, bool):
             raise TypeError(
-                f"I expected guild_id to be an int, but I got a {guild_id.__class__.name__} instead!"
+                f"I expected blacklisted to be a bool, but I got a {blacklisted.__class__.__name__} instead!"
             )
         self.blacklisted = blacklisted
         try:
@@ -99,7 +99,7 @@ class GuildData:
             blacklisted=bool(data["blacklisted"]),
             guild_id=data["guild_id"],
             can_create_problems_check=data["can_create_problems_check"],
-            mods_check=data["mods_check"],
+            mods_check=data["mods_check"] if "mods_check" in data else data["mod_check"],  # The column is mod_check
             can_create_quizzes_check=data["can_create_quizzes_check"],
         )
 
@@ -49,7 +49,7 @@ class CheckForUserPassage:
         return cls(
             blacklisted_users=data["blacklisted_users"],
             permissions_needed=data["permissions_needed"],
-            roles_allowed=data["roles_needed"],
+            roles_allowed=data["roles_allowed"] if "roles_allowed" in data else data["roles_needed"],  # to_dict's key
             whitelisted_users=data["whitelisted_users"],
         )
 
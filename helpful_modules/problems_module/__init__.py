@@ -25,6 +25,7 @@ from .linear_algebra_problem import LinearAlgebraProblem
 from .cache import *
 from .cache_rewrite_with_redis import RedisCache
 from .errors import *
+from .query import Q
 from .quizzes import *
 from .user_data import UserData
 
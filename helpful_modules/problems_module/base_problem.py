@@ -17,8 +17,8 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
 """
 
+import ast
 import asyncio
-import pickle
 import sys
 import traceback
 import typing
@@ -28,24 +28,97 @@ from typing import Optional
 
 import disnake
 
+from .codec import decode
 from .dict_convertible import DictConvertible
 from .errors import *
+from .user_id_set import UserIdSet
 import orjson
 MAX_ANSWERS_PER_PROBLEM = 30
 ANSWER_CHAR_LIMIT = 1000
 QUESTION_CHAR_LIMIT = 2000
 
+# Every problem type, by name (the "type" in extra_stuff). Subclasses of BaseProblem are added automatically
+PROBLEM_TYPES: typing.Dict[str, typing.Type["BaseProblem"]] = {}
+
+
+def parse_extra_stuff(extra_stuff: typing.Optional[str]) -> dict:
+    """Parse the extra_stuff column of a row. It is JSON, but older versions of the bot stored a Python repr"""
+    if not extra_stuff:
+        return {"type": "BaseProblem"}
+    try:
+        return orjson.loads(extra_stuff)
+    except orjson.JSONDecodeError:
+        return ast.literal_eval(extra_stuff)
+
+
+def dump_extra_stuff(extra_stuff: dict) -> str:
+    """Serialize the extra stuff of a problem (see get_extra_stuff) for the extra_stuff column"""
+    return orjson.dumps(extra_stuff, option=orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+
+
+def _make_row_decoder(cls: typing.Type["BaseProblem"]) -> typing.Callable[[dict, dict, typing.Any], "BaseProblem"]:
+    """Make the function that turns a row of the problems table (and its parsed extra_stuff) into a problem of type cls.
+    The fields that the type needs are looked up once, here, instead of every time a row is decoded"""
+    extra_fields = tuple(cls.EXTRA_FIELDS)
+    type_name = cls.__name__
+
+    def decode_row(row: dict, extra_stuff: dict, cache) -> "BaseProblem":
+        kwargs = {}
+        for field in extra_fields:
+            if field in extra_stuff:
+                kwargs[field] = extra_stuff[field]
+            elif field in row:
+                kwargs[field] = row[field]
+        return cls(
+            question=row["question"],
+            answers=decode(row["answers"]),
+            id=int(row["problem_id"]),
+            guild_id=row["guild_id"],
+            voters=decode(row["voters"]),
+            solvers=decode(row["solvers"]),
+            author=row["author"],
+            cache=cache,
+            type=type_name,
+            **kwargs,
+        )
+
+    return decode_row
+
+
 # TODO: finish from_dict so that it knows to convert to a ComputationalProblem or a LinearAlgebraProblem or some other kind of problem
 class BaseProblem(DictConvertible):
     """For readability purposes :) This also isn't an ABC."""
 
+    # There can be a lot of problems in memory (the cache keeps all of them), so they don't have a __dict__
+    __slots__ = (
+        "type",
+        "question",
+        "answer",
+        "id",
+        "guild_id",
+        "_voters",
+        "_solvers",
+        "author",
+        "_cache",
+        "answers",
+        "tolerance",
+    )
+
+    # The keys of get_extra_stuff() that are given back to __init__ when the problem is loaded. Subclasses can override this
+    EXTRA_FIELDS: typing.ClassVar[typing.Tuple[str, ...]] = ("tolerance",)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        PROBLEM_TYPES[cls.__name__] = cls
+        cls._row_decoder = staticmethod(_make_row_decoder(cls))
+
     def __init__(
         self,
         question: str,
         id: int,
         author: int,
         answer: str = None,
-        guild_id: typing.Optional[str] = None,
+        guild_id: typing.Optional[typing.Union[int, str]] = None,
         voters: list = None,
         solvers: list = None,
         cache=None,
@@ -60,8 +133,9 @@ class BaseProblem(DictConvertible):
             solvers = []
         if answers is None:
             answers = []
-        if guild_id is not None and not isinstance(guild_id, str):
-            raise TypeError("guild_id is not an string")
+        # The guild ids are stored as integers (and come back from the database as integers)
+        if guild_id is not None and not isinstance(guild_id, (int, str)):
+            raise TypeError("guild_id is not an integer or a string")
         if not isinstance(id, int):
             raise TypeError("id is not an integer")
         if not isinstance(question, str):
@@ -72,9 +146,9 @@ class BaseProblem(DictConvertible):
             raise TypeError("answer is not a string")
         if not isinstance(author, int):
             raise TypeError("author is not an integer")
-        if not isinstance(voters, list):
+        if not isinstance(voters, (list, UserIdSet)):
             raise TypeError("voters is not a list")
-        if not isinstance(solvers, list):
+        if not isinstance(solvers, (list, UserIdSet)):
             raise TypeError("solvers is not a list")
         if not isinstance(answers, list):
             raise TypeError("answers isn't a list")
@@ -103,6 +177,24 @@ class BaseProblem(DictConvertible):
         self.answers = answers
         self.tolerance = tolerance
 
+    @property
+    def voters(self) -> UserIdSet:
+        """The ids of the users who voted for the deletion of this problem. Lists that are assigned are converted"""
+        return self._voters
+
+    @voters.setter
+    def voters(self, value: typing.Iterable[int]) -> None:
+        self._voters = value if isinstance(value, UserIdSet) else UserIdSet(value)
+
+    @property
+    def solvers(self) -> UserIdSet:
+        """The ids of the users who solved this problem. Lists that are assigned are converted"""
+        return self._solvers
+
+    @solvers.setter
+    def solvers(self, value: typing.Iterable[int]) -> None:
+        self._solvers = value if isinstance(value, UserIdSet) else UserIdSet(value)
+
     async def edit(
         self,
         question: str = None,
@@ -134,9 +226,9 @@ class BaseProblem(DictConvertible):
             raise TypeError("answer is not a string")
         if not isinstance(author, int) and author is not None:
             raise TypeError("author is not an integer")
-        if not isinstance(voters, list) and voters is not None:
+        if not isinstance(voters, (list, UserIdSet)) and voters is not None:
             raise TypeError("voters is not a list")
-        if not isinstance(solvers, list) and solvers is not None:
+        if not isinstance(solvers, (list, UserIdSet)) and solvers is not None:
             raise TypeError("solvers is not a list")
         if (
             id is not None
@@ -190,30 +282,15 @@ class BaseProblem(DictConvertible):
             await self._cache.update_problem(self.id, self)
 
     @classmethod
-    def from_row(cls, row: dict, cache=None):
-        """Convert a dictionary-ified row into a MathProblem"""
+    def from_row(cls, row: dict, cache=None, extra_stuff: typing.Optional[dict] = None):
+        """Convert a dictionary-ified row into a MathProblem.
+        extra_stuff is the parsed extra_stuff column of the row, if it has already been parsed (by convert_row_to_problem)"""
         if not isinstance(row, dict):
             raise TypeError("The problem has not been dictionary-ified")
         try:
-            answers = pickle.loads(
-                row["answers"]
-            )  # Load answers from bytes to a list (which should contain only pickleable objects)!
-            voters = pickle.loads(row["voters"])  # Do the same for voters and solvers
-            solvers = pickle.loads(row["solvers"])
-            our_row = dict()
-            our_row.update(row)
-            del our_row["problem_id"]
-            our_row["id"] = row["problem_id"]
-            our_row["answers"]=answers
-            our_row["voters"]=voters
-            our_row["solvers"]=solvers
-            our_row["tolerance"] = row.get("tolerance", None),
-            our_row.update(orjson.loads(row.get("extra_stuff", "{}").replace("'", '"')))
-            try:
-                del our_row["extra_stuff"]
-            except KeyError:
-                pass
-            return cls.from_dict(our_row, cache=cache)
+            if extra_stuff is None:
+                extra_stuff = parse_extra_stuff(row.get("extra_stuff"))
+            return cls._row_decoder(row, extra_stuff, cache)
         except BaseException as e:
             traceback.print_exception(
                 type(e), e, e.__traceback__, file=sys.stderr
@@ -250,8 +327,8 @@ class BaseProblem(DictConvertible):
             "question": self.question,
             "id": str(self.id),
             "guild_id": str(self.guild_id),
-            "voters": self.voters,
-            "solvers": self.solvers,
+            "voters": self.voters.to_list(),
+            "solvers": self.solvers.to_list(),
             "author": self.author,
             **self.get_extra_stuff(),
         }
@@ -442,4 +519,7 @@ class BaseProblem(DictConvertible):
                 self.solvers == other.solvers and
                 self.author == other.author and
                 self.get_extra_stuff() == other.get_extra_stuff()
-        )
\ No newline at end of file
+        )
+
+PROBLEM_TYPES["BaseProblem"] = BaseProblem  # __init_subclass__ isn't called for BaseProblem itself
+BaseProblem._row_decoder = staticmethod(_make_row_decoder(BaseProblem))
@@ -1,7 +1,7 @@
 from . import *
 from .misc_related_cache import MathProblemCache
 
-from .problems_related_cache import ProblemsRelatedCache
+from .problems_related_cache import ProblemsRelatedCache, VoteResult
 from .quiz_related_cache import QuizRelatedCache
 from .user_data_related_cache import UserDataRelatedCache
 from .permissions_required_related_cache import PermissionsRequiredRelatedCache
@@ -1,22 +1,19 @@
-import aiosqlite
 from aiomysql import DictCursor
 
-from ...dict_factory import dict_factory
 from ..appeal import Appeal
+from ..errors import SQLException
 from .guild_data_related_cache import GuildDataRelatedCache
 
 
 class AppealsRelatedCache(GuildDataRelatedCache):
     async def set_appeal_data(self, data: Appeal):
         assert isinstance(data, Appeal)  # Basic type-checking
-
-            async with aiosqlite.connect(self.db) as conn:
+        if self.use_sqlite:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
-                    """INSERT INTO appeals (special_id, appeal_str, appeal_num, user_id, timestamp,type) 
-                    VALUES (?,?,?,?,?,?) 
-                    ON CONFLICT REPLACE 
-                    special_id=?, appeal_str=?, appeal_num=?, user_id=?, timestamp=?, type=?""",
+                    """INSERT OR REPLACE INTO appeals (special_id, appeal_str, appeal_num, user_id, timestamp, type)
+                    VALUES (?,?,?,?,?,?)""",
                     (
                         data.special_id,
                         data.appeal_str,
@@ -24,17 +21,10 @@ class AppealsRelatedCache(GuildDataRelatedCache):
                         data.user_id,
                         data.timestamp,
                         data.type,
-                        data.special_id,
-                        data.appeal_str,
-                        data.appeal_num,
-                        data.user_id,
-                        data.timestamp,
-                        data.type,
                     ),
                 )  # TODO: test
-                await conn.commit()
         else:
-            with self.get_a_connection() as connection:
+            async with self.get_a_connection() as connection:
                 cursor = await connection.cursor(DictCursor)
                 await cursor.execute(
                     """INSERT INTO appeals (special_id, appeal_str, appeal_num, user_id, timestamp,type) 
@@ -62,8 +52,7 @@ class AppealsRelatedCache(GuildDataRelatedCache):
         assert isinstance(default, Appeal)
 
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db) as conn:
-                conn.row_factory = dict_factory
+            async with self._sqlite_pool.reader() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     "SELECT * FROM appeals WHERE special_id = ?", (special_id,)
@@ -93,34 +82,34 @@ class AppealsRelatedCache(GuildDataRelatedCache):
                     raise SQLException(
                         "There were too many rows with the same special id in the appeals table!"
                     )
-async def initialize_sql_table(self) -> None:
-    """Initialize SQL table for appeals."""
-    await super().initialize_sql_table()
-    if self.use_sqlite:
-        async with aiosqlite.connect(self.db) as conn:
-            cursor = await conn.cursor()
-            await cursor.execute(
-                """CREATE TABLE IF NOT EXISTS appeals (
-                    special_id INTEGER PRIMARY KEY,
-                    appeal_str TEXT,
-                    appeal_num INTEGER,
-                    user_id INTEGER,
-                    timestamp INTEGER,
-                    type TEXT
-                )"""
-            )
-            await conn.commit()
-    else:
-        async with self.get_a_connection() as connection:
-            cursor = await connection.cursor(DictCursor)
-            await cursor.execute(
-                """CREATE TABLE IF NOT EXISTS appeals (
-                    special_id BIGINT PRIMARY KEY,
-                    appeal_str TEXT,
-                    appeal_num INT,
-                    user_id BIGINT,
-                    timestamp BIGINT,
-                    type TEXT
-                )"""
-            )
-            await connection.commit()
+
+    async def initialize_sql_table(self) -> None:
+        """Initialize SQL table for appeals."""
+        await super().initialize_sql_table()
+        if self.use_sqlite:
+            async with self._sqlite_pool.writer() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute(
+                    """CREATE TABLE IF NOT EXISTS appeals (
+                        special_id INTEGER PRIMARY KEY,
+                        appeal_str TEXT,
+                        appeal_num INTEGER,
+                        user_id INTEGER,
+                        timestamp INTEGER,
+                        type TEXT
+                    )"""
+                )
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
+                    """CREATE TABLE IF NOT EXISTS appeals (
+                        special_id BIGINT PRIMARY KEY,
+                        appeal_str TEXT,
+                        appeal_num INT,
+                        user_id BIGINT,
+                        timestamp BIGINT,
+                        type TEXT
+                    )"""
+                )
+                await connection.commit()
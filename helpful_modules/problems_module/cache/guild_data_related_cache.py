@@ -1,44 +1,42 @@
 import asyncio
 import copy
+import json
+import typing
 
 import aiomysql
-import aiosqlite
 from aiomysql import DictCursor
 
 from ...dict_factory import dict_factory
 from ..GuildData.guild_data import GuildData
-from ..mysql_connector_with_stmt import *
-from ..mysql_connector_with_stmt import mysql_connection
+from ..errors import SQLException
 from .permissions_required_related_cache import PermissionsRequiredRelatedCache
 
 
 class GuildDataRelatedCache(PermissionsRequiredRelatedCache):
     async def set_guild_data(self, data: GuildData):
-        """Set the guild data given in the cache. The guild id will be inferred."""
+        """Set the guild data given in the cache. The guild id will be inferred.
+        The blacklisted guild ids (see is_guild_id_blacklisted) are updated too"""
         assert isinstance(data, GuildData)  # Basic type-checking
+        # The checks are stored as JSON, which is what GuildData parses
+        values = (
+            data.guild_id,
+            int(data.blacklisted),
+            json.dumps(data.can_create_problems_check.to_dict()),
+            json.dumps(data.can_create_quizzes_check.to_dict()),
+            json.dumps(data.mods_check.to_dict()),
+        )
 
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
-                    """INSERT INTO guild_data (guild_id, blacklisted, can_create_problems_check, can_create_quizzes_check, mod_check) 
-                    VALUES (?,?,?,?,?) 
-                    ON CONFLICT REPLACE 
-                    guild_id = ?, blacklisted=?, can_create_problems_check = ?, can_create_quizzes_check = ?, mod_check = ?""",
-                    (
-                        data.guild_id,
-                        int(data.blacklisted),
-                        str(data.can_create_problems_check.to_dict()),
-                        str(data.can_create_quizzes_check.to_dict()),
-                        str(data.mods_check.to_dict()),
-                        data.guild_id,
-                        int(data.blacklisted),
-                        str(data.can_create_problems_check.to_dict()),
-                        str(data.can_create_quizzes_check.to_dict()),
-                        str(data.mods_check.to_dict()),
-                    ),
-                )  # TODO: test
-                await conn.commit()
+                    """INSERT INTO guild_data (guild_id, blacklisted, can_create_problems_check, can_create_quizzes_check, mod_check)
+                    VALUES (?,?,?,?,?)
+                    ON CONFLICT(guild_id) DO UPDATE SET blacklisted=excluded.blacklisted,
+                    can_create_problems_check=excluded.can_create_problems_check,
+                    can_create_quizzes_check=excluded.can_create_quizzes_check, mod_check=excluded.mod_check""",
+                    values,
+                )
         else:
             async with self.get_a_connection() as connection:
                 cursor = await connection.cursor(DictCursor)
@@ -46,28 +44,21 @@ class GuildDataRelatedCache(PermissionsRequiredRelatedCache):
                     """INSERT INTO guild_data (guild_id, blacklisted, can_create_problems_check, can_create_quizzes_check, mod_check)
                     VALUES (%s, %s, %s, %s, %s)
                     ON DUPLICATE KEY UPDATE
-                    guild_id=?, blacklisted=?, can_create_problems_check=?, can_create_quizzes_check=?, mod_check = ?""",
-                    (
-                        data.guild_id,
-                        int(data.blacklisted),
-                        str(data.can_create_problems_check.to_dict()),
-                        str(data.can_create_quizzes_check.to_dict()),
-                        str(data.mods_check.to_dict()),
-                        data.guild_id,
-                        int(data.blacklisted),
-                        str(data.can_create_problems_check.to_dict()),
-                        str(data.can_create_quizzes_check.to_dict()),
-                        str(data.mods_check.to_dict()),
-                    ),
+                    guild_id=%s, blacklisted=%s, can_create_problems_check=%s, can_create_quizzes_check=%s, mod_check = %s""",
+                    values + values,
                 )  # TODO: test this
+        if self._blacklisted_guild_ids is not None:
+            if data.blacklisted:
+                self._blacklisted_guild_ids.add(data.guild_id)
+            else:
+                self._blacklisted_guild_ids.discard(data.guild_id)
 
     async def get_guild_data(self, guild_id: int, default: GuildData):
         assert isinstance(guild_id, int)
         assert isinstance(default, GuildData)
 
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db) as conn:
-                conn.row_factory = dict_factory
+            async with self._sqlite_pool.reader() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     "SELECT * FROM guild_data WHERE guild_id = ?", (guild_id,)
@@ -98,11 +89,37 @@ class GuildDataRelatedCache(PermissionsRequiredRelatedCache):
                         "There were too many rows with the same guild id in guild data"
                     )
 
+    async def get_guild_data_many(self, guild_ids: typing.Iterable[int]) -> typing.Dict[int, GuildData]:
+        """Return a dictionary of the guild data of these guilds (the guilds that don't have any are left out).
+        It is read with 1 query per 500 guilds, instead of 1 query per guild"""
+        guild_ids = list(dict.fromkeys(guild_ids))
+        assert all(isinstance(guild_id, int) for guild_id in guild_ids)
+        placeholder = "?" if self.use_sqlite else "%s"
+        rows = []
+        if self.use_sqlite:
+            async with self._sqlite_pool.reader() as conn:
+                cursor = await conn.cursor()
+                for chunk in self._chunks(guild_ids):
+                    await cursor.execute(
+                        f"SELECT * FROM guild_data WHERE guild_id IN ({','.join([placeholder] * len(chunk))})", tuple(chunk)
+                    )
+                    rows.extend(await cursor.fetchall())
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                for chunk in self._chunks(guild_ids):
+                    await cursor.execute(
+                        f"SELECT * FROM guild_data WHERE guild_id IN ({','.join([placeholder] * len(chunk))})", tuple(chunk)
+                    )
+                    rows.extend(await cursor.fetchall())
+        guild_data = {row["guild_id"]: GuildData.from_dict(row) for row in rows}
+        return {guild_id: guild_data[guild_id] for guild_id in guild_ids if guild_id in guild_data}
+
     async def initialize_sql_table(self) -> None:
         """Initialize SQL table for guild data."""
         await super().initialize_sql_table()
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     """CREATE TABLE IF NOT EXISTS guild_data (
@@ -113,7 +130,6 @@ class GuildDataRelatedCache(PermissionsRequiredRelatedCache):
                         mod_check TEXT
                     )"""
                 )
-                await conn.commit()
         else:
             async with self.get_a_connection() as connection:
                 cursor = await connection.cursor(DictCursor)
@@ -0,0 +1,142 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+A small in-process cache with a maximum size (the least recently used entry is evicted first)
+and a time to live (entries older than ttl seconds are treated as missing).
+The TTL bounds how stale an entry can be when another process changes the database.
+A read that misses can pass the generation of the key to put, so that the value it read isn't cached if the key was
+invalidated while it was being read.
+"""
+import time
+import typing
+from collections import OrderedDict
+
+MISSING = object()
+
+
+class LRUCache:
+    """An LRU cache with a TTL. It isn't thread-safe, but it doesn't need to be (everything runs in the event loop)"""
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl: typing.Optional[float] = 60.0,
+        timer: typing.Callable[[], float] = time.monotonic,
+    ):
+        if max_size < 0:
+            raise ValueError("max_size must not be negative")
+        self.max_size = max_size
+        self.ttl = ttl
+        self.timer = timer
+        self._entries: "OrderedDict[typing.Hashable, typing.Tuple[float, typing.Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # The keys invalidated most recently (at most max_size of them), with the number of invalidations when it happened
+        self._generations: "OrderedDict[typing.Hashable, int]" = OrderedDict()
+        self._invalidations = 0
+        # The generation of the keys that aren't in _generations (it's at least the generation of any key forgotten)
+        self._oldest_generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return self.peek(key, MISSING) is not MISSING
+
+    def peek(self, key, default=None):
+        """Return the value without counting a hit or a miss and without making it more recently used"""
+        try:
+            expires_at, value = self._entries[key]
+        except KeyError:
+            return default
+        if self.timer() >= expires_at:
+            return default
+        return value
+
+    def get(self, key, default=None):
+        """Return the value of key, or default if it isn't cached (or has expired)"""
+        try:
+            expires_at, value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        if self.timer() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def generation(self, key) -> int:
+        """Return a number that changes every time key is invalidated. Read it before reading the value, and pass it
+        to put"""
+        return self._generations.get(key, self._oldest_generation)
+
+    def put(self, key, value, generation: typing.Optional[int] = None) -> None:
+        """Cache value. If the cache is full, the least recently used entry is evicted.
+        If generation isn't None and key was invalidated since generation was read, nothing is cached
+        (the value may be older than what invalidated it)"""
+        if self.max_size == 0:
+            return
+        if generation is not None and generation != self.generation(key):
+            return
+        expires_at = float("inf") if self.ttl is None else self.timer() + self.ttl
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key) -> None:
+        """Forget key (if it is cached)"""
+        self._entries.pop(key, None)
+        self._invalidations += 1
+        self._generations[key] = self._invalidations
+        self._generations.move_to_end(key)
+        while len(self._generations) > max(self.max_size, 1):
+            _, self._oldest_generation = self._generations.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forget everything. The counters are kept"""
+        self._entries.clear()
+        self._invalidations += 1
+        self._generations.clear()
+        self._oldest_generation = self._invalidations
+
+    def values(self) -> typing.Iterator[typing.Any]:
+        """The values that haven't expired, from the least recently used to the most recently used"""
+        now = self.timer()
+        return (value for expires_at, value in list(self._entries.values()) if now < expires_at)
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of the lookups that were hits (0 if there weren't any lookups)"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> typing.Dict[str, typing.Union[int, float]]:
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
@@ -0,0 +1,168 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+Approximate memory accounting for the objects that MathProblemCache keeps in memory, and a memory budget
+that decides which guild's problems to stop caching (the least recently used guild first) when it is exceeded.
+"""
+import sys
+import typing
+import weakref
+from array import array
+from collections import OrderedDict
+
+from ..base_problem import BaseProblem
+from ..user_id_set import UserIdSet
+
+# Attributes that refer to something that isn't owned by the object (the cache, or the bot)
+_NOT_OWNED = frozenset(("cache", "_cache", "bot"))
+_PROXY_TYPES = (weakref.ProxyType, weakref.CallableProxyType, weakref.ReferenceType)
+_ATOMS = (str, bytes, int, float, bool, type(None), array)
+# The memory used by an entry of a dictionary (and of the indexes of the problems): a rough estimate
+DICT_ENTRY_SIZE = 100
+
+
+def approximate_size(obj, _seen: typing.Optional[typing.Set[int]] = None) -> int:
+    """Return approximately how many bytes obj and the objects it owns use.
+    Objects that are referred to more than once are only counted once. References to the cache aren't followed"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen or type(obj) in _PROXY_TYPES:
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, _ATOMS):
+        return size
+    if isinstance(obj, UserIdSet):
+        return size + (0 if obj._ids is None else sys.getsizeof(obj._ids))
+    if isinstance(obj, dict):
+        return size + sum(approximate_size(key, _seen) + approximate_size(value, _seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(approximate_size(item, _seen) for item in obj)
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if name not in _NOT_OWNED and hasattr(obj, name):
+                size += approximate_size(getattr(obj, name), _seen)
+    attributes = getattr(obj, "__dict__", None)
+    if attributes is not None:
+        size += sys.getsizeof(attributes) + sum(
+            approximate_size(value, _seen) for name, value in attributes.items() if name not in _NOT_OWNED
+        )
+    return size
+
+
+def problem_size(problem: BaseProblem) -> int:
+    """approximate_size(problem), but faster for the most common kind of problem (a BaseProblem),
+    because this is called for every problem when every problem is loaded"""
+    if type(problem) is not BaseProblem:
+        return approximate_size(problem)
+    getsizeof = sys.getsizeof
+    size = getsizeof(problem) + getsizeof(problem.question) + getsizeof(problem.answers) + 2 * getsizeof(problem.id)
+    size += sum(map(getsizeof, problem.answers))
+    for users in (problem._voters, problem._solvers):
+        size += getsizeof(users) + (0 if users._ids is None else getsizeof(users._ids))
+    return size
+
+
+class MemoryBudget:
+    """How many bytes each guild's cached problems use (approximately), in least recently used order.
+    Other cached things (like the quizzes) are counted too, but they can't be evicted.
+    It isn't thread-safe, but it doesn't need to be (everything runs in the event loop)"""
+
+    def __init__(self, max_bytes: typing.Optional[int] = None):
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        self.max_bytes = max_bytes  # None means that there is no limit
+        self._guild_usage: "OrderedDict[typing.Optional[int], int]" = OrderedDict()
+        self._guild_total = 0  # sum(self._guild_usage.values())
+        self._other_usage: typing.Dict[str, int] = {}
+        self.evictions = 0
+        self.evicted_bytes = 0
+
+    @property
+    def usage(self) -> int:
+        return self._guild_total + sum(self._other_usage.values())
+
+    def guild_usage(self, guild_id: typing.Optional[int]) -> int:
+        return self._guild_usage.get(guild_id, 0)
+
+    def __contains__(self, guild_id: typing.Optional[int]) -> bool:
+        """Whether the problems of this guild are counted"""
+        return guild_id in self._guild_usage
+
+    def charge(self, guild_id: typing.Optional[int], num_bytes: int) -> None:
+        """Count num_bytes more (or less, if it is negative) for the guild.
+        If more bytes are counted, it becomes the most recently used guild"""
+        old = self._guild_usage.get(guild_id, 0)
+        self._guild_usage[guild_id] = max(old + num_bytes, 0)
+        self._guild_total += self._guild_usage[guild_id] - old
+        if num_bytes > 0:
+            self._guild_usage.move_to_end(guild_id)
+
+    def touch(self, guild_id: typing.Optional[int]) -> None:
+        """Make the guild the most recently used guild (if its problems are counted)"""
+        if guild_id in self._guild_usage:
+            self._guild_usage.move_to_end(guild_id)
+
+    def forget(self, guild_id: typing.Optional[int]) -> int:
+        """Stop counting the guild. Returns the number of bytes that were counted for it"""
+        num_bytes = self._guild_usage.pop(guild_id, 0)
+        self._guild_total -= num_bytes
+        return num_bytes
+
+    def set_other(self, name: str, num_bytes: int) -> None:
+        """Set the number of bytes used by something that isn't evicted (like the cached quizzes)"""
+        self._other_usage[name] = num_bytes
+
+    def clear(self) -> None:
+        """Stop counting every guild. The other usage and the counters are kept"""
+        self._guild_usage.clear()
+        self._guild_total = 0
+
+    def over_budget(self) -> bool:
+        return self.max_bytes is not None and self.usage > self.max_bytes
+
+    def guilds_to_evict(self, keep: typing.Container = ()) -> typing.List[typing.Optional[int]]:
+        """Return the least recently used guilds whose problems have to be evicted to get back under the budget.
+        The guilds in keep are never returned. This doesn't evict them: call evicted() for each guild after evicting it"""
+        if not self.over_budget():
+            return []
+        excess = self.usage - self.max_bytes
+        guilds = []
+        for guild_id, num_bytes in self._guild_usage.items():
+            if excess <= 0:
+                break
+            if guild_id in keep:
+                continue
+            guilds.append(guild_id)
+            excess -= num_bytes
+        return guilds
+
+    def evicted(self, guild_id: typing.Optional[int]) -> None:
+        """Record that the guild's problems were evicted"""
+        self.evictions += 1
+        self.evicted_bytes += self.forget(guild_id)
+
+    def stats(self) -> typing.Dict[str, typing.Union[int, float, None]]:
+        return {
+            "usage": self.usage,
+            "max_bytes": self.max_bytes,
+            "guilds": len(self._guild_usage),
+            "evictions": self.evictions,
+            "evicted_bytes": self.evicted_bytes,
+            **{f"{name}_usage": num_bytes for name, num_bytes in self._other_usage.items()},
+        }
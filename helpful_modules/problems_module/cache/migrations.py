@@ -0,0 +1,402 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+Versioned schema migrations.
+The version of the schema is stored in the schema_version table (one row per applied migration).
+Every time the cache starts, the migrations that haven't been applied yet are applied in order.
+Each migration checks what already exists before changing anything,
+because databases created by older versions of the bot don't all have the same tables.
+"""
+import logging
+import time
+import typing
+
+import orjson
+from aiomysql import DictCursor
+
+from ..base_problem import dump_extra_stuff, parse_extra_stuff
+from ..errors import SQLException
+
+log = logging.getLogger(__name__)
+
+MigrationStep = typing.Callable[[typing.Any, typing.Any], typing.Awaitable[None]]
+
+
+class Migration:
+    """A change to the schema. sqlite and mysql are coroutine functions that take (cache, cursor)"""
+
+    def __init__(self, version: int, description: str, sqlite: MigrationStep, mysql: MigrationStep):
+        self.version = version
+        self.description = description
+        self.sqlite = sqlite
+        self.mysql = mysql
+
+    def __repr__(self):
+        return f"Migration(version={self.version}, description={self.description!r})"
+
+
+# Helpers
+
+
+async def _sqlite_columns(cursor, table: str) -> typing.List[str]:
+    await cursor.execute(f"PRAGMA table_info({table})")
+    return [row["name"].lower() for row in await cursor.fetchall()]
+
+
+async def _mysql_columns(cursor, table: str) -> typing.List[str]:
+    await cursor.execute(
+        "SELECT COLUMN_NAME AS name FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,),
+    )
+    return [row["name"].lower() for row in await cursor.fetchall()]
+
+
+async def _mysql_index_exists(cursor, table: str, index_name: str) -> bool:
+    await cursor.execute(
+        "SELECT 1 FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (table, index_name),
+    )
+    return len(await cursor.fetchall()) > 0
+
+
+async def _back_up_duplicates(cursor, table: str, column: str) -> int:
+    """Copy every row of table whose column is the same as another row's into {table}_duplicates
+    (made if needed), and log each of them, before the duplicates are deleted.
+    Returns the number of rows copied"""
+    duplicated = (
+        f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL "
+        f"GROUP BY {column} HAVING COUNT(*) > 1"
+    )
+    await cursor.execute(f"SELECT * FROM {table} WHERE {column} IN ({duplicated})")
+    rows = await cursor.fetchall()
+    if not rows:
+        return 0
+    await cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {table}_duplicates AS SELECT * FROM {table} WHERE 1 = 0"
+    )
+    await cursor.execute(
+        f"INSERT INTO {table}_duplicates SELECT * FROM {table} WHERE {column} IN ({duplicated})"
+    )
+    for row in rows:
+        log.warning(f"{table} has more than 1 row with the same {column} as this one: {dict(row)}")
+    log.warning(
+        f"Only one row of each {column} of {table} will be kept. "
+        f"The {len(rows)} rows above were copied to {table}_duplicates first"
+    )
+    return len(rows)
+
+
+async def _sqlite_unique_index(cursor, table: str, column: str) -> None:
+    """Back up the duplicate rows, delete them (keeping the newest one), then add a unique index"""
+    if await _back_up_duplicates(cursor, table, column):
+        await cursor.execute(
+            f"""DELETE FROM {table} WHERE {column} IS NOT NULL AND rowid NOT IN (
+            SELECT MAX(rowid) FROM {table} WHERE {column} IS NOT NULL GROUP BY {column})"""
+        )
+    await cursor.execute(
+        f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_{column}_unique ON {table} ({column})"
+    )
+
+
+async def _mysql_unique_index(cursor, table: str, column: str) -> None:
+    """Same as _sqlite_unique_index. MySQL rows have no rowid, so if there are duplicates,
+    the table is copied into a new table that already has the unique index
+    (INSERT IGNORE keeps the first row)"""
+    index_name = f"{table}_{column}_unique"
+    if await _mysql_index_exists(cursor, table, index_name):
+        return
+    if not await _back_up_duplicates(cursor, table, column):
+        await cursor.execute(f"CREATE UNIQUE INDEX {index_name} ON {table} ({column})")
+        return
+    await cursor.execute(f"DROP TABLE IF EXISTS {table}_deduplicated")
+    await cursor.execute(f"CREATE TABLE {table}_deduplicated LIKE {table}")
+    await cursor.execute(f"CREATE UNIQUE INDEX {index_name} ON {table}_deduplicated ({column})")
+    await cursor.execute(f"INSERT IGNORE INTO {table}_deduplicated SELECT * FROM {table}")
+    await cursor.execute(f"RENAME TABLE {table} TO {table}_old, {table}_deduplicated TO {table}")
+    await cursor.execute(f"DROP TABLE {table}_old")
+
+
+async def _mysql_index(cursor, table: str, name: str, columns: str) -> None:
+    if not await _mysql_index_exists(cursor, table, name):
+        await cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+# The migrations
+# Never change a migration that has been released: add a new one instead.
+
+DEFAULT_EXTRA_STUFF = str({"type": "BaseProblem"})
+
+
+async def _add_extra_stuff_sqlite(cache, cursor) -> None:
+    if "extra_stuff" not in await _sqlite_columns(cursor, "problems"):
+        # SQLite needs a constant default to add a NOT NULL column
+        # (and placeholders aren't allowed here)
+        default = DEFAULT_EXTRA_STUFF.replace("'", "''")
+        await cursor.execute(
+            f"ALTER TABLE problems ADD COLUMN extra_stuff TEXT(20000) NOT NULL DEFAULT '{default}'"
+        )
+
+
+async def _add_extra_stuff_mysql(cache, cursor) -> None:
+    if "extra_stuff" not in await _mysql_columns(cursor, "problems"):
+        await cursor.execute("ALTER TABLE problems ADD COLUMN extra_stuff TEXT(20000) NOT NULL")
+        await cursor.execute("UPDATE problems SET extra_stuff = %s", (DEFAULT_EXTRA_STUFF,))
+
+
+async def _move_voters_and_solvers(cache, cursor) -> None:
+    await cache._move_voters_and_solvers_into_their_tables(cursor)
+
+
+async def _unique_indexes_sqlite(cache, cursor) -> None:
+    # get_problem raises TooManyProblems otherwise
+    await _sqlite_unique_index(cursor, "problems", "problem_id")
+    await _sqlite_unique_index(cursor, "user_data", "user_id")
+    await _sqlite_unique_index(cursor, "quiz_submission_sessions", "special_id")
+
+
+async def _unique_indexes_mysql(cache, cursor) -> None:
+    await _mysql_unique_index(cursor, "problems", "problem_id")
+    await _mysql_unique_index(cursor, "quiz_submission_sessions", "special_id")
+    # user_data.user_id is already the primary key in MySQL
+
+
+async def _lookup_indexes_sqlite(cache, cursor) -> None:
+    await cursor.execute("CREATE INDEX IF NOT EXISTS problems_guild_id ON problems (guild_id)")
+    await cursor.execute("CREATE INDEX IF NOT EXISTS problems_author ON problems (author)")
+    await cursor.execute("CREATE INDEX IF NOT EXISTS quizzes_quiz_id ON quizzes (quiz_id)")
+    await cursor.execute(
+        "CREATE INDEX IF NOT EXISTS quiz_submissions_quiz_id_user_id "
+        "ON quiz_submissions (quiz_id, user_id)"
+    )
+
+
+async def _lookup_indexes_mysql(cache, cursor) -> None:
+    await _mysql_index(cursor, "problems", "problems_guild_id", "guild_id")
+    await _mysql_index(cursor, "problems", "problems_author", "author")
+    await _mysql_index(cursor, "quizzes", "quizzes_quiz_id", "quiz_id")
+    await _mysql_index(
+        cursor, "quiz_submissions", "quiz_submissions_quiz_id_user_id", "quiz_id, user_id"
+    )
+
+
+async def _change_log_sqlite(cache, cursor) -> None:
+    # AUTOINCREMENT, so that the sequence numbers of pruned rows are never reused
+    await cursor.execute(
+        """CREATE TABLE IF NOT EXISTS changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity TEXT NOT NULL,
+        entity_id INTEGER NOT NULL
+        )"""
+    )
+
+
+async def _change_log_mysql(cache, cursor) -> None:
+    await cursor.execute(
+        """CREATE TABLE IF NOT EXISTS changes (
+        seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+        entity VARCHAR(16) NOT NULL,
+        entity_id BIGINT NOT NULL
+        )"""
+    )
+
+
+async def _extra_stuff_to_json(cache, cursor) -> None:
+    """Older versions of the bot stored str(problem.get_extra_stuff()),
+    which has to be parsed with ast.literal_eval"""
+    placeholder = "?" if cache.use_sqlite else "%s"
+    await cursor.execute("SELECT problem_id, extra_stuff FROM problems")
+    updates = []
+    for row in await cursor.fetchall():
+        try:
+            orjson.loads(row["extra_stuff"])
+            continue  # Already JSON
+        except orjson.JSONDecodeError:
+            pass
+        try:
+            extra_stuff = dump_extra_stuff(parse_extra_stuff(row["extra_stuff"]))
+        except (ValueError, SyntaxError, TypeError):
+            log.warning(
+                f"The extra_stuff of problem {row['problem_id']} can't be parsed: "
+                f"{row['extra_stuff']!r}"
+            )
+            continue
+        updates.append((extra_stuff, row["problem_id"]))
+    if updates:
+        await cursor.executemany(
+            f"UPDATE problems SET extra_stuff = {placeholder} WHERE problem_id = {placeholder}",
+            updates,
+        )
+
+
+REENCODE_BATCH_SIZE = 500
+
+
+async def _reencode_pickled_values(cache, cursor) -> None:
+    position = {}  # So that the values that can't be re-encoded are only looked at once
+    total = 0
+    while True:
+        reencoded, selected = await cache._reencode_legacy_values(
+            cursor, REENCODE_BATCH_SIZE, position
+        )
+        if not selected:
+            break
+        total += reencoded
+    if total:
+        log.info(f"Re-encoded {total} pickled values")
+
+
+async def _guild_id_problem_id_index_sqlite(cache, cursor) -> None:
+    await cursor.execute(
+        "CREATE INDEX IF NOT EXISTS problems_guild_id_problem_id ON problems (guild_id, problem_id)"
+    )
+
+
+async def _guild_id_problem_id_index_mysql(cache, cursor) -> None:
+    await _mysql_index(cursor, "problems", "problems_guild_id_problem_id", "guild_id, problem_id")
+
+
+MIGRATIONS: typing.List[Migration] = [
+    Migration(
+        1,
+        "Add problems.extra_stuff to old databases",
+        _add_extra_stuff_sqlite,
+        _add_extra_stuff_mysql,
+    ),
+    Migration(
+        2,
+        "Move the pickled voters and solvers into problem_votes and problem_solves",
+        _move_voters_and_solvers,
+        _move_voters_and_solvers,
+    ),
+    Migration(
+        3,
+        "Unique indexes on problems.problem_id, user_data.user_id "
+        "and quiz_submission_sessions.special_id",
+        _unique_indexes_sqlite,
+        _unique_indexes_mysql,
+    ),
+    Migration(
+        4,
+        "Indexes on problems.guild_id, problems.author, quizzes.quiz_id "
+        "and quiz_submissions(quiz_id, user_id)",
+        _lookup_indexes_sqlite,
+        _lookup_indexes_mysql,
+    ),
+    Migration(
+        5,
+        "Add the changes table (the change log read by update_cache)",
+        _change_log_sqlite,
+        _change_log_mysql,
+    ),
+    Migration(6, "Store problems.extra_stuff as JSON", _extra_stuff_to_json, _extra_stuff_to_json),
+    Migration(
+        7,
+        "Index on problems(guild_id, problem_id) for get_problems_page",
+        _guild_id_problem_id_index_sqlite,
+        _guild_id_problem_id_index_mysql,
+    ),
+    Migration(
+        8,
+        "Re-encode the values pickled by older versions of the bot "
+        "(decode doesn't unpickle them any more)",
+        _reencode_pickled_values,
+        _reencode_pickled_values,
+    ),
+]
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+async def get_schema_version(cache) -> int:
+    """Return the version of the schema of the cache's database
+    (0 if no migrations have been applied)"""
+    if cache.use_sqlite:
+        async with cache._sqlite_pool.reader() as conn:
+            cursor = await conn.cursor()
+            await cursor.execute("SELECT MAX(version) AS version FROM schema_version")
+            row = await cursor.fetchone()
+    else:
+        async with cache.get_a_connection() as connection:
+            cursor = await connection.cursor(DictCursor)
+            await cursor.execute("SELECT MAX(version) AS version FROM schema_version")
+            row = await cursor.fetchone()
+    return row["version"] or 0
+
+
+async def run_migrations(cache, migrations: typing.Optional[typing.List[Migration]] = None) -> int:
+    """Apply every migration that hasn't been applied yet, in order.
+    Returns the number of migrations applied.
+    Every migration is applied in its own transaction, together with its row in schema_version.
+    (MySQL commits DDL statements immediately,
+    which is why the MySQL migrations check what exists before changing it.)"""
+    if migrations is None:
+        migrations = MIGRATIONS
+    if cache.use_sqlite:
+        async with cache._sqlite_pool.writer() as conn:
+            await conn.execute(
+                """CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                description TEXT,
+                applied_at INT
+                )"""
+            )
+    else:
+        async with cache.get_a_connection() as connection:
+            cursor = await connection.cursor(DictCursor)
+            await cursor.execute(
+                """CREATE TABLE IF NOT EXISTS schema_version (
+                version INT PRIMARY KEY,
+                description TEXT,
+                applied_at BIGINT
+                )"""
+            )
+    current_version = await get_schema_version(cache)
+    to_apply = sorted(
+        (migration for migration in migrations if migration.version > current_version),
+        key=lambda migration: migration.version,
+    )
+    for migration in to_apply:
+        log.info(f"Applying migration {migration.version}: {migration.description}")
+        try:
+            if cache.use_sqlite:
+                async with cache._sqlite_pool.writer() as conn:
+                    if not conn.in_transaction:
+                        # So that the DDL is rolled back too if something fails
+                        await conn.execute("BEGIN")
+                    cursor = await conn.cursor()
+                    await migration.sqlite(cache, cursor)
+                    await cursor.execute(
+                        "INSERT INTO schema_version (version, description, applied_at) "
+                        "VALUES (?, ?, ?)",
+                        (migration.version, migration.description, int(time.time())),
+                    )
+            else:
+                async with cache.get_a_connection() as connection:
+                    cursor = await connection.cursor(DictCursor)
+                    await migration.mysql(cache, cursor)
+                    await cursor.execute(
+                        "INSERT INTO schema_version (version, description, applied_at) "
+                        "VALUES (%s, %s, %s)",
+                        (migration.version, migration.description, int(time.time())),
+                    )
+        except Exception as e:
+            raise SQLException(
+                f"Migration {migration.version} ({migration.description}) failed"
+            ) from e
+    return len(to_apply)
@@ -16,179 +16,329 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
 """
 import logging
+import time
 import typing
-from copy import copy, deepcopy
 from typing import *
-import pickle
-from warnings import warn
 
-import aiosqlite
+from aiomysql import DictCursor
+
 from ..parse_problem import convert_row_to_problem
 from helpful_modules.dict_factory import dict_factory
 from ..appeal import Appeal
-from ..base_problem import BaseProblem
+from ..codec import HEADERS, decode, encode_ids, encode_json
 from ..errors import *
-from ..mysql_connector_with_stmt import mysql_connection
 from ..quizzes import Quiz, QuizProblem, QuizSolvingSession, QuizSubmission
 from ..quizzes.quiz_description import QuizDescription
-from .user_data_related_cache import UserDataRelatedCache
+from .memory_budget import approximate_size
+from .migrations import run_migrations
+from .problem_index import AUTHOR
+from .appeals_related_cache import AppealsRelatedCache
 
 log = logging.getLogger(__name__)
 
 
-class MathProblemCache(UserDataRelatedCache):
+class MathProblemCache(AppealsRelatedCache):
+    # AppealsRelatedCache brings the guild data (set_guild_data keeps the blacklisted guild ids up to date),
+    # the permissions and the appeals. The tables are all created by initialize_sql_table below
+    # update_cache reloads everything instead of applying the changes one by one if more than this many changes are pending
+    change_log_resync_threshold: int = 5000
+    # The changes table is pruned down to this many rows once it has twice as many
+    change_log_max_rows: int = 100_000
+    # On MySQL, a seq is handed out when its row is inserted, not when the transaction commits, so a change can show up
+    # below the last seq that was applied. The seqs that were missing are read again by every update_cache for this
+    # many seconds (a seq that never shows up belonged to a transaction that was rolled back)
+    change_log_gap_timeout: float = 60.0
+    # full_resync looks for missing seqs among this many seqs below the position it loaded
+    change_log_gap_window: int = 1000
+
     async def update_cache(self: "MathProblemCache") -> None:
-        """Method revamped! This method updates the cache of the guilds, the guild problems, and the cache of the global problems. Takes O(N) time"""
-        warn(message="update_cache hangs", category=PMDeprecationWarning, stacklevel=-1)
-        await self.get_all_problems()
-        guild_problems = {}
+        """Update the cached problems and quizzes.
+        The first call reloads everything (see full_resync). After that, only the problems and quizzes that were changed
+        since the last call (according to the changes table) are reloaded, so calling this when nothing changed costs 1 query.
+        If too many things changed, or if the changes that haven't been applied yet were pruned, everything is reloaded.
+        If this (or cache_all_problems, or full_resync) is already running, this waits for the running call instead of
+        starting another one.
+        If stale_while_revalidate is True and everything has been loaded before, this starts the update in the background
+        and returns immediately."""
+        if self.stale_while_revalidate and self._last_change_seq is not None:
+            self._single_flight.run_in_background(self._RELOAD, self._update_cache)
+            return
+        await self._single_flight.run(self._RELOAD, self._update_cache)
 
-        guild_ids = []
-        quiz_problems_dict = {}
-        quiz_sessions_dict = {}
-        quiz_submissions_dict = {}
+    async def _update_cache(self: "MathProblemCache") -> None:
+        oldest, newest = await self._get_change_log_bounds()
+        # _full_resync is called directly: this already runs under the _RELOAD key
+        if self._last_change_seq is None or (oldest is not None and oldest > self._last_change_seq + 1):
+            await self._full_resync()
+            return
+        now = time.monotonic()
+        missing = {seq: give_up for seq, give_up in self._missing_change_seqs.items() if give_up > now}
+        if newest is None or newest <= self._last_change_seq:
+            newest = self._last_change_seq
+            if not missing:
+                self._missing_change_seqs = missing
+                return  # Nothing changed
+        elif newest - self._last_change_seq > self.change_log_resync_threshold:
+            await self._full_resync()
+            return
+        seen = await self._apply_changes(self._last_change_seq, newest, missing.keys())
+        give_up = now + self.change_log_gap_timeout
+        for seq in range(self._last_change_seq + 1, newest + 1):
+            if seq not in seen:
+                missing[seq] = give_up
+        self._missing_change_seqs = {seq: until for seq, until in missing.items() if seq not in seen}
+        self._last_change_seq = newest
+        if oldest is not None and newest - oldest >= 2 * self.change_log_max_rows:
+            await self.prune_change_log()
+
+    async def full_resync(self: "MathProblemCache") -> None:
+        """Reload every problem and quiz from the database. Takes O(N) time.
+        If this (or cache_all_problems, or update_cache) is already running, this waits for the running call instead of
+        loading everything again"""
+        await self._single_flight.run(self._RELOAD, self._full_resync)
+
+    async def _cache_all_problems(self: "MathProblemCache") -> None:
+        # Loading only the problems wouldn't move _last_change_seq, so update_cache would apply the same changes again
+        # on top of them. Reloading everything keeps the problems, the quizzes and _last_change_seq consistent
+        await self._full_resync()
+
+    async def _full_resync(self: "MathProblemCache") -> None:
+        # The position in the change log is read first: whatever changes while everything is being loaded is applied again
+        # by the next update_cache, which is harmless. So are the seqs below it that weren't committed yet
+        oldest, newest = await self._get_change_log_bounds()
+        missing = set()
+        if newest is not None:
+            missing = await self._find_missing_change_seqs(
+                max(oldest, newest - self.change_log_gap_window + 1), newest
+            )
+        guild_problems, problem_index = await self._load_all_problems()
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                conn.row_factory = dict_factory
+            async with self._sqlite_pool.reader() as conn:
                 cursor = await conn.cursor()
-                await cursor.execute("SELECT * FROM quizzes")
-                for Row in await cursor.fetchall():
-                    quiz_problem = QuizProblem.from_row(Row, cache=copy(self))
-                    # Add the problem to the cache
-                    try:
-                        quiz_problems_dict[quiz_problem.id].append(quiz_problem)
-                    except KeyError:
-                        quiz_problems_dict[quiz_problem.id] = [quiz_problem]
-                await cursor.execute("SELECT submissions from quiz_submissions")
-                for Row in await cursor.fetchall():
-                    submission = QuizSubmission.from_dict(
-                        pickle.loads(Row["submission"]), cache=copy(self)
-                    )
-                    try:
-                        quiz_submissions_dict[submission.quiz_id].append(submission)
-                    except KeyError:
-                        quiz_submissions_dict[submission.quiz_id] = [submission]
-                await cursor.execute("SELECT * FROM quiz_submission_sessions")
-                for _row in await cursor.fetchall():
-                        session = QuizSolvingSession.from_sqlite_dict(_row, cache=self)
-                        try:
-                            quiz_sessions_dict[session.quiz_id].append(session)
-                        except KeyError:
-                            quiz_sessions_dict[session.quiz_id] = [session]
+                quiz_problems, quiz_submissions, quiz_sessions = await self._load_quizzes(cursor)
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                quiz_problems, quiz_submissions, quiz_sessions = await self._load_quizzes(cursor)
+        newest = newest or 0
+        if self._last_change_seq is not None and newest < self._last_change_seq:
+            # The cache already has newer changes than this snapshot (it can't happen while every reload goes through
+            # the _RELOAD key, but publishing would silently undo them)
+            log.warning(f"Not publishing a snapshot at change {newest}, the cache is already at {self._last_change_seq}")
+            return
+        # Everything was loaded, so it's replaced all at once
+        self._publish_problems(guild_problems, problem_index)
+        self.problem_lru.clear()
+        self._cached_quizzes_by_id = {}
+        self._cached_quiz_sizes = {}
+        self.cached_sessions = quiz_sessions
+        self.cached_submissions_organized_by_dict = quiz_submissions
+        self._replace_cached_quizzes(quiz_problems.keys(), quiz_problems)
+        give_up = time.monotonic() + self.change_log_gap_timeout
+        self._missing_change_seqs = {seq: give_up for seq in missing}
+        self._last_change_seq = newest
 
+    async def _get_change_log_bounds(self) -> typing.Tuple[typing.Optional[int], typing.Optional[int]]:
+        """Return the smallest and the largest sequence numbers in the changes table (None if it is empty).
+        Both are read from the primary key index (SQLite can only do that with 1 MIN/MAX per SELECT)"""
+        query = "SELECT (SELECT MIN(seq) FROM changes) AS oldest, (SELECT MAX(seq) FROM changes) AS newest"
+        if self.use_sqlite:
+            async with self._sqlite_pool.reader() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute(query)
+                row = await cursor.fetchone()
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute("SELECT * FROM problems")  # Get all problems
-                for row in cursor.fetchall():
-                    problem = convert_row_to_problem(row, cache=copy(self))
-                    if (
-                        problem.guild_id not in guild_ids
-                    ):  # Similar logic: Make sure it's there!
-                        guild_ids.append(problem.guild_id)
-                        guild_problems[problem.guild_id] = (
-                            {}
-                        )  # For quick, cached access?
-                    try:
-                        guild_problems[problem.guild_id][problem.id] = problem
-                    except BaseException as e:
-                        raise SQLException(
-                            "An error occurred while assigning the problem..."
-                        ) from e
-                cursor.execute("SELECT * FROM quizzes")  # Get all quiz problems
-                for row in cursor.fetchall():
-                    quiz_problem = QuizProblem.from_row(
-                        row, cache=copy(self)
-                    )  # Turn the quiz problems into QuizProblem objects
-                    try:
-                        quiz_problems_dict[quiz_problem.id].append(
-                            quiz_problem
-                        )  # Add it to the quiz with the given id
-                    except KeyError:
-                        quiz_problems_dict[quiz_problem.id] = [
-                            quiz_problem
-                        ]  # New quiz!
-                # Similar log for quiz submissions
-                cursor.execute("SELECT submissions from quiz_submissions")
-                for row in cursor.fetchall():
-                    submission = QuizSubmission.from_dict(
-                        pickle.loads(row["submission"]), cache=copy(self)
-                    )
-                    try:
-                        quiz_submissions_dict[submission.quiz_id].append(submission)
-                    except KeyError:
-                        quiz_submissions_dict[submission.quiz_id] = [submission]
-                cursor.execute("SELECT * FROM quiz_submission_sessions")
-                for _row in cursor.fetchall():
-                    session = QuizSolvingSession.from_sqlite_dict(_row, cache=self)
-                    try:
-                        quiz_sessions_dict[session.quiz_id].append(session)
-                    except KeyError:
-                        quiz_sessions_dict[session.quiz_id] = [session]
-        try:
-            global_problems = deepcopy(
-                guild_problems[None]
-            )  # Must deepcopy or weird warnings will occur
-            # TODO: fix this so this doesn't lead to errors
-        except KeyError:  # No global problems yet
-            global_problems = {}
-        # Don't deepcopy the problems
-        self.guild_problems = guild_problems
-        self.guild_ids = guild_ids
-        self.global_problems = global_problems
-        self.cached_sessions = quiz_sessions_dict
-        self.cached_quizzes = []  # Could cause a race condition
-        for _id in quiz_problems_dict.keys():
-            has_submissions = _id in list(
-                quiz_submissions_dict.keys()
-            )  # There could be a quiz with problems but not submissions
-            if has_submissions:
-                self.cached_quizzes.append(
-                    Quiz(
-                        _id,
-                        quiz_problems=quiz_problems_dict[_id],
-                        submissions=quiz_submissions_dict[_id],
-                        existing_sessions=(
-                            [quiz_sessions_dict[quiz_id]]
-                            if quiz_id in quiz_sessions_dict.keys()
-                            else []
-                        ),
-                        authors=set(
-                            (problem.author for problem in quiz_submissions_dict[_id])
-                        ),
-                    )
-                )
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(query)
+                row = await cursor.fetchone()
+        return row["oldest"], row["newest"]
 
-            else:
-                self.cached_quizzes.append(
-                    Quiz(
-                        _id,
-                        quiz_problems=quiz_problems_dict[_id],
-                        submissions=[],
-                        existing_sessions=(
-                            [quiz_sessions_dict[quiz_id]]
-                            if quiz_id in quiz_sessions_dict.keys()
-                            else []
-                        ),
-                        authors=set(
-                            (problem.author for problem in quiz_submissions_dict[_id])
-                        ),
-                    )
+    async def _find_missing_change_seqs(self, first: int, last: int) -> typing.Set[int]:
+        """Return the seqs between first and last (both included) that aren't in the changes table"""
+        if self.use_sqlite:
+            async with self._sqlite_pool.reader() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute("SELECT seq FROM changes WHERE seq >= ? AND seq <= ?", (first, last))
+                rows = await cursor.fetchall()
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute("SELECT seq FROM changes WHERE seq >= %s AND seq <= %s", (first, last))
+                rows = await cursor.fetchall()
+        return set(range(first, last + 1)) - {row["seq"] for row in rows}
+
+    async def prune_change_log(self) -> int:
+        """Delete the oldest rows of the changes table, keeping the last change_log_max_rows rows.
+        A cache that hasn't applied the deleted rows yet will reload everything. Returns the number of rows deleted."""
+        _, newest = await self._get_change_log_bounds()
+        if newest is None:
+            return 0
+        if self.use_sqlite:
+            async with self._sqlite_pool.writer() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute("DELETE FROM changes WHERE seq <= ?", (newest - self.change_log_max_rows,))
+                return cursor.rowcount
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute("DELETE FROM changes WHERE seq <= %s", (newest - self.change_log_max_rows,))
+                return cursor.rowcount
+
+    async def _apply_changes(
+        self, after: int, until: int, also: typing.Iterable[int] = ()
+    ) -> typing.Set[int]:
+        """Reload the problems and the quizzes that changed between the sequence numbers after (excluded) and until
+        (included), and in the changes whose seqs are in also. Returns the seqs of the changes that were applied"""
+        also = list(also)
+        if self.use_sqlite:
+            query = "SELECT seq, entity, entity_id FROM changes WHERE (seq > ? AND seq <= ?)"
+            if also:
+                query += f" OR seq IN ({', '.join('?' * len(also))})"
+            async with self._sqlite_pool.reader() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute(query, (after, until, *also))
+                changes = await cursor.fetchall()
+                problem_ids = list({row["entity_id"] for row in changes if row["entity"] == self._PROBLEM_CHANGE})
+                quiz_ids = list({row["entity_id"] for row in changes if row["entity"] == self._QUIZ_CHANGE})
+                problems = await self._load_problems(cursor, problem_ids)
+                quiz_problems, quiz_submissions, quiz_sessions = await self._load_quizzes(cursor, quiz_ids)
+        else:
+            query = "SELECT seq, entity, entity_id FROM changes WHERE (seq > %s AND seq <= %s)"
+            if also:
+                query += f" OR seq IN ({', '.join(['%s'] * len(also))})"
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(query, (after, until, *also))
+                changes = await cursor.fetchall()
+                problem_ids = list({row["entity_id"] for row in changes if row["entity"] == self._PROBLEM_CHANGE})
+                quiz_ids = list({row["entity_id"] for row in changes if row["entity"] == self._QUIZ_CHANGE})
+                problems = await self._load_problems(cursor, problem_ids)
+                quiz_problems, quiz_submissions, quiz_sessions = await self._load_quizzes(cursor, quiz_ids)
+
+        for problem_id in problem_ids:
+            self.problem_lru.invalidate(problem_id)
+            # The problems that were deleted (or moved to another guild) are removed first
+            self._uncache_problem(problem_id)
+        for problem in problems:
+            self._cache_problem(problem)
+
+        for quiz_id in quiz_ids:
+            for cached, loaded in (
+                (self.cached_sessions, quiz_sessions),
+                (self.cached_submissions_organized_by_dict, quiz_submissions),
+            ):
+                if quiz_id in loaded:
+                    cached[quiz_id] = loaded[quiz_id]
+                else:
+                    cached.pop(quiz_id, None)
+        self._replace_cached_quizzes(quiz_ids, quiz_problems)
+        return {row["seq"] for row in changes}
+
+    async def _load_quizzes(
+        self, cursor, quiz_ids: typing.Optional[typing.List[int]] = None
+    ) -> typing.Tuple[dict, dict, dict]:
+        """Load the problems, the submissions and the sessions of these quizzes (of every quiz if quiz_ids is None).
+        Returns 3 dictionaries whose keys are quiz ids"""
+        placeholder = "?" if self.use_sqlite else "%s"
+        if quiz_ids is None:
+            wheres = [("", ())]
+        else:
+            wheres = [
+                (f" WHERE quiz_id IN ({','.join([placeholder] * len(chunk))})", tuple(chunk))
+                for chunk in self._chunks(quiz_ids)
+            ]
+        quiz_problems_dict = {}
+        quiz_submissions_dict = {}
+        quiz_sessions_dict = {}
+        for where, params in wheres:
+            await cursor.execute("SELECT * FROM quizzes" + where, params)
+            for row in await cursor.fetchall():
+                quiz_problems_dict.setdefault(row["quiz_id"], []).append(QuizProblem.from_row(row, cache=self.handle))
+            await cursor.execute("SELECT quiz_id, submissions FROM quiz_submissions" + where, params)
+            for row in await cursor.fetchall():
+                quiz_submissions_dict.setdefault(row["quiz_id"], []).append(
+                    QuizSubmission.from_dict(decode(row["submissions"]), cache=self.handle)
                 )
-        self.cached_submissions = quiz_submissions_dict.values()
-        self.cached_submissions_organized_by_dict = quiz_submissions_dict
+            await cursor.execute("SELECT * FROM quiz_submission_sessions" + where, params)
+            for row in await cursor.fetchall():
+                # The quiz of the session is attached when the quiz is built (see _build_quiz)
+                quiz_sessions_dict.setdefault(row["quiz_id"], []).append(QuizSolvingSession.from_row(row))
+        return quiz_problems_dict, quiz_submissions_dict, quiz_sessions_dict
+
+    def _replace_cached_quizzes(self, quiz_ids: typing.Iterable[int], quiz_problems_dict: dict) -> None:
+        """Rebuild the cached quizzes with these ids (quizzes without problems are removed).
+        The sessions and the submissions must already be cached"""
+        for _id in quiz_ids:
+            if _id not in quiz_problems_dict:
+                self._cached_quizzes_by_id.pop(_id, None)
+                self._cached_quiz_sizes.pop(_id, None)
+                continue
+            quiz = self._cached_quizzes_by_id[_id] = self._build_quiz(
+                _id,
+                quiz_problems_dict[_id],
+                self.cached_submissions_organized_by_dict.get(_id, []),  # There could be a quiz with problems but not submissions
+                self.cached_sessions.get(_id, []),
+            )
+            self._cached_quiz_sizes[_id] = approximate_size(quiz)  # With its problems, submissions and sessions
+        self.cached_quizzes = list(self._cached_quizzes_by_id.values())
+        self.cached_submissions = self.cached_submissions_organized_by_dict.values()
+        self.memory_budget.set_other("quizzes", sum(self._cached_quiz_sizes.values()))
+        self._evict_guilds_over_budget()
+
+    @staticmethod
+    def _build_quiz(
+        quiz_id: int,
+        quiz_problems: typing.List[QuizProblem],
+        submissions: typing.List[QuizSubmission],
+        sessions: typing.List[QuizSolvingSession],
+    ) -> Quiz:
+        """Build a quiz out of what _load_quizzes loaded, and attach it to its sessions"""
+        quiz = Quiz(
+            quiz_id,
+            quiz_problems=quiz_problems,
+            submissions=submissions,
+            existing_sessions=sessions,
+            authors=set((problem.author for problem in quiz_problems)),
+        )
+        for session in sessions:
+            session._quiz = quiz
+        return quiz
+
+    async def get_quizzes(self, quiz_ids: typing.Iterable[int]) -> typing.Dict[int, Quiz]:
+        """Return a dictionary of the quizzes with these ids (the quizzes that don't exist are left out).
+        If every quiz has already been loaded by update_cache, the cached quizzes are returned. Otherwise,
+        the quizzes are loaded together (with a few queries for all of them, instead of a few queries per quiz)"""
+        quiz_ids = list(dict.fromkeys(quiz_ids))
+        if self._last_change_seq is not None:
+            await self.update_cache()  # Only applies the changes made since the last time
+            return {
+                quiz_id: self._cached_quizzes_by_id[quiz_id]
+                for quiz_id in quiz_ids
+                if quiz_id in self._cached_quizzes_by_id
+            }
+        if not quiz_ids:
+            return {}
+        if self.use_sqlite:
+            async with self._sqlite_pool.reader() as conn:
+                cursor = await conn.cursor()
+                quiz_problems, quiz_submissions, quiz_sessions = await self._load_quizzes(cursor, quiz_ids)
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                quiz_problems, quiz_submissions, quiz_sessions = await self._load_quizzes(cursor, quiz_ids)
+        return {
+            quiz_id: self._build_quiz(
+                quiz_id, problems, quiz_submissions.get(quiz_id, []), quiz_sessions.get(quiz_id, [])
+            )
+            for quiz_id, problems in quiz_problems.items()
+        }
 
     async def get_all_by_author_id(self, author_id: int) -> dict:
         """Return a dictionary containing everything that was created by the author"""
         assert isinstance(author_id, int)  # Make sure it is of type integer
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                conn.row_factory = dict_factory
+            async with self._sqlite_pool.reader() as conn:
                 cursor = await conn.cursor()  # Create a cursor
                 # Get all quiz problems they made
                 await cursor.execute(
@@ -198,7 +348,7 @@ class MathProblemCache(UserDataRelatedCache):
                     dict_factory(cursor, row) for row in await cursor.fetchall()
                 ]  # Get the results and convert it to a dictionary
                 quiz_problems = [
-                    QuizProblem.from_row(item, cache=copy(self))
+                    QuizProblem.from_row(item, cache=self.handle)
                     for item in quiz_problems_raw
                 ]  # Convert the rows into QuizProblems, because these will be easier to use than rows will (and it will also be more readable)
 
@@ -209,10 +359,10 @@ class MathProblemCache(UserDataRelatedCache):
                 )  # Get the submissions
                 # Convert them to QuizSubmissions!
                 quiz_submissions = [
-                    QuizSubmission.from_dict(pickle.loads(item[0]), cache=copy(self))
+                    QuizSubmission.from_dict(decode(item["submissions"]), cache=self.handle)
                     for item in await cursor.fetchall()
                 ]  # For each item: load it from bytes into a dictionary and
-                # convert the dictionary into a QuizSubmission! However, I should just pickle it directly.
+                # convert the dictionary into a QuizSubmission!
 
                 # Get the problems the author made that are not attached to a quiz
                 await cursor.execute(
@@ -221,15 +371,13 @@ class MathProblemCache(UserDataRelatedCache):
                 problems = [
                     convert_row_to_problem(row) for row in await cursor.fetchall()
                 ]
+                await self._load_voters_and_solvers(cursor, problems)
                 await cursor.execute(
                     """SELECT * FROM quiz_submission_sessions WHERE user_id = ?""",
                     (author_id,),
                 )
 
-                sessions = [
-                    QuizSolvingSession.from_sqlite_dict(cache=self, dict=item)
-                    for item in await cursor.fetchall()
-                ]
+                session_rows = list(await cursor.fetchall())
                 await cursor.execute(
                     "SELECT * FROM quiz_description WHERE author = ?", (author_id,)
                 )
@@ -243,51 +391,44 @@ class MathProblemCache(UserDataRelatedCache):
                     for data in await cursor.fetchall()
                 ]
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
-                    "SELECT * FROM quizzes WHERE author = '%s'", (author_id,)
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
+                    "SELECT * FROM quizzes WHERE author = %s", (author_id,)
                 )
                 quiz_problems = [
-                    QuizProblem.from_row(row, cache=copy(self))
-                    for row in cursor.fetchall()
+                    QuizProblem.from_row(row, cache=self.handle)
+                    for row in await cursor.fetchall()
                 ]
-                cursor.execute(
-                    "SELECT submissions FROM quiz_submissions WHERE user_id = '%s'",
+                await cursor.execute(
+                    "SELECT submissions FROM quiz_submissions WHERE user_id = %s",
                     (author_id,),
                 )
                 quiz_submissions = [
-                    QuizSubmission.from_dict(submission, cache=copy(self))
+                    QuizSubmission.from_dict(submission, cache=self.handle)
                     for submission in [
-                        pickle.loads(item["submissions"]) for item in cursor.fetchall()
+                        decode(item["submissions"]) for item in await cursor.fetchall()
                     ]
                 ]
-                cursor.execute(
-                    "SELECT * FROM problems WHERE author = '%s'", (author_id,)
+                await cursor.execute(
+                    "SELECT * FROM problems WHERE author = %s", (author_id,)
                 )
                 problems = [
-                    BaseProblem.from_dict(item, cache=copy(self))
-                    for item in cursor.fetchall()
+                    convert_row_to_problem(item, cache=self.handle)
+                    for item in await cursor.fetchall()
                 ]
-                cursor.execute(
-                    "SELECT * FROM quiz_submission_sessions WHERE author = %s",
-                    (user_id,),
+                await self._load_voters_and_solvers(cursor, problems)
+                await cursor.execute(
+                    "SELECT * FROM quiz_submission_sessions WHERE user_id = %s",
+                    (author_id,),
                 )
-                sessions = [
-                    QuizSolvingSession.from_mysql_dict(cache=self, dict=item)
-                    for item in cursor.fetchall()
-                ]
-                cursor.execute(
+                session_rows = list(await cursor.fetchall())
+                await cursor.execute(
                     "SELECT * FROM quiz_description WHERE author = %s", (author_id,)
                 )
                 descriptions = [
                     QuizDescription.from_dict(cache=self, data=data)
-                    for data in cursor.fetchall()
+                    for data in await cursor.fetchall()
                 ]
                 await cursor.execute("SELECT * FROM appeals WHERE user_id=%s", (author_id,))
                 appeals = [
@@ -295,6 +436,8 @@ class MathProblemCache(UserDataRelatedCache):
                     for data in await cursor.fetchall()
                 ]
 
+        # After the connection is released, because the quizzes of the sessions are loaded with another one
+        sessions = await QuizSolvingSession.from_rows(session_rows, cache=self)
         return {
             "quiz_problems": quiz_problems,
             "quiz_submissions": quiz_submissions,
@@ -309,8 +452,23 @@ class MathProblemCache(UserDataRelatedCache):
         assert isinstance(user_id, int)
         await self.del_user_data(user_id)
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
+                await self._record_changes_of_rows(
+                    cursor, self._PROBLEM_CHANGE, "problems", "problem_id", "author = ?", (user_id,)
+                )
+                await self._record_changes_of_rows(
+                    cursor, self._QUIZ_CHANGE, "quizzes", "quiz_id", "author = ?", (user_id,)
+                )
+                for table in ("quiz_submissions", "quiz_submission_sessions"):
+                    await self._record_changes_of_rows(
+                        cursor, self._QUIZ_CHANGE, table, "quiz_id", "user_id = ?", (user_id,)
+                    )
+                for table in ("problem_votes", "problem_solves"):
+                    await cursor.execute(
+                        f"DELETE FROM {table} WHERE problem_id IN (SELECT problem_id FROM problems WHERE author = ?)",
+                        (user_id,),
+                    )  # The votes for (and solves of) their problems
                 await cursor.execute(
                     "DELETE FROM problems WHERE author = ?", (user_id,)
                 )  # Delete all problems submitted by the author
@@ -327,28 +485,39 @@ class MathProblemCache(UserDataRelatedCache):
                     "DELETE FROM quiz_description WHERE author= ?", (user_id,)
                 )
                 await cursor.execute("DELETE FROM appeals WHERE user_id=?", (user_id,))
-                await conn.commit()  # Otherwise, nothing happens and it rolls back!!
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute("DELETE FROM problems WHERE author = '%s'", (user_id,))
-                cursor.execute("DELETE FROM quizzes WHERE author = '%s'", (user_id,))
-                cursor.execute(
-                    "DELETE FROM quiz_submissions WHERE author = '%s'", (user_id,)
-                )
-                cursor.execute(
-                    "DELETE FROM quiz_submission_sessions WHERE author = %s", (user_id,)
-                )
-                cursor.execute(
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await self._record_changes_of_rows(
+                    cursor, self._PROBLEM_CHANGE, "problems", "problem_id", "author = %s", (user_id,)
+                )
+                await self._record_changes_of_rows(
+                    cursor, self._QUIZ_CHANGE, "quizzes", "quiz_id", "author = %s", (user_id,)
+                )
+                for table in ("quiz_submissions", "quiz_submission_sessions"):
+                    await self._record_changes_of_rows(
+                        cursor, self._QUIZ_CHANGE, table, "quiz_id", "user_id = %s", (user_id,)
+                    )
+                for table in ("problem_votes", "problem_solves"):
+                    await cursor.execute(
+                        f"DELETE FROM {table} WHERE problem_id IN (SELECT problem_id FROM problems WHERE author = %s)",
+                        (user_id,),
+                    )  # The votes for (and solves of) their problems
+                await cursor.execute("DELETE FROM problems WHERE author = %s", (user_id,))
+                await cursor.execute("DELETE FROM quizzes WHERE author = %s", (user_id,))
+                await cursor.execute(
+                    "DELETE FROM quiz_submissions WHERE user_id = %s", (user_id,)
+                )
+                await cursor.execute(
+                    "DELETE FROM quiz_submission_sessions WHERE user_id = %s", (user_id,)
+                )
+                await cursor.execute(
                     "DELETE FROM quiz_description WHERE author = %s", (user_id,)
                 )
                 await cursor.execute("DELETE FROM appeals WHERE user_id=%s", (user_id,))
-                connection.commit()
+        self.problem_lru.clear()  # Their problems could be cached
+        for problem in self.problem_index.get(AUTHOR, user_id):
+            self._uncache_problem(problem.id)
 
     async def delete_all_by_guild_id(self, guild_id: int) -> None:
         """Delete all data stored by a given guild. This deletes all problems & quizzes & quiz submissions under that guild!"""
@@ -358,8 +527,20 @@ class MathProblemCache(UserDataRelatedCache):
             )
         assert isinstance(guild_id, int)
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
+                await self._record_changes_of_rows(
+                    cursor, self._PROBLEM_CHANGE, "problems", "problem_id", "guild_id = ?", (guild_id,)
+                )
+                for table in ("quizzes", "quiz_submissions", "quiz_submission_sessions"):
+                    await self._record_changes_of_rows(
+                        cursor, self._QUIZ_CHANGE, table, "quiz_id", "guild_id = ?", (guild_id,)
+                    )
+                for table in ("problem_votes", "problem_solves"):
+                    await cursor.execute(
+                        f"DELETE FROM {table} WHERE problem_id IN (SELECT problem_id FROM problems WHERE guild_id = ?)",
+                        (guild_id,),
+                    )
                 await cursor.execute(
                     "DELETE FROM problems WHERE guild_id = ?", (guild_id,)
                 )  # Delete all problems from the guild
@@ -374,41 +555,170 @@ class MathProblemCache(UserDataRelatedCache):
                     (guild_id,),
                 )  # Delete all quiz submissions from the guild!
                 await cursor.execute(
-                    "DELETE FROM quiz_description WHERE guild_id = %s", (guild_id,)
+                    "DELETE FROM quiz_description WHERE guild_id = ?", (guild_id,)
                 )
-                await conn.commit()  # Otherwise, nothing happens!
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await self._record_changes_of_rows(
+                    cursor, self._PROBLEM_CHANGE, "problems", "problem_id", "guild_id = %s", (guild_id,)
+                )
+                for table in ("quizzes", "quiz_submissions", "quiz_submission_sessions"):
+                    await self._record_changes_of_rows(
+                        cursor, self._QUIZ_CHANGE, table, "quiz_id", "guild_id = %s", (guild_id,)
+                    )
+                for table in ("problem_votes", "problem_solves"):
+                    await cursor.execute(
+                        f"DELETE FROM {table} WHERE problem_id IN (SELECT problem_id FROM problems WHERE guild_id = %s)",
+                        (guild_id,),
+                    )
+                await cursor.execute(
                     "DELETE FROM problems WHERE guild_id = %s", (guild_id,)
                 )  # Remove all guild problems from this guild
-                cursor.execute(
+                await cursor.execute(
                     "DELETE FROM quizzes WHERE guild_id = %s", (guild_id,)
                 )  # Remove all quizzes from the guild
-                cursor.execute(
+                await cursor.execute(
                     "DELETE FROM quiz_submissions WHERE guild_id = %s", (guild_id,)
                 )  # Remove all quiz submissions as well
-                cursor.execute(
+                await cursor.execute(
                     "DELETE FROM quiz_submission_sessions WHERE guild_id = %s",
                     (guild_id,),
                 )
-                cursor.execute(
+                await cursor.execute(
                     "DELETE FROM quiz_description WHERE guild_id = %s", (guild_id,)
                 )
 
                 # uh oh - we don't have a guild id
-                connection.commit()
+        self.problem_lru.clear()  # The problems of the guild could be cached
+        for problem_id in list(self.guild_problems.get(guild_id, {}).keys()):
+            self._uncache_problem(problem_id)
+        if guild_id in self._evicted_guild_ids:  # Its problems weren't cached
+            self._evicted_guild_ids.discard(guild_id)
+            self.guild_ids.discard(guild_id)
+
+    async def get_blacklisted_guild_ids(self) -> typing.Set[int]:
+        """Return the ids of the blacklisted guilds. They are loaded with one query the first time,
+        and set_guild_data keeps them up to date after that. Don't modify the returned set!"""
+        if self._blacklisted_guild_ids is None:
+            return await self.refresh_blacklisted_guild_ids()
+        return self._blacklisted_guild_ids
+
+    async def is_guild_id_blacklisted(self, guild_id: int) -> bool:
+        """Return whether the guild is blacklisted, without loading its guild data"""
+        return guild_id in await self.get_blacklisted_guild_ids()
+
+    async def refresh_blacklisted_guild_ids(self) -> typing.Set[int]:
+        """Load the ids of the blacklisted guilds from the database again
+        (in case another process blacklisted a guild) and return them"""
+        if self.use_sqlite:
+            async with self._sqlite_pool.reader() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute("SELECT guild_id FROM guild_data WHERE blacklisted")
+                rows = await cursor.fetchall()
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute("SELECT guild_id FROM guild_data WHERE blacklisted")
+                rows = await cursor.fetchall()
+        self._blacklisted_guild_ids = {row["guild_id"] for row in rows}
+        return self._blacklisted_guild_ids
 
     def __bool__(self):
         """Return bool(self)"""
         return True
 
+    # Every BLOB column: (table, column, encoder, the columns that identify a row in MySQL)
+    # In SQLite, the rows are identified by their rowid.
+    _BLOB_COLUMNS = (
+        ("problems", "answers", encode_json, ("problem_id",)),
+        ("problems", "voters", encode_ids, ("problem_id",)),
+        ("problems", "solvers", encode_ids, ("problem_id",)),
+        ("quizzes", "answer", encode_json, ("quiz_id", "problem_id")),
+        ("quizzes", "voters", encode_ids, ("quiz_id", "problem_id")),
+        ("quizzes", "solvers", encode_ids, ("quiz_id", "problem_id")),
+        ("quiz_submissions", "submissions", encode_json, ("quiz_id", "user_id")),
+        ("quiz_submission_sessions", "answers", encode_json, ("special_id",)),
+    )
+
+    async def reencode_legacy_rows(self, batch_size: int = 500) -> int:
+        """Re-encode every value that was pickled by older versions of the bot (see codec.py),
+        batch_size values per transaction. Returns the number of values that were re-encoded.
+        Migration 8 already re-encodes every pickled value when the cache starts, so this only finds
+        values that were written by an older version of the bot afterwards"""
+        position: typing.Dict[typing.Tuple[str, str], tuple] = {}
+        total = 0
+        while True:
+            if self.use_sqlite:
+                async with self._sqlite_pool.writer() as conn:
+                    reencoded, selected = await self._reencode_legacy_values(
+                        await conn.cursor(), batch_size, position
+                    )
+            else:
+                async with self.get_a_connection() as connection:
+                    reencoded, selected = await self._reencode_legacy_values(
+                        await connection.cursor(DictCursor), batch_size, position
+                    )
+            total += reencoded
+            if not selected:
+                return total
+
+    async def _reencode_legacy_values(
+        self, cursor, limit: int, position: typing.Dict[typing.Tuple[str, str], tuple]
+    ) -> typing.Tuple[int, int]:
+        """Look at the next (at most) limit pickled values with cursor, and re-encode them.
+        This is the only place (with migration 2) where pickles are loaded.
+        The rows are read in the order of their keys: position has the key of the last row looked at
+        in each (table, column), and is updated, so that values that can't be re-encoded aren't
+        selected again by the next call. Returns (the number of values that were re-encoded,
+        the number of values looked at): 0 values looked at means that there is nothing left to do"""
+        placeholder = "?" if self.use_sqlite else "%s"
+        headers = ", ".join(f"'{header.hex().upper()}'" for header in HEADERS)
+        remaining = limit
+        reencoded = 0
+        for table, column, encoder, key_columns in self._BLOB_COLUMNS:
+            if remaining <= 0:
+                break
+            if self.use_sqlite:
+                key_columns = ("rowid",)
+            keys = ", ".join(key_columns)
+            # (rowid would be renamed otherwise)
+            selected_keys = ", ".join(f"{key} AS key_{key}" for key in key_columns)
+            after = position.get((table, column))
+            where_after = ""
+            if after is not None:
+                where_after = f"AND ({keys}) > ({', '.join([placeholder] * len(after))})"
+            await cursor.execute(
+                f"""SELECT {selected_keys}, {column} AS value FROM {table}
+                WHERE {column} IS NOT NULL AND HEX(SUBSTR({column}, 1, 1)) NOT IN ({headers})
+                {where_after} ORDER BY {keys} LIMIT {int(remaining)}""",
+                after or (),
+            )
+            rows = await cursor.fetchall()
+            updates = []
+            for row in rows:
+                row_key = tuple(row[f"key_{key}"] for key in key_columns)
+                try:
+                    new_value = encoder(decode(row["value"], allow_legacy=True))
+                except Exception as e:
+                    log.warning(
+                        f"Could not re-encode the value of {table}.{column} at {row_key}: {e!r}"
+                    )
+                    continue
+                updates.append((new_value, *row_key, row["value"]))
+            if rows:
+                position[(table, column)] = tuple(rows[-1][f"key_{key}"] for key in key_columns)
+            if updates:
+                where = " AND ".join(f"{key} = {placeholder}" for key in key_columns)
+                await cursor.executemany(
+                    f"UPDATE {table} SET {column} = {placeholder} "
+                    f"WHERE {where} AND {column} = {placeholder}",
+                    updates,
+                )
+            remaining -= len(rows)
+            reencoded += len(updates)
+        return reencoded, limit - remaining
+
     async def run_sql(
         self, sql: str, placeholders: typing.Optional[typing.List[Any]] = None
     ) -> dict:
@@ -418,29 +728,21 @@ class MathProblemCache(UserDataRelatedCache):
         if placeholders is None:
             placeholders = []
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                conn.row_factory = dict_factory
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(sql, placeholders)
-                await conn.commit()
                 return await cursor.fetchall()
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(sql, placeholders)
-                connection.commit()
-                return cursor.fetchall()
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(sql, placeholders)
+                return await cursor.fetchall()
 
     async def initialize_sql_table(self):
         """Initialize my internal SQL tables. This does nothing if the internal SQL tables already exist!"""
         log.info("Initializing my internal SQL tables")
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     """CREATE TABLE IF NOT EXISTS problems (
@@ -453,7 +755,7 @@ class MathProblemCache(UserDataRelatedCache):
                         solvers BLOB NOT NULL,
                         extra_stuff TEXT(20000) NOT NULL
                         )"""
-                )  # Blob types will be compiled with pickle.loads() and pickle.dumps() (they are lists)
+                )  # Blob types are encoded with codec.py (they are lists)
                 # author: int = user_id
                 # Create table of problems
                 log.debug("Created problems table")
@@ -527,20 +829,25 @@ class MathProblemCache(UserDataRelatedCache):
                     )
                     """
                 )
+                for table in ("problem_votes", "problem_solves"):
+                    await cursor.execute(
+                        f"""CREATE TABLE IF NOT EXISTS {table} (
+                        problem_id INT NOT NULL,
+                        user_id INT NOT NULL,
+                        PRIMARY KEY (problem_id, user_id)
+                        ) WITHOUT ROWID"""
+                    )  # One row per vote (or solve), so voting is one INSERT instead of rewriting a pickled list
+                    await cursor.execute(
+                        f"CREATE INDEX IF NOT EXISTS {table}_user_id ON {table} (user_id)"
+                    )
                 # Maybe SQL won't understand enums... but that's ok :)
                 log.debug("Created user_data table")
-                await conn.commit()  # Otherwise, when this closes, the database just reverted!
                 log.debug("Saved!")
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
                 log.debug("Created cursor")
-                cursor.execute(
+                await cursor.execute(
                     """CREATE TABLE IF NOT EXISTS problems (
                         guild_id BIGINT,
                         problem_id BIGINT NOT NULL,
@@ -551,10 +858,10 @@ class MathProblemCache(UserDataRelatedCache):
                         solvers BLOB NOT NULL,
                         extra_stuff TEXT(20000) NOT NULL
                         )"""
-                )  # Blob types will be compiled with pickle.loads() and pickle.dumps() (they are lists)
+                )  # Blob types are encoded with codec.py (they are lists)
                 # author: int = user_id
                 log.debug("Created problems table!")
-                cursor.execute(
+                await cursor.execute(
                     """CREATE TABLE IF NOT EXISTS quizzes (
                     guild_id BIGINT,
                     quiz_id BIGINT NOT NULL PRIMARY KEY,
@@ -567,7 +874,7 @@ class MathProblemCache(UserDataRelatedCache):
                 )"""
                 )
                 log.debug("Created quizzes table")
-                cursor.execute(
+                await cursor.execute(
                     """CREATE TABLE IF NOT EXISTS quiz_submissions (
                     guild_id BIGINT,
                     quiz_id BIGINT NOT NULL,
@@ -577,51 +884,60 @@ class MathProblemCache(UserDataRelatedCache):
                 )  # as dictionary
                 # Used to store submissions
                 log.debug("Created submissions table")
-                cursor.execute(
+                await cursor.execute(
                     """CREATE TABLE IF NOT EXISTS user_data (
-                    user_id INT,
+                    user_id BIGINT PRIMARY KEY,
                     trusted BOOLEAN DEFAULT false,
                     blacklisted BOOLEAN DEFAULT false
                     )"""
                 )
-                cursor.execute(
+                await cursor.execute(
                     """CREATE TABLE IF NOT EXISTS quiz_submission_sessions (
-                    quiz_id INT NOT NULL,
-                    user_id INT NOT NULL,
+                    quiz_id BIGINT NOT NULL,
+                    user_id BIGINT NOT NULL,
                     is_finished INT,
-                    start_time INT,
-                    expire_time INT,
-                    guild_id INT,
+                    start_time BIGINT,
+                    expire_time BIGINT,
+                    guild_id BIGINT,
                     answers BLOB,
-                    special_id VARCHAR,
+                    special_id BIGINT,
                     attempt_num INT
                     )"""
                 )
-                cursor.execute(
-                    """CREATE TABLE IF NOT EXISTS quiz_description ("
-                               description VARCHAR,
-                               quiz_id INT PRIMARY KEY,
+                await cursor.execute(
+                    """CREATE TABLE IF NOT EXISTS quiz_description (
+                               description TEXT,
+                               quiz_id BIGINT PRIMARY KEY,
                                time_limit INT,
                                intensity FLOAT,
-                               license VARCHAR,
-                               category VARCHAR,
-                               author INT,
-                               guild_id INT,
+                               license TEXT,
+                               category TEXT,
+                               author BIGINT,
+                               guild_id BIGINT
                                )
                                """
                 )
-                cursor.execute(
+                await cursor.execute(
                     """CREATE TABLE IF NOT EXISTS guild_data (
                     blacklisted INT,
-                    guild_id INT,
-                    can_create_problems_check VARCHAR,
-                    can_create_quizzes_check VARCHAR,
-                    mod_check VARCHAR,
+                    guild_id BIGINT PRIMARY KEY,
+                    can_create_problems_check TEXT,
+                    can_create_quizzes_check TEXT,
+                    mod_check TEXT
                     )
                     """
                 )
+                for table in ("problem_votes", "problem_solves"):
+                    await cursor.execute(
+                        f"""CREATE TABLE IF NOT EXISTS {table} (
+                        problem_id BIGINT NOT NULL,
+                        user_id BIGINT NOT NULL,
+                        PRIMARY KEY (problem_id, user_id),
+                        INDEX (user_id)
+                        )"""
+                    )
                 # TODO: test whether SQL can serialize enums
                 # I don't know whether SQL can serialize enums
                 log.debug("Created user data table")
-                connection.commit()
                 log.debug("Saved tables!")
+        await run_migrations(self)  # Add the indexes (and whatever else has changed since the tables were created)
@@ -37,35 +37,33 @@ class PermissionsRequiredRelatedCache(UserDataRelatedCache):
         user_id: int,
         permissions_required: typing.Optional[typing.Dict[str, bool]] = None,
         command_name: str | None = None,
+        user_data: typing.Optional[UserData] = None,
     ) -> bool:
-        """Return whether the user meets permissions required to use the command"""
+        """Return whether the user meets permissions required to use the command.
+        If the caller already has the user's data, it can pass it as user_data, so it isn't looked up again.
+        Permissions that UserData doesn't have are ignored"""
         if permissions_required is None:
             permissions_required = await self.get_permissions_required_for_command(
                 command_name
             )
 
         await self.update_cache()
+        if user_data is None:
+            user_data = await self.get_user_data(
+                user_id, default=UserData.default(user_id=user_id)
+            )
         if "trusted" in permissions_required.keys():
-            if (
-                await self.get_user_data(
-                    user_id, default=UserData.default(user_id=user_id)
-                )
-            ).trusted != permissions_required["trusted"]:
+            if user_data.trusted != permissions_required["trusted"]:
                 return False
 
         if "blacklisted" in permissions_required.keys():
-            if (
-                (
-                    await self.get_user_data(
-                        user_id, default=UserData.default(user_id=user_id)
-                    )
-                )
-            ).blacklisted != permissions_required["blacklisted"]:
+            if user_data.blacklisted != permissions_required["blacklisted"]:
                 return False
 
+        user_data_dict = user_data.to_dict()
         for key, val in permissions_required.items():
             try:
-                if self.cached_user_data[user_id].to_dict()[key] != val:
+                if user_data_dict[key] != val:
                     return False
             except KeyError:
                 pass
@@ -0,0 +1,94 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+Indexes of the problems cached in MathProblemCache.guild_problems: by id, and for each user,
+the problems that they authored, voted for and solved (an inverted index for each relation).
+Finding a user's problems then takes O(the user's problems) time instead of going through every cached problem.
+"""
+import typing
+
+from ..base_problem import BaseProblem
+
+AUTHOR = "author"
+VOTERS = "voters"
+SOLVERS = "solvers"
+RELATIONS = (AUTHOR, VOTERS, SOLVERS)
+# The fields of a Q (see query.py) that can be looked up in the index
+RELATION_OF_FIELD = {"author": AUTHOR, "voter_contains": VOTERS, "solver_contains": SOLVERS}
+RELATION_OF_TABLE = {"problem_votes": VOTERS, "problem_solves": SOLVERS}
+
+
+class ProblemIndex:
+    """The problems by id, and user id -> {problem id: problem} for each relation.
+    The cache must tell the index about every problem that it caches or stops caching (with add and remove),
+    and about every change to the voters or the solvers of a cached problem (with add_user and remove_user)"""
+
+    def __init__(self):
+        self.by_id: typing.Dict[int, BaseProblem] = {}
+        self._by_user: typing.Dict[str, typing.Dict[int, typing.Dict[int, BaseProblem]]] = {
+            relation: {} for relation in RELATIONS
+        }
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, problem_id: int) -> bool:
+        return problem_id in self.by_id
+
+    @staticmethod
+    def _users(problem: BaseProblem, relation: str) -> typing.Iterable[int]:
+        if relation == AUTHOR:
+            return (problem.author,)
+        return getattr(problem, relation)
+
+    def add(self, problem: BaseProblem) -> None:
+        """Index the problem. If a problem with the same id is already indexed, it is replaced"""
+        self.remove(problem.id)
+        self.by_id[problem.id] = problem
+        for relation in RELATIONS:
+            for user_id in self._users(problem, relation):
+                self.add_user(relation, user_id, problem)
+
+    def remove(self, problem_id: int) -> typing.Optional[BaseProblem]:
+        """Stop indexing the problem with this id, and return it (or None if it wasn't indexed)"""
+        problem = self.by_id.pop(problem_id, None)
+        if problem is not None:
+            for relation in RELATIONS:
+                for user_id in self._users(problem, relation):
+                    self.remove_user(relation, user_id, problem_id)
+        return problem
+
+    def add_user(self, relation: str, user_id: int, problem: BaseProblem) -> None:
+        """Record that the user is related to the problem (for example, that they voted for it)"""
+        self._by_user[relation].setdefault(user_id, {})[problem.id] = problem
+
+    def remove_user(self, relation: str, user_id: int, problem_id: int) -> None:
+        problems = self._by_user[relation].get(user_id)
+        if problems is None:
+            return
+        problems.pop(problem_id, None)
+        if not problems:
+            del self._by_user[relation][user_id]
+
+    def get(self, relation: str, user_id: int) -> typing.List[BaseProblem]:
+        """Return the problems that the user is related to (for example, the problems that they solved)"""
+        return list(self._by_user[relation].get(user_id, {}).values())
+
+    def pop_user(self, relation: str, user_id: int) -> typing.List[BaseProblem]:
+        """Forget every problem that the user is related to, and return them"""
+        return list(self._by_user[relation].pop(user_id, {}).values())
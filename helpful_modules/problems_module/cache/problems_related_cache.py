@@ -18,30 +18,52 @@ Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
 """
 
 import asyncio
+import contextlib
 import logging
-import pickle
 import sqlite3
 import typing
 import warnings
-from copy import copy, deepcopy
-from types import FunctionType
+import weakref
+from copy import deepcopy
+from types import FunctionType, MappingProxyType
 from typing import *
 
-import aiosqlite
+import aiomysql
 import disnake
+import disnake.ext.commands
+from aiomysql import DictCursor
 
 from helpful_modules.dict_factory import dict_factory
 from ..parse_problem import convert_dict_to_problem, convert_row_to_problem
 
-from ..base_problem import BaseProblem
+from ..base_problem import BaseProblem, dump_extra_stuff
+from ..codec import decode, encode_ids, encode_json
 from ..errors import *
-from ..mysql_connector_with_stmt import mysql_connection
+from ..query import Q
 from ..quizzes import QuizProblem
+from ..sqlite_pool import SQLiteConnectionPool
+from .lru import LRUCache
+from .memory_budget import DICT_ENTRY_SIZE, MemoryBudget, problem_size
+from .problem_index import RELATION_OF_FIELD, RELATION_OF_TABLE, ProblemIndex
+from .single_flight import SingleFlight
 
 log = logging.getLogger(__name__)
 
+
+class VoteResult(typing.NamedTuple):
+    """What add_vote_and_count and remove_vote_and_count did"""
+
+    changed: bool  # Whether the vote was added (removed)
+    num_votes: int  # The number of votes for the problem after that
+    deleted: bool = False  # Whether the problem was deleted because it reached the vote threshold
+
+
 # TODO: make a function that takes into account the 3 types of problems, and make a function that given a problem dictionary, converts the problem to the right type
 class ProblemsRelatedCache:
+    # The single-flight key shared by cache_all_problems, update_cache and full_resync:
+    # at most one of them runs at a time, and the others wait for it
+    _RELOAD = "reload"
+
     def __init__(
         self,
         *,
@@ -60,11 +82,32 @@ class ProblemsRelatedCache:
         db_name: str = "problems_module.db",
         update_cache_by_default_when_requesting: bool = True,
         use_cached_problems: bool = False,
+        sqlite_readers: int = 4,
+        mysql_pool_size: int = 10,
+        problem_cache_size: int = 10000,
+        problem_cache_ttl: typing.Optional[float] = 60.0,
+        user_data_cache_size: int = 10000,
+        user_data_cache_ttl: typing.Optional[float] = 60.0,
+        stale_while_revalidate: bool = False,
+        memory_budget: typing.Optional[int] = 256 * 2**20,
     ):
         """Create a new MathProblemCache. The arguments should be self-explanatory.
-        Many methods are async!"""
+        Many methods are async! await start() before using it (nothing is done with the database until then).
+        sqlite_readers is the number of read connections kept open when SQLite is used (there is always 1 writer)
+        mysql_pool_size is the maximum number of connections in the MySQL connection pool
+        problem_cache_size and problem_cache_ttl configure the LRU cache used by get_problem (see problem_lru).
+        Entries older than problem_cache_ttl seconds are reloaded, in case another process changed them.
+        user_data_cache_size and user_data_cache_ttl do the same for get_user_data (see user_data_lru)
+        If stale_while_revalidate is True, cache_all_problems and update_cache don't wait for the reload once the problems
+        have been loaded: they start it in the background and return, and the cached problems are used until it's done
+        memory_budget is the approximate number of bytes that the cached problems and quizzes can use (None for no limit).
+        When it is exceeded, the problems of the least recently used guilds stop being cached (see memory_budget.py),
+        and they are loaded again the next time they are needed"""
         self.cached_submissions_organized_by_dict = None
         log.info("Initializing the MathProblemCache object.")
+        # The cache that every problem (and quiz, submission...) loaded by this object refers to.
+        # It's a weak reference, so loading a problem doesn't copy this object, and the problems don't keep it alive
+        self.handle = weakref.proxy(self)
         # make_sql_table([], db_name = sql_dict_db_name)
         # make_sql_table([], db_name = "MathProblemCache1.db", table_name="kv_store")
         if use_sqlite:
@@ -93,20 +136,114 @@ class ProblemsRelatedCache:
         self.mysql_password = mysql_password
         self.mysql_db_ip = mysql_db_ip
         self.mysql_db_name = mysql_db_name
-        asyncio.run(
-            self.initialize_sql_table()
-        )  # Initialize the SQL tables (but asyncio.run() has to be used because __init__ cannot be async)
+        self._sqlite_pool = SQLiteConnectionPool(db_name, readers=sqlite_readers)
+        self._mysql_pool_size = mysql_pool_size
+        self._mysql_pool: typing.Optional[aiomysql.Pool] = None
+        self._mysql_pool_lock: typing.Optional[asyncio.Lock] = None
+        # The problems recently returned by get_problem. Every method of this object that changes a problem keeps it up to date
+        self.problem_lru = LRUCache(max_size=problem_cache_size, ttl=problem_cache_ttl)
+        # The user data recently returned by get_user_data (None means that the user has no row)
+        self.user_data_lru = LRUCache(max_size=user_data_cache_size, ttl=user_data_cache_ttl)
+        # The ids of the blacklisted guilds (loaded the first time they are needed)
+        self._blacklisted_guild_ids: typing.Optional[typing.Set[int]] = None
+        # Concurrent calls of cache_all_problems, update_cache and full_resync wait for the call that is already running
+        # (they all use the _RELOAD key)
+        self._single_flight = SingleFlight()
+        self.stale_while_revalidate = stale_while_revalidate
+        self.memory_budget = MemoryBudget(memory_budget)
+        # The guilds whose problems were evicted from guild_problems because of the memory budget
+        self._evicted_guild_ids: typing.Set[typing.Optional[int]] = set()
+        self._started = False  # Whether start() was called
+        self._background_tasks: typing.Set[asyncio.Task] = set()
         self.update_cache_by_default_when_requesting = (
             update_cache_by_default_when_requesting
         )
         self.guild_ids = set()
         self.cached_submissions = []
         self.cached_quizzes = []
+        self._cached_quizzes_by_id = {}
+        self._cached_quiz_sizes: typing.Dict[int, int] = {}  # The approximate size of each cached quiz, in bytes
         self.guild_problems = dict()
+        self.problem_index = ProblemIndex()  # Indexes of the problems in guild_problems (see problem_index.py)
+        self._problems_loaded = False  # Whether every problem has been loaded into guild_problems at least once
+        self._last_change_seq: typing.Optional[int] = None  # The last row of the changes table applied by update_cache
+        # The seqs below _last_change_seq that weren't committed yet, and when update_cache stops waiting for them
+        self._missing_change_seqs: typing.Dict[int, float] = {}
         self._guilds: typing.List[disnake.Guild] = []
         #asyncio.run(self.update_cache())
         self.cached_sessions = {}
 
+    async def start(self, *, warm: bool = False) -> None:
+        """Create the SQL tables (and run the migrations, which re-encode the values that are still pickled).
+        This must be awaited once, in the event loop that will use the cache, before anything else is done with it
+        (the bot does this in its setup hook). Calling it again does nothing.
+        If warm is True, every problem and quiz is loaded in the background (see update_cache), so this doesn't wait for it."""
+        if self._started:
+            return
+        await self.initialize_sql_table()
+        self._started = True
+        if warm:
+            self._start_background_task(self.update_cache())
+
+    def _start_background_task(self, coro: typing.Coroutine) -> asyncio.Task:
+        """Run coro in a task that close() cancels. Exceptions are logged"""
+        task = asyncio.get_running_loop().create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_task_done)
+        return task
+
+    def _background_task_done(self, task: asyncio.Task) -> None:
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("A background task of the cache failed", exc_info=task.exception())
+
+    async def close(self) -> None:
+        """Close every connection that this cache holds. This should be called when the bot shuts down."""
+        for task in list(self._background_tasks):
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        self._started = False
+        await self._sqlite_pool.close()
+        if self._mysql_pool is not None:
+            pool, self._mysql_pool = self._mysql_pool, None
+            self._mysql_pool_lock = None
+            pool.close()
+            await pool.wait_closed()
+
+    async def _get_mysql_pool(self) -> aiomysql.Pool:
+        """Return the MySQL connection pool, creating it if it doesn't exist yet"""
+        if self._mysql_pool_lock is None:
+            self._mysql_pool_lock = asyncio.Lock()
+        async with self._mysql_pool_lock:
+            if self._mysql_pool is None:
+                log.info(f"Creating a MySQL connection pool with at most {self._mysql_pool_size} connections")
+                self._mysql_pool = await aiomysql.create_pool(
+                    host=self.mysql_db_ip,
+                    user=self.mysql_username,
+                    password=self.mysql_password,
+                    db=self.mysql_db_name,
+                    minsize=1,
+                    maxsize=self._mysql_pool_size,
+                    autocommit=False,
+                    cursorclass=DictCursor,
+                )
+        return self._mysql_pool
+
+    @contextlib.asynccontextmanager
+    async def get_a_connection(self) -> typing.AsyncIterator[aiomysql.Connection]:
+        """Borrow a connection from the MySQL connection pool. Every MySQL query of every mixin goes through this.
+        The transaction is committed when the block exits normally, and rolled back if an exception is raised.
+        The connection is given back to the pool afterwards."""
+        pool = await self._get_mysql_pool()
+        async with pool.acquire() as connection:
+            try:
+                yield connection
+            except BaseException:
+                await connection.rollback()
+                raise
+            else:
+                await connection.commit()
+
     async def bgsave(self, schedule: bool = True, path: str = None, wait: bool = False, raise_on_error: bool = False, replace: bool = False):
         """
         Perform a background save operation.
@@ -185,6 +322,8 @@ class ProblemsRelatedCache:
         if self.use_cached_problems:
             if self.update_cache_by_default_when_requesting:
                 await self.update_cache()  # Make sure the cache is up-to-date
+            await self._ensure_guild_cached(guild_id)
+            await self._ensure_guild_cached(None)
             try:
                 return self.guild_problems[guild_id][
                     problem_id
@@ -197,20 +336,21 @@ class ProblemsRelatedCache:
                         "Problem not found in the cache! You may want to try again, but without caching!"
                     )
         else:
+            # The problems in problem_lru are shared, so copies are returned (like get_user_data does):
+            # changing a problem without update_problem mustn't change what the next get_problem returns
+            problem = self.problem_lru.get(problem_id)
+            if problem is not None:
+                return deepcopy(problem)
             # Otherwise, use SQL to get the problem!
             if self.use_sqlite:
-                async with aiosqlite.connect(self.db_name) as conn:
-                    try:
-                        conn.row_factory = dict_factory  # Make sure the row_factory can be set to dict_factory
-                    except Exception as e:
-                        raise MathProblemsModuleException(f"Oh no{'!' * 30}") from e
+                async with self._sqlite_pool.reader() as conn:
                     # Theory: the sql statement is not the problem
                     cursor = await conn.cursor()
                     log.debug(
                         f"Getting the problem with guild id {guild_id} and problem_id {problem_id} (types: {type(guild_id)}, {type(problem_id)})"
                     )
                     log.debug("Expected SQL statement:")
-                    log.warning(
+                    log.debug(
                         f"""SELECT * FROM problems
     WHERE problem_id = {problem_id})"""
                     )
@@ -230,92 +370,196 @@ class ProblemsRelatedCache:
                         raise TooManyProblems(
                             f"{len(rows)} problems exist with the same guild_id and problem_id, not 1"
                         )
-                    await conn.commit()
                     if isinstance(rows[0], sqlite3.Row):
                         row = dict_factory(cursor, rows[0])  #
                     else:
                         row = rows[0]
-                    return convert_dict_to_problem(row, cache=copy(self))
+                    problem = convert_row_to_problem(row, cache=self.handle)
+                    await self._load_voters_and_solvers(cursor, [problem])
+                    self.problem_lru.put(problem_id, problem)
+                    return deepcopy(problem)
             else:
-                with mysql_connection(
-                    host=self.mysql_db_ip,
-                    password=self.mysql_password,
-                    user=self.mysql_username,
-                    database=self.mysql_db_name,
-                ) as connection:
-                    cursor = connection.cursor(dictionaries=True)
-                    cursor.execute(
+                async with self.get_a_connection() as connection:
+                    cursor = await connection.cursor(DictCursor)
+                    await cursor.execute(
                         "SELECT * from problems WHERE problem_id = %s", (problem_id,)
                     )  # Get the problem
-                    rows = cursor.fetchall()
+                    rows = await cursor.fetchall()
                     if len(rows) == 0:
                         raise ProblemNotFound("Problem not found!")
                     elif len(rows) > 1:
                         raise TooManyProblems(
                             "Uh oh... 2 problems exist with the same guild id and the same problem id"
                         )
-                    return convert_row_to_problem(cache=copy(self), row=rows[0])
+                    problem = convert_row_to_problem(cache=self.handle, row=rows[0])
+                    await self._load_voters_and_solvers(cursor, [problem])
+                    self.problem_lru.put(problem_id, problem)
+                    return deepcopy(problem)
+
+    async def get_problems(self, problem_ids: typing.Iterable[int]) -> typing.Dict[int, BaseProblem]:
+        """Return a dictionary of the problems with these ids, in the same order (the problems that don't exist are left out).
+        The problems that aren't cached are read together, with 1 query per 500 ids instead of 1 query per problem"""
+        problem_ids = list(dict.fromkeys(problem_ids))
+        problems: typing.Dict[int, BaseProblem] = {}
+        if self.use_cached_problems:
+            if self.update_cache_by_default_when_requesting:
+                await self.update_cache()
+            for problem_id in problem_ids:
+                if problem_id in self.problem_index:
+                    problems[problem_id] = self.problem_index.by_id[problem_id]
+            # The other problems can only be in the database if their guilds were evicted (or nothing was loaded yet)
+            missing = problem_ids if self._evicted_guild_ids or not self._problems_loaded else []
+        else:
+            for problem_id in problem_ids:
+                problem = self.problem_lru.get(problem_id)
+                if problem is not None:
+                    problems[problem_id] = deepcopy(problem)  # Copies, like get_problem
+            missing = problem_ids
+        missing = [problem_id for problem_id in missing if problem_id not in problems]
+        if missing:
+            if self.use_sqlite:
+                async with self._sqlite_pool.reader() as conn:
+                    cursor = await conn.cursor()
+                    loaded = await self._load_problems(cursor, missing)
+            else:
+                async with self.get_a_connection() as connection:
+                    cursor = await connection.cursor(DictCursor)
+                    loaded = await self._load_problems(cursor, missing)
+            for problem in loaded:
+                problems[problem.id] = problem
+                if not self.use_cached_problems:
+                    self.problem_lru.put(problem.id, deepcopy(problem))
+        return {problem_id: problems[problem_id] for problem_id in problem_ids if problem_id in problems}
+
     async def cache_all_problems(self):
-        self.guild_ids = set()
-        self.guild_problems={}
+        """Load every problem into guild_problems.
+        If this (or update_cache, or full_resync) is already running, this waits for the running call instead of
+        loading everything again (unless stale_while_revalidate is True and the problems have already been loaded:
+        then this returns immediately)"""
+        if self.stale_while_revalidate and self._problems_loaded:
+            self._single_flight.run_in_background(self._RELOAD, self._cache_all_problems)
+            return
+        await self._single_flight.run(self._RELOAD, self._cache_all_problems)
+
+    async def _cache_all_problems(self) -> None:
+        self._publish_problems(*await self._load_all_problems())
+
+    async def _load_all_problems(
+        self,
+    ) -> typing.Tuple[typing.Dict[typing.Optional[int], typing.Dict[int, BaseProblem]], ProblemIndex]:
+        """Load every problem from the database, without changing the cache.
+        Returns the problems (guild id -> problem id -> problem) and an index of them, to give to _publish_problems"""
+        guild_problems: typing.Dict[typing.Optional[int], typing.Dict[int, BaseProblem]] = {}
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                conn.row_factory = dict_factory
+            async with self._sqlite_pool.reader() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute("SELECT * FROM problems")  # Get all problems
                 for row in await cursor.fetchall():  # For each problem:
-                    if not isinstance(row, dict):
+                    problem = convert_row_to_problem(row=row, cache=self.handle)
+                    guild_problems.setdefault(problem.guild_id, {})[problem.id] = problem
+                await self._load_voters_and_solvers(
+                    cursor,
+                    [problem for problems in guild_problems.values() for problem in problems.values()],
+                    everything=True,
+                )
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute("SELECT * FROM problems")  # Get all problems
+                for row in await cursor.fetchall():
+                    problem = convert_row_to_problem(row, cache=self.handle)
+                    guild_problems.setdefault(problem.guild_id, {})[problem.id] = problem
+                await self._load_voters_and_solvers(
+                    cursor,
+                    [problem for problems in guild_problems.values() for problem in problems.values()],
+                    everything=True,
+                )
+        problem_index = ProblemIndex()
+        for problems in guild_problems.values():
+            for problem in problems.values():
+                problem_index.add(problem)
+        return guild_problems, problem_index
 
-                        problem = convert_row_to_problem(
-                            pickle.loads(row), cache=copy(self)
-                        )  # Convert the problems to problem objects
-                    else:
-                        problem = convert_row_to_problem(row=row, cache=copy(self))
-                    if (
-                        problem.guild_id not in self.guild_ids
-                    ):  # Similar logic: Make sure it's there!
-                        self.guild_ids.add(problem.guild_id)
-                        self.guild_problems[problem.guild_id] = (
-                            {}
-                        )  # For quick, cached access?
-                    try:
-                        self.guild_problems[problem.guild_id][problem.id] = problem
-                    except BaseException as e:
-                        raise SQLException(
-                            "The cache could not be updated because assigning the problem failed!"
-                        ) from e
+    def _publish_problems(
+        self, guild_problems: typing.Dict[typing.Optional[int], typing.Dict[int, BaseProblem]], problem_index: ProblemIndex
+    ) -> None:
+        """Replace the cached problems with the loaded ones, all at once (there is no await, so nothing can see them
+        half-replaced). The dictionaries returned before aren't changed"""
+        self.guild_problems, self.guild_ids, self.problem_index = guild_problems, set(guild_problems), problem_index
+        self._problems_loaded = True
+        self._evicted_guild_ids = set()
+        self.memory_budget.clear()
+        for guild_id, problems in guild_problems.items():
+            self.memory_budget.charge(guild_id, sum(self._cached_problem_size(problem) for problem in problems.values()))
+        self._evict_guilds_over_budget()
+
+    def _cache_problem(self, problem: BaseProblem) -> None:
+        """Put the problem in guild_problems (replacing the cached problem with the same id) and index it.
+        If the problems of its guild were evicted, it isn't cached (it'll be loaded with the rest of the guild's problems)"""
+        self._uncache_problem(problem.id)
+        self.guild_ids.add(problem.guild_id)
+        if problem.guild_id in self._evicted_guild_ids:
             return
+        self.guild_problems.setdefault(problem.guild_id, {})[problem.id] = problem
+        self.problem_index.add(problem)
+        self.memory_budget.charge(problem.guild_id, self._cached_problem_size(problem))
+        self._evict_guilds_over_budget(keep=(problem.guild_id,))
 
-        with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-        ) as connection:
-            cursor = connection.cursor(dictionaries=True)
-            cursor.execute("SELECT * FROM problems")  # Get all problems
-            for row in cursor.fetchall():
-                problem = convert_row_to_problem(row, cache=copy(self))
-                if (
-                        problem.guild_id not in self.guild_ids
-                ):  # Similar logic: Make sure it's there!
-                    self.guild_ids.add(problem.guild_id)
-                    self.guild_problems[problem.guild_id] = (
-                        {}
-                    )  # For quick, cached access?
-                try:
-                    self.guild_problems[problem.guild_id][problem.id] = problem
-                except BaseException as e:
-                    raise SQLException(
-                        "An error occurred while assigning the problem..."
-                    ) from e
+    def _uncache_problem(self, problem_id: int) -> typing.Optional[BaseProblem]:
+        """Remove the problem from guild_problems and from the indexes. Returns the removed problem (or None)"""
+        problem = self.problem_index.remove(problem_id)
+        if problem is None:
+            return None
+        guild_problems = self.guild_problems.get(problem.guild_id)
+        if guild_problems is not None:
+            guild_problems.pop(problem_id, None)
+            self.memory_budget.charge(problem.guild_id, -self._cached_problem_size(problem))
+            if not guild_problems:
+                del self.guild_problems[problem.guild_id]
+                self.guild_ids.discard(problem.guild_id)
+                self.memory_budget.forget(problem.guild_id)
+        return problem
+
+    @staticmethod
+    def _cached_problem_size(problem: BaseProblem) -> int:
+        """The approximate number of bytes used by the problem and by its entries in guild_problems and in the indexes"""
+        return problem_size(problem) + DICT_ENTRY_SIZE * (3 + len(problem.voters) + len(problem.solvers))
+
+    def _evict_guilds_over_budget(self, keep: typing.Container = ()) -> None:
+        """Stop caching the problems of the least recently used guilds (except the guilds in keep)
+        until the cache is under its memory budget"""
+        for guild_id in self.memory_budget.guilds_to_evict(keep):
+            problems = self.guild_problems.pop(guild_id, {})
+            for problem_id in problems:
+                self.problem_index.remove(problem_id)
+            self._evicted_guild_ids.add(guild_id)
+            self.memory_budget.evicted(guild_id)
+            log.info(f"Evicted the {len(problems)} cached problems of the guild {guild_id}, because of the memory budget")
+
+    async def _ensure_guild_cached(self, guild_id: typing.Optional[int]) -> None:
+        """Load the problems of the guild again if they were evicted, and make it the most recently used guild"""
+        if guild_id not in self._evicted_guild_ids:
+            self.memory_budget.touch(guild_id)
+            return
+        await self._single_flight.run(("guild", guild_id), lambda: self._load_evicted_guild(guild_id))
+
+    async def _load_evicted_guild(self, guild_id: typing.Optional[int]) -> None:
+        problems = await self._get_problems_matching(Q(guild_id=guild_id))
+        if guild_id not in self._evicted_guild_ids:
+            return  # Everything was reloaded in the meantime
+        self._evicted_guild_ids.discard(guild_id)
+        for problem in problems:
+            self._cache_problem(problem)
 
     @property
     def global_problems(self):
-        return self.guild_problems.get(None, {})
+        return MappingProxyType(self.guild_problems.get(None, {}))
     @global_problems.setter
     def global_problems(self, value):
-        self.guild_problems[None] = value
+        for problem_id in list(self.global_problems.keys()):
+            self._uncache_problem(problem_id)
+        for problem in value.values():
+            self._cache_problem(problem)
     async def get_all_problems(
         self,
         replace_cache: bool = False
@@ -325,19 +569,17 @@ class ProblemsRelatedCache:
         return self.guild_problems
     async def get_guild_problems(
         self, guild: disnake.Guild, replace_cache: bool = False
-    ) -> typing.Dict[int, BaseProblem]:
-        """Gets the guild problems! Guild must be a Guild object. If you are trying to get global problems, use get_global_problems."""
+    ) -> typing.Mapping[int, BaseProblem]:
+        """Gets the guild problems (a read-only view of the cached problems)! Guild must be a Guild object. If you are trying to get global problems, use get_global_problems."""
         assert isinstance(guild, disnake.Guild)
         if replace_cache:
             await self.cache_all_problems()
-        try:
-            return self.guild_problems[guild.id]
-        except KeyError:
-            return {}
+        await self._ensure_guild_cached(guild.id)
+        return MappingProxyType(self.guild_problems.get(guild.id, {}))
 
     async def get_problems_by_guild_id(
         self, guild_id: int, replace_cache: bool = False
-    ) -> typing.Dict[int, BaseProblem]:
+    ) -> typing.Mapping[int, BaseProblem]:
         if not isinstance(guild_id, int) and guild_id is not None:
             raise AssertionError
 
@@ -345,10 +587,8 @@ class ProblemsRelatedCache:
             return await self.get_global_problems()
         if replace_cache:
             await self.cache_all_problems()
-        try:
-            return self.guild_problems[guild_id]
-        except KeyError:
-            return {}
+        await self._ensure_guild_cached(guild_id)
+        return MappingProxyType(self.guild_problems.get(guild_id, {}))
 
     async def get_problems_by_func(
         self: "MathProblemCache",
@@ -358,34 +598,114 @@ class ProblemsRelatedCache:
         kwargs: Optional[dict] = None,
 
     ) -> typing.List[BaseProblem]:
-        """Returns the list of all problems that match the given function. args and kwargs are extra parameters to give to the function"""
+        """Returns the list of all problems that match the given function. args and kwargs are extra parameters to give to the function.
+        func can also be a Q (see query.py). Then the database does the filtering, and only the matching problems are loaded.
+        A function has to be called on every cached problem, so it's much slower"""
+        if isinstance(func, Q):
+            if self.use_cached_problems:
+                if replace_cache:
+                    await self.cache_all_problems()
+                elif self.update_cache_by_default_when_requesting:
+                    await self.update_cache()
+                lookup = func.lookup()
+                if lookup is not None and lookup[0] == "guild_id":
+                    await self._ensure_guild_cached(lookup[1])
+                elif self._evicted_guild_ids:
+                    return await self._get_problems_matching(func)  # Some problems aren't cached
+                return self._get_cached_problems_matching(func)
+            return await self._get_problems_matching(func)
         if args is None:
             args = []
         if kwargs is None:
             kwargs = {}
         if replace_cache:
             await self.cache_all_problems()
-        guild_problems = []
-        for item in self.guild_problems.values():
-            guild_problems.extend(
-                item.values()
-            )  # This could be a list comprehension (but it creates the list of guild problems)
-        global_problems_that_meet_the_criteria = [
-            problem
-            for problem in self.global_problems.values()
-            if func(problem, *args, **kwargs)  # type: ignore
-        ]
-        guild_problems_that_meet_the_criteria = [
-            problem for problem in guild_problems if func(problem, *args, **kwargs)  # type: ignore
-        ]
-        problems_that_meet_the_criteria = global_problems_that_meet_the_criteria
-        problems_that_meet_the_criteria.extend(guild_problems_that_meet_the_criteria)
+        problems_that_meet_the_criteria = []
+        for item in self.guild_problems.values():  # The global problems are self.guild_problems[None], so they're included
+            problems_that_meet_the_criteria.extend(
+                problem for problem in item.values() if func(problem, *args, **kwargs)  # type: ignore
+            )
+        for guild_id in list(self._evicted_guild_ids):  # These are loaded, but they aren't cached again
+            problems_that_meet_the_criteria.extend(
+                problem
+                for problem in await self._get_problems_matching(Q(guild_id=guild_id))
+                if func(problem, *args, **kwargs)  # type: ignore
+            )
         return problems_that_meet_the_criteria
 
-    async def get_global_problems(self: "MathProblemCache", replace_cache: bool = False) -> typing.List[BaseProblem]:
-        """Returns global problems"""
+    def _get_cached_problems_matching(self, q: Q) -> typing.List[BaseProblem]:
+        """Return the cached problems that match q. If q has a condition on the id, the guild id, the author,
+        the voters or the solvers, only the problems given by the index for that condition are checked"""
+        lookup = q.lookup()
+        if lookup is None:
+            candidates = self.problem_index.by_id.values()
+        elif lookup[0] == "id":
+            candidates = [self.problem_index.by_id[lookup[1]]] if lookup[1] in self.problem_index else []
+        elif lookup[0] == "guild_id":
+            candidates = self.guild_problems.get(lookup[1], {}).values()
+        else:
+            candidates = self.problem_index.get(RELATION_OF_FIELD[lookup[0]], lookup[1])
+        return [problem for problem in candidates if q.matches(problem)]
+
+    async def _get_problems_matching(self, q: Q) -> typing.List[BaseProblem]:
+        """Load the problems that match q from the database"""
+        where, params = q.to_sql("?" if self.use_sqlite else "%s")
+        if self.use_sqlite:
+            async with self._sqlite_pool.reader() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute(f"SELECT * FROM problems WHERE {where}", tuple(params))
+                problems = [convert_row_to_problem(row, cache=self.handle) for row in await cursor.fetchall()]
+                await self._load_voters_and_solvers(cursor, problems)
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(f"SELECT * FROM problems WHERE {where}", tuple(params))
+                problems = [convert_row_to_problem(row, cache=self.handle) for row in await cursor.fetchall()]
+                await self._load_voters_and_solvers(cursor, problems)
+        return problems
+
+    async def get_problems_page(
+        self,
+        guild_id: typing.Optional[int],
+        after_problem_id: typing.Optional[int] = None,
+        limit: int = 25,
+        exclude_solved_by: typing.Optional[int] = None,
+    ) -> typing.List[BaseProblem]:
+        """Return at most limit problems of the guild (the global problems if guild_id is None), sorted by id,
+        whose ids are bigger than after_problem_id. To get the next page, pass the id of the last problem of this page.
+        If exclude_solved_by is a user id, the problems solved by that user are skipped.
+        This reads one page of the (guild_id, problem_id) index, so it doesn't depend on how many problems there are."""
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        q = Q(guild_id=guild_id)
+        if exclude_solved_by is not None:
+            q = q & ~Q(solver_contains=exclude_solved_by)
+        placeholder = "?" if self.use_sqlite else "%s"
+        where, params = q.to_sql(placeholder)
+        if after_problem_id is not None:
+            where += f" AND problem_id > {placeholder}"
+            params.append(after_problem_id)
+        params.append(limit)
+        query = f"SELECT * FROM problems WHERE {where} ORDER BY problem_id LIMIT {placeholder}"
+        if self.use_sqlite:
+            async with self._sqlite_pool.reader() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute(query, tuple(params))
+                problems = [convert_row_to_problem(row, cache=self.handle) for row in await cursor.fetchall()]
+                await self._load_voters_and_solvers(cursor, problems)
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(query, tuple(params))
+                problems = [convert_row_to_problem(row, cache=self.handle) for row in await cursor.fetchall()]
+                await self._load_voters_and_solvers(cursor, problems)
+        return problems
+
+    async def get_global_problems(self: "MathProblemCache", replace_cache: bool = False) -> typing.Mapping[int, BaseProblem]:
+        """Returns global problems (a read-only view of the cached problems)"""
         if replace_cache:
             await self.cache_all_problems()
+        await self._ensure_guild_cached(None)
         return self.global_problems
 
     def add_empty_guild(self, guild) -> typing.NoReturn:
@@ -450,57 +770,111 @@ class ProblemsRelatedCache:
             raise TypeError("Problem is not a valid Problem object.")
         # All the checks passed, hooray! Now let's add the problem.
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                try:
-                    conn.row_factory = dict_factory  # Make sure the row_factory can be set to dict_factory
-                except BaseException as exc:
-                    # Not writeable?
-                    if isinstance(exc, AttributeError):  # Can't set attribute
-                        pass
-                    else:
-                        raise  # Re-raise the exception
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 # We will raise if the problem already exists!
-                await cursor.execute(
-                    """INSERT INTO problems (guild_id, problem_id, question, answers, voters, solvers, author, extra_stuff)
-                VALUES (?,?,?,?,?,?,?,?)""",
-                    (
-                        problem.guild_id,  # We expect the problem's guild id to be either an integer or None
-                        int(problem.id),
-                        problem.get_question(),
-                        pickle.dumps(problem.answers),
-                        pickle.dumps(problem.get_voters()),
-                        pickle.dumps(problem.get_solvers()),
-                        int(problem.author),
-                        str(problem.get_extra_stuff()),
-                    ),
-                )
-
-                await conn.commit()
+                await self._insert_problems(cursor, [problem])
             return problem
         else:
-            async with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = await connection.cursor(dictionaries=True)
-                await cursor.execute(
-                    """INSERT INTO problems (guild_id, problem_id, question, answer, voters, solvers, author, extra_stuff)
-                VALUES (%s,%s,%s,%b,%b,%b,%s, %s)""",
-                    (
-                        int(problem.guild_id),
-                        int(problem.id),
-                        problem.get_question(),
-                        pickle.dumps(problem.answers),
-                        pickle.dumps(problem.get_voters()),
-                        pickle.dumps(problem.get_solvers()),
-                        int(problem.author),
-                        str(problem.get_extra_stuff()),
-                    ),
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await self._insert_problems(cursor, [problem])
+            return problem
+
+    async def add_problems(self, problems: typing.Iterable[BaseProblem]) -> typing.List[BaseProblem]:
+        """Add many problems at once, in 1 transaction. Returns the problems that were added.
+        If several problems have the same id, only the first one is added.
+        The limits are checked once for the whole batch: if a guild would have more than max_guild_problems problems,
+        nothing is added. Nothing is added either if one of the problems already exists."""
+        problems_by_id: typing.Dict[int, BaseProblem] = {}
+        for problem in problems:
+            if not isinstance(problem, BaseProblem):
+                raise TypeError("Problem is not a valid Problem object.")
+            problems_by_id.setdefault(int(problem.id), problem)
+        if not problems_by_id:
+            return []
+        new_problems = list(problems_by_id.values())
+        new_problems_per_guild: typing.Dict[int, int] = {}
+        for problem in new_problems:
+            if problem.guild_id is not None:  # There is no limit for global problems
+                guild_id = int(problem.guild_id)
+                new_problems_per_guild[guild_id] = new_problems_per_guild.get(guild_id, 0) + 1
+        if self.use_sqlite:
+            async with self._sqlite_pool.writer() as conn:
+                cursor = await conn.cursor()
+                await self._check_new_problems(cursor, list(problems_by_id.keys()), new_problems_per_guild)
+                await self._insert_problems(cursor, new_problems)
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await self._check_new_problems(cursor, list(problems_by_id.keys()), new_problems_per_guild)
+                await self._insert_problems(cursor, new_problems)
+        return new_problems
+
+    async def _check_new_problems(
+        self, cursor, problem_ids: typing.List[int], new_problems_per_guild: typing.Dict[int, int]
+    ) -> None:
+        """Raise if one of the problems already exists, or if a guild would have too many problems. Used by add_problems"""
+        placeholder = "?" if self.use_sqlite else "%s"
+        for i in range(0, len(problem_ids), 500):
+            chunk = problem_ids[i : i + 500]
+            await cursor.execute(
+                f"SELECT problem_id FROM problems WHERE problem_id IN ({','.join([placeholder] * len(chunk))})",
+                tuple(chunk),
+            )
+            existing = [row["problem_id"] for row in await cursor.fetchall()]
+            if existing:
+                raise MathProblemsModuleException(
+                    f"Problems with these ids already exist: {existing}. Use update_problem instead"
+                )
+        guild_ids = list(new_problems_per_guild.keys())
+        if not guild_ids:
+            return
+        await cursor.execute(
+            f"SELECT guild_id, COUNT(*) AS num FROM problems WHERE guild_id IN ({','.join([placeholder] * len(guild_ids))}) "
+            "GROUP BY guild_id",
+            tuple(guild_ids),
+        )
+        existing_problems_per_guild = {row["guild_id"]: row["num"] for row in await cursor.fetchall()}
+        for guild_id, num_new_problems in new_problems_per_guild.items():
+            if existing_problems_per_guild.get(guild_id, 0) + num_new_problems > self.max_guild_problems:
+                raise TooManyProblems(
+                    f"There are already {self.max_guild_problems} problems!"
                 )
 
+    async def _insert_problems(self, cursor, problems: typing.List[BaseProblem]) -> None:
+        """Insert the problems (and their voters and solvers) with executemany. Used by add_problems"""
+        placeholder = "?" if self.use_sqlite else "%s"
+        insert_ignore = "INSERT OR IGNORE" if self.use_sqlite else "INSERT IGNORE"
+        await cursor.executemany(
+            f"""INSERT INTO problems (guild_id, problem_id, question, answers, voters, solvers, author, extra_stuff)
+            VALUES ({','.join([placeholder] * 8)})""",
+            [
+                (
+                    problem.guild_id,
+                    int(problem.id),
+                    problem.get_question(),
+                    encode_json(problem.answers),
+                    encode_ids([]),  # The voters and solvers are stored in problem_votes/problem_solves
+                    encode_ids([]),
+                    int(problem.author),
+                    dump_extra_stuff(problem.get_extra_stuff()),
+                )
+                for problem in problems
+            ],
+        )
+        for attr, table in self._VOTES_AND_SOLVES_TABLES.items():
+            rows = [
+                (int(problem.id), int(user_id)) for problem in problems for user_id in getattr(problem, attr)
+            ]
+            if rows:
+                await cursor.executemany(
+                    f"{insert_ignore} INTO {table} (problem_id, user_id) VALUES ({placeholder}, {placeholder})", rows
+                )
+        await self._record_changes(cursor, self._PROBLEM_CHANGE, [problem.id for problem in problems])
+        for problem in problems:
+            self.problem_lru.invalidate(problem.id)
+
     async def remove_problem(
         self, guild_id: typing.Optional[int], problem_id: int
     ) -> BaseProblem:
@@ -522,83 +896,45 @@ class ProblemsRelatedCache:
             else:
                 raise TypeError("problem_id isn't an integer!")
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                try:
-                    conn.row_factory = dict_factory  # Make sure the row_factory can be set to dict_factory
-                except BaseException as exc:
-                    # Not writeable?
-                    try:
-                        dict_factory  # Check for name error
-                    except NameError as exc2:
-                        raise MathProblemsModuleException(
-                            "dict_factory could not be found"
-                        ) from exc2
-                    if isinstance(exc, AttributeError):  # Can't set attribute
-                        raise SQLException("Uh oh")
-                    else:
-                        raise  # Re-raise the exception
-                cursor = await conn.cursor()
-                await cursor.execute(
-                    "DELETE FROM problems WHERE problem_id = ?",
-                    (problem_id,),
-                )  # The actual deletion
-                try:
-                    del self.guild_problems[guild_id][
-                        problem_id
-                    ]  # Delete from the cache
-                    await self.update_cache()
-                except KeyError:
-                    # It's already deleted!
-                    pass
+            async with self._sqlite_pool.writer() as conn:
+                await self._delete_problem_rows(await conn.cursor(), problem_id)
+        else:
+            async with self.get_a_connection() as connection:
+                await self._delete_problem_rows(await connection.cursor(DictCursor), problem_id)
+        await self._forget_deleted_problem(problem_id)
 
-                await conn.commit()
+    async def _delete_problem_rows(self, cursor, problem_id: int) -> None:
+        """Delete the problem, its votes and its solves, in the transaction of cursor"""
+        placeholder = "?" if self.use_sqlite else "%s"
+        for table in ("problems", "problem_votes", "problem_solves"):
+            await cursor.execute(
+                f"DELETE FROM {table} WHERE problem_id = {placeholder}", (problem_id,)
+            )
+        await self._record_changes(cursor, self._PROBLEM_CHANGE, [problem_id])
 
-        else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
-                    "DELETE FROM problems WHERE problem_id = %s",
-                    (problem_id,),
-                )  # The actual deletion
-                connection.commit()
-                try:
-                    del self.guild_problems[guild_id][
-                        problem_id
-                    ]  # Delete from the cache
-                    await self.update_cache()
-                except KeyError:
-                    pass
+    async def _forget_deleted_problem(self, problem_id: int) -> None:
+        """Remove a problem that was deleted from the database from the caches"""
+        self.problem_lru.invalidate(problem_id)
+        if self._uncache_problem(problem_id) is not None:  # Delete from the cache
+            await self.update_cache()
 
     async def remove_duplicate_problems(self) -> None:
         """Deletes duplicate problems. Takes O(N^2) time which is slow"""
         if self.use_sqlite:
-            async with aiosqlite.connect(
-                self.db_name
-            ) as conn:  # Fetch the list of problems
+            async with self._sqlite_pool.reader() as conn:  # Fetch the list of problems
                 cursor = await conn.cursor()
                 await cursor.execute("SELECT * FROM problems")
                 all_problems = [
-                    BaseProblem.from_row(dict_factory(cursor, row))
-                    for row in deepcopy(await cursor.fetchall())
+                    BaseProblem.from_row(row)
+                    for row in await cursor.fetchall()
                 ]
-                await conn.commit()
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
                 await cursor.execute("SELECT * FROM Problems")
                 all_problems = [
-                    BaseProblem.from_row(row, cache=copy(self))
-                    for row in cursor.fetchall()
+                    BaseProblem.from_row(row, cache=self.handle)
+                    for row in await cursor.fetchall()
                 ]
         for problemA in range(len(all_problems)):
             for problemB in range(len(all_problems)):
@@ -639,67 +975,363 @@ class ProblemsRelatedCache:
         return self.guild_ids
 
     async def update_problem(self, problem_id: int, new: BaseProblem) -> None:
-        """Update the problem stored with the given guild id and problem id. This replaces the problem with the new problem"""
+        """Update the problem stored with the given guild id and problem id. This replaces the problem with the new problem
+        The voters and solvers are not updated: use add_vote/remove_vote/add_solve/remove_solve for that"""
         assert isinstance(problem_id, int)
         assert isinstance(new, BaseProblem) and not isinstance(new, QuizProblem)
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                try:
-                    conn.row_factory = dict_factory  # Make sure the row_factory can be set to dict_factory
-                except BaseException as exc:
-                    # Not writeable?
-                    try:
-                        dict_factory  # Check for name error
-                    except NameError as exc2:
-                        raise MathProblemsModuleException(
-                            "dict_factory could not be found"
-                        ) from exc2
-                    if isinstance(exc, AttributeError):  # Can't set attribute
-                        pass
-                    else:
-                        raise  # Re-raise the exception
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
-                # We will raise if the problem already exists!
                 await cursor.execute(
                     """UPDATE problems 
-                    SET guild_id = ?, problem_id = ?, question = ?, answers = ?, voters = ?, solvers = ?, author = ?, extra_stuff = ?
+                    SET guild_id = ?, problem_id = ?, question = ?, answers = ?, author = ?, extra_stuff = ?
                     WHERE problem_id = ?;""",
                     (
                         new.guild_id,
                         int(new.id),
                         new.get_question(),
-                        pickle.dumps(new.answers),
-                        pickle.dumps(new.get_voters()),
-                        pickle.dumps(new.get_solvers()),
+                        encode_json(new.answers),
                         int(new.author),
+                        dump_extra_stuff(new.get_extra_stuff()),
                         int(problem_id),
-                        str(new.get_extra_stuff()),
                     ),
                 )
+                await self._record_changes(cursor, self._PROBLEM_CHANGE, [problem_id, new.id])
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
                     """UPDATE problems 
-                    SET guild_id = '%s', problem_id = '%s', question = %s, answer = %s, voters = %s, solvers = %s, author = '%s', extra_stuff = '%s'
-                    WHERE problem_id = '%s'""",
+                    SET guild_id = %s, problem_id = %s, question = %s, answers = %s, author = %s, extra_stuff = %s
+                    WHERE problem_id = %s""",
                     (
-                        int(new.guild_id),
+                        new.guild_id,
                         int(new.id),
                         new.question,
-                        pickle.dumps(new.answers),
-                        pickle.dumps(new.voters),
-                        pickle.dumps(new.solvers),
+                        encode_json(new.answers),
                         int(new.author),
+                        dump_extra_stuff(new.get_extra_stuff()),
                         problem_id,
-                        str(new.get_extra_stuff()),
                     ),
                 )
+                await self._record_changes(cursor, self._PROBLEM_CHANGE, [problem_id, new.id])
+        self.problem_lru.invalidate(problem_id)
+        self.problem_lru.invalidate(new.id)
+
+    # Every method that changes a problem or a quiz appends a row to the changes table, in the same transaction as the change.
+    # update_cache (see misc_related_cache.py) then only reloads the problems and quizzes that changed since it last ran.
+    _PROBLEM_CHANGE = "problem"
+    _QUIZ_CHANGE = "quiz"
+
+    async def _record_changes(self, cursor, entity: str, entity_ids: typing.Iterable[int]) -> None:
+        """Record that the problems (or quizzes) with these ids changed. cursor must be the cursor that made the change"""
+        placeholder = "?" if self.use_sqlite else "%s"
+        rows = [(entity, int(entity_id)) for entity_id in set(entity_ids) if entity_id is not None]
+        if rows:
+            await cursor.executemany(
+                f"INSERT INTO changes (entity, entity_id) VALUES ({placeholder}, {placeholder})", rows
+            )
+
+    async def _record_changes_of_rows(self, cursor, entity: str, table: str, column: str, where: str, params: tuple) -> None:
+        """Record a change for every distinct value of column in the rows of table that match where.
+        This has to be called before the rows are deleted"""
+        await cursor.execute(
+            f"INSERT INTO changes (entity, entity_id) SELECT DISTINCT '{entity}', {column} FROM {table} "
+            f"WHERE {where} AND {column} IS NOT NULL",
+            params,
+        )
+
+    # Votes and solves are stored as one row per (problem, user) in problem_votes and problem_solves.
+    # The primary key is (problem_id, user_id), so voting or solving is a single INSERT, and the database
+    # (not the bot) makes sure that nobody votes for (or solves) the same problem twice.
+    _VOTES_AND_SOLVES_TABLES = {"voters": "problem_votes", "solvers": "problem_solves"}
+
+    async def _insert_user_row(self, table: str, problem_id: int, user_id: int) -> bool:
+        """Insert (problem_id, user_id) into table. Returns whether a row was inserted (False if it already existed)"""
+        if self.use_sqlite:
+            async with self._sqlite_pool.writer() as conn:
+                cursor = await conn.cursor()
+                return await self._insert_user_row_with(cursor, table, problem_id, user_id)
+        else:
+            async with self.get_a_connection() as connection:
+                return await self._insert_user_row_with(
+                    await connection.cursor(DictCursor), table, problem_id, user_id
+                )
+
+    async def _insert_user_row_with(
+        self, cursor, table: str, problem_id: int, user_id: int
+    ) -> bool:
+        """_insert_user_row, in the transaction of cursor"""
+        insert_ignore = "INSERT OR IGNORE" if self.use_sqlite else "INSERT IGNORE"
+        placeholder = "?" if self.use_sqlite else "%s"
+        await cursor.execute(
+            f"{insert_ignore} INTO {table} (problem_id, user_id) "
+            f"VALUES ({placeholder}, {placeholder})",
+            (int(problem_id), int(user_id)),
+        )
+        inserted = cursor.rowcount == 1
+        if inserted:
+            await self._record_changes(cursor, self._PROBLEM_CHANGE, [problem_id])
+            self._update_cached_problem_users(table, problem_id, user_id, added=True)
+        return inserted
+
+    async def _delete_user_row(self, table: str, problem_id: int, user_id: int) -> bool:
+        """Delete (problem_id, user_id) from table. Returns whether a row was deleted"""
+        if self.use_sqlite:
+            async with self._sqlite_pool.writer() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute(
+                    f"DELETE FROM {table} WHERE problem_id = ? AND user_id = ?",
+                    (int(problem_id), int(user_id)),
+                )
+                deleted = cursor.rowcount == 1
+                if deleted:
+                    await self._record_changes(cursor, self._PROBLEM_CHANGE, [problem_id])
+                    self._update_cached_problem_users(table, problem_id, user_id, added=False)
+                return deleted
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
+                    f"DELETE FROM {table} WHERE problem_id = %s AND user_id = %s",
+                    (int(problem_id), int(user_id)),
+                )
+                deleted = cursor.rowcount == 1
+                if deleted:
+                    await self._record_changes(cursor, self._PROBLEM_CHANGE, [problem_id])
+                    self._update_cached_problem_users(table, problem_id, user_id, added=False)
+                return deleted
+
+    def _update_cached_problem_users(self, table: str, problem_id: int, user_id: int, added: bool) -> None:
+        """Update the voters or the solvers of the problem in problem_lru and in guild_problems (and the indexes)
+        after a row was added to or deleted from table, so that the next get_problem doesn't have to read the database again"""
+        relation = RELATION_OF_TABLE[table]
+        cached_problem = self.problem_index.by_id.get(problem_id)
+        if cached_problem is not None and (user_id in getattr(cached_problem, relation)) != added:
+            self.memory_budget.charge(cached_problem.guild_id, (1 if added else -1) * (8 + DICT_ENTRY_SIZE))
+        for problem in (self.problem_lru.peek(problem_id), cached_problem):
+            if problem is None:
+                continue
+            users = getattr(problem, relation)
+            if added and user_id not in users:
+                users.append(user_id)
+            elif not added and user_id in users:
+                users.remove(user_id)
+        if cached_problem is not None:
+            if added:
+                self.problem_index.add_user(relation, user_id, cached_problem)
+            else:
+                self.problem_index.remove_user(relation, user_id, problem_id)
+
+    async def _count_user_rows(self, table: str, problem_id: int) -> int:
+        """Return the number of rows in table for this problem. This uses the primary key index"""
+        if self.use_sqlite:
+            async with self._sqlite_pool.reader() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute(
+                    f"SELECT COUNT(*) AS num FROM {table} WHERE problem_id = ?",
+                    (int(problem_id),),
+                )
+                return (await cursor.fetchone())["num"]
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
+                    f"SELECT COUNT(*) AS num FROM {table} WHERE problem_id = %s",
+                    (int(problem_id),),
+                )
+                return (await cursor.fetchone())["num"]
+
+    async def add_vote(self, problem_id: int, user_id: int) -> bool:
+        """Add a vote for the deletion of the problem. This is a single INSERT.
+        Returns True if the vote was added, and False if the user had already voted for this problem"""
+        return await self._insert_user_row("problem_votes", problem_id, user_id)
+
+    async def remove_vote(self, problem_id: int, user_id: int) -> bool:
+        """Remove the user's vote for the problem. Returns False if the user hadn't voted for this problem"""
+        return await self._delete_user_row("problem_votes", problem_id, user_id)
+
+    async def add_solve(self, problem_id: int, user_id: int) -> bool:
+        """Mark the problem as solved by the user. This is a single INSERT.
+        Returns True if the solve was added, and False if the user had already solved this problem"""
+        return await self._insert_user_row("problem_solves", problem_id, user_id)
+
+    async def remove_solve(self, problem_id: int, user_id: int) -> bool:
+        """Mark the problem as not solved by the user. Returns False if the user hadn't solved this problem"""
+        return await self._delete_user_row("problem_solves", problem_id, user_id)
+
+    async def add_vote_and_count(
+        self, problem: BaseProblem, user_id: int, vote_threshold: typing.Optional[int] = None
+    ) -> VoteResult:
+        """Add the user's vote for the deletion of the problem and count the votes.
+        If the vote was added and there are at least vote_threshold votes now, the problem
+        is deleted. The vote, the count and the deletion are one transaction (on SQLite, with
+        the write connection; on MySQL, the problem's row is locked first), so concurrent votes
+        can't both miss the threshold, and only one of them deletes the problem
+        :raises ProblemNotFoundException: if the problem doesn't exist (anymore)"""
+        if self.use_sqlite:
+            async with self._sqlite_pool.writer() as conn:
+                result = await self._add_vote_and_count_with(
+                    await conn.cursor(), problem.id, user_id, vote_threshold
+                )
+        else:
+            async with self.get_a_connection() as connection:
+                result = await self._add_vote_and_count_with(
+                    await connection.cursor(DictCursor), problem.id, user_id, vote_threshold
+                )
+        if result.deleted:
+            await self._forget_deleted_problem(problem.id)
+        return result
+
+    async def _add_vote_and_count_with(
+        self, cursor, problem_id: int, user_id: int, vote_threshold: typing.Optional[int]
+    ) -> VoteResult:
+        """add_vote_and_count, in the transaction of cursor
+        (the caches aren't updated here if the problem is deleted)"""
+        placeholder = "?" if self.use_sqlite else "%s"
+        lock = "" if self.use_sqlite else " FOR UPDATE"  # SQLite only has one writer at a time
+        await cursor.execute(
+            f"SELECT problem_id FROM problems WHERE problem_id = {placeholder}{lock}", (problem_id,)
+        )
+        if not await cursor.fetchall():
+            raise ProblemNotFoundException(f"Problem {problem_id} doesn't exist")
+        added = await self._insert_user_row_with(cursor, "problem_votes", problem_id, user_id)
+        await cursor.execute(
+            f"SELECT COUNT(*) AS num FROM problem_votes WHERE problem_id = {placeholder}",
+            (int(problem_id),),
+        )
+        num_votes = (await cursor.fetchone())["num"]
+        if not added or not vote_threshold or num_votes < vote_threshold:
+            return VoteResult(added, num_votes)
+        await self._delete_problem_rows(cursor, problem_id)
+        return VoteResult(added, num_votes, deleted=True)
+
+    async def remove_vote_and_count(self, problem_id: int, user_id: int) -> VoteResult:
+        """Remove the user's vote for the problem and count the votes that are left"""
+        removed = await self.remove_vote(problem_id, user_id)
+        return VoteResult(removed, await self.get_num_votes(problem_id))
+
+    async def get_num_votes(self, problem_id: int) -> int:
+        """Return the number of votes for the deletion of this problem, without loading the voters"""
+        return await self._count_user_rows("problem_votes", problem_id)
+
+    async def get_num_solves(self, problem_id: int) -> int:
+        """Return the number of users who solved this problem, without loading the solvers"""
+        return await self._count_user_rows("problem_solves", problem_id)
+
+    async def delete_all_votes_by_user_id(self, user_id: int) -> None:
+        """Delete every vote that the user made"""
+        await self._delete_all_rows_of_user("problem_votes", user_id)
+
+    async def delete_all_solves_by_user_id(self, user_id: int) -> None:
+        """Forget about every problem that the user solved"""
+        await self._delete_all_rows_of_user("problem_solves", user_id)
+
+    async def _delete_all_rows_of_user(self, table: str, user_id: int) -> None:
+        if self.use_sqlite:
+            async with self._sqlite_pool.writer() as conn:
+                cursor = await conn.cursor()
+                await self._record_changes_of_rows(
+                    cursor, self._PROBLEM_CHANGE, table, "problem_id", "user_id = ?", (int(user_id),)
+                )
+                await cursor.execute(f"DELETE FROM {table} WHERE user_id = ?", (int(user_id),))
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await self._record_changes_of_rows(
+                    cursor, self._PROBLEM_CHANGE, table, "problem_id", "user_id = %s", (int(user_id),)
+                )
+                await cursor.execute(f"DELETE FROM {table} WHERE user_id = %s", (int(user_id),))
+        # Keep the cached problems consistent. The index gives the problems in guild_problems that the user voted for
+        # (or solved), so only the problem_lru (which is small) has to be searched
+        relation = RELATION_OF_TABLE[table]
+        for problem in [*self.problem_index.pop_user(relation, user_id), *self.problem_lru.values()]:
+            if user_id in getattr(problem, relation):
+                getattr(problem, relation).remove(user_id)
+
+    @staticmethod
+    def _chunks(ids: typing.List[int], size: int = 500) -> typing.List[typing.List[int]]:
+        return [ids[i : i + size] for i in range(0, len(ids), size)]
+
+    async def _load_problems(self, cursor, problem_ids: typing.List[int]) -> typing.List[BaseProblem]:
+        """Load the problems with these ids (with their voters and solvers). Problems that don't exist are skipped"""
+        placeholder = "?" if self.use_sqlite else "%s"
+        problems = []
+        for chunk in self._chunks(problem_ids):
+            await cursor.execute(
+                f"SELECT * FROM problems WHERE problem_id IN ({','.join([placeholder] * len(chunk))})", tuple(chunk)
+            )
+            problems.extend(convert_row_to_problem(row, cache=self.handle) for row in await cursor.fetchall())
+        await self._load_voters_and_solvers(cursor, problems)
+        return problems
+
+    async def _load_voters_and_solvers(
+        self, cursor, problems: typing.Iterable[BaseProblem], everything: bool = False
+    ) -> None:
+        """Fill in the voters and solvers of the problems from problem_votes and problem_solves.
+        cursor must be a cursor of the connection that loaded the problems.
+        If everything is True, the problems are every problem in the database, so the whole tables are read."""
+        problems_by_id = {problem.id: problem for problem in problems}
+        if not problems_by_id:
+            return
+        placeholder = "?" if self.use_sqlite else "%s"
+        for attr, table in self._VOTES_AND_SOLVES_TABLES.items():
+            for problem in problems_by_id.values():
+                setattr(problem, attr, [])
+            if everything:
+                chunks = [None]
+            else:
+                ids = list(problems_by_id.keys())
+                chunks = [ids[i : i + 500] for i in range(0, len(ids), 500)]
+            for chunk in chunks:
+                if chunk is None:
+                    await cursor.execute(f"SELECT problem_id, user_id FROM {table}")
+                else:
+                    await cursor.execute(
+                        f"SELECT problem_id, user_id FROM {table} WHERE problem_id IN ({','.join([placeholder] * len(chunk))})",
+                        tuple(chunk),
+                    )
+                for row in await cursor.fetchall():
+                    problem = problems_by_id.get(row["problem_id"])
+                    if problem is not None:
+                        getattr(problem, attr).append(row["user_id"])
+
+    async def _move_voters_and_solvers_into_their_tables(self, cursor) -> None:
+        """Copy the voters and solvers that are still pickled in the problems table into problem_votes/problem_solves,
+        and empty the pickled lists. This is migration 2 (see migrations.py), so cursor is the cursor of the migration's transaction."""
+        placeholder = "?" if self.use_sqlite else "%s"
+        insert_ignore = "INSERT OR IGNORE" if self.use_sqlite else "INSERT IGNORE"
+        empty_list = encode_ids([])
+        await cursor.execute("SELECT problem_id, voters, solvers FROM problems")
+        rows = {"voters": [], "solvers": []}
+        moved_problems = []
+        for row in await cursor.fetchall():
+            moved = False
+            for attr in rows.keys():
+                user_ids = decode(row[attr], allow_legacy=True) if row[attr] else []
+                if not user_ids:
+                    continue
+                moved = True
+                for user_id in user_ids:
+                    try:
+                        rows[attr].append((int(row["problem_id"]), int(user_id)))
+                    except (TypeError, ValueError):
+                        log.warning(f"Ignoring the invalid user id {user_id!r} in problem {row['problem_id']}")
+            if moved:
+                moved_problems.append((empty_list, empty_list, row["problem_id"]))
+        if not moved_problems:
+            return
+        log.info(f"Moving the voters and solvers of {len(moved_problems)} problems into their own tables")
+        for attr, table in self._VOTES_AND_SOLVES_TABLES.items():
+            if rows[attr]:
+                await cursor.executemany(
+                    f"{insert_ignore} INTO {table} (problem_id, user_id) VALUES ({placeholder}, {placeholder})",
+                    rows[attr],
+                )
+        await cursor.executemany(
+            f"UPDATE problems SET voters = {placeholder}, solvers = {placeholder} WHERE problem_id = {placeholder}",
+            moved_problems,
+        )
 
     @property
     def max_question_length(self):
@@ -720,7 +1352,7 @@ class ProblemsRelatedCache:
     async def initialize_sql_table(self):
         """Initialize the SQL tables if they don't already exist"""
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     """
@@ -737,28 +1369,21 @@ class ProblemsRelatedCache:
                     )
                     """
                 )
-                await conn.commit()
         else:
-            with mysql_connection(
-                    host=self.mysql_db_ip,
-                    password=self.mysql_password,
-                    user=self.mysql_username,
-                    database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
                     """
                     CREATE TABLE IF NOT EXISTS problems (
-                        id INT PRIMARY KEY,
-                        guild_id INT,
-                        problem_id INT,
+                        id INT AUTO_INCREMENT PRIMARY KEY,
+                        guild_id BIGINT,
+                        problem_id BIGINT,
                         question TEXT,
                         answers LONGBLOB,
                         voters LONGBLOB,
                         solvers LONGBLOB,
-                        author INT,
+                        author BIGINT,
                         extra_stuff TEXT
                     )
                     """
                 )
-                connection.commit()
@@ -1,15 +1,14 @@
 import logging
-import pickle
 import typing
-from copy import copy
 from typing import *
 
-import aiosqlite
+from aiomysql import DictCursor
 
 from helpful_modules.dict_factory import dict_factory
 
+from ..codec import decode, encode_ids, encode_json
 from ..errors import *
-from ..mysql_connector_with_stmt import *
+from ..query import QUIZ_FIELDS, Q
 from ..quizzes import Quiz, QuizProblem, QuizSolvingSession, QuizSubmission
 from ..quizzes.quiz_description import QuizDescription
 from .problems_related_cache import ProblemsRelatedCache
@@ -22,34 +21,25 @@ class QuizRelatedCache(ProblemsRelatedCache):
 
     async def get_quiz_sessions(self, quiz_id: int) -> List[QuizSolvingSession]:
         """Get the quiz sessions for a quiz"""
+        # The sessions share the same quiz, which from_rows loads once
+        return await QuizSolvingSession.from_rows(await self._get_quiz_session_rows(quiz_id), cache=self)
+
+    async def _get_quiz_session_rows(self, quiz_id: int) -> List[dict]:
+        """Get the rows of the quiz sessions for a quiz"""
         assert isinstance(quiz_id, int)
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db) as conn:
-                conn.row_factory = dict_factory
+            async with self._sqlite_pool.reader() as conn:
                 cursor = await conn.cursor()
-                await cursor.execute("SELECT * WHERE quiz_id = ?", (quiz_id,))
-                # For each row retrieved: use from_sqlite_dict to turn into a QuizSolvingSession and return it
-                return [
-                    QuizSolvingSession.from_sqlite_dict(item)
-                    for item in await cursor.fetchall()
-                ]
+                await cursor.execute("SELECT * FROM quiz_submission_sessions WHERE quiz_id = ?", (quiz_id,))
+                return list(await cursor.fetchall())
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
                     "SELECT * FROM quiz_submission_sessions WHERE quiz_id = %s",
                     (quiz_id,),
                 )
-                # For each row retrieved: turn it into a QuizSolvingSession using from_mysql_dict and return the result
-                return [
-                    QuizSolvingSession.from_mysql_dict(item)
-                    for item in cursor.fetchall()
-                ]
+                return list(await cursor.fetchall())
 
     async def add_quiz_session(self, session: QuizSolvingSession):
         """Add a QuizSession to the SQL database"""
@@ -61,52 +51,44 @@ class QuizRelatedCache(ProblemsRelatedCache):
             pass
 
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                conn.row_factory = dict_factory
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     """INSERT INTO quiz_submission_sessions (user_id, quiz_id, guild_id, is_finished, answers, start_time, expire_time, special_id, attempt_num)
-                    VALUES (?,?,?,?,?,?,?,?)""",
+                    VALUES (?,?,?,?,?,?,?,?,?)""",
                     (
                         session.user_id,
                         session.quiz_id,
                         session.guild_id,
                         int(session.is_finished),
-                        pickle.dumps(session.answers),
+                        encode_json(session.answers),
                         session.start_time,
                         session.expire_time,
                         session.special_id,
                         session.attempt_num,
                     ),
                 )
-                await conn.commit()
+                await self._record_changes(cursor, self._QUIZ_CHANGE, [session.quiz_id])
                 return
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
                     """INSERT INTO quiz_submission_sessions (user_id, quiz_id, guild_id, is_finished, answers, start_time, expire_time, special_id, attempt_num)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s)""",
+                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
                     (
                         session.user_id,
                         session.quiz_id,
                         session.guild_id,
                         int(session.is_finished),
-                        pickle.dumps(
-                            session.answers
-                        ),  # TODO: don't use pickle (because RCE)
+                        encode_json(session.answers),
                         session.start_time,
                         session.expire_time,
                         session.special_id,
                         session.attempt_num,
                     ),
                 )
-                connection.commit()
+                await self._record_changes(cursor, self._QUIZ_CHANGE, [session.quiz_id])
 
     async def update_quiz_session(self, special_id: int, session: QuizSolvingSession):
         """Update the quiz session given the special id"""
@@ -120,9 +102,12 @@ class QuizRelatedCache(ProblemsRelatedCache):
             ) from quiz_session_not_found_exception
 
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                conn.row_factory = dict_factory
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
+                await self._record_changes_of_rows(  # The session might have been moved to another quiz
+                    cursor, self._QUIZ_CHANGE, "quiz_submission_sessions", "quiz_id", "special_id = ?", (special_id,)
+                )
+                await self._record_changes(cursor, self._QUIZ_CHANGE, [session.quiz_id])
                 await cursor.execute(
                     """UPDATE quiz_submission_sessions 
                     SET guild_id = ?, quiz_id = ?, user_id = ?, answers = ?, start_time = ?, expire_time = ?, is_finished = ?, special_id = ?, attempt_num = ?
@@ -131,7 +116,7 @@ class QuizRelatedCache(ProblemsRelatedCache):
                         session.guild_id,
                         session.quiz_id,
                         session.user_id,
-                        pickle.dumps(session.answers),
+                        encode_json(session.answers),
                         session.start_time,
                         session.expire_time,
                         int(session.is_finished),
@@ -140,17 +125,15 @@ class QuizRelatedCache(ProblemsRelatedCache):
                         session.special_id,
                     ),
                 )
-                await conn.commit()
                 return
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(  # Connect to SQL and actually change it
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await self._record_changes_of_rows(
+                    cursor, self._QUIZ_CHANGE, "quiz_submission_sessions", "quiz_id", "special_id = %s", (special_id,)
+                )
+                await self._record_changes(cursor, self._QUIZ_CHANGE, [session.quiz_id])
+                await cursor.execute(  # Connect to SQL and actually change it
                     """UPDATE quiz_submission_sessions 
                     SET guild_id = %s, quiz_id = %s, user_id = %s, answers = %s, start_time = %s, expire_time = %s, is_finished = %s, special_id = %s, attempt_num = %s
                     WHERE special_id = %s""",
@@ -158,7 +141,7 @@ class QuizRelatedCache(ProblemsRelatedCache):
                         session.guild_id,
                         session.quiz_id,
                         session.user_id,
-                        pickle.dumps(session.answers),
+                        encode_json(session.answers),
                         session.start_time,
                         session.expire_time,
                         int(session.is_finished),
@@ -167,7 +150,6 @@ class QuizRelatedCache(ProblemsRelatedCache):
                         session.special_id,
                     ),
                 )
-                connection.commit()
                 return
 
     async def delete_quiz_session(self, special_id: int):
@@ -175,27 +157,26 @@ class QuizRelatedCache(ProblemsRelatedCache):
         assert isinstance(special_id, int)  # basic type-checking
 
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
+                await self._record_changes_of_rows(
+                    cursor, self._QUIZ_CHANGE, "quiz_submission_sessions", "quiz_id", "special_id = ?", (special_id,)
+                )
                 await cursor.execute(
                     "DELETE FROM quiz_submission_sessions WHERE special_id = ?",
                     (special_id,),
                 )
-                await conn.commit()
 
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
-                    "DELETE FROM quiz_submission_session WHERE special_id=%s",
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await self._record_changes_of_rows(
+                    cursor, self._QUIZ_CHANGE, "quiz_submission_sessions", "quiz_id", "special_id = %s", (special_id,)
+                )
+                await cursor.execute(
+                    "DELETE FROM quiz_submission_sessions WHERE special_id=%s",
                     (special_id,),
                 )
-                connection.commit()
 
     async def get_quiz_session_by_special_id(
         self, special_id: int
@@ -204,7 +185,7 @@ class QuizRelatedCache(ProblemsRelatedCache):
         assert isinstance(special_id, int)  # Basic type-checking
 
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
+            async with self._sqlite_pool.reader() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     "SELECT * FROM quiz_submission_sessions WHERE special_id = ?",
@@ -219,23 +200,14 @@ class QuizRelatedCache(ProblemsRelatedCache):
                     raise MathProblemsModuleException(
                         "There are too many quiz sessions with this special id"
                     )
-                else:
-                    return QuizSolvingSession.from_sqlite_dict(
-                        potential_sessions[0]
-                    )
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
                     "SELECT * FROM quiz_submission_sessions WHERE special_id = %s",
                     (special_id,),
                 )
-                potential_sessions = list(cursor.fetchall())
+                potential_sessions = list(await cursor.fetchall())
                 if len(potential_sessions) < 1:
                     raise QuizSessionNotFoundException(
                         "There aren't any quiz sessions found with this special id"
@@ -244,19 +216,14 @@ class QuizRelatedCache(ProblemsRelatedCache):
                     raise MathProblemsModuleException(
                         "There are too many quiz sessions with this special id"
                     )
-                else:
-                    return QuizSolvingSession.from_mysql_dict(
-                        potential_sessions[0], cache=self
-                    )
-
-
+        return (await QuizSolvingSession.from_rows(potential_sessions, cache=self))[0]
 
     async def add_quiz(self, quiz: Quiz) -> Quiz:
         """Add a quiz"""
         assert isinstance(quiz, Quiz)
         if not quiz.empty:
             num_already_existing_quizzes = await self.get_quizzes_by_func(
-                func=lambda _quiz: not _quiz.empty and _quiz.guild_id == quiz.guild_id  # type: ignore
+                func=Q(guild_id=quiz.guild_id)  # Only quizzes with problems have rows in the quizzes table
             )
             if len(num_already_existing_quizzes) >= self.cache.max_quizzes_per_guild:
                 raise TooManyQuizzesException(len(num_already_existing_quizzes) + 1)
@@ -268,22 +235,7 @@ class QuizRelatedCache(ProblemsRelatedCache):
         except QuizNotFound:
             pass
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                try:
-                    conn.row_factory = dict_factory  # Make sure the row_factory can be set to dict_factory
-                except BaseException as exc:
-                    # Not writeable?
-                    try:
-                        dict_factory()  # Check for name error
-                    except NameError as exc2:
-                        raise MathProblemsModuleException(
-                            "dict_factory could not be found"
-                        ) from exc2
-                    if isinstance(exc, AttributeError):  # Can't set attribute
-                        pass
-                    else:
-                        raise  # Re-raise the exception
-
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 for item in quiz.problems:
                     await cursor.execute(
@@ -294,9 +246,9 @@ class QuizRelatedCache(ProblemsRelatedCache):
                             item.quiz_id,
                             item.problem_id,
                             item.question,
-                            pickle.dumps(item.answers),
-                            pickle.dumps(item.voters),
-                            pickle.dumps(item.solvers),
+                            encode_json(item.answers),
+                            encode_ids(item.voters),
+                            encode_ids(item.solvers),
                             item.author,
                         ),
                     )
@@ -308,45 +260,41 @@ class QuizRelatedCache(ProblemsRelatedCache):
                             item.guild_id,
                             item.quiz_id,
                             item.user_id,
-                            pickle.dumps(item.to_dict()),
+                            encode_json(item.to_dict()),
                         ),
                     )
+                await self._record_changes(cursor, self._QUIZ_CHANGE, [quiz.id])
 
-                await conn.commit()
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
                 for item in quiz.problems:
-                    cursor.execute(
+                    await cursor.execute(
                         """INSERT INTO quizzes (guild_id, quiz_id, problem_id, question, answer, voters, solvers, author)
-                    VALUES ('%s','%s','%s',%s,%s,%s,%s,'%s')""",
+                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s)""",
                         (
                             item.guild_id,
                             item.quiz_id,
                             item.problem_id,
                             item.question,
-                            pickle.dumps(item.answers),
-                            pickle.dumps(item.voters),
-                            pickle.dumps(item.solvers),
+                            encode_json(item.answers),
+                            encode_ids(item.voters),
+                            encode_ids(item.solvers),
                             item.author,
                         ),
                     )
                 for item in quiz.submissions:
-                    cursor.execute(
+                    await cursor.execute(
                         """INSERT INTO quiz_submissions (guild_id, quiz_id, user_id, submissions)
-                    VALUES ('%s','%s','%s',%s)""",
+                    VALUES (%s,%s,%s,%s)""",
                         (
                             item.guild_id,
                             item.quiz_id,
                             item.user_id,
-                            pickle.dumps(item.to_dict()),
+                            encode_json(item.to_dict()),
                         ),
                     )
+                await self._record_changes(cursor, self._QUIZ_CHANGE, [quiz.id])
         return quiz
 
     def __str__(self):
@@ -356,21 +304,7 @@ class QuizRelatedCache(ProblemsRelatedCache):
         """Get the quiz with the id specified. Returns None if not found"""
         assert isinstance(quiz_id, int)
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                try:
-                    conn.row_factory = dict_factory  # Make sure the row_factory can be set to dict_factory
-                except BaseException as exc:
-                    # Not writeable?
-                    try:
-                        dict_factory()  # Check for name error
-                    except NameError as exc2:
-                        raise MathProblemsModuleException(
-                            "dict_factory could not be found"
-                        ) from exc2
-                    if isinstance(exc, AttributeError):  # Can't set attribute
-                        pass
-                    else:
-                        raise  # Re-raise the exception
+            async with self._sqlite_pool.reader() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     "SELECT * FROM quizzes WHERE quiz_id=?", (quiz_id,)
@@ -384,34 +318,30 @@ class QuizRelatedCache(ProblemsRelatedCache):
                 )
                 submissions = await cursor.fetchall()
                 submissions = [
-                    QuizSubmission.from_dict(pickle.loads(item[0]), cache=copy(self))
+                    QuizSubmission.from_dict(decode(item["submissions"]), cache=self.handle)
                     for item in submissions
                 ]
                 problems = [
-                    QuizProblem.from_row(dict_factory(cursor, row), cache=copy(self))
+                    QuizProblem.from_row(dict_factory(cursor, row), cache=self.handle)
                     for row in problems
                 ]
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute("SELECT * FROM quizzes WHERE quiz_id = '%s'", (quiz_id,))
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute("SELECT * FROM quizzes WHERE quiz_id = %s", (quiz_id,))
                 problems = [
-                    QuizProblem.from_row(row, copy(self)) for row in cursor.fetchall()
+                    QuizProblem.from_row(row, self.handle) for row in await cursor.fetchall()
                 ]
-                cursor.execute(
-                    "SELECT * FROM submissions WHERE quiz_id = '%s'", (quiz_id,)
+                await cursor.execute(
+                    "SELECT submissions FROM quiz_submissions WHERE quiz_id = %s", (quiz_id,)
                 )
                 submissions = [
-                    QuizSubmission.from_dict(pickle.loads(row[0]), cache=copy(self))
-                    for row in cursor.fetchall()
+                    QuizSubmission.from_dict(decode(row["submissions"]), cache=self.handle)
+                    for row in await cursor.fetchall()
                 ]
         authors = set((problem.author for problem in problems))
-        sessions = await self.get_quiz_sessions(quiz_id)
+        # Not get_quiz_sessions, which would get this quiz again
+        sessions = [QuizSolvingSession.from_row(row) for row in await self._get_quiz_session_rows(quiz_id)]
         description = await self.get_quiz_description(quiz_id)
         quiz = Quiz(
             quiz_id,
@@ -422,6 +352,8 @@ class QuizRelatedCache(ProblemsRelatedCache):
             existing_sessions=sessions,
             description=description,
         )
+        for session in sessions:
+            session._quiz = quiz
         return quiz
 
     async def update_quiz(self, quiz_id: int, new: Quiz) -> None:
@@ -437,7 +369,7 @@ class QuizRelatedCache(ProblemsRelatedCache):
     async def delete_quiz(self, quiz_id: int):
         """Delete a quiz!"""
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     "DELETE FROM quizzes WHERE quiz_id = ?", (quiz_id,)
@@ -451,32 +383,29 @@ class QuizRelatedCache(ProblemsRelatedCache):
                 await cursor.execute(
                     "DELETE from quiz_description WHERE quiz_id = ?", (quiz_id,)
                 )
-                await conn.commit()  # Commit
+                await self._record_changes(cursor, self._QUIZ_CHANGE, [quiz_id])
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
-                    "DELETE FROM quizzes WHERE quiz_id = '?'", (quiz_id,)
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
+                    "DELETE FROM quizzes WHERE quiz_id = %s", (quiz_id,)
                 )  # Delete the quiz's problems
-                cursor.execute(
-                    "DELETE FROM quiz_submissions WHERE quiz_id='?'", (quiz_id,)
+                await cursor.execute(
+                    "DELETE FROM quiz_submissions WHERE quiz_id = %s", (quiz_id,)
                 )  # Delete the submissions as well.
-                cursor.execute(
-                    "DELETE FROM quiz_submission_sessions WHERE quiz_id = ?", (quiz_id,)
+                await cursor.execute(
+                    "DELETE FROM quiz_submission_sessions WHERE quiz_id = %s", (quiz_id,)
                 )  # Delete the sessions associated with it
-                connection.commit()
+                await cursor.execute(
+                    "DELETE FROM quiz_description WHERE quiz_id = %s", (quiz_id,)
+                )
+                await self._record_changes(cursor, self._QUIZ_CHANGE, [quiz_id])
 
     async def get_quiz_description(self, quiz_id: int) -> QuizDescription:
         """Get a quiz description from a quiz id"""
         assert isinstance(quiz_id, int)
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                conn.row_factory = dict_factory
+            async with self._sqlite_pool.reader() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     "SELECT * FROM quiz_description WHERE quiz_id = ?", (quiz_id,)
@@ -492,17 +421,12 @@ class QuizRelatedCache(ProblemsRelatedCache):
                     possible_quiz_descriptions[0], cache=self
                 )
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
-                    "SELECT * FROM quiz_description WHERE quiz_id = ?", (quiz_id,)
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
+                    "SELECT * FROM quiz_description WHERE quiz_id = %s", (quiz_id,)
                 )
-                possible_quiz_descriptions = cursor.fetchall()
+                possible_quiz_descriptions = await cursor.fetchall()
                 if len(possible_quiz_descriptions) == 0:
                     raise QuizDescriptionNotFoundException("Quiz description not found")
                 elif len(possible_quiz_descriptions) > 1:
@@ -525,7 +449,7 @@ class QuizRelatedCache(ProblemsRelatedCache):
             )
 
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     """UPDATE quiz_description
@@ -543,16 +467,10 @@ class QuizRelatedCache(ProblemsRelatedCache):
                         description.quiz_id,
                     ),
                 )
-                await conn.commit()
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
                     """UPDATE quiz_description
                     SET description = %s, license = %s, time_limit = %s, intensity = %s, category = %s, quiz_id = %s, author = %s, guild_id = %s
                     WHERE quiz_id = %s""",
@@ -568,7 +486,6 @@ class QuizRelatedCache(ProblemsRelatedCache):
                         description.quiz_id,
                     ),
                 )
-                connection.commit()
 
     async def add_quiz_description(self, description: QuizDescription):
         """Add quiz description"""
@@ -579,11 +496,10 @@ class QuizRelatedCache(ProblemsRelatedCache):
         except QuizDescriptionNotFoundException:
             pass
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                conn.row_factory = dict_factory
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
-                    """INSERT INTO quiz_description (description, license, time_limit, intensity, quiz_id, author, category. guild_id)
+                    """INSERT INTO quiz_description (description, license, time_limit, intensity, quiz_id, author, category, guild_id)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                     """,
                     (
@@ -598,18 +514,12 @@ class QuizRelatedCache(ProblemsRelatedCache):
                         description.guild_id,
                     ),
                 )
-                await conn.commit()
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
                     """INSERT INTO quiz_description (description, license, time_limit, intensity, quiz_id, author, category, guild_id)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s. %s)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
                     """,
                     (
                         # These will replace the ?'s
@@ -623,32 +533,24 @@ class QuizRelatedCache(ProblemsRelatedCache):
                         description.guild_id,
                     ),
                 )
-                connection.commit()
 
     async def delete_quiz_description(self, quiz_id: int):
         """DELETE quiz description!"""
 
         assert isinstance(quiz_id, int)
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
-                    "DELETE * FROM quiz_description WHERE quiz_id = ?", (quiz_id,)
+                    "DELETE FROM quiz_description WHERE quiz_id = ?", (quiz_id,)
                 )  # Delete it
-                await conn.commit()
 
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
-                    "DELETE * FROM quiz_description WHERE quiz_id = ?", (quiz_id,)
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
+                    "DELETE FROM quiz_description WHERE quiz_id = %s", (quiz_id,)
                 )  # Delete it
-                connection.commit()
 
     async def get_quizzes_by_func(
         self: "QuizRelatedCache",
@@ -659,7 +561,15 @@ class QuizRelatedCache(ProblemsRelatedCache):
         """Get the quizzes that match the function.
         Function is a function that takes in the quiz, and the provided arguments and keyword arguments.
         Return something True-like to signify you want the quiz in the list, and False-like to signify you don't.
+        func can also be a Q (see query.py) of the fields in QUIZ_FIELDS. Then the database finds the ids of the quizzes.
+        A quiz matches a Q if one of its problems matches it (the quizzes table has a row per problem).
         """
+        if isinstance(func, Q):
+            quiz_ids = await self._get_quiz_ids_matching(func)
+            if not quiz_ids:
+                return []
+            await self.update_cache()
+            return [self._cached_quizzes_by_id[quiz_id] for quiz_id in quiz_ids if quiz_id in self._cached_quizzes_by_id]
         if args is None:
             args = []
         if kwargs is None:
@@ -667,12 +577,26 @@ class QuizRelatedCache(ProblemsRelatedCache):
         await self.update_cache()
         return [quiz for quiz in self.cached_quizzes if func(quiz, *args, **kwargs)]  # type: ignore
 
+    async def _get_quiz_ids_matching(self, q: Q) -> typing.List[int]:
+        """Return the ids of the quizzes that match q"""
+        where, params = q.to_sql("?" if self.use_sqlite else "%s", fields=QUIZ_FIELDS)
+        if self.use_sqlite:
+            async with self._sqlite_pool.reader() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute(f"SELECT DISTINCT quiz_id FROM quizzes WHERE {where}", tuple(params))
+                return [row["quiz_id"] for row in await cursor.fetchall()]
+        else:
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(f"SELECT DISTINCT quiz_id FROM quizzes WHERE {where}", tuple(params))
+                return [row["quiz_id"] for row in await cursor.fetchall()]
+
     async def initialize_sql_table(self):
         """Initialize the SQL tables if they don't already exist"""
         await super().initialize_sql_table()  # Initialize base problem-related tables
 
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     """
@@ -735,16 +659,10 @@ class QuizRelatedCache(ProblemsRelatedCache):
                     )
                     """
                 )
-                await conn.commit()
         else:
-            with mysql_connection(
-                    host=self.mysql_db_ip,
-                    password=self.mysql_password,
-                    user=self.mysql_username,
-                    database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
                     """
                     CREATE TABLE IF NOT EXISTS quiz_description (
                         id INT AUTO_INCREMENT PRIMARY KEY,
@@ -755,12 +673,11 @@ class QuizRelatedCache(ProblemsRelatedCache):
                         intensity REAL,
                         category TEXT,
                         author INT,
-                        guild_id INT,
-                        FOREIGN KEY (quiz_id) REFERENCES quizzes(quiz_id)
+                        guild_id INT
                     )
                     """
                 )
-                cursor.execute(
+                await cursor.execute(
                     """
                     CREATE TABLE IF NOT EXISTS quizzes (
                         id INT AUTO_INCREMENT PRIMARY KEY,
@@ -771,24 +688,22 @@ class QuizRelatedCache(ProblemsRelatedCache):
                         answer LONGBLOB,
                         voters LONGBLOB,
                         solvers LONGBLOB,
-                        author INT,
-                        FOREIGN KEY (quiz_id) REFERENCES quiz_description(quiz_id)
+                        author INT
                     )
                     """
                 )
-                cursor.execute(
+                await cursor.execute(
                     """
                     CREATE TABLE IF NOT EXISTS quiz_submissions (
                         id INT AUTO_INCREMENT PRIMARY KEY,
                         guild_id INT,
                         quiz_id INT,
                         user_id INT,
-                        submissions LONGBLOB,
-                        FOREIGN KEY (quiz_id) REFERENCES quiz_description(quiz_id)
+                        submissions LONGBLOB
                     )
                     """
                 )
-                cursor.execute(
+                await cursor.execute(
                     """
                     CREATE TABLE IF NOT EXISTS quiz_submission_sessions (
                         id INT AUTO_INCREMENT PRIMARY KEY,
@@ -800,9 +715,7 @@ class QuizRelatedCache(ProblemsRelatedCache):
                         start_time INT,
                         expire_time INT,
                         special_id INT,
-                        attempt_num INT,
-                        FOREIGN KEY (quiz_id) REFERENCES quiz_description(quiz_id)
+                        attempt_num INT
                     )
                     """
                 )
-                connection.commit()
@@ -0,0 +1,75 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+Makes sure that only 1 call of an expensive function (like reloading every problem) runs at a time.
+The callers that come while it is running wait for that call and get its result (or its exception),
+instead of running the same function again at the same time.
+"""
+import asyncio
+import logging
+import typing
+
+log = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """At most 1 running task per key.
+    It isn't thread-safe, but it doesn't need to be (everything runs in the event loop)"""
+
+    def __init__(self):
+        self._tasks: typing.Dict[typing.Hashable, asyncio.Task] = {}
+        self.calls = 0  # The number of times that a function was actually called
+        self.joined = 0  # The number of callers that waited for a call that was already running
+
+    def __contains__(self, key) -> bool:
+        """Whether a call is running for this key"""
+        task = self._tasks.get(key)
+        return task is not None and not task.done()
+
+    def start(self, key, func: typing.Callable[[], typing.Awaitable[typing.Any]]) -> asyncio.Task:
+        """Start func() in a task unless a call is already running for key,
+        and return the running task"""
+        task = self._tasks.get(key)
+        if task is not None and not task.done():
+            self.joined += 1
+            return task
+        self.calls += 1
+        task = asyncio.get_running_loop().create_task(func())
+        self._tasks[key] = task
+        task.add_done_callback(lambda finished: self._forget(key, finished))
+        return task
+
+    def _forget(self, key, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            # Logged here, because nobody might be waiting for the task (see run_in_background)
+            log.warning(f"The call for {key!r} failed", exc_info=task.exception())
+
+    async def run(self, key, func: typing.Callable[[], typing.Awaitable[typing.Any]]):
+        """Call func(), or wait for the call that is already running for key. Returns its result.
+        Cancelling one caller doesn't cancel the call,
+        because the other callers are waiting for it too"""
+        return await asyncio.shield(self.start(key, func))
+
+    def run_in_background(
+        self, key, func: typing.Callable[[], typing.Awaitable[typing.Any]]
+    ) -> asyncio.Task:
+        """Start func() (unless a call is already running for key) without waiting for it.
+        Exceptions are logged"""
+        return self.start(key, func)
@@ -6,14 +6,14 @@ from copy import copy, deepcopy
 from types import FunctionType
 from typing import *
 
-import aiosqlite
 import disnake
+from aiomysql import DictCursor
 
 from helpful_modules.dict_factory import dict_factory
 
 from ..errors import *
-from ..mysql_connector_with_stmt import mysql_connection
 from ..user_data import UserData
+from .lru import MISSING
 from .quiz_related_cache import QuizRelatedCache
 
 log = logging.getLogger(__name__)
@@ -26,6 +26,9 @@ class UserDataRelatedCache(QuizRelatedCache):
     async def get_user_data(
         self, user_id: int, default: typing.Optional[UserData] | str = None
     ):
+        """Return the user data of the user, or default if there isn't any.
+        The result is cached in user_data_lru (including the fact that there isn't any), so the permission checks
+        that run before every command usually don't read the database"""
         log.debug(
             f"get_user_data method called. user_id: {user_id}, default: {default}"
         )
@@ -36,9 +39,19 @@ class UserDataRelatedCache(QuizRelatedCache):
         if default is None:
             default = UserData(user_id=user_id, trusted=False, blacklisted=False)
             # To avoid mutable default arguments
+        cached = self.user_data_lru.get(user_id, MISSING)
+        if cached is not MISSING:
+            return default if cached is None else copy(cached)  # A copy, so that changing it doesn't change the cache
+        # If set_user_data or del_user_data runs while this is reading, what was read isn't cached
+        generation = self.user_data_lru.generation(user_id)
+        user_data = await self._get_user_data_from_db(user_id)
+        self.user_data_lru.put(user_id, user_data, generation)
+        return default if user_data is None else copy(user_data)
+
+    async def _get_user_data_from_db(self, user_id: int) -> typing.Optional[UserData]:
+        """Read the user data of the user from the database. Returns None if there isn't any"""
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
-                conn.row_factory = dict_factory
+            async with self._sqlite_pool.reader() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     "SELECT * FROM user_data WHERE user_id = ?", (user_id,)
@@ -46,38 +59,28 @@ class UserDataRelatedCache(QuizRelatedCache):
                 cursor_results = list(await cursor.fetchall())
                 log.debug(f"Data selected (results: {cursor_results})")
                 if len(cursor_results) == 0:
-                    return default
+                    return None
                 elif len(cursor_results) == 1:
-                    dict_to_use = cursor_results[0]
-                    dict_to_use["trusted"] = bool(dict_to_use["trusted"])
-                    dict_to_use["blacklisted"] = bool(dict_to_use["blacklisted"])
-                    dict_to_use["user_id"] = int(dict_to_use["USER_ID"])
                     log.debug("Data successfully returned!")
-                    return UserData.from_dict(dict_to_use)
+                    return self._user_data_from_row(cursor_results[0])
                 else:
                     raise TooMuchUserDataException(
                         f"Too much user data; found {len(cursor_results)} results, but only 0 or 1 results are expected."
                         f"Results: {cursor_results}"
                     )
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
+            async with self.get_a_connection() as connection:
                 log.debug("Connected to MySQL")
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
-                    "SELECT * FROM user_data WHERE user_id=?",
-                    (user_id,),  # TODO: fix placeholders
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
+                    "SELECT * FROM user_data WHERE user_id=%s",
+                    (user_id,),
                 )
-                results = list(cursor.fetchall())
+                results = list(await cursor.fetchall())
                 if len(results) == 0:
-                    return default
+                    return None
                 elif len(results) == 1:
-                    results[0]["user_id"] = results[0]["USER_ID"]
-                    return UserData.from_dict(results[0])
+                    return self._user_data_from_row(results[0])
                 else:
                     try:
                         raise TooMuchUserDataException(
@@ -86,78 +89,110 @@ class UserDataRelatedCache(QuizRelatedCache):
                     except NameError:
                         raise TooMuchUserDataException("Too much user data found!")
 
+    @staticmethod
+    def _user_data_from_row(row: dict) -> UserData:
+        """Convert a row of the user_data table into UserData (the column used to be called USER_ID)"""
+        return UserData(
+            user_id=int(row["USER_ID"] if "USER_ID" in row else row["user_id"]),
+            trusted=bool(row["trusted"]),
+            blacklisted=bool(row["blacklisted"]),
+        )
+
+    async def get_user_data_many(self, user_ids: typing.Iterable[int]) -> typing.Dict[int, UserData]:
+        """Return a dictionary of the user data of these users (the users who don't have any are left out).
+        The user data that isn't in user_data_lru is read together, with 1 query per 500 users instead of 1 query per user"""
+        user_ids = list(dict.fromkeys(user_ids))
+        assert all(isinstance(user_id, int) for user_id in user_ids)
+        found: typing.Dict[int, typing.Optional[UserData]] = {}
+        missing = []
+        for user_id in user_ids:
+            cached = self.user_data_lru.get(user_id, MISSING)
+            if cached is MISSING:
+                missing.append(user_id)
+            else:
+                found[user_id] = cached
+        if missing:
+            generations = {user_id: self.user_data_lru.generation(user_id) for user_id in missing}
+            placeholder = "?" if self.use_sqlite else "%s"
+            rows = []
+            if self.use_sqlite:
+                async with self._sqlite_pool.reader() as conn:
+                    cursor = await conn.cursor()
+                    for chunk in self._chunks(missing):
+                        await cursor.execute(
+                            f"SELECT * FROM user_data WHERE user_id IN ({','.join([placeholder] * len(chunk))})", tuple(chunk)
+                        )
+                        rows.extend(await cursor.fetchall())
+            else:
+                async with self.get_a_connection() as connection:
+                    cursor = await connection.cursor(DictCursor)
+                    for chunk in self._chunks(missing):
+                        await cursor.execute(
+                            f"SELECT * FROM user_data WHERE user_id IN ({','.join([placeholder] * len(chunk))})", tuple(chunk)
+                        )
+                        rows.extend(await cursor.fetchall())
+            loaded = {}
+            for row in rows:
+                user_data = self._user_data_from_row(row)
+                if user_data.user_id in loaded:
+                    raise TooMuchUserDataException(f"Too much user data for the user {user_data.user_id}")
+                loaded[user_data.user_id] = user_data
+            for user_id in missing:
+                found[user_id] = loaded.get(user_id)
+                # None means that there isn't any, like get_user_data
+                self.user_data_lru.put(user_id, found[user_id], generations[user_id])
+        # Copies, so that changing them doesn't change the cache
+        return {user_id: copy(found[user_id]) for user_id in user_ids if found[user_id] is not None}
+
     async def set_user_data(self, user_id: int, new: UserData) -> None:
         """Set the user_data of a user."""
         assert isinstance(user_id, int)
         assert isinstance(new, UserData)
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 log.debug("Connected to SQLite!")
-                conn.row_factory = dict_factory
-                blacklisted_int = int(new.blacklisted)
-                trusted_int = int(new.trusted)
                 cursor = await conn.cursor()
-                if await self.get_user_data(user_id, default="Okay") == "Okay":
-                    await cursor.execute(
-                        "INSERT INTO user_data (user_id, blacklisted, trusted) VALUES (?, ?, ?)",
-                        (user_id, blacklisted_int, trusted_int),
-                    )
-                else:
-                    await cursor.execute(
-                        """UPDATE user_data 
-                    SET user_id=?, blacklisted=?, trusted=?
-                    WHERE user_id=?;""",
-                        (user_id, blacklisted_int, trusted_int, user_id),
-                    )
-
-                await conn.commit()
+                # One statement, so it doesn't matter whether the row exists (or is being inserted right now)
+                # (the unique index on user_id is created by the migrations)
+                await cursor.execute(
+                    """INSERT INTO user_data (user_id, blacklisted, trusted) VALUES (?, ?, ?)
+                    ON CONFLICT(user_id) DO UPDATE SET blacklisted=excluded.blacklisted, trusted=excluded.trusted""",
+                    (user_id, int(new.blacklisted), int(new.trusted)),
+                )
                 log.debug("Finished!")
+            self.user_data_lru.invalidate(user_id)
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
+            async with self.get_a_connection() as connection:
                 log.debug("Connected to MySQL")
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute(
-                    """UPDATE user_id
-                   SET user_id = %s, trusted=%s, blacklisted=%s
-                   WHERE user_id = %s""",
-                    (user_id, new.trusted, new.blacklisted, user_id),
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute(
+                    """INSERT INTO user_data (user_id, trusted, blacklisted)
+                   VALUES (%s, %s, %s)
+                   ON DUPLICATE KEY UPDATE trusted=VALUES(trusted), blacklisted=VALUES(blacklisted)""",
+                    (user_id, int(new.trusted), int(new.blacklisted)),
                 )
-                connection.commit()
                 log.debug("Finished!")
-                return
-
+            self.user_data_lru.invalidate(user_id)
 
     async def del_user_data(self, user_id: int):
         """Delete user data given the user id"""
         assert isinstance(user_id, int)
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute(
                     "DELETE FROM user_data WHERE user_id = ?", (user_id,)
                 )
-                await conn.commit()
         else:
-            with mysql_connection(
-                host=self.mysql_db_ip,
-                password=self.mysql_password,
-                user=self.mysql_username,
-                database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor(dictionaries=True)
-                cursor.execute("DELETE FROM user_data WHERE user_id = %s", (user_id,))
-                connection.commit()
-                connection.close()
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute("DELETE FROM user_data WHERE user_id = %s", (user_id,))
+        self.user_data_lru.invalidate(user_id)
 
     async def initialize_sql_table(self) -> None:
         """Initialize SQL tables if they don't exist."""
         if self.use_sqlite:
-            async with aiosqlite.connect(self.db_name) as conn:
+            async with self._sqlite_pool.writer() as conn:
                 cursor = await conn.cursor()
                 await cursor.execute("""
                     CREATE TABLE IF NOT EXISTS user_data (
@@ -166,20 +201,13 @@ class UserDataRelatedCache(QuizRelatedCache):
                         blacklisted INTEGER
                     )
                 """)
-                await cursor.commit()
         else:
-            with mysql_connection(
-                    host=self.mysql_db_ip,
-                    password=self.mysql_password,
-                    user=self.mysql_username,
-                    database=self.mysql_db_name,
-            ) as connection:
-                cursor = connection.cursor()
-                cursor.execute("""
+            async with self.get_a_connection() as connection:
+                cursor = await connection.cursor(DictCursor)
+                await cursor.execute("""
                     CREATE TABLE IF NOT EXISTS user_data (
-                        user_id INT PRIMARY KEY,
+                        user_id BIGINT PRIMARY KEY,
                         trusted BOOLEAN,
                         blacklisted BOOLEAN
                     )
                 """)
-                connection.commit()
@@ -15,110 +15,725 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
 """
+import ast
 import asyncio
+import random
 import typing
+from copy import copy, deepcopy
 from typing import List
 
 import orjson
 from redis import asyncio as aioredis  # type: ignore
-from ..parse_problem import convert_dict_to_problem
+from redis.exceptions import ResponseError  # type: ignore
 from ...FileDictionaryReader import AsyncFileDict
 from ..appeal import Appeal
-from ..base_problem import BaseProblem
+from ..base_problem import PROBLEM_TYPES, BaseProblem
+from ..codec import HEADER_JSON, HEADERS, VALUE_ENCODERS, decode
+from ..cache.lru import MISSING, LRUCache
+from ..cache.problems_related_cache import VoteResult
 from ..dict_convertible import DictConvertible
 from ..errors import (
     FormatException,
     InvalidDictionaryInDatabaseException,
     LockedCacheException,
     ProblemNotFoundException,
+    RedisClusterNotSupportedException,
     ThingNotFound,
+    WriteConflictException,
 )
 from ..GuildData import GuildData
+from ..query import Q
 from ..quizzes import Quiz
 from ..user_data import UserData
 
+# Every entity of a type is in one hash, whose fields are the ids
+PROBLEMS = "Problems"
+QUIZZES = "Quizzes"
+USER_DATA = "UserData"
+GUILD_DATA = "GuildData"
+APPEALS = "Appeals"  # By user id
+ENTITY_HASHES = (PROBLEMS, QUIZZES, USER_DATA, GUILD_DATA, APPEALS)
 
-class RedisCache:
-    """A class that is supposed to handle the problems, and have the same API as problems_related_cache"""
 
-    def __init__(self, redis_url: str, password: str):
+def guild_problems_key(guild_id: int | str | None) -> str:
+    """The key of the sorted set of the ids of the guild's problems (the scores are the ids, for get_problems_page)"""
+    return f"GuildProblemIds:{guild_id}"
+
+
+def author_problems_key(author: int) -> str:
+    """The key of the set of the ids of the problems made by the author"""
+    return f"AuthorProblemIds:{author}"
+
+
+def voters_key(problem_id: int) -> str:
+    return f"ProblemVoters:{problem_id}"
+
+
+def solvers_key(problem_id: int) -> str:
+    return f"ProblemSolvers:{problem_id}"
+
+
+def user_things_key(user_id: int) -> str:
+    """The key of the set of everything that belongs to the user (see get_all_by_user_id).
+    Its members are "{hash}:{field}" for the entities the user made (or that are about the user),
+    and the keys of the voter and solver sets the user is in"""
+    return f"UserThings:{user_id}"
+
+
+# Add ARGV[1] (a user id) to the voter or solver set KEYS[1] of problem ARGV[2], and KEYS[1] to the user's
+# UserThings set KEYS[2]. KEYS[3] is the Problems hash: nothing is added if the problem doesn't exist.
+# Returns {whether the user was added, the size of the set}, or {-1, 0} if the problem doesn't exist
+ADD_USER_SCRIPT = """
+if redis.call('HEXISTS', KEYS[3], ARGV[2]) == 0 then
+    return {-1, 0}
+end
+local added = redis.call('SADD', KEYS[1], ARGV[1])
+if added == 1 then
+    redis.call('SADD', KEYS[2], KEYS[1])
+end
+return {added, redis.call('SCARD', KEYS[1])}
+"""
+
+# The opposite of ADD_USER_SCRIPT (without the check). Returns {whether the user was removed, the size of the set}
+REMOVE_USER_SCRIPT = """
+local removed = redis.call('SREM', KEYS[1], ARGV[1])
+if removed == 1 then
+    redis.call('SREM', KEYS[2], KEYS[1])
+end
+return {removed, redis.call('SCARD', KEYS[1])}
+"""
+
+# ADD_USER_SCRIPT for a vote, which also deletes the problem if the vote was added and there are at least ARGV[3]
+# votes now (0 means never). KEYS[1] to KEYS[3] are the same as in ADD_USER_SCRIPT, KEYS[4] is the solver set,
+# and KEYS[5] to KEYS[7] are the indexes of the problem's guild and author and the author's UserThings set.
+# They come from the problem's value, which can't be decoded here, so it is read first and passed as ARGV[4]:
+# if the problem has changed since then, nothing is done. ARGV[5] is the prefix of the UserThings sets
+# of the voters and the solvers (which are only known here), and ARGV[6] is the problem's member in KEYS[7].
+# Returns {whether the vote was added, the number of votes, whether the problem was deleted},
+# {-1, 0, 0} if the problem doesn't exist, or {-2, 0, 0} if it has changed
+ADD_VOTE_AND_COUNT_SCRIPT = """
+local value = redis.call('HGET', KEYS[3], ARGV[2])
+if not value then
+    return {-1, 0, 0}
+end
+if value ~= ARGV[4] then
+    return {-2, 0, 0}
+end
+local added = redis.call('SADD', KEYS[1], ARGV[1])
+if added == 1 then
+    redis.call('SADD', KEYS[2], KEYS[1])
+end
+local count = redis.call('SCARD', KEYS[1])
+local threshold = tonumber(ARGV[3])
+if added == 0 or threshold == 0 or count < threshold then
+    return {added, count, 0}
+end
+redis.call('HDEL', KEYS[3], ARGV[2])
+redis.call('ZREM', KEYS[5], ARGV[2])
+redis.call('SREM', KEYS[6], ARGV[2])
+redis.call('SREM', KEYS[7], ARGV[6])
+for _, key in ipairs({KEYS[1], KEYS[4]}) do
+    for _, user_id in ipairs(redis.call('SMEMBERS', key)) do
+        redis.call('SREM', ARGV[5] .. user_id, key)
+    end
+end
+redis.call('DEL', KEYS[1], KEYS[4])
+return {added, count, 1}
+"""
+
+# Run commands on the hashes and the indexes only if the values they were computed from haven't changed since they
+# were read. It is like WATCH, but for single hash fields: WATCH can only watch a whole hash, so writes to different
+# entities of a type would make each other retry.
+# ARGV[1] is the number of checks, then come the checks: ('H', key number, field, value) if the field of the hash
+# still has that value ('' if it didn't exist), or ('S', key number, N, N members) if the set still has these members.
+# The rest are the commands: (command, key number, number of arguments, arguments...). See _CheckedWrites.
+# Returns 1 if the commands were run, or 0 if something changed
+CHECK_AND_WRITE_SCRIPT = """
+local i = 2
+for _ = 1, tonumber(ARGV[1]) do
+    local key = KEYS[tonumber(ARGV[i + 1])]
+    if ARGV[i] == 'H' then
+        if (redis.call('HGET', key, ARGV[i + 2]) or '') ~= ARGV[i + 3] then
+            return 0
+        end
+        i = i + 4
+    else
+        local n = tonumber(ARGV[i + 2])
+        if redis.call('SCARD', key) ~= n then
+            return 0
+        end
+        for j = i + 3, i + 2 + n do
+            if redis.call('SISMEMBER', key, ARGV[j]) == 0 then
+                return 0
+            end
+        end
+        i = i + 3 + n
+    end
+end
+while i <= #ARGV do
+    local n = tonumber(ARGV[i + 2])
+    redis.call(ARGV[i], KEYS[tonumber(ARGV[i + 1])], unpack(ARGV, i + 3, i + 2 + n))
+    i = i + 3 + n
+end
+return 1
+"""
+
+
+class _CheckedWrites:
+    """The checks and the commands of one CHECK_AND_WRITE_SCRIPT call. Commands are queued with the same methods
+    as on a pipeline, so _reindex_owners, _index_problems, _unindex_problem and _remove_users_sets can queue them
+    here too"""
+
+    # The most arguments a command gets (unpack can't unpack many more at once); commands with more are split
+    MAX_ARGS = 1000
+
+    def __init__(self):
+        self.keys: typing.Dict[str, int] = {}  # key -> its number in KEYS
+        self.num_checks = 0
+        self.checks: typing.List[typing.Any] = []
+        self.commands: typing.List[typing.Any] = []
+
+    def _key(self, key: str) -> int:
+        return self.keys.setdefault(key, len(self.keys) + 1)
+
+    def check_field(self, name: str, field: str | int, value: bytes | None) -> None:
+        """Only run the commands if the field of the hash name still has this value (None means no value)"""
+        self.checks += ["H", self._key(name), field, b"" if value is None else value]
+        self.num_checks += 1
+
+    def check_set(self, key: str, members: typing.Collection) -> None:
+        """Only run the commands if the set still has exactly these members"""
+        self.checks += ["S", self._key(key), len(members), *members]
+        self.num_checks += 1
+
+    def _command(self, command: str, key: str, args: typing.Sequence) -> None:
+        for start in range(0, max(len(args), 1), self.MAX_ARGS):
+            chunk = args[start:start + self.MAX_ARGS]
+            self.commands += [command, self._key(key), len(chunk), *chunk]
+
+    def hset(self, name: str, key: str | int | None = None, value: typing.Any = None, mapping: dict | None = None):
+        args = [] if key is None else [key, value]
+        for item in (mapping or {}).items():
+            args += item
+        self._command("HSET", name, args)
+
+    def hdel(self, name: str, *fields):
+        self._command("HDEL", name, fields)
+
+    def sadd(self, key: str, *members):
+        self._command("SADD", key, members)
+
+    def srem(self, key: str, *members):
+        self._command("SREM", key, members)
+
+    def zadd(self, key: str, mapping: dict):
+        self._command("ZADD", key, [arg for member, score in mapping.items() for arg in (score, member)])
+
+    def zrem(self, key: str, *members):
+        self._command("ZREM", key, members)
+
+    def delete(self, *keys: str):
+        for key in keys:
+            self._command("DEL", key, ())
+
+    async def run(self, script, client) -> bool:
+        """Call the script. Returns False if nothing was written because something changed"""
+        args = [self.num_checks, *self.checks, *self.commands]
+        return bool(await script(keys=list(self.keys), args=args, client=client))
+
+
+# Set once the UserThings sets have been built for the entities that were written before they existed
+USER_THINGS_INDEX_BUILT = "UserThingsIndexBuilt"
+# The set of the ids of the blacklisted guilds, which add_guild_data keeps up to date,
+# and the key that is set once it has been filled with the guilds that were blacklisted before that
+BLACKLISTED_GUILD_IDS = "BlacklistedGuildIds"
+BLACKLISTED_GUILD_IDS_BUILT = "BlacklistedGuildIdsBuilt"
+
+
+def _owners(record: typing.Any) -> typing.Set[int]:
+    """Return the ids of the users who an entity (converted into a dictionary) belongs to:
+    its author, its authors or the user it is about"""
+    if not isinstance(record, dict):
+        return set()
+    owners = set(record.get("authors") or ())
+    for field in ("author", "user_id"):
+        if record.get(field) is not None:
+            owners.add(record[field])
+    return {int(owner) for owner in owners}
+
+
+def _is_legacy_value(value: bytes) -> bool:
+    """Return whether a value was written before the values were encoded with the codec (see codec.py)"""
+    return value[:1] not in HEADERS
+
+
+def _loads(value: bytes) -> typing.Any:
+    """Decode a value of an entity hash. Values that were written before the codec was used are decoded too:
+    they are plain JSON, or even str() of a dictionary
+    :raises InvalidDictionaryInDatabaseException: if it can't be decoded"""
+    try:
+        if value[:1] == HEADER_JSON:  # The most common kind of value, without the overhead of decode()
+            return orjson.loads(value[1:])
+        if not _is_legacy_value(value):
+            return decode(value, allow_legacy=False)
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            return ast.literal_eval(value.decode("utf-8"))
+    except (ValueError, SyntaxError, FormatException) as exc:  # JSONDecodeError and UnicodeDecodeError are ValueErrors
+        raise InvalidDictionaryInDatabaseException("A value in the database can't be decoded") from exc
+
+
+def _owners_of_value(value: bytes | None) -> typing.Set[int]:
+    """_owners of a value of an entity hash. Values that can't be decoded don't have owners"""
+    if value is None:
+        return set()
+    try:
+        return _owners(_loads(value))
+    except InvalidDictionaryInDatabaseException:
+        return set()
+
+
+def _problem_record(problem: BaseProblem) -> dict:
+    """Convert a problem into what is stored in the Problems hash (once it is encoded).
+    The voters and the solvers aren't part of it: they are in their own sets (see add_vote)"""
+    return {
+        "id": problem.id,
+        "guild_id": problem.guild_id,
+        "question": problem.question,
+        "answers": problem.answers,
+        "author": problem.author,
+        "extra_stuff": problem.get_extra_stuff(),
+    }
+
+
+def _load_problem(value: bytes, voters: typing.Iterable, solvers: typing.Iterable, cache=None) -> BaseProblem:
+    """Convert a value of the Problems hash (and the problem's voters and solvers) into a problem of the right type"""
+    record = _loads(value)
+    try:
+        extra_stuff = record["extra_stuff"]
+        problem_type = PROBLEM_TYPES[extra_stuff["type"]]
+    except (KeyError, TypeError) as exc:
+        raise FormatException("A problem in the database doesn't have the right format") from exc
+    return problem_type(
+        question=record["question"],
+        answers=record["answers"],
+        id=record["id"],
+        guild_id=record["guild_id"],
+        voters=sorted(map(int, voters)),
+        solvers=sorted(map(int, solvers)),
+        author=record["author"],
+        cache=cache,
+        type=problem_type.__name__,
+        **{field: extra_stuff[field] for field in problem_type.EXTRA_FIELDS if field in extra_stuff},
+    )
+
+
+class RedisCache:
+    """A class that is supposed to handle the problems, and have the same API as problems_related_cache.
+
+    Every entity of a type is stored in one hash (see ENTITY_HASHES), and the problems are indexed by guild
+    and by author. The indexes are updated in the same script call as the problems (see CHECK_AND_WRITE_SCRIPT).
+    The voters and the solvers of each problem are sets, so that votes and solves don't rewrite the problem.
+    They are changed by Lua scripts (see ADD_USER_SCRIPT), so that a vote or a solve is one atomic round trip.
+    The values are encoded with value_codec (one of codec.VALUE_ENCODERS: "json", or "msgpack" if it is installed).
+    Every value starts with a header that says how it's encoded, so the codec can be changed at any time.
+
+    This needs a single Redis server (or a primary with replicas), not a Redis Cluster: the scripts use keys that
+    a cluster would put in different hash slots, which it refuses with CROSSSLOT, and ADD_VOTE_AND_COUNT_SCRIPT
+    also uses the UserThings sets of the voters and the solvers, which it can't declare.
+    start raises RedisClusterNotSupportedException on a cluster"""
+
+    # How many times a write is attempted (see _write_checked) before WriteConflictException is raised,
+    # and the most time waited between two attempts, in seconds
+    MAX_WRITE_ATTEMPTS = 10
+    MAX_WRITE_BACKOFF = 0.5
+
+    def __init__(
+        self,
+        redis_url: str,
+        password: str,
+        problem_cache_size: int = 10000,
+        problem_cache_ttl: float | None = 60.0,
+        user_data_cache_size: int = 10000,
+        user_data_cache_ttl: float | None = 60.0,
+        value_codec: str = "json",
+    ):
+        if value_codec not in VALUE_ENCODERS:
+            raise ValueError(f"value_codec must be one of {', '.join(VALUE_ENCODERS)}")
+        self._encode = VALUE_ENCODERS[value_codec]
+        self._encode(None)  # Raises ImportError now if the codec's library isn't installed
         self.redis_url = redis_url
         self.password = password
-        self.redis = aioredis.from_url(
-            redis_url, encoding="utf-8", decode_responses=True, password=password
-        )
+        # The values are binary, so the responses aren't decoded
+        self.redis = aioredis.from_url(redis_url, decode_responses=False, password=password)
         self.lock = asyncio.Lock()
         self._async_file_dict = AsyncFileDict("config.json")
+        # The problems recently returned by get_problem, by id (see MathProblemCache.problem_lru)
+        self.problem_lru = LRUCache(max_size=problem_cache_size, ttl=problem_cache_ttl)
+        # The user data recently returned by get_user_data (None means that there isn't any)
+        self.user_data_lru = LRUCache(max_size=user_data_cache_size, ttl=user_data_cache_ttl)
+        # register_script doesn't talk to Redis: calling a script sends EVALSHA (and the script itself only if
+        # Redis doesn't have it yet). The client is passed to each call, so self.redis can still be replaced
+        self._add_user_script = self.redis.register_script(ADD_USER_SCRIPT)
+        self._remove_user_script = self.redis.register_script(REMOVE_USER_SCRIPT)
+        self._check_and_write_script = self.redis.register_script(CHECK_AND_WRITE_SCRIPT)
+        self._add_vote_and_count_script = self.redis.register_script(ADD_VOTE_AND_COUNT_SCRIPT)
+
+    async def start(self, *, warm: bool = False, reencode_legacy_rows: bool = False) -> None:
+        """The same lifecycle hook as MathProblemCache.start. Redis doesn't have tables to create
+        and nothing is cached in memory ahead of time, so this checks that Redis can be reached,
+        and builds the UserThings sets and the set of blacklisted guilds the first time it is started.
+        If reencode_legacy_rows is True, the values that were written before the codec was used are re-encoded
+        :raises RedisClusterNotSupportedException: if Redis is a cluster (see the docstring of the class)"""
+        await self.redis.ping()
+        if await self._is_cluster():
+            raise RedisClusterNotSupportedException(
+                "RedisCache needs a single Redis server: its scripts would fail with CROSSSLOT on a Redis Cluster"
+            )
+        if not await self.redis.exists(USER_THINGS_INDEX_BUILT):
+            await self.rebuild_user_things_index()
+        if not await self.redis.exists(BLACKLISTED_GUILD_IDS_BUILT):
+            await self.rebuild_blacklisted_guild_ids()
+        if reencode_legacy_rows:
+            await self.reencode_legacy_values()
+
+    async def _is_cluster(self) -> bool:
+        """Return whether Redis is a Redis Cluster"""
+        if isinstance(self.redis, aioredis.RedisCluster):
+            return True
+        try:
+            info = await self.redis.info("cluster")
+        except ResponseError:  # Servers that don't know about clusters (or don't have INFO)
+            return False
+        return bool(int(info.get("cluster_enabled", 0)))
+
+    async def reencode_legacy_values(self, batch_size: int = 1000) -> int:
+        """Re-encode the values that were written before the codec was used (they can still be read, but they are
+        bigger and slower to decode). Each batch is rewritten with one script call, which is retried if one of
+        its values changes in the meantime
+        Returns the number of values that were re-encoded
+        Time complexity: O(N)"""
+        num_reencoded = 0
+        for name in ENTITY_HASHES:
+            fields = [
+                field async for field, value in self.redis.hscan_iter(name, count=batch_size) if _is_legacy_value(value)
+            ]
+            for start in range(0, len(fields), batch_size):
+                batch = fields[start:start + batch_size]
+
+                async def reencode(writes):
+                    values = await self.redis.hmget(name, batch)
+                    legacy = {
+                        field: value
+                        for field, value in zip(batch, values)
+                        if value is not None and _is_legacy_value(value)
+                    }
+                    for field, value in legacy.items():
+                        writes.check_field(name, field, value)
+                    if legacy:
+                        reencoded = {field: self._encode(_loads(value)) for field, value in legacy.items()}
+                        writes.hset(name, mapping=reencoded)
+                    return len(legacy)
+
+                num_reencoded += await self._write_checked(reencode)
+        return num_reencoded
+
+    async def rebuild_user_things_index(self, batch_size: int = 1000) -> None:
+        """Add every entity, and every voter and solver set, to the UserThings sets of the users they belong to.
+        This only has to be done once, for what was written before those sets were kept up to date
+        Time complexity: O(N)"""
+        pipeline = self.redis.pipeline(transaction=False)
+        for name in ENTITY_HASHES:
+            async for field, value in self.redis.hscan_iter(name, count=batch_size):
+                self._reindex_owners(pipeline, f"{name}:{field.decode()}", set(), _owners_of_value(value))
+                if len(pipeline) >= batch_size:
+                    await pipeline.execute()
+        await pipeline.execute()
+        for pattern in (voters_key("*"), solvers_key("*")):
+            keys = [key.decode() async for key in self.redis.scan_iter(match=pattern, count=batch_size)]
+            for start in range(0, len(keys), batch_size):
+                batch = keys[start:start + batch_size]
+                for key in batch:
+                    pipeline.smembers(key)
+                for key, users in zip(batch, await pipeline.execute()):
+                    for user_id in users:
+                        pipeline.sadd(user_things_key(int(user_id)), key)
+                await pipeline.execute()
+        await self.redis.set(USER_THINGS_INDEX_BUILT, 1)
+
+    async def rebuild_blacklisted_guild_ids(self, batch_size: int = 1000) -> None:
+        """Add the guilds that are blacklisted to BLACKLISTED_GUILD_IDS, with one scan of the guild data.
+        This only has to be done once, for the guild data that was written before that set was kept up to date
+        Time complexity: O(the number of guilds)"""
+        pipeline = self.redis.pipeline(transaction=False)
+        async for guild_id, value in self.redis.hscan_iter(GUILD_DATA, count=batch_size):
+            if _loads(value).get("blacklisted"):
+                pipeline.sadd(BLACKLISTED_GUILD_IDS, guild_id)
+                if len(pipeline) >= batch_size:
+                    await pipeline.execute()
+        await pipeline.execute()
+        await self.redis.set(BLACKLISTED_GUILD_IDS_BUILT, 1)
+
+    async def close(self) -> None:
+        """Close the connections to Redis"""
+        await self.redis.aclose()
 
     @property
     def is_locked(self):
         """Return whether the cache is locked"""
         return self.lock.locked()
 
-    async def get_key(self, thing: str):
-        """Return the value with key thing
+    async def get_key(self, name: str, key: str | int):
+        """Return the value of key in the hash name (None if there isn't one)
         Time complexity: O(1)"""
-        return await self.redis.hget(thing)
+        return await self.redis.hget(name, key)
 
-    async def set_key(self, key: str, value: str | dict):
-        """Set the thing at key to value.
+    async def set_key(self, name: str, key: str | int, value: typing.Any):
+        """Set key to value in the hash name. The value is converted to JSON.
+        The UserThings sets of its old and new owners are updated in the same script call
         Time complexity: O(1)
+        :param name: the name of the hash
         :param key: the key
         :param value: the value
         :return: Nothing
         :raises LockedCacheException: If the cache is locked"""
         if self.is_locked:
             raise LockedCacheException("The cache is currently locked!")
-        await self.redis.hset(key, str(value))
+        await self._set_entities([(name, key, value)])
 
-    async def del_key(self, key: str):
-        """Delete the key associated with key:
+    async def del_key(self, name: str, key: str | int):
+        """Delete key from the hash name (and from the UserThings sets of its owners)
         Time complexity: O(1)"""
         if self.is_locked:
             raise LockedCacheException("The cache is currently locked")
-        await self.redis.hdel(key)
+
+        async def delete(writes):
+            old_value = await self.redis.hget(name, key)
+            writes.check_field(name, key, old_value)
+            writes.hdel(name, key)
+            self._reindex_owners(writes, f"{name}:{key}", _owners_of_value(old_value), set())
+
+        await self._write_checked(delete)
+
+    @staticmethod
+    def _reindex_owners(pipeline, member: str, old_owners: typing.Set[int], new_owners: typing.Set[int]) -> None:
+        """Queue the commands that move member from the UserThings sets of its old owners to those of its new owners"""
+        for owner in old_owners - new_owners:
+            pipeline.srem(user_things_key(owner), member)
+        for owner in new_owners - old_owners:
+            pipeline.sadd(user_things_key(owner), member)
+
+    async def _write_checked(self, prepare: typing.Callable[[_CheckedWrites], typing.Awaitable]) -> typing.Any:
+        """Read what is needed and queue the checks and the commands with prepare (an async function),
+        and run them with CHECK_AND_WRITE_SCRIPT. If one of the checked values changed in the meantime, this is
+        retried after a random delay that doubles each time (so that the writers that conflict don't retry in lockstep).
+        Returns what prepare returned
+        :raises WriteConflictException: if the values still changed after MAX_WRITE_ATTEMPTS attempts"""
+        for attempt in range(self.MAX_WRITE_ATTEMPTS):
+            await self._wait_before_attempt(attempt)
+            writes = _CheckedWrites()
+            result = await prepare(writes)
+            if await writes.run(self._check_and_write_script, self.redis):
+                return result
+        self._give_up_writing()
+
+    async def _wait_before_attempt(self, attempt: int) -> None:
+        """Wait before the attempt-th attempt of a write that conflicted (attempts are numbered from 0)"""
+        if attempt:
+            await asyncio.sleep(random.uniform(0, min(self.MAX_WRITE_BACKOFF, 0.005 * 2 ** attempt)))
+
+    def _give_up_writing(self) -> typing.NoReturn:
+        raise WriteConflictException(
+            f"The values kept changing while they were being written ({self.MAX_WRITE_ATTEMPTS} attempts)"
+        )
+
+    async def _set_entities(self, entities: typing.List[typing.Tuple[str, str | int, typing.Any]]) -> None:
+        """Write (hash name, key, value) entities, and update the UserThings sets of their owners,
+        with one script call. The old values are read first (in one pipeline), and the script only writes
+        if they haven't changed in the meantime (otherwise, this is retried)"""
+        if not entities:
+            return
+        encoded = [self._encode(value) for _, _, value in entities]
+
+        async def write(writes):
+            reads = self.redis.pipeline(transaction=False)
+            for name, key, _ in entities:
+                reads.hget(name, key)
+            old_values = await reads.execute()
+            for (name, key, value), new_value, old_value in zip(entities, encoded, old_values):
+                writes.check_field(name, key, old_value)
+                writes.hset(name, key, new_value)
+                self._reindex_owners(writes, f"{name}:{key}", _owners_of_value(old_value), _owners(value))
+
+        await self._write_checked(write)
+
+    async def _load_problems(self, problem_ids: typing.Iterable[int | str]) -> typing.List[BaseProblem]:
+        """Return the problems with these ids, in the same order (the problems that don't exist are skipped).
+        Their values, voters and solvers are read in one pipeline, so this is one round trip
+        Time complexity: O(N + the number of votes and solves)"""
+        problem_ids = [int(problem_id) for problem_id in problem_ids]
+        if not problem_ids:
+            return []
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.hmget(PROBLEMS, problem_ids)
+        for problem_id in problem_ids:
+            pipeline.smembers(voters_key(problem_id))
+            pipeline.smembers(solvers_key(problem_id))
+        values, *users = await pipeline.execute()
+        return [
+            _load_problem(value, users[2 * i], users[2 * i + 1], cache=self)
+            for i, value in enumerate(values)
+            if value is not None
+        ]
+
+    @staticmethod
+    def _index_problems(pipeline, problems: typing.Iterable[BaseProblem]) -> None:
+        """Queue the commands that add the problems to the indexes of their guilds and authors"""
+        by_guild: typing.Dict[str, typing.Dict[int, int]] = {}
+        by_author: typing.Dict[str, typing.List[int]] = {}
+        for problem in problems:
+            by_guild.setdefault(guild_problems_key(problem.guild_id), {})[problem.id] = problem.id
+            by_author.setdefault(problem.author, []).append(problem.id)
+        for key, problem_ids in by_guild.items():
+            pipeline.zadd(key, problem_ids)
+        for author, problem_ids in by_author.items():
+            pipeline.sadd(author_problems_key(author), *problem_ids)
+            pipeline.sadd(user_things_key(author), *(f"{PROBLEMS}:{problem_id}" for problem_id in problem_ids))
+
+    @staticmethod
+    def _unindex_problem(pipeline, problem_id: int | str, value: bytes) -> None:
+        """Queue the commands that remove the problem (stored as value) from the indexes of its guild and author"""
+        record = _loads(value)
+        pipeline.zrem(guild_problems_key(record["guild_id"]), problem_id)
+        pipeline.srem(author_problems_key(record["author"]), problem_id)
+        pipeline.srem(user_things_key(record["author"]), f"{PROBLEMS}:{problem_id}")
+
+    async def _write_problems(self, problems: typing.Dict[int, BaseProblem]) -> None:
+        """Write the problems, and update the indexes, with one script call.
+        The old versions of the problems are read first, because they have to be removed from the indexes
+        of their old guild and author. The script only writes if they haven't changed in the meantime
+        (otherwise, this is retried)"""
+        if self.is_locked:
+            raise LockedCacheException("The cache is currently locked!")
+        problem_ids = list(problems.keys())
+        values = {problem_id: self._encode(_problem_record(problem)) for problem_id, problem in problems.items()}
+
+        async def write(writes):
+            old_values = await self.redis.hmget(PROBLEMS, problem_ids)
+            for problem_id, old_value in zip(problem_ids, old_values):
+                writes.check_field(PROBLEMS, problem_id, old_value)
+                if old_value is not None:
+                    self._unindex_problem(writes, problem_id, old_value)
+            writes.hset(PROBLEMS, mapping=values)
+            self._index_problems(writes, problems.values())
+
+        await self._write_checked(write)
+        for problem in problems.values():
+            self.problem_lru.invalidate(problem.id)
 
     async def get_problem(self, guild_id: int, problem_id: int) -> BaseProblem:
         """Attempt to return the problem with guild_id and problem_id =problem_id
         Time complexity: O(1)"""
         if guild_id is not None and not isinstance(guild_id, int):
             raise TypeError("guild_id is not an int")
-        result = await self.get_key(f"BaseProblem:{guild_id}:{problem_id}")
-        if result is not None:
-            return convert_dict_to_problem(orjson.loads(result))
-        result = await self.get_key(f"QuizProblem:{guild_id}:{problem_id}")
-        if result is not None:
-            return convert_dict_to_problem(orjson.loads(result))
+        # The ids are unique, but the problem has to be in this guild
+        problem = self.problem_lru.get(problem_id)
+        if problem is None:
+            problems = await self._load_problems([problem_id])
+            problem = problems[0] if problems else None
+            if problem is not None:
+                self.problem_lru.put(problem_id, problem)
+        if problem is not None and str(problem.guild_id) == str(guild_id):
+            # The problems in problem_lru are shared, so a copy is returned (like MathProblemCache.get_problem)
+            return deepcopy(problem)
         raise ProblemNotFoundException("That problem is not found")
 
     async def get_all_problems(self):
         """Return a list of all problems!
         Time complexity: O(N)"""
-        return list(
-            map(convert_dict_to_problem, await self.redis.hgetall("BaseProblem").values())
-        )
-
-    async def get_all_things(self):
-        """Return a list of EVERYTHING in the data base"""
-        return list(self.redis.hgetall(""))
+        return await self._load_problems(await self.redis.hkeys(PROBLEMS))
+
+    async def get_all_things(self) -> typing.Dict[str, bytes]:
+        """Return a dictionary of EVERYTHING in the data base (not decoded). The keys are {the name of the hash}:{the id}"""
+        pipeline = self.redis.pipeline(transaction=False)
+        for name in ENTITY_HASHES:
+            pipeline.hgetall(name)
+        return {
+            f"{name}:{key.decode()}": value
+            for name, values in zip(ENTITY_HASHES, await pipeline.execute())
+            for key, value in values.items()
+        }
 
     async def get_all_problems_by_guild(self, guild_id: int | None):
-        """return a list of all problems with the guild id = id
-        Time complexity: O(N)"""
-        return list(
-            map(
-                convert_dict_to_problem,
-                await self.redis.hgetall(f"BaseProblem:{guild_id}").values(),
-            )
-        )
+        """return a list of all problems with the guild id = id, sorted by id.
+        The ids come from the guild's index, and the problems are then read in one pipeline
+        Time complexity: O(N) where N is the number of problems of the guild"""
+        return await self._load_problems(await self.redis.zrange(guild_problems_key(guild_id), 0, -1))
+
+    async def get_all_problems_by_author(self, author: int):
+        """return a list of all problems made by the author (read the same way as get_all_problems_by_guild)
+        Time complexity: O(N) where N is the number of problems made by the author"""
+        return await self._load_problems(sorted(map(int, await self.redis.smembers(author_problems_key(author)))))
 
     async def get_all_problems_by_func(self, func):
         """Return a list of all problems that satisfy the function.
         It is actually implemented as filter(func, await self.get_all_problems())
         Time complexity: O(N + sumF(P) over all problems) where F(P) is the big O runtime
-        of calling func on a problem P"""
+        of calling func on a problem P.
+        func can also be a Q (see query.py). If every match has a certain guild id (or author, or id),
+        only the problems in that guild's (or author's) index are checked"""
+        if isinstance(func, Q):
+            lookup = func.lookup()
+            if lookup is not None and lookup[0] == "guild_id":
+                candidates = await self.get_all_problems_by_guild(lookup[1])
+            elif lookup is not None and lookup[0] == "author":
+                candidates = await self.get_all_problems_by_author(lookup[1])
+            elif lookup is not None and lookup[0] == "id":
+                candidates = await self._load_problems([lookup[1]])
+            else:
+                candidates = await self.get_all_problems()
+            return [problem for problem in candidates if func.matches(problem)]
         return filter(func, await self.get_all_problems())
 
+    async def get_problems_page(
+        self,
+        guild_id: int | None,
+        after_problem_id: int | None = None,
+        limit: int = 25,
+        exclude_solved_by: int | None = None,
+    ) -> typing.List[BaseProblem]:
+        """Return at most limit problems of the guild, sorted by id, whose ids are bigger than after_problem_id.
+        If exclude_solved_by is a user id, the problems solved by that user are skipped.
+        Each batch of ids is checked with one pipeline, and its problems are read with another one (see get_problems)
+        Time complexity: O(log(N) + limit) (plus the skipped problems)"""
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        problems = []
+        minimum = "-inf" if after_problem_id is None else f"({after_problem_id}"
+        while len(problems) < limit:
+            problem_ids = await self.redis.zrangebyscore(
+                guild_problems_key(guild_id), minimum, "+inf", start=0, num=limit - len(problems)
+            )
+            if not problem_ids:
+                break
+            problem_ids = list(map(int, problem_ids))
+            minimum = f"({problem_ids[-1]}"
+            if exclude_solved_by is not None:
+                pipeline = self.redis.pipeline(transaction=False)
+                for problem_id in problem_ids:
+                    pipeline.sismember(solvers_key(problem_id), exclude_solved_by)
+                solved = await pipeline.execute()
+                problem_ids = [problem_id for problem_id, is_solver in zip(problem_ids, solved) if not is_solver]
+            problems.extend((await self.get_problems(problem_ids)).values())
+        return problems
+
+    async def get_problems(self, problem_ids: typing.Iterable[int]) -> typing.Dict[int, BaseProblem]:
+        """Return a dictionary of the problems with these ids, in the same order (the problems that don't exist are left out).
+        They are read in one pipeline (one round trip)
+        Time complexity: O(N + the number of votes and solves)"""
+        return {problem.id: problem for problem in await self._load_problems(dict.fromkeys(problem_ids))}
+
     async def get_global_problems(self):
         """
         Return a list of all global problems.
@@ -148,11 +763,23 @@ class RedisCache:
             raise TypeError("Problem_id is not an int or problem is not a base problem")
         if problem.id != problem_id:
             raise ValueError("Ids do not match")
+        await self._write_problems({problem_id: problem})
 
-        await self.set_key(
-            f"BaseProblem:{problem.guild_id}:{problem_id}",
-            str(problem.to_dict(show_answer=True)),
-        )
+    async def add_problems(self, problems: typing.Iterable[BaseProblem]) -> typing.List[BaseProblem]:
+        """
+        Add many problems to the cache. If several problems have the same id, only the first one is added.
+
+        :param problems: The BaseProblem instances.
+        :return: The problems that were added.
+        """
+        problems_by_id = {}
+        for problem in problems:
+            if not isinstance(problem, BaseProblem):
+                raise TypeError("problem is not a base problem")
+            problems_by_id.setdefault(problem.id, problem)
+        if problems_by_id:
+            await self._write_problems(problems_by_id)  # One script call for all of them
+        return list(problems_by_id.values())
 
     async def update_problem(self, problem_id: int, problem: BaseProblem):
         """
@@ -169,14 +796,138 @@ class RedisCache:
 
         :param problem_id: The ID of the problem.
         :param guild_id: The ID of the guild.
+        :return: Whether the problem existed.
         :raises TypeError: If 'problem_id' is not an int or 'guild_id' is not an int.
         """
         if not isinstance(problem_id, int) or (
             guild_id is not None and not isinstance(guild_id, int)
         ):
             raise TypeError("Bad types!")
-        await self.del_key(f"BaseProblem:{guild_id}:{problem_id}")
-        await self.del_key(f"QuizProblem:{guild_id}:{problem_id}")
+        if self.is_locked:
+            raise LockedCacheException("The cache is currently locked")
+
+        async def remove(writes):
+            reads = self.redis.pipeline(transaction=False)
+            reads.hget(PROBLEMS, problem_id)
+            reads.smembers(voters_key(problem_id))
+            reads.smembers(solvers_key(problem_id))
+            old_value, voters, solvers = await reads.execute()
+            writes.check_field(PROBLEMS, problem_id, old_value)
+            writes.check_set(voters_key(problem_id), voters)
+            writes.check_set(solvers_key(problem_id), solvers)
+            writes.hdel(PROBLEMS, problem_id)
+            if old_value is not None:
+                self._unindex_problem(writes, problem_id, old_value)
+            writes.zrem(guild_problems_key(guild_id), problem_id)
+            self._remove_users_sets(writes, problem_id, voters, solvers)
+            return old_value is not None
+
+        removed = await self._write_checked(remove)
+        self.problem_lru.invalidate(problem_id)
+        return removed
+
+    @staticmethod
+    def _remove_users_sets(pipeline, problem_id: int, voters: typing.Iterable, solvers: typing.Iterable) -> None:
+        """Queue the commands that delete the problem's voter and solver sets, and remove them from the UserThings
+        sets of the voters and the solvers"""
+        for key, users in ((voters_key(problem_id), voters), (solvers_key(problem_id), solvers)):
+            for user_id in users:
+                pipeline.srem(user_things_key(int(user_id)), key)
+        pipeline.delete(voters_key(problem_id), solvers_key(problem_id))
+
+    async def _change_membership(self, key: str, problem_id: int, user_id: int, add: bool) -> VoteResult:
+        """Add the user to (or remove the user from) the voter or solver set key, and the set to (from) the user's
+        UserThings set, with one script call. Returns whether the user was added (removed), and the size of the set
+        :raises ProblemNotFoundException: if the user is added and the problem doesn't exist"""
+        if add:
+            changed, count = await self._add_user_script(
+                keys=[key, user_things_key(user_id), PROBLEMS], args=[user_id, problem_id], client=self.redis
+            )
+        else:
+            changed, count = await self._remove_user_script(
+                keys=[key, user_things_key(user_id)], args=[user_id], client=self.redis
+            )
+        self.problem_lru.invalidate(problem_id)
+        if changed == -1:
+            raise ProblemNotFoundException("That problem is not found")
+        return VoteResult(bool(changed), count)
+
+    async def add_vote(self, problem_id: int, user_id: int) -> bool:
+        """Add a vote for the deletion of the problem. Returns False if the user had already voted.
+        Time complexity: O(1)
+        :raises ProblemNotFoundException: if the problem doesn't exist"""
+        return (await self._change_membership(voters_key(problem_id), problem_id, user_id, add=True)).changed
+
+    async def remove_vote(self, problem_id: int, user_id: int) -> bool:
+        """Remove the user's vote for the problem. Returns False if the user hadn't voted.
+        Time complexity: O(1)"""
+        return (await self.remove_vote_and_count(problem_id, user_id)).changed
+
+    async def add_solve(self, problem_id: int, user_id: int) -> bool:
+        """Mark the problem as solved by the user. Returns False if the user had already solved it.
+        Time complexity: O(1)
+        :raises ProblemNotFoundException: if the problem doesn't exist"""
+        return (await self._change_membership(solvers_key(problem_id), problem_id, user_id, add=True)).changed
+
+    async def remove_solve(self, problem_id: int, user_id: int) -> bool:
+        """Mark the problem as not solved by the user.
+        Time complexity: O(1)"""
+        return (await self._change_membership(solvers_key(problem_id), problem_id, user_id, add=False)).changed
+
+    async def add_vote_and_count(
+        self, problem: BaseProblem, user_id: int, vote_threshold: int | None = None
+    ) -> VoteResult:
+        """Add the user's vote for the deletion of the problem and count the votes.
+        If the vote was added and there are at least vote_threshold votes now, the problem is deleted
+        (with its indexes and its voter and solver sets). The vote, the count and the deletion are one
+        ADD_VOTE_AND_COUNT_SCRIPT call, so concurrent votes can't both miss the threshold,
+        and only one of them deletes the problem. The stored problem is read first, for its guild and author:
+        if it changes before the script runs, this is retried like _write_checked
+        Time complexity: O(1), or O(the number of votes and solves) when the problem is deleted
+        :raises ProblemNotFoundException: if the problem doesn't exist (anymore)
+        :raises WriteConflictException: if the problem kept changing"""
+        problem_id = problem.id
+        for attempt in range(self.MAX_WRITE_ATTEMPTS):
+            await self._wait_before_attempt(attempt)
+            value = await self.redis.hget(PROBLEMS, problem_id)
+            if value is None:
+                raise ProblemNotFoundException("That problem is not found")
+            record = _loads(value)
+            added, count, deleted = await self._add_vote_and_count_script(
+                keys=[
+                    voters_key(problem_id),
+                    user_things_key(user_id),
+                    PROBLEMS,
+                    solvers_key(problem_id),
+                    guild_problems_key(record["guild_id"]),
+                    author_problems_key(record["author"]),
+                    user_things_key(record["author"]),
+                ],
+                args=[user_id, problem_id, vote_threshold or 0, value, user_things_key(""), f"{PROBLEMS}:{problem_id}"],
+                client=self.redis,
+            )
+            if added == -2:
+                continue
+            self.problem_lru.invalidate(problem_id)
+            if added == -1:
+                raise ProblemNotFoundException("That problem is not found")
+            return VoteResult(bool(added), count, bool(deleted))
+        self._give_up_writing()
+
+    async def remove_vote_and_count(self, problem_id: int, user_id: int) -> VoteResult:
+        """Remove the user's vote for the problem and count the votes that are left, with one script call
+        Time complexity: O(1)"""
+        return await self._change_membership(voters_key(problem_id), problem_id, user_id, add=False)
+
+    async def get_num_votes(self, problem_id: int) -> int:
+        """Return the number of votes for the deletion of the problem.
+        Time complexity: O(1)"""
+        return await self.redis.scard(voters_key(problem_id))
+
+    async def get_num_solves(self, problem_id: int) -> int:
+        """Return the number of users who solved the problem.
+        Time complexity: O(1)"""
+        return await self.redis.scard(solvers_key(problem_id))
 
     # Additional methods for quizzes
 
@@ -187,7 +938,7 @@ class RedisCache:
         :param quiz_id: The ID of the quiz.
         :param quiz_data: The data associated with the quiz.
         """
-        await self.set_key(f"Quiz:{quiz_id}", quiz_data)
+        await self.set_key(QUIZZES, quiz_id, quiz_data)
         # TODO: fix the type bug
 
     async def add_quiz(self, quiz_id: int, quiz: Quiz):
@@ -203,9 +954,9 @@ class RedisCache:
         :return: The data associated with the quiz.
         :raises ProblemNotFoundException: If the quiz is not found.
         """
-        result = await self.get_key(f"Quiz:{quiz_id}")
+        result = await self.get_key(QUIZZES, quiz_id)
         if result is not None:
-            return orjson.loads(result)
+            return _loads(result)
         raise ProblemNotFoundException("That quiz is not found")
 
     async def remove_quiz(self, quiz_id: int):
@@ -214,7 +965,7 @@ class RedisCache:
 
         :param quiz_id: The ID of the quiz.
         """
-        await self.del_key(f"Quiz:{quiz_id}")
+        await self.del_key(QUIZZES, quiz_id)
 
     async def add_thing(self, thing: DictConvertible):
         """
@@ -224,7 +975,7 @@ class RedisCache:
         :type thing: DictConvertible
         :return: Nothing.
         """
-        await self.set_key(f"{thing.__class__.__name__}:{thing.guild_id}:{thing.id}", thing.to_dict())  # type: ignore
+        await self.set_key(thing.__class__.__name__, f"{thing.guild_id}:{thing.id}", thing.to_dict())  # type: ignore
 
     async def add_things(self, things: List[DictConvertible]):
         """
@@ -241,17 +992,10 @@ class RedisCache:
         async with self.lock:
             # Inside the lock-protected block
 
-            # Create a pipeline to execute batch commands
-            pipeline = self.redis.pipeline()
-
-            # Add each thing to the pipeline
-            for thing in things:
-                key = f"{thing.__class__.__name__}:{thing.guild_id}:{thing.id}"
-                value = str(thing.to_dict())
-                pipeline.hset(key, value)
-
-            # Execute the batch set operation
-            await pipeline.execute()
+            # Write every thing (the things of a type are in the hash named after it) with one script call
+            await self._set_entities(
+                [(thing.__class__.__name__, f"{thing.guild_id}:{thing.id}", thing.to_dict()) for thing in things]
+            )
 
     async def remove_thing(self, thing: DictConvertible):
         """
@@ -261,7 +1005,7 @@ class RedisCache:
         :type thing: DictConvertible
         :return: Nothing.
         """
-        await self.del_key(f"{thing.__class__.__name__}:{thing.guild_id}:{thing.id}")  # type: ignore
+        await self.del_key(thing.__class__.__name__, f"{thing.guild_id}:{thing.id}")  # type: ignore
 
     async def get_thing(
         self,
@@ -285,45 +1029,67 @@ class RedisCache:
         :rtype: DictConvertible
         :raises ThingNotFound: If the object is not found.
         """
-        result = await self.get_key(f"{cls.__name__}:{thing_guild_id}:{thing_id}")
+        result = await self.get_key(cls.__name__, f"{thing_guild_id}:{thing_id}")
         if result is not None:
+            record = _loads(result)  # Raises InvalidDictionaryInDatabaseException if it can't be decoded
             try:
-                return await cls.from_dict(orjson.loads(result))
+                return await cls.from_dict(record)
             except FormatException as fe:
                 fe.args[0] += "There was a problem with the format of the exception"
                 raise fe
             except KeyError as ke:
                 raise FormatException("Oh no, the formatting is bad!") from ke
-            except orjson.JSONDecodeError as jde:
-                raise InvalidDictionaryInDatabaseException(
-                    "It's not even formatted as JSON!"
-                ) from jde
             except Exception as exc:
                 raise RuntimeError("Something bad happened...") from exc
         if default is not None:
             return default
         raise ThingNotFound("The thing is not found!")
 
+    @staticmethod
+    def _load_user_data(value: bytes | None) -> UserData | None:
+        """Convert a value of the UserData hash into UserData (None stays None)"""
+        if value is None:
+            return None
+        record = _loads(value)
+        try:
+            return UserData.from_dict(record)
+        except FormatException as fe:
+            raise FormatException("Oh no, the formatting is bad") from fe
+
     async def get_user_data(self, user_id: int, default: UserData | None = None):
-        result = await self.get_key(f"UserData:{user_id}")
-        if result is not None:
-            try:
-                return UserData.from_dict(orjson.loads(result))
-            except orjson.JSONDecodeError:
-                raise InvalidDictionaryInDatabaseException(
-                    "We have a non-dictionary on our hands"
-                )
-            except FormatException as fe:
-                raise FormatException("Oh no, the formatting is bad") from fe
+        user_data = self.user_data_lru.get(user_id, MISSING)
+        if user_data is MISSING:
+            # If the user data is changed while this is reading it, what was read isn't cached
+            generation = self.user_data_lru.generation(user_id)
+            user_data = self._load_user_data(await self.get_key(USER_DATA, user_id))
+            self.user_data_lru.put(user_id, user_data, generation)
+        if user_data is not None:
+            return copy(user_data)
         if default is not None:
             return default
         raise ThingNotFound("I could not find any user data")
 
+    async def get_user_data_many(self, user_ids: typing.Iterable[int]) -> typing.Dict[int, UserData]:
+        """Return a dictionary of the user data of these users (the users who don't have any are left out).
+        The user data that isn't in user_data_lru is read with one HMGET
+        Time complexity: O(N)"""
+        user_ids = list(dict.fromkeys(user_ids))
+        found = {user_id: self.user_data_lru.get(user_id, MISSING) for user_id in user_ids}
+        missing = [user_id for user_id, user_data in found.items() if user_data is MISSING]
+        if missing:
+            generations = {user_id: self.user_data_lru.generation(user_id) for user_id in missing}
+            for user_id, value in zip(missing, await self.redis.hmget(USER_DATA, missing)):
+                found[user_id] = self._load_user_data(value)
+                self.user_data_lru.put(user_id, found[user_id], generations[user_id])
+        return {user_id: copy(user_data) for user_id, user_data in found.items() if user_data is not None}
+
     async def add_user_data(self, thing: UserData):
-        await self.set_key(f"UserData:{thing.user_id}", str(thing.to_dict()))
+        await self.set_key(USER_DATA, thing.user_id, thing.to_dict())
+        self.user_data_lru.invalidate(thing.user_id)
 
     async def remove_user_data(self, thing: UserData):
-        await self.del_key(f"UserData:{thing.user_id}")
+        await self.del_key(USER_DATA, thing.user_id)
+        self.user_data_lru.invalidate(thing.user_id)
 
     async def get_permissions_required_for_command(
         self, command_name
@@ -342,6 +1108,7 @@ class RedisCache:
         user_id: int,
         permissions_required: typing.Optional[typing.Dict[str, bool]] = None,
         command_name: str | None = None,
+        user_data: UserData | None = None,
     ) -> bool:
         """
         Return whether the user meets permissions required to use the command.
@@ -349,31 +1116,25 @@ class RedisCache:
         :param user_id: The ID of the user.
         :param permissions_required: Optional permissions required for the command.
         :param command_name: Optional name of the command.
+        :param user_data: Optional user data of the user, if the caller already has it (it isn't looked up then).
         :return: True if the user meets permissions, False otherwise.
         """
         if permissions_required is None:
             permissions_required = await self.get_permissions_required_for_command(
                 command_name
             )
+        if user_data is None:
+            user_data = await self.get_user_data(
+                user_id, default=UserData.default(user_id=user_id)
+            )
 
         if "trusted" in permissions_required.keys():
-            if (
-                await self.get_user_data(
-                    user_id, default=UserData.default(user_id=user_id)
-                )
-            ).trusted != permissions_required["trusted"]:
+            if user_data.trusted != permissions_required["trusted"]:
                 return False
 
         if "blacklisted" in permissions_required.keys():
-            if (
-                (
-                    await self.get_user_data(
-                        user_id, default=UserData.default(user_id=user_id)
-                    )
-                )
-            ).blacklisted != permissions_required["blacklisted"]:
+            if user_data.blacklisted != permissions_required["blacklisted"]:
                 return False
-        user_data = await self.get_user_data(user_id)
         return all(
             getattr(user_data, key) != val for key, val in permissions_required.items()
         )
@@ -381,14 +1142,11 @@ class RedisCache:
     async def get_appeal(
         self, user_id: int, default: Appeal | None = None
     ) -> Appeal | None:
-        result = await self.get_key(f"Appeal:{user_id}")
+        result = await self.get_key(APPEALS, user_id)
         if result is not None:
+            record = _loads(result)
             try:
-                return Appeal.from_dict(orjson.loads(result))
-            except orjson.JSONDecodeError:
-                raise InvalidDictionaryInDatabaseException(
-                    "We have a non-dictionary on our hands"
-                )
+                return Appeal.from_dict(record)
             except FormatException as fe:
                 raise FormatException("Oh no, the formatting is bad") from fe
         if default is not None:
@@ -396,10 +1154,10 @@ class RedisCache:
         raise ThingNotFound("I could not find any appeal")
 
     async def add_appeal(self, thing: Appeal):
-        await self.set_key(f"Appeal:{thing.user_id}", thing.to_dict())
+        await self.set_key(APPEALS, thing.user_id, thing.to_dict())
 
     async def remove_appeal(self, thing: Appeal):
-        await self.del_key(f"Appeal:{thing.user_id}")
+        await self.del_key(APPEALS, thing.user_id)
 
     async def update_cache(self):
         """
@@ -411,14 +1169,6 @@ class RedisCache:
             "This method is being removed, due to its expensiveness..."
         )
 
-    async def add_guild_data(self, guild_data: GuildData):
-        """
-        Add guild data to the cache.
-
-        :param guild_data: The GuildData instance to add.
-        """
-        await self.set_key(f"GuildData:{guild_data.guild_id}", guild_data.to_dict())
-
     async def del_guild_data(self, guild_id: int):
         """
         Remove guild data from the cache.
@@ -426,114 +1176,160 @@ class RedisCache:
         :param guild_id: The ID of the guild.
         :raises TypeError: If 'guild_id' is not an int.
         """
-        await self.del_key(f"GuildData:{guild_id}")
-
-    async def get_guild_data(
-        self, guild_id: int, default: GuildData | None = None
-    ) -> GuildData:
-        """
-        Get guild data by guild ID.
-
-        :param guild_id: The ID of the guild.
-        :param default: The default GuildData instance to return if not found.
-        :return: The GuildData instance.
-        :raises ThingNotFound: If the guild data is not found.
-        """
-
-        result = await self.get_key(f"GuildData:{guild_id}")
-        if result is not None:
-            try:
-                return Appeal.from_dict(orjson.loads(result))
-            except orjson.JSONDecodeError:
-                raise InvalidDictionaryInDatabaseException(
-                    "We have a non-dictionary on our hands"
-                )
-            except FormatException as fe:
-                raise FormatException("Oh no, the formatting is bad") from fe
-        if default is not None:
-            return default
-        raise ThingNotFound("I could not find any guild_data")
+        await self.remove_guild_data(guild_id)
 
     async def get_all_by_user_id(self, user_id: int) -> list[str]:
         """
-        Get a list of keys corresponding to things authored by the specified user.
+        Get a list of the keys of the things that belong to the specified user.
 
-        This method queries all things stored in the Redis database and returns the keys
-        of the items where the provided user_id matches the 'author', 'authors', or 'user_id'
-        field in the stored JSON data.
+        They are read from the user's UserThings set, which every write keeps up to date:
+        "{hash}:{field}" for the things whose 'author', 'authors' or 'user_id' is the user,
+        and the keys of the voter and solver sets the user is in.
+        Time complexity: O(the number of things that belong to the user)
 
         :param user_id: The user ID to match against.
         :type user_id: int
-        :return: A list of keys corresponding to things authored by the specified user.
+        :return: A list of keys corresponding to things that belong to the specified user.
         :rtype: List[str]
-        :raises FormatException: If a stored value in Redis is not a valid JSON dictionary.
         """
-        # get all things
-        things = await self.get_all_things()
-        things_authored = []
-        for key, value in things.items():
-            dictionarified = None
-            try:
-                dictionarified = orjson.loads(value)  # type: ignore
-            except orjson.JSONDecodeError:
-                raise FormatException("Something in the redis is not a dictionary..")
-            if dictionarified is None:
-                raise FormatException("No dictionary found")
-            if dictionarified.get("author", None) == user_id:
-                things_authored.append(key)
-                continue
-            elif user_id in dictionarified.get("authors", []):
-                things_authored.append(key)
-                continue
-            elif dictionarified.get("user_id", None) == user_id:
-                things_authored.append(key)
-                continue
-
-        return things_authored
+        return sorted(member.decode() for member in await self.redis.smembers(user_things_key(user_id)))
 
     async def del_all_by_user_id(self, user_id: int):
         """DELETE all things that match the user_id
         This operation is IRREVERSIBLE!
-        Time complexity: O(N)
+        The things are found with the user's UserThings set, and they are deleted (and the user is removed from
+        the voter and solver sets) with one script call, which is retried if any of them changes meanwhile.
+        Time complexity: O(the number of things that belong to the user)
         Params:
         :param user_id: the user id of the user we need to remove all things of
         Raises
         :raises TypeError: if the user_id is not actually an int
-        :raises FormatException: if something in the redis isn't a dict
+        :raises LockedCacheException: if the cache is locked
 
         Returns
         nothing"""
-        things_to_remove = await self.get_all_by_user_data(user_id=user_id)
-        async with self.lock:
-            await asyncio.sleep(3.0000)
-            await self.redis.delete(*things_to_remove)
-            await asyncio.sleep(3.0000)
+        if not isinstance(user_id, int):
+            raise TypeError("user_id is not an int")
+        if self.is_locked:
+            raise LockedCacheException("The cache is currently locked")
+        index_key = user_things_key(user_id)
+        membership_prefixes = (voters_key(""), solvers_key(""))
+
+        async def delete(writes):
+            entities: typing.Dict[str, typing.List[str]] = {}  # hash name -> fields
+            memberships = []
+            things = await self.redis.smembers(index_key)
+            writes.check_set(index_key, things)
+            for member in things:
+                member = member.decode()
+                if member.startswith(membership_prefixes):
+                    memberships.append(member)
+                else:
+                    name, _, field = member.partition(":")
+                    entities.setdefault(name, []).append(field)
+            problem_ids = entities.get(PROBLEMS, [])
+            users_keys = [key for problem_id in problem_ids for key in (voters_key(problem_id), solvers_key(problem_id))]
+            # Read everything in one round trip
+            reads = self.redis.pipeline(transaction=False)
+            for name, fields in entities.items():
+                reads.hmget(name, fields)
+            for key in users_keys:
+                reads.smembers(key)
+            results = await reads.execute()
+            values = dict(zip(entities.keys(), results))
+            users = results[len(entities):]
+            for key, members in zip(users_keys, users):
+                writes.check_set(key, members)
+
+            for name, fields in entities.items():
+                writes.hdel(name, *fields)
+                for field, value in zip(fields, values[name]):
+                    writes.check_field(name, field, value)
+                    # Other owners (like the other authors of a quiz) don't have it anymore either
+                    self._reindex_owners(writes, f"{name}:{field}", _owners_of_value(value) - {user_id}, set())
+                    if name == PROBLEMS and value is not None:
+                        self._unindex_problem(writes, field, value)
+            for i, problem_id in enumerate(problem_ids):
+                self._remove_users_sets(writes, problem_id, users[2 * i], users[2 * i + 1])
+            for key in memberships:
+                writes.srem(key, user_id)
+            writes.delete(index_key)
+            return problem_ids
+
+        deleted_problem_ids = await self._write_checked(delete)
+        for problem_id in deleted_problem_ids:
+            self.problem_lru.invalidate(int(problem_id))
+        self.user_data_lru.invalidate(user_id)
 
     async def get_guild_data(
         self, guild_id: int, default: GuildData | None = None
     ) -> GuildData | None:
-        result = await self.get_key(f"GuildData:{guild_id}")
+        """
+        Get guild data by guild ID.
+
+        :param guild_id: The ID of the guild.
+        :param default: The default GuildData instance to return if not found.
+        :return: The GuildData instance.
+        :raises ThingNotFound: If the guild data is not found.
+        """
+        result = await self.get_key(GUILD_DATA, guild_id)
         if result is not None:
+            record = _loads(result)
             try:
-                return GuildData.from_dict(orjson.loads(result))
-            except orjson.JSONDecodeError:
-                raise InvalidDictionaryInDatabaseException(
-                    "We have a non-dictionary on our hands"
-                )
+                return GuildData.from_dict(record)
             except FormatException as fe:
                 raise FormatException("Oh no, the formatting is bad") from fe
         if default is not None:
             return default
         raise ThingNotFound("I could not find any guild data")
 
+    async def get_guild_data_many(self, guild_ids: typing.Iterable[int]) -> typing.Dict[int, GuildData]:
+        """Return a dictionary of the guild data of these guilds (the guilds that don't have any are left out).
+        It is read with one HMGET
+        Time complexity: O(N)"""
+        guild_ids = list(dict.fromkeys(guild_ids))
+        if not guild_ids:
+            return {}
+        guild_data = {}
+        for guild_id, value in zip(guild_ids, await self.redis.hmget(GUILD_DATA, guild_ids)):
+            if value is not None:
+                guild_data[guild_id] = GuildData.from_dict(_loads(value))
+        return guild_data
+
     async def add_guild_data(self, thing: GuildData):
-        await self.set_key(f"GuildData:{thing.guild_id}", str(thing.to_dict()))
+        """Add (or replace) the guild data. The set of blacklisted guilds is updated in the same transaction"""
+        if self.is_locked:
+            raise LockedCacheException("The cache is currently locked!")
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.hset(GUILD_DATA, thing.guild_id, self._encode(thing.to_dict(include_cache=False)))
+        if thing.blacklisted:
+            pipeline.sadd(BLACKLISTED_GUILD_IDS, thing.guild_id)
+        else:
+            pipeline.srem(BLACKLISTED_GUILD_IDS, thing.guild_id)
+        await pipeline.execute()
 
     async def remove_guild_data(self, thing: GuildData | int):
-        if isinstance(thing, GuildData):
-            await self.del_key(f"GuildData:{thing.guild_id}")
-        else:
-            await self.del_key(f"GuildData:{thing}")
+        if self.is_locked:
+            raise LockedCacheException("The cache is currently locked")
+        guild_id = thing.guild_id if isinstance(thing, GuildData) else thing
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.hdel(GUILD_DATA, guild_id)
+        pipeline.srem(BLACKLISTED_GUILD_IDS, guild_id)
+        await pipeline.execute()
+
+    async def get_blacklisted_guild_ids(self) -> typing.Set[int]:
+        """Return the ids of the blacklisted guilds (add_guild_data keeps them in a set)
+        Time complexity: O(N)"""
+        return {int(guild_id) for guild_id in await self.redis.smembers(BLACKLISTED_GUILD_IDS)}
+
+    async def refresh_blacklisted_guild_ids(self) -> typing.Set[int]:
+        """Same as get_blacklisted_guild_ids: the set in Redis is always up to date"""
+        return await self.get_blacklisted_guild_ids()
+
+    async def is_guild_id_blacklisted(self, guild_id: int) -> bool:
+        """Return whether the guild is blacklisted, without loading its guild data
+        Time complexity: O(1)"""
+        return bool(await self.redis.sismember(BLACKLISTED_GUILD_IDS, guild_id))
     async def bgsave(
             self,
             schedule: typing.Any,
@@ -0,0 +1,135 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+The binary format used for the BLOB columns (answers, voters, solvers, submissions...),
+instead of pickle, and for the values of RedisCache.
+Every value starts with a 1-byte header:
+the high 4 bits are the version of the format and the low 4 bits are the kind.
+    kind 1: a list of user ids, stored as little-endian signed 64-bit integers
+    kind 2: anything else, stored as JSON (with orjson)
+    kind 3: anything else, stored with msgpack (an optional dependency),
+            which is more compact for dictionaries full of ids
+Pickles never start with one of these headers (the first byte of a pickle is 0x80,
+or a printable character for protocols 0 and 1), so the values written by older versions
+of the bot can be told apart. Unpickling runs arbitrary code, so decode only accepts them
+when it's told to: the migrations that re-encode them (see migrations.py) are the only callers
+that do.
+"""
+import pickle
+import sys
+import typing
+from array import array
+
+import orjson
+
+from .errors import FormatException
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+CODEC_VERSION = 1
+KIND_IDS = 1
+KIND_JSON = 2
+KIND_MSGPACK = 3
+HEADER_IDS = bytes([CODEC_VERSION << 4 | KIND_IDS])
+HEADER_JSON = bytes([CODEC_VERSION << 4 | KIND_JSON])
+HEADER_MSGPACK = bytes([CODEC_VERSION << 4 | KIND_MSGPACK])
+HEADERS = (HEADER_IDS, HEADER_JSON, HEADER_MSGPACK)
+
+
+def _default(obj: typing.Any) -> typing.Any:
+    """Tell orjson how to serialize the objects that it doesn't know about"""
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    raise TypeError(f"Can't encode an object of type {type(obj).__name__}")
+
+
+def encode_json(value: typing.Any) -> bytes:
+    """Encode a JSON-serializable value (answers, a submission's dictionary...)"""
+    return HEADER_JSON + orjson.dumps(
+        value, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+
+def encode_msgpack(value: typing.Any) -> bytes:
+    """Encode a value with msgpack. Ids take at most 9 bytes instead of up to 20 digits.
+    :raises ImportError: if msgpack isn't installed"""
+    if msgpack is None:
+        raise ImportError("msgpack isn't installed")
+    return HEADER_MSGPACK + msgpack.packb(value, default=_default)
+
+
+# The encoders that RedisCache can be configured with. decode() can decode the values of all of them
+VALUE_ENCODERS: typing.Dict[str, typing.Callable[[typing.Any], bytes]] = {
+    "json": encode_json,
+    "msgpack": encode_msgpack,
+}
+
+
+def encode_ids(ids: typing.Iterable[int]) -> bytes:
+    """Encode a list of user ids as an array of int64s. Falls back to JSON if something isn't an int
+    (ints that don't fit in 64 bits can't be encoded at all: orjson refuses them too)"""
+    ids = list(ids)
+    try:
+        if not all(type(_id) is int for _id in ids):
+            raise TypeError
+        encoded = array("q", ids)
+    except (TypeError, OverflowError):
+        return encode_json(ids)
+    if sys.byteorder != "little":
+        encoded.byteswap()
+    return HEADER_IDS + encoded.tobytes()
+
+
+def is_legacy(data: typing.Optional[bytes]) -> bool:
+    """Return whether the value was written by an older version of the bot (with pickle)"""
+    return data is not None and bytes(data[:1]) not in HEADERS
+
+
+def decode(data: typing.Optional[bytes], *, allow_legacy: bool = False) -> typing.Any:
+    """Decode a value written by encode_ids, encode_json or encode_msgpack.
+    Pickled values (from older versions of the bot) are only unpickled if allow_legacy is True.
+    Only the migrations that re-encode them pass it: everything else raises FormatException"""
+    if data is None:
+        return None
+    data = bytes(data)
+    header = data[:1]
+    if header == HEADER_IDS:
+        ids = array("q")
+        ids.frombytes(data[1:])
+        if sys.byteorder != "little":
+            ids.byteswap()
+        return ids.tolist()
+    if header == HEADER_JSON:
+        return orjson.loads(data[1:])
+    if header == HEADER_MSGPACK:
+        if msgpack is None:
+            raise FormatException("This value is encoded with msgpack, which isn't installed")
+        return msgpack.unpackb(data[1:], strict_map_key=False)
+    if not allow_legacy:
+        raise FormatException("This value isn't encoded with the current codec (it may be pickled)")
+    try:
+        return pickle.loads(data)
+    except Exception as e:
+        raise FormatException("This value is neither encoded with the codec nor pickled") from e
@@ -22,6 +22,9 @@ import mpmath
 
 
 class ComputationalProblem(BaseProblem):
+    __slots__ = ()
+    EXTRA_FIELDS = ("tolerance",)
+
     def __init__(self, *args, **kwargs):
         tolerance = kwargs.pop("tolerance", 0.001)
         super().__init__(*args, **kwargs)
@@ -63,5 +66,6 @@ class ComputationalProblem(BaseProblem):
             author=deepcopy(self.author),
             id=deepcopy(self.id),
             guild_id=deepcopy(self.guild_id),
+            cache=self._cache,
             **deepcopy(self.get_extra_stuff()),
         )
\ No newline at end of file
@@ -37,6 +37,8 @@ class DictConvertible(Protocol):
     Throw a FormatException if either function is undefined.
     """
 
+    __slots__ = ()  # So that the subclasses can use __slots__
+
     @classmethod
     def from_dict(cls, data: Dict) -> T: ...
 
@@ -182,3 +182,15 @@ class LockedCacheException(RuntimeError):
     """Raised when an operation is done on a locked RedisCache"""
 
     pass
+
+
+class WriteConflictException(MathProblemsModuleException):
+    """Raised by RedisCache when a write keeps conflicting with other writes, and it has run out of attempts"""
+
+    pass
+
+
+class RedisClusterNotSupportedException(MathProblemsModuleException):
+    """Raised when RedisCache is started on a Redis Cluster (its scripts use keys that can be in different slots)"""
+
+    pass
@@ -43,8 +43,8 @@ class LinearAlgebraProblem(BaseProblem):
         equal_to (list): A list of values equal to the right-hand side of the equations.
     """
 
-    coeffs: list
-    equal_to: list
+    __slots__ = ("coeffs", "equal_to")
+    EXTRA_FIELDS = ("coeffs", "equal_to")
 
     def __init__(self, *args, **kwargs):
         """
@@ -198,5 +198,6 @@ class LinearAlgebraProblem(BaseProblem):
             author=deepcopy(self.author),
             id=deepcopy(self.id),
             guild_id=deepcopy(self.guild_id),
+            cache=self._cache,
             **deepcopy(self.get_extra_stuff()),
         )
\ No newline at end of file
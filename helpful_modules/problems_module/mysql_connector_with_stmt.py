@@ -5,24 +5,21 @@ import aiomysql
 # Licensed under GPLv3 (or later)
 
 
-@contextlib.contextmanager  # type: ignore
-def mysql_connection(*args, **kwargs) -> aiomysql.Connection:
-    """A custom with statement to connect to a MySQL database.
-    This makes connecting to MYSQL possible within a context wrapper. This is a wrapper around MySQL
-    You must take care to provide the correct arguments and keyword arguments, which will be directly passed to the mysql.connector.connect() method.
-    If an exception happens in the with statement, the connection will commit and close and then the exception will be raised.
+@contextlib.asynccontextmanager
+async def mysql_connection(*args, **kwargs) -> aiomysql.Connection:
+    """A custom async with statement to connect to a MySQL database.
+    This opens a single aiomysql connection; the arguments and keyword arguments are passed directly to aiomysql.connect().
+    If an exception happens in the async with statement, the connection will roll back and close and then the exception will be raised.
     Otherwise, the connection will commit and close. It will not return anything. :-)
+    The cache doesn't use this anymore: it borrows connections from its pool with MathProblemCache.get_a_connection().
     This function is licensed under GPLv3."""
-    connection = aiomysql.connect(*args, **kwargs)  # type: ignore
+    connection = await aiomysql.connect(*args, **kwargs)
     try:
         yield connection
-    except:
-        print(
-            "An exception occured!. After closing resources, the exception will be raised"
-        )
-        connection.commit()
-        connection.close()
+    except BaseException:
+        await connection.rollback()
         raise
+    else:
+        await connection.commit()
     finally:
-        connection.commit()
         connection.close()
@@ -16,35 +16,33 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
 """
 
-from .base_problem import BaseProblem
-from .linear_algebra_problem import LinearAlgebraProblem
-from .computational_problem import ComputationalProblem
-import orjson
-# TODO: When there are new problem types, this must handle it
+# The problem types are imported for their registration in PROBLEM_TYPES
+from .base_problem import PROBLEM_TYPES, BaseProblem, parse_extra_stuff  # noqa: F401
+from .linear_algebra_problem import LinearAlgebraProblem  # noqa: F401
+from .computational_problem import ComputationalProblem  # noqa: F401
+
+
 def convert_dict_to_problem(data: dict, cache= None):
     if not isinstance(data, dict):
         raise TypeError("data is not a dict")
     if "type" not in data["extra_stuff"].keys():
         raise ValueError(f"data {data} doesn't have a type")
-    match data["extra_stuff"]["type"]:
-        case "BaseProblem": return BaseProblem.from_dict(data, cache)
-        case "ComputationalProblem": return ComputationalProblem.from_dict(data, cache)
-        case "LinearAlgebraProblem": return LinearAlgebraProblem.from_dict(data, cache)
-        case _:
-            raise ValueError("Type is mal-formed")
+    try:
+        problem_type = PROBLEM_TYPES[data["extra_stuff"]["type"]]
+    except KeyError:
+        raise ValueError("Type is mal-formed")
+    return problem_type.from_dict(data, cache)
+
+
 def convert_row_to_problem(row: dict, cache = None):
+    """Convert a row of the problems table into a problem of the right type. extra_stuff is only parsed once"""
     if not isinstance(row, dict):
         raise TypeError("row is not a dict")
-    try:
-        extra_stuff = orjson.loads(row["extra_stuff"].replace("'", '"'))
-    except orjson.JSONDecodeError:
-        print(row["extra_stuff"])
-        raise
+    extra_stuff = parse_extra_stuff(row["extra_stuff"])
     if "type" not in extra_stuff.keys():
         raise ValueError(f"row {row} doesn't have a type")
-    match extra_stuff["type"]:
-        case "BaseProblem": return BaseProblem.from_row(row, cache)
-        case "ComputationalProblem": return ComputationalProblem.from_row(row, cache)
-        case "LinearAlgebraProblem": return LinearAlgebraProblem.from_row(row, cache)
-        case _:
-            raise ValueError(f"The row {row} is mal-formed")
\ No newline at end of file
+    try:
+        problem_type = PROBLEM_TYPES[extra_stuff["type"]]
+    except KeyError:
+        raise ValueError(f"The row {row} is mal-formed")
+    return problem_type.from_row(row, cache, extra_stuff=extra_stuff)
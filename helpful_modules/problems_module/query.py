@@ -0,0 +1,211 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+
+Filters that the database can run, instead of calling a Python function on every problem.
+    await cache.get_problems_by_func(
+        Q(author=user_id) | Q(solver_contains=user_id) & Q(guild_id=guild_id)
+    )
+A Q is compiled to a parameterized WHERE clause by the SQL caches,
+and to index lookups by RedisCache.
+Q(a=1, b=2) means a == 1 and b == 2. Combine Qs with | (or) and & (and), and negate them with ~.
+Q.matches(thing) checks a problem (or a quiz) in Python, for the caches that can't do better.
+"""
+import typing
+
+from .errors import MathProblemsModuleException
+
+
+class Field:
+    """A field that can be used in a Q.
+    column is the SQL column, attribute is the attribute of the Python object"""
+
+    def __init__(self, column: str, attribute: str):
+        self.column = column
+        self.attribute = attribute
+
+    def to_sql(self, value, placeholder: str) -> typing.Tuple[str, list]:
+        if value is None:
+            return f"{self.column} IS NULL", []
+        return f"{self.column} = {placeholder}", [value]
+
+    def matches(self, thing, value) -> bool:
+        return getattr(thing, self.attribute) == value
+
+
+class InField(Field):
+    """Q(id_in=[...]): the value is one of the given values"""
+
+    def to_sql(self, value, placeholder: str) -> typing.Tuple[str, list]:
+        values = list(value)
+        if not values:
+            return "1 = 0", []
+        return f"{self.column} IN ({','.join([placeholder] * len(values))})", values
+
+    def matches(self, thing, value) -> bool:
+        return getattr(thing, self.attribute) in value
+
+
+class ContainsField(Field):
+    """Q(voter_contains=user_id): the value is in a list attribute.
+    In SQL, the list is a table with one row per (problem, user), like problem_votes"""
+
+    def __init__(
+        self,
+        column: str,
+        attribute: str,
+        table: typing.Optional[str] = None,
+        key: str = "problem_id",
+    ):
+        super().__init__(column, attribute)
+        self.table = table
+        self.key = key
+
+    def to_sql(self, value, placeholder: str) -> typing.Tuple[str, list]:
+        if self.table is None:
+            return super().to_sql(value, placeholder)
+        subquery = f"SELECT {self.key} FROM {self.table} WHERE {self.column} = {placeholder}"
+        return f"{self.key} IN ({subquery})", [value]
+
+    def matches(self, thing, value) -> bool:
+        return value in getattr(thing, self.attribute)
+
+
+PROBLEM_FIELDS: typing.Dict[str, Field] = {
+    "id": Field("problem_id", "id"),
+    "id_in": InField("problem_id", "id"),
+    "author": Field("author", "author"),
+    "guild_id": Field("guild_id", "guild_id"),
+    "voter_contains": ContainsField("user_id", "voters", table="problem_votes"),
+    "solver_contains": ContainsField("user_id", "solvers", table="problem_solves"),
+}
+# A quiz is stored as one row per problem, so a quiz matches if one of its rows matches
+QUIZ_FIELDS: typing.Dict[str, Field] = {
+    "id": Field("quiz_id", "id"),
+    "id_in": InField("quiz_id", "id"),
+    "guild_id": Field("guild_id", "guild_id"),
+    "author": ContainsField("author", "authors"),
+}
+
+
+class Q:
+    """A filter. See the documentation of this module"""
+
+    def __init__(self, **conditions):
+        self.operator = "and"
+        self.children: typing.List["Q"] = []
+        self.conditions: typing.List[typing.Tuple[str, typing.Any]] = list(conditions.items())
+
+    @classmethod
+    def _combine(cls, operator: str, children: typing.List["Q"]) -> "Q":
+        q = cls()
+        q.operator = operator
+        q.children = children
+        return q
+
+    def __and__(self, other: "Q") -> "Q":
+        if not isinstance(other, Q):
+            return NotImplemented
+        return self._combine("and", [self, other])
+
+    def __or__(self, other: "Q") -> "Q":
+        if not isinstance(other, Q):
+            return NotImplemented
+        return self._combine("or", [self, other])
+
+    def __invert__(self) -> "Q":
+        return self._combine("not", [self])
+
+    def __repr__(self):
+        if self.operator == "not":
+            return f"~{self.children[0]!r}"
+        if self.children:
+            separator = " & " if self.operator == "and" else " | "
+            return "(" + separator.join(map(repr, self.children)) + ")"
+        return "Q(" + ", ".join(f"{name}={value!r}" for name, value in self.conditions) + ")"
+
+    @staticmethod
+    def _field(fields: typing.Dict[str, Field], name: str) -> Field:
+        try:
+            return fields[name]
+        except KeyError:
+            raise MathProblemsModuleException(
+                f"Can't filter by {name}. Use one of {list(fields.keys())}"
+            )
+
+    def to_sql(
+        self, placeholder: str = "?", fields: typing.Dict[str, Field] = None
+    ) -> typing.Tuple[str, list]:
+        """Compile this filter to a WHERE clause (without the WHERE) and its parameters.
+        placeholder is ? for SQLite and %s for MySQL"""
+        if fields is None:
+            fields = PROBLEM_FIELDS
+        if self.operator == "not":
+            where, params = self.children[0].to_sql(placeholder, fields)
+            return f"NOT ({where})", params
+        clauses = []
+        params = []
+        for name, value in self.conditions:
+            clause, clause_params = self._field(fields, name).to_sql(value, placeholder)
+            clauses.append(clause)
+            params.extend(clause_params)
+        for child in self.children:
+            clause, clause_params = child.to_sql(placeholder, fields)
+            clauses.append(f"({clause})")
+            params.extend(clause_params)
+        if not clauses:
+            return "1 = 1", []  # Q() matches everything
+        return f" {self.operator.upper()} ".join(clauses), params
+
+    def matches(self, thing, fields: typing.Dict[str, Field] = None) -> bool:
+        """Check whether a problem (or a quiz, with fields=QUIZ_FIELDS) matches this filter,
+        in Python"""
+        if fields is None:
+            fields = PROBLEM_FIELDS
+        if self.operator == "not":
+            return not self.children[0].matches(thing, fields)
+        results = (
+            self._field(fields, name).matches(thing, value) for name, value in self.conditions
+        )
+        children = (child.matches(thing, fields) for child in self.children)
+        if self.operator == "or":
+            return any(results) or any(children)
+        return all(results) and all(children)
+
+    def __call__(self, thing) -> bool:
+        """So that a Q can be used wherever a function is expected"""
+        return self.matches(thing)
+
+    def lookup(self) -> typing.Optional[typing.Tuple[str, typing.Any]]:
+        """Return a (field, value) condition that every match satisfies, or None if there isn't one.
+        Caches that have an index for that field only need to check the things that the index
+        returns"""
+        if self.operator == "not":
+            return None
+        if self.operator == "and":
+            for condition in self.conditions:
+                if condition[0] in (
+                    "id", "guild_id", "author", "voter_contains", "solver_contains"
+                ):
+                    return condition
+            for child in self.children:
+                condition = child.lookup()
+                if condition is not None:
+                    return condition
+        elif len(self.conditions) == 1 and not self.children:
+            return self.conditions[0]
+        return None
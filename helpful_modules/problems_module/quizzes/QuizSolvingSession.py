@@ -1,11 +1,11 @@
 import time
 import typing
 import warnings
-from asyncio import run
 
 from helpful_modules.problems_module.errors import *
 from helpful_modules.threads_or_useful_funcs import generate_new_id
 
+from ..codec import decode
 from ..dict_convertible import DictConvertible
 from .quiz_problem import QuizProblem
 from .quiz_submissions import QuizSubmission, QuizSubmissionAnswer
@@ -68,60 +68,32 @@ class QuizSolvingSession(DictConvertible):
     def is_finished(self: "QuizSolvingSession"):
         return self.overtime
     @classmethod
-    def better_init(
-        cls,
-        *,
-        user_id: int,
-        quiz_id: int,
-        cache,
-        is_finished: bool,
-        answers: typing.List[QuizSubmissionAnswer],
-        guild_id: int,
-        start_time: int,
-        expire_time: int,
-        special_id: int
-    ) -> "QuizSolvingSession":
-        QuizSession: "QuizSolvingSession" = cls(
-            cache=cache, quiz_id=quiz_id, user_id=user_id
-        )
-        QuizSession.is_finished = is_finished
-        QuizSession.answers = answers
-        QuizSession.guild_id = guild_id
-        QuizSession._quiz = run(cache.get_quiz(quiz_id))
-        QuizSession.start_time = start_time
-        QuizSession.expire_time = expire_time
-        QuizSession.special_id = special_id
-        return QuizSession
+    def from_row(cls, row: dict, quiz: typing.Optional["Quiz"] = None) -> "QuizSolvingSession":
+        """Convert a row of the quiz_submission_sessions table into a QuizSolvingSession without querying anything.
+        The quiz is attached afterwards (see from_rows), because the quizzes of many sessions are loaded together"""
+        session = cls.__new__(cls)
+        session.user_id = row["user_id"]
+        session.quiz_id = row["quiz_id"]
+        session.guild_id = row["guild_id"]
+        session.attempt_num = row["attempt_num"]
+        session.start_time = row["start_time"]
+        session.expire_time = row["expire_time"]
+        session.special_id = row["special_id"]
+        session.is_final = bool(row.get("is_finished", False))
+        session.answers = decode(row["answers"])  # See codec.py for the format
+        session._quiz = quiz
+        return session
 
     @classmethod
-    def from_sqlite_dict(cls, dict: dict) -> "QuizSolvingSession":
-        """Convert a dict returned from sql into a QuizSolvingSession"""
-        return cls.better_init(
-            start_time=dict["start_time"],
-            expire_time=dict["expire_time"],
-            user_id=dict["user_id"],
-            quiz_id=dict["quiz_id"],
-            guild_id=dict["guild_id"],
-            answers=list(
-                map(QuizSubmissionAnswer.to_dict, dict["answers"])
-            ),  # TODO: don't use pickle because RCE
-            special_id=dict["special_id"],
-            attempt_num=dict["attempt_num"],
-        )
-
-    @classmethod
-    def from_mysql_dict(cls, dict: dict) -> "QuizSolvingSession":
-        return cls.better_init(
-            start_time=dict["start_time"],
-            user_id=dict["user_id"],
-            quiz_id=dict["quiz_id"],
-            guild_id=dict["guild_id"],
-            expire_time=dict["expire_time"],
-            is_finished=dict["is_finished"],
-            answers=dict["answers"],
-            special_id=dict["special_id"],
-            attempt_num=dict["attempt_num"],
-        )
+    async def from_rows(cls, rows: typing.Iterable[dict], cache) -> typing.List["QuizSolvingSession"]:
+        """Convert rows of the quiz_submission_sessions table into QuizSolvingSessions.
+        The quizzes of the sessions are loaded with one call to cache.get_quizzes, instead of one query per session"""
+        sessions = [cls.from_row(row) for row in rows]
+        if sessions:
+            quizzes = await cache.get_quizzes({session.quiz_id for session in sessions})
+            for session in sessions:
+                session._quiz = quizzes.get(session.quiz_id)
+        return sessions
 
     def to_dict(self) -> dict:
         return {
@@ -11,6 +11,8 @@ from ..dict_convertible import DictConvertible
 class QuizProblem(BaseProblem, DictConvertible):
     """A class that represents a Quiz Math Problem"""
 
+    __slots__ = ("is_written", "quiz_id", "max_score", "min_score", "cache")
+
     def __init__(
         self,
         question: str,
@@ -99,8 +101,8 @@ class QuizProblem(BaseProblem, DictConvertible):
             "question": self.question,
             "id": str(self.id),
             "guild_id": str(self.guild_id),
-            "voters": self.voters,
-            "solvers": self.solvers,
+            "voters": self.voters.to_list(),
+            "solvers": self.solvers.to_list(),
             "author": self.author,
             "quiz_id": self.quiz_id,
             "is_written": self.is_written,
@@ -0,0 +1,158 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import asyncio
+import contextlib
+import logging
+import typing
+
+import aiosqlite
+
+from helpful_modules.dict_factory import dict_factory
+
+from .errors import SQLException
+
+log = logging.getLogger(__name__)
+
+
+class SQLiteConnectionPool:
+    """A small pool of persistent aiosqlite connections.
+
+    SQLite allows many readers but only one writer at a time,
+    so the pool keeps several read connections and exactly one write connection.
+    Every connection is opened once (the first time the pool is used) and reused until close()
+    is called, instead of opening a new connection (and a new thread) for every query.
+    The database is switched to WAL mode so that readers are not blocked by the writer."""
+
+    def __init__(self, db_name: str, *, readers: int = 4, timeout: float = 30.0):
+        if readers < 1:
+            raise ValueError("The pool needs at least 1 read connection")
+        self.db_name = db_name
+        self.num_readers = readers
+        self.timeout = timeout
+        self._readers: typing.Optional[asyncio.Queue] = None
+        self._all_readers: typing.List[aiosqlite.Connection] = []
+        self._writer: typing.Optional[aiosqlite.Connection] = None
+        self._write_lock: typing.Optional[asyncio.Lock] = None
+        self._open_lock: typing.Optional[asyncio.Lock] = None
+        # How many connections have been opened over the lifetime of the pool
+        self.connections_opened = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def _connect(self) -> aiosqlite.Connection:
+        conn = await aiosqlite.connect(self.db_name, timeout=self.timeout)
+        conn.row_factory = dict_factory
+        self.connections_opened += 1
+        return conn
+
+    async def open(self) -> None:
+        """Open every connection of the pool. This does nothing if the pool is already open."""
+        if self._open_lock is None:
+            self._open_lock = asyncio.Lock()
+        async with self._open_lock:
+            if self.is_open:
+                return
+            log.info(
+                f"Opening a SQLite connection pool for {self.db_name} "
+                f"with {self.num_readers} readers"
+            )
+            writer = await self._connect()
+            await writer.execute("PRAGMA journal_mode=WAL")
+            await writer.execute("PRAGMA synchronous=NORMAL")
+            await writer.commit()
+            readers = asyncio.Queue()
+            for _ in range(self.num_readers):
+                conn = await self._connect()
+                self._all_readers.append(conn)
+                readers.put_nowait(conn)
+            self._readers = readers
+            self._write_lock = asyncio.Lock()
+            self._writer = writer
+
+    @contextlib.asynccontextmanager
+    async def reader(self) -> typing.AsyncIterator[aiosqlite.Connection]:
+        """Borrow a read connection. Don't write with it: writes must go through writer()."""
+        if not self.is_open:
+            await self.open()
+        # close() replaces self._readers, and waits for the connections to come back to this queue
+        readers = self._readers
+        conn = await readers.get()
+        try:
+            yield conn
+        finally:
+            readers.put_nowait(conn)
+
+    @contextlib.asynccontextmanager
+    async def writer(self) -> typing.AsyncIterator[aiosqlite.Connection]:
+        """Borrow the write connection. Only one coroutine can hold it at a time.
+        The transaction is committed when the block exits normally,
+        and rolled back if an exception is raised."""
+        while True:
+            if not self.is_open:
+                await self.open()
+            write_lock = self._write_lock
+            await write_lock.acquire()
+            # close() may have closed the pool (and another coroutine may have opened a new one)
+            # while this was waiting
+            if self._writer is not None and self._write_lock is write_lock:
+                break
+            write_lock.release()
+        writer = self._writer
+        try:
+            yield writer
+        except BaseException:
+            await writer.rollback()
+            raise
+        else:
+            await writer.commit()
+        finally:
+            write_lock.release()
+
+    async def close(self) -> None:
+        """Close every connection of the pool. The pool will be re-opened if it is used again.
+        This waits for the write connection, and (for up to timeout seconds) for the read
+        connections that are borrowed to come back, so they aren't closed while they are used"""
+        if not self.is_open:
+            return
+        async with self._write_lock:
+            writer, self._writer = self._writer, None
+            all_readers, self._all_readers = self._all_readers, []
+            readers, self._readers = self._readers, None
+            self._open_lock = None
+        # Not while holding the write lock:
+        # a coroutine that has borrowed a reader could be waiting for the writer
+        # (it gets the writer of a new pool)
+        try:
+            for _ in all_readers:
+                await asyncio.wait_for(readers.get(), self.timeout)
+        except asyncio.TimeoutError:
+            log.warning(
+                f"Closing the SQLite connection pool for {self.db_name} "
+                f"while some readers are still borrowed"
+            )
+        exceptions = []
+        for conn in [writer, *all_readers]:
+            try:
+                await conn.close()
+            except Exception as e:
+                exceptions.append(e)
+        if exceptions:
+            raise SQLException("Some SQLite connections could not be closed") from exceptions[0]
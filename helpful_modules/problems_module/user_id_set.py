@@ -0,0 +1,137 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import typing
+from array import array
+from bisect import bisect_left, insort
+
+
+class UserIdSet:
+    """The voters (or the solvers) of a problem.
+    It's a set, so `user_id in problem.solvers` doesn't have to go through a list of every solver.
+    It also has the list methods that the rest of the bot uses (append, remove, clear...),
+    and it's equal to a list with the same ids (in any order),
+    so problem.to_dict() and the database format don't change.
+    The ids are kept in a sorted array of 64-bit ints, which takes 8 bytes per id
+    (a list takes 8 bytes per id, plus 32 bytes for each int object),
+    and is searched with a binary search when it's large.
+    Ids that aren't 64-bit ints (which shouldn't happen) are kept in a tuple instead.
+    An empty UserIdSet doesn't allocate anything."""
+
+    __slots__ = ("_ids",)
+    # Arrays with at most this many ids are searched linearly,
+    # which is faster than a binary search when they're this short
+    SMALL = 8
+
+    def __init__(self, ids: typing.Iterable[typing.Hashable] = ()):
+        self._ids: typing.Union[None, array, tuple] = None
+        self._store(ids)
+
+    def _store(self, ids: typing.Iterable[typing.Hashable]) -> None:
+        ids = list(dict.fromkeys(ids))  # Without duplicates
+        if not ids:
+            self._ids = None
+            return
+        if all(type(user_id) is int for user_id in ids):
+            try:
+                self._ids = array("q", sorted(ids))
+                return
+            except OverflowError:
+                pass
+        self._ids = tuple(ids)
+
+    def __contains__(self, user_id) -> bool:
+        ids = self._ids
+        if ids is None:
+            return False
+        if type(ids) is tuple or len(ids) <= self.SMALL:
+            return user_id in ids
+        if type(user_id) is not int:
+            return False
+        index = bisect_left(ids, user_id)
+        return index < len(ids) and ids[index] == user_id
+
+    def __iter__(self) -> typing.Iterator[typing.Hashable]:
+        if self._ids is None:
+            return iter(())
+        if type(self._ids) is tuple:
+            return iter(self._ids)
+        # A copy, so that the set can be changed while it's being iterated over
+        return iter(self._ids.tolist())
+
+    def __len__(self) -> int:
+        return 0 if self._ids is None else len(self._ids)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (UserIdSet, set, frozenset, list, tuple)):
+            return len(self) == len(other) and all(user_id in self for user_id in other)
+        return NotImplemented
+
+    __hash__ = None  # It's mutable
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def __getstate__(self):
+        return list(self)
+
+    def __setstate__(self, state) -> None:
+        self._store(state)
+
+    def append(self, user_id) -> None:
+        """Add the user id (if it isn't already there)"""
+        if user_id in self:
+            return
+        if type(self._ids) is array and type(user_id) is int:
+            try:
+                insort(self._ids, user_id)
+                return
+            except OverflowError:
+                pass
+        self._store([*self, user_id])
+
+    add = append
+
+    def extend(self, user_ids: typing.Iterable[typing.Hashable]) -> None:
+        self._store([*self, *user_ids])
+
+    def remove(self, user_id) -> None:
+        """Remove the user id. Raises ValueError if it isn't there, like list.remove"""
+        if user_id not in self:
+            raise ValueError(f"{user_id!r} is not in the set")
+        self.discard(user_id)
+
+    def discard(self, user_id) -> None:
+        """Remove the user id if it is there"""
+        if user_id not in self:
+            return
+        if type(self._ids) is tuple:
+            self._store(other for other in self._ids if other != user_id)
+            return
+        del self._ids[bisect_left(self._ids, user_id)]
+        if not self._ids:
+            self._ids = None
+
+    def clear(self) -> None:
+        self._ids = None
+
+    def copy(self) -> "UserIdSet":
+        return UserIdSet(self)
+
+    def to_list(self) -> list:
+        return list(self)
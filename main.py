@@ -214,6 +214,7 @@ bot = TheDiscordMathProblemBot(
     # activity = nextcord.CustomActivity(name="Making sure that the bot works!", emoji = "🙂") # This didn't work anyway, will set the activity in on_connect
 )
 bot._sync_commands_debug = True
+bot.add_closing_thing(main_cache.close)  # Close the cache's database connections when the bot shuts down
 # setup(bot)
 # bot._transport_modules = {
 #    "problems_module": problems_module,
@@ -0,0 +1,64 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from helpful_modules.custom_bot import TheDiscordMathProblemBot
+from helpful_modules.interaction_context import InteractionContext
+from helpful_modules.problems_module.cache.lru import LRUCache
+from helpful_modules.problems_module.user_data import UserData
+
+
+class TestInteractionContext(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bot = SimpleNamespace(
+            cache=MagicMock(),
+            _interaction_contexts=LRUCache(max_size=10, ttl=None),
+        )
+        self.bot.cache.get_user_data = AsyncMock(return_value=UserData(user_id=5, trusted=True, blacklisted=False))
+        self.inter = SimpleNamespace(id=1, author=SimpleNamespace(id=5), guild_id=None)
+
+    async def test_user_data_is_loaded_once(self):
+        ctx = TheDiscordMathProblemBot.ctx_for(self.bot, self.inter)
+        self.assertIs(TheDiscordMathProblemBot.ctx_for(self.bot, self.inter), ctx)
+        self.assertIsInstance(ctx, InteractionContext)
+        self.assertTrue(await ctx.is_trusted())
+        self.assertFalse(await ctx.is_blacklisted())
+        self.assertFalse(await ctx.is_guild_blacklisted())  # Not in a guild
+        self.bot.cache.get_user_data.assert_awaited_once()
+
+        ctx.invalidate()
+        await ctx.user_data()
+        self.assertEqual(self.bot.cache.get_user_data.await_count, 2)
+        other_inter = SimpleNamespace(id=2, author=SimpleNamespace(id=5), guild_id=None)
+        self.assertIsNot(TheDiscordMathProblemBot.ctx_for(self.bot, other_inter), ctx)
+
+    async def test_dropped_when_the_command_completes(self):
+        ctx = TheDiscordMathProblemBot.ctx_for(self.bot, self.inter)
+        await ctx.user_data()
+        await TheDiscordMathProblemBot.drop_ctx(self.bot, self.inter)
+        # A component callback of the same interaction loads the user data again
+        self.assertIsNot(TheDiscordMathProblemBot.ctx_for(self.bot, self.inter), ctx)
+        await TheDiscordMathProblemBot.ctx_for(self.bot, self.inter).user_data()
+        self.assertEqual(self.bot.cache.get_user_data.await_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -256,6 +256,41 @@ class TestBreakIntoPages(unittest.TestCase):
         expected_result = ['Short']
         self.assertEqual(break_into_pages(text, max_page_length), expected_result)
 
+class TestKeysetPaginatorView(unittest.IsolatedAsyncioTestCase):
+    async def test_an_empty_page_is_the_end(self):
+        pages = {None: ("Page 1", 1), 1: ("", None)}  # The key of page 1 points past the last page
+
+        async def fetch_page(key):
+            return pages[key]
+
+        view = await helpful_modules.paginator_view.KeysetPaginatorView.create(-100, fetch_page)
+        self.assertFalse(view.next_page_button.disabled)
+        interaction = AsyncMock(
+            spec=disnake.MessageInteraction, author=AsyncMock(spec=disnake.User, id=-100), response=AsyncMock()
+        )
+        await view.next_page_button.callback(interaction)
+        interaction.send.assert_awaited_once_with("This is the last page", ephemeral=True)
+        self.assertEqual((view.page_num, view.text, view.next_key), (0, "Page 1", None))
+        self.assertEqual(view.page_keys, [None])
+        self.assertTrue(view.next_page_button.disabled)
+
+    async def test_next_is_disabled_on_the_last_page(self):
+        pages = {None: ("Page 1", 1), 1: ("Page 2", None)}
+
+        async def fetch_page(key):
+            return pages[key]
+
+        view = await helpful_modules.paginator_view.KeysetPaginatorView.create(-100, fetch_page)
+        interaction = AsyncMock(
+            spec=disnake.MessageInteraction, author=AsyncMock(spec=disnake.User, id=-100), response=AsyncMock()
+        )
+        await view.next_page_button.callback(interaction)
+        self.assertEqual((view.page_num, view.text), (1, "Page 2"))
+        self.assertTrue(view.next_page_button.disabled)
+        await view.prev_page_button.callback(interaction)
+        self.assertEqual((view.page_num, view.text), (0, "Page 1"))
+        self.assertFalse(view.next_page_button.disabled)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,83 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import os
+import tempfile
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import (
+    BaseProblem,
+    MathProblemCache,
+    MathProblemsModuleException,
+    TooManyProblems,
+)
+
+
+class TestAddProblems(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache = MathProblemCache(
+            mysql_username="",
+            mysql_password="",
+            mysql_db_ip="",
+            mysql_db_name="",
+            use_sqlite=True,
+            db_name=os.path.join(self.tempdir.name, "test.db"),
+            update_cache_by_default_when_requesting=False,
+            max_guild_problems=2,
+        )
+
+    async def asyncSetUp(self):
+        await self.cache.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    async def test_add_problems(self):
+        added = await self.cache.add_problems(
+            [
+                BaseProblem(question="1+1?", answer="2", id=1, author=5, voters=[7]),
+                BaseProblem(question="2+2?", answer="4", id=2, author=5),
+                BaseProblem(question="3+3?", answer="6", id=1, author=5),  # Same id as the first one
+            ]
+        )
+        self.assertEqual([problem.question for problem in added], ["1+1?", "2+2?"])
+        self.assertEqual((await self.cache.get_problem(None, 1)).voters, [7])
+        self.assertEqual(await self.cache.add_problems([]), [])
+
+        with self.assertRaises(MathProblemsModuleException):
+            await self.cache.add_problems([BaseProblem(question="?", answer="?", id=2, author=5)])
+
+    async def test_guild_limit_is_checked_for_the_whole_batch(self):
+        await self.cache.add_problem(1, BaseProblem(question="1+1?", answer="2", id=1, author=5, guild_id="3"))
+        with self.assertRaises(TooManyProblems):
+            await self.cache.add_problems(
+                [BaseProblem(question="?", answer="?", id=i, author=5, guild_id="3") for i in (2, 3)]
+            )
+        with self.assertRaises(MathProblemsModuleException):  # Nothing was added
+            await self.cache.get_problem(None, 2)
+        await self.cache.add_problems([BaseProblem(question="?", answer="?", id=2, author=5, guild_id="3")])
+
+
+if __name__ == "__main__":
+    unittest.main()
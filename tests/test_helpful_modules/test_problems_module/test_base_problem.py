@@ -22,7 +22,7 @@ import unittest.mock
 from unittest.mock import AsyncMock
 import disnake
 from helpful_modules.problems_module import BaseProblem, PMDeprecationWarning
-import pickle
+from helpful_modules.problems_module.codec import encode_ids, encode_json
 
 # Define a standard sample problem for testing
 sample_problem = BaseProblem(
@@ -58,9 +58,9 @@ class TestBaseProblem(unittest.TestCase):
             "problem_id": -2,
             "guild_id": None,
             "author": "-987654321",
-            "answers": pickle.dumps(["6"]),
-            "voters": pickle.dumps([]),
-            "solvers": pickle.dumps([]),
+            "answers": encode_json(["6"]),
+            "voters": encode_ids([]),
+            "solvers": encode_ids([]),
             "tolerance": 0.2
         }
         recieved_problem = BaseProblem.from_row(row)
@@ -223,6 +223,46 @@ class TestBaseProblem(unittest.TestCase):
         problem = sample_problem
         self.assertEqual(problem.get_extra_stuff(), {})  # No extra stuff present
 
+    def test_convert_row_to_problem(self):
+        from helpful_modules.problems_module import LinearAlgebraProblem
+        from helpful_modules.problems_module.base_problem import dump_extra_stuff
+        from helpful_modules.problems_module.parse_problem import convert_row_to_problem
+
+        problem = LinearAlgebraProblem(
+            question="Solve", answers=["1 2"], id=3, author=5, coeffs=[[1, 0], [0, 1]], equal_to=[1, 2]
+        )
+        row = {
+            "guild_id": None,
+            "problem_id": 3,
+            "question": "Solve",
+            "answers": encode_json(["1 2"]),
+            "voters": encode_ids([]),
+            "solvers": encode_ids([]),
+            "author": 5,
+        }
+        for extra_stuff in (dump_extra_stuff(problem.get_extra_stuff()), str(problem.get_extra_stuff())):
+            row["extra_stuff"] = extra_stuff  # JSON, and the repr stored by older versions of the bot
+            self.assertEqual(convert_row_to_problem(row), problem)
+
+    def test_convert_row_of_a_guild_problem(self):
+        from helpful_modules.problems_module import ComputationalProblem
+        from helpful_modules.problems_module.parse_problem import convert_row_to_problem
+
+        row = {
+            "guild_id": 123456789012345678,  # What the database returns
+            "problem_id": 4,
+            "question": "1/3?",
+            "answers": encode_json(["0.333"]),
+            "voters": encode_ids([]),
+            "solvers": encode_ids([]),
+            "author": 5,
+            "extra_stuff": "{'tolerance': 0.01, 'type': 'ComputationalProblem'}",
+        }
+        problem = convert_row_to_problem(row)
+        self.assertIsInstance(problem, ComputationalProblem)
+        self.assertEqual(problem.guild_id, 123456789012345678)
+        self.assertEqual(problem.tolerance, 0.01)
+
 
 if __name__ == "__main__":
     unittest.main()
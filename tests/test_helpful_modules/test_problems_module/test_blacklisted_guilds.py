@@ -0,0 +1,101 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import MathProblemCache
+from helpful_modules.problems_module.GuildData import GuildData
+
+EVERYONE = '{"blacklisted_users": [], "whitelisted_users": [], "roles_needed": [], "permissions_needed": []}'
+
+
+class TestBlacklistedGuilds(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tempdir.name, "test.db")
+        self.cache = MathProblemCache(
+            mysql_username="",
+            mysql_password="",
+            mysql_db_ip="",
+            mysql_db_name="",
+            use_sqlite=True,
+            db_name=self.db_name,
+            update_cache_by_default_when_requesting=False,
+        )
+
+    async def asyncSetUp(self):
+        await self.cache.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def set_blacklisted(self, guild_id: int, blacklisted: bool):
+        """Change the database directly, like another process would"""
+        conn = sqlite3.connect(self.db_name)
+        conn.execute(
+            "INSERT OR REPLACE INTO guild_data (guild_id, blacklisted, can_create_problems_check, can_create_quizzes_check, mod_check) "
+            "VALUES (?, ?, '{}', '{}', '{}')",
+            (guild_id, int(blacklisted)),
+        )
+        conn.commit()
+        conn.close()
+
+    async def test_blacklisted_guild_ids(self):
+        self.set_blacklisted(1, True)
+        self.set_blacklisted(2, False)
+        self.assertEqual(await self.cache.get_blacklisted_guild_ids(), {1})
+        self.assertTrue(await self.cache.is_guild_id_blacklisted(1))
+        self.assertFalse(await self.cache.is_guild_id_blacklisted(2))
+        self.assertFalse(await self.cache.is_guild_id_blacklisted(3))
+
+        self.set_blacklisted(2, True)
+        self.assertFalse(await self.cache.is_guild_id_blacklisted(2))  # Not loaded again
+        self.assertEqual(await self.cache.refresh_blacklisted_guild_ids(), {1, 2})
+        self.assertTrue(await self.cache.is_guild_id_blacklisted(2))
+
+
+    async def test_set_guild_data(self):
+        self.set_blacklisted(1, True)
+        self.assertFalse(await self.cache.is_guild_id_blacklisted(5))  # The blacklisted guild ids are loaded now
+
+        guild_data = GuildData(5, True, EVERYONE, EVERYONE, EVERYONE)
+        await self.cache.set_guild_data(guild_data)
+        self.assertTrue(await self.cache.is_guild_id_blacklisted(5))  # Without refresh_blacklisted_guild_ids
+        guild_data.blacklisted = False
+        await self.cache.set_guild_data(guild_data)  # The row exists now, so it's updated
+        self.assertFalse(await self.cache.is_guild_id_blacklisted(5))
+        self.assertEqual(await self.cache.refresh_blacklisted_guild_ids(), {1})
+
+    async def test_get_guild_data_many(self):
+        for guild_id in (1, 2):
+            await self.cache.set_guild_data(GuildData(guild_id, guild_id == 2, EVERYONE, EVERYONE, EVERYONE))
+        guild_data = await self.cache.get_guild_data_many([2, 3, 1])
+        self.assertEqual(list(guild_data.keys()), [2, 1])  # In order, without the guild that has none
+        self.assertEqual([data.blacklisted for data in guild_data.values()], [True, False])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import BaseProblem, MathProblemCache
+
+
+def make_cache(db_name: str) -> MathProblemCache:
+    return MathProblemCache(
+        mysql_username="",
+        mysql_password="",
+        mysql_db_ip="",
+        mysql_db_name="",
+        use_sqlite=True,
+        db_name=db_name,
+        update_cache_by_default_when_requesting=False,
+    )
+
+
+class TestChangeLog(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        db_name = os.path.join(self.tempdir.name, "test.db")
+        # writer makes the changes, reader only calls update_cache (like 2 processes sharing the database)
+        self.writer = make_cache(db_name)
+        self.reader = make_cache(db_name)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def run_test(self, coro):
+        async def run():
+            try:
+                await self.writer.start()
+                await self.reader.start()
+                await coro
+            finally:
+                await self.writer.close()
+                await self.reader.close()
+
+        asyncio.run(run())
+
+    def test_only_changes_are_applied(self):
+        async def check():
+            await self.writer.add_problem(1, BaseProblem(question="1+1?", answer="2", id=1, author=5))
+            await self.reader.update_cache()
+            first = self.reader.global_problems[1]
+
+            await self.reader.update_cache()  # Nothing changed
+            self.assertIs(self.reader.global_problems[1], first)
+
+            await self.writer.add_problem(2, BaseProblem(question="2+2?", answer="4", id=2, author=6))
+            await self.writer.add_vote(1, 7)
+            await self.reader.update_cache()
+            self.assertEqual(self.reader.global_problems[1].voters, [7])
+            self.assertEqual(self.reader.global_problems[2].question, "2+2?")
+
+            await self.writer.remove_problem(None, 1)
+            await self.reader.update_cache()
+            self.assertEqual(list(self.reader.global_problems.keys()), [2])
+
+        self.run_test(check())
+
+    def test_full_resync_when_changes_were_pruned(self):
+        async def check():
+            await self.reader.update_cache()
+            self.writer.change_log_max_rows = 1
+            for problem_id in range(1, 4):
+                await self.writer.add_problem(
+                    problem_id, BaseProblem(question="1+1?", answer="2", id=problem_id, author=5)
+                )
+            self.assertEqual(await self.writer.prune_change_log(), 2)
+            await self.reader.update_cache()
+            self.assertEqual(sorted(self.reader.global_problems.keys()), [1, 2, 3])
+
+        self.run_test(check())
+
+    def test_changes_committed_out_of_order(self):
+        async def move_change(old_seq: int, new_seq: int):
+            async with self.writer._sqlite_pool.writer() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute("UPDATE changes SET seq = ? WHERE seq = ?", (new_seq, old_seq))
+
+        async def check():
+            for problem_id in (1, 2):
+                await self.writer.add_problem(
+                    problem_id, BaseProblem(question="1+1?", answer="2", id=problem_id, author=5)
+                )
+            await self.reader.update_cache()
+            self.assertEqual(self.reader._last_change_seq, 2)
+
+            # Seqs 3 and 4 are held by transactions that haven't committed yet
+            await self.writer.update_problem(2, BaseProblem(question="2+2?", answer="4", id=2, author=5))
+            await move_change(3, 5)
+            await self.reader.update_cache()
+            self.assertEqual(self.reader._last_change_seq, 5)
+            self.assertEqual(self.reader.global_problems[2].question, "2+2?")
+            self.assertEqual(set(self.reader._missing_change_seqs), {3, 4})
+
+            # The transaction that got seq 4 commits after the reader moved past it
+            await self.writer.update_problem(1, BaseProblem(question="3+3?", answer="6", id=1, author=5))
+            await move_change(6, 4)
+            await self.reader.update_cache()
+            self.assertEqual(self.reader.global_problems[1].question, "3+3?")
+            self.assertEqual(set(self.reader._missing_change_seqs), {3})
+
+            # Seq 3 was rolled back, so it's eventually given up on
+            self.reader.change_log_gap_timeout = 0
+            self.reader._missing_change_seqs = {3: 0}
+            await self.reader.update_cache()
+            self.assertEqual(self.reader._missing_change_seqs, {})
+
+        self.run_test(check())
+
+    def test_full_resync_remembers_missing_changes(self):
+        async def check():
+            await self.writer.add_problem(1, BaseProblem(question="1+1?", answer="2", id=1, author=5))
+            await self.writer.add_problem(2, BaseProblem(question="2+2?", answer="4", id=2, author=5))
+            async with self.writer._sqlite_pool.writer() as conn:
+                cursor = await conn.cursor()
+                await cursor.execute("UPDATE changes SET seq = 3 WHERE seq = 2")
+            await self.reader.update_cache()
+            self.assertEqual(set(self.reader._missing_change_seqs), {2})
+
+        self.run_test(check())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import asyncio
+import os
+import pickle
+import tempfile
+import unittest
+import unittest.mock
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import MathProblemCache
+from helpful_modules.problems_module.cache.migrations import _reencode_pickled_values
+from helpful_modules.problems_module.codec import (
+    decode,
+    encode_ids,
+    encode_json,
+    encode_msgpack,
+    is_legacy,
+    msgpack,
+)
+from helpful_modules.problems_module.errors import FormatException
+
+
+class TestCodec(unittest.TestCase):
+    def test_ids(self):
+        ids = [845751152901750824, 1, -5, 2**63 - 1]
+        encoded = encode_ids(ids)
+        self.assertEqual(len(encoded), 1 + 8 * len(ids))
+        self.assertEqual(decode(encoded), ids)
+        self.assertEqual(decode(encode_ids([])), [])
+        self.assertFalse(is_legacy(encoded))
+
+    def test_ids_that_are_not_int64s_use_json(self):
+        self.assertEqual(decode(encode_ids(["hi i am a voter", 5])), ["hi i am a voter", 5])
+        self.assertEqual(decode(encode_ids([True, 5])), [True, 5])
+
+    def test_json(self):
+        value = {"answers": ["4", "four"], "user_id": 5}
+        self.assertEqual(decode(encode_json(value)), value)
+
+    @unittest.skipIf(msgpack is None, "msgpack isn't installed")
+    def test_msgpack(self):
+        value = {"authors": [845751152901750824, 5], "id": 3, 7: None}
+        self.assertEqual(decode(encode_msgpack(value)), value)
+        self.assertLess(len(encode_msgpack(value)), len(encode_json(value)))
+        self.assertFalse(is_legacy(encode_msgpack(value)))
+
+    def test_legacy_values_are_only_decoded_when_allowed(self):
+        for protocol in range(0, pickle.HIGHEST_PROTOCOL + 1):
+            pickled = pickle.dumps(["2", 3], protocol=protocol)
+            self.assertTrue(is_legacy(pickled))
+            self.assertEqual(decode(pickled, allow_legacy=True), ["2", 3])
+            with self.assertRaises(FormatException):
+                decode(pickled)
+
+
+class TestReencodingLegacyRows(unittest.TestCase):
+    def run_with_legacy_rows(self, reencode):
+        """Make a database with 6 values that can't be decoded, followed by 10 problems whose values are pickled,
+        and call reencode(cache)"""
+        with tempfile.TemporaryDirectory() as tempdir:
+            cache = MathProblemCache(
+                mysql_username="",
+                mysql_password="",
+                mysql_db_ip="",
+                mysql_db_name="",
+                use_sqlite=True,
+                db_name=os.path.join(tempdir, "test.db"),
+                update_cache_by_default_when_requesting=False,
+            )
+
+            async def check():
+                try:
+                    await cache.start()
+                    async with cache._sqlite_pool.writer() as conn:
+                        await conn.executemany(
+                            "INSERT INTO problems (guild_id, problem_id, question, answers, author, voters, solvers, extra_stuff) "
+                            "VALUES (?,?,?,?,?,?,?,?)",
+                            [
+                                (None, 100 + i, "?", b"garbage", 5, encode_ids([]), encode_ids([]), "{'type': 'BaseProblem'}")
+                                for i in range(6)
+                            ]
+                            + [
+                                (None, i, "1+1?", pickle.dumps(["2"]), 5, pickle.dumps([]), pickle.dumps([]), "{'type': 'BaseProblem'}")
+                                for i in range(10)
+                            ],
+                        )
+                    await reencode(cache)
+                    async with cache._sqlite_pool.reader() as conn:
+                        cursor = await conn.execute("SELECT answers, voters FROM problems WHERE problem_id < 100")
+                        for row in await cursor.fetchall():
+                            self.assertFalse(is_legacy(row["answers"]))
+                            self.assertEqual(decode(row["answers"]), ["2"])
+                            self.assertEqual(decode(row["voters"]), [])
+                    self.assertEqual((await cache.get_problem(None, 3)).answers, ["2"])
+                finally:
+                    await cache.close()
+
+            asyncio.run(check())
+
+    def test_reencode_in_batches(self):
+        async def reencode(cache):
+            with self.assertLogs("helpful_modules.problems_module.cache.misc_related_cache", "WARNING") as logs:
+                # The values that can't be decoded fill the first batch, but they are skipped after that
+                self.assertEqual(await cache.reencode_legacy_rows(batch_size=4), 30)
+            self.assertEqual(sum("Could not re-encode" in line for line in logs.output), 6)
+            self.assertEqual(await cache.reencode_legacy_rows(), 0)
+
+        self.run_with_legacy_rows(reencode)
+
+    @unittest.mock.patch("helpful_modules.problems_module.cache.migrations.REENCODE_BATCH_SIZE", 4)
+    def test_the_migration_gets_past_values_that_cannot_be_reencoded(self):
+        async def reencode(cache):
+            async with cache._sqlite_pool.writer() as conn:
+                with self.assertLogs("helpful_modules.problems_module.cache.misc_related_cache", "WARNING"):
+                    await _reencode_pickled_values(cache, await conn.cursor())
+
+        self.run_with_legacy_rows(reencode)
+
+
+if __name__ == "__main__":
+    unittest.main()
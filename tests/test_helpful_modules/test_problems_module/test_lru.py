@@ -0,0 +1,63 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import unittest
+
+from helpful_modules.problems_module.cache.lru import LRUCache
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_lru_and_ttl(self):
+        now = [0.0]
+        cache = LRUCache(max_size=2, ttl=10, timer=lambda: now[0])
+        cache.put(1, "a")
+        cache.put(2, "b")
+        self.assertEqual(cache.get(1), "a")  # 2 is now the least recently used
+        cache.put(3, "c")
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.evictions, 1)
+        now[0] = 10
+        self.assertIsNone(cache.get(1))  # Expired
+        self.assertEqual(len(cache), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertAlmostEqual(cache.hit_rate, 1 / 3)
+
+    def test_put_after_invalidate_is_skipped(self):
+        cache = LRUCache(max_size=2, ttl=None)
+        generation = cache.generation(1)
+        cache.invalidate(1)  # Written while 1 was being read
+        cache.put(1, "old", generation)
+        self.assertNotIn(1, cache)
+        cache.put(1, "new", cache.generation(1))
+        self.assertEqual(cache.get(1), "new")
+
+        generation = cache.generation(1)
+        cache.clear()
+        cache.put(1, "old", generation)
+        self.assertNotIn(1, cache)
+
+        # Only the generations of the last max_size invalidated keys are kept, but forgetting one still changes it
+        generation = cache.generation(1)
+        for key in (1, 2, 3):
+            cache.invalidate(key)
+        cache.put(1, "old", generation)
+        self.assertNotIn(1, cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import os
+import tempfile
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import MathProblemCache, Q
+from helpful_modules.problems_module.cache.memory_budget import MemoryBudget
+from helpful_modules.problems_module.codec import encode_ids, encode_json
+
+
+class TestMemoryBudget(unittest.TestCase):
+    def test_least_recently_used_guilds_are_evicted_first(self):
+        budget = MemoryBudget(max_bytes=250)
+        budget.charge(1, 100)
+        budget.charge(2, 100)
+        budget.charge(3, 100)
+        self.assertEqual(budget.guilds_to_evict(), [1])
+        budget.touch(1)
+        self.assertEqual(budget.guilds_to_evict(), [2])
+        self.assertEqual(budget.guilds_to_evict(keep=(2,)), [3])
+        budget.set_other("quizzes", 100)
+        self.assertEqual(budget.guilds_to_evict(), [2, 3])
+        budget.evicted(2)
+        self.assertEqual((budget.usage, budget.evictions, budget.evicted_bytes), (300, 1, 100))
+
+    def test_no_limit(self):
+        budget = MemoryBudget(max_bytes=None)
+        budget.charge(None, 10**12)
+        self.assertEqual(budget.guilds_to_evict(), [])
+
+
+class TestCacheMemoryBudget(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache = MathProblemCache(
+            mysql_username="",
+            mysql_password="",
+            mysql_db_ip="",
+            mysql_db_name="",
+            use_sqlite=True,
+            db_name=os.path.join(self.tempdir.name, "test.db"),
+            update_cache_by_default_when_requesting=False,
+            use_cached_problems=True,
+        )
+
+    async def asyncSetUp(self):
+        await self.cache.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    async def test_evicted_guilds_are_loaded_again(self):
+        async with self.cache._sqlite_pool.writer() as conn:
+            await conn.executemany(
+                "INSERT INTO problems (guild_id, problem_id, question, answers, voters, solvers, author, extra_stuff) "
+                "VALUES (?,?,?,?,?,?,?,?)",
+                [
+                    (f"guild {i % 3}", i, f"{i}+{i}?", encode_json([str(2 * i)]), encode_ids([]), encode_ids([]), 5,
+                     "{'type': 'BaseProblem'}")
+                    for i in range(30)
+                ],
+            )
+        await self.cache.cache_all_problems()
+        one_guild = self.cache.memory_budget.guild_usage("guild 0")
+        self.assertGreater(one_guild, 0)
+        # Only 2 guilds fit
+        self.cache.memory_budget.max_bytes = self.cache.memory_budget.usage - one_guild // 2
+        await self.cache.get_problems_by_func(Q(guild_id="guild 1"))
+        await self.cache.get_problems_by_func(Q(guild_id="guild 2"))
+        self.cache._evict_guilds_over_budget()
+        self.assertEqual(set(self.cache.guild_problems.keys()), {"guild 1", "guild 2"})
+        self.assertEqual(self.cache.memory_budget.evictions, 1)
+        self.assertNotIn(0, self.cache.problem_index)
+
+        # Every problem is still found
+        self.assertEqual(len(await self.cache.get_problems_by_func(Q(author=5))), 30)
+        self.assertEqual(len(await self.cache.get_problems_by_func(lambda problem: problem.author == 5)), 30)
+
+        self.assertEqual(len(await self.cache.get_problems_by_func(Q(guild_id="guild 0"))), 10)  # Loaded again...
+        self.assertNotIn("guild 1", self.cache.guild_problems)  # ... and the least recently used guild is evicted
+        self.assertIn(0, self.cache.problem_index)
+        self.assertLessEqual(self.cache.memory_budget.usage, self.cache.memory_budget.max_bytes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import asyncio
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import MathProblemCache
+from helpful_modules.problems_module.cache.migrations import (
+    SCHEMA_VERSION,
+    get_schema_version,
+    run_migrations,
+)
+from helpful_modules.problems_module.codec import decode, is_legacy
+
+
+def make_cache(db_name: str) -> MathProblemCache:
+    return MathProblemCache(
+        mysql_username="",
+        mysql_password="",
+        mysql_db_ip="",
+        mysql_db_name="",
+        use_sqlite=True,
+        db_name=db_name,
+        update_cache_by_default_when_requesting=False,
+    )
+
+
+def make_old_database(db_name: str):
+    """Make a database like the ones made by old versions of the bot (no extra_stuff, no indexes, duplicates)"""
+    conn = sqlite3.connect(db_name)
+    conn.execute(
+        """CREATE TABLE problems (guild_id INT, problem_id INT, question TEXT(2000) NOT NULL,
+        answers BLOB NOT NULL, author INT NOT NULL, voters BLOB NOT NULL, solvers BLOB NOT NULL)"""
+    )
+    conn.execute("CREATE TABLE user_data (USER_ID INT, trusted INT NOT NULL, blacklisted INT NOT NULL)")
+    conn.executemany(
+        "INSERT INTO problems VALUES (?,?,?,?,?,?,?)",
+        [
+            (None, 1, "1+1?", pickle.dumps(["2"]), 5, pickle.dumps([1, 2]), pickle.dumps([3])),
+            (None, 1, "1+1?", pickle.dumps(["2"]), 5, pickle.dumps([]), pickle.dumps([])),
+            (None, 2, "2+2?", pickle.dumps(["4"]), 6, pickle.dumps([]), pickle.dumps([4])),
+        ],
+    )
+    conn.executemany("INSERT INTO user_data VALUES (?,?,?)", [(7, 0, 0), (7, 1, 0)])
+    conn.commit()
+    conn.close()
+
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tempdir.name, "test.db")
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def indexes(self):
+        conn = sqlite3.connect(self.db_name)
+        names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        conn.close()
+        return names
+
+    def test_old_database_is_migrated_once(self):
+        make_old_database(self.db_name)
+        cache = make_cache(self.db_name)
+        self.assertEqual(self.indexes(), set())  # Nothing is done before start()
+
+        async def check():
+            try:
+                await cache.start()
+                self.assertEqual(await get_schema_version(cache), SCHEMA_VERSION)
+                self.assertEqual(await run_migrations(cache), 0)  # Nothing left to do
+                await cache.initialize_sql_table()
+                self.assertEqual(await get_schema_version(cache), SCHEMA_VERSION)
+
+                problem = await cache.get_problem(None, 1)  # Used to raise TooManyProblems
+                self.assertEqual(problem.get_extra_stuff(), {"type": "BaseProblem"})
+                self.assertEqual(await cache.get_num_votes(1), 2)
+                self.assertEqual(await cache.get_num_solves(2), 1)
+                self.assertTrue((await cache.get_user_data(7)).trusted)  # The newest row is kept
+            finally:
+                await cache.close()
+
+        with self.assertLogs("helpful_modules.problems_module.cache.migrations", "WARNING") as logs:
+            asyncio.run(check())
+        self.assertEqual(sum("has more than 1 row" in line for line in logs.output), 4)
+        conn = sqlite3.connect(self.db_name)
+        self.assertEqual(
+            {row[0] for row in conn.execute("SELECT extra_stuff FROM problems")}, {'{"type":"BaseProblem"}'}
+        )  # JSON instead of the repr of a dict
+        for answers, in conn.execute("SELECT answers FROM problems"):
+            self.assertFalse(is_legacy(answers))  # The pickles were re-encoded
+            self.assertIn(decode(answers), (["2"], ["4"]))
+        # Every row that had a duplicate was backed up before the duplicates were deleted
+        self.assertEqual(
+            sorted(conn.execute("SELECT user_id, trusted FROM user_data_duplicates")), [(7, 0), (7, 1)]
+        )
+        self.assertEqual([row[0] for row in conn.execute("SELECT problem_id FROM problems_duplicates")], [1, 1])
+        conn.close()
+        self.assertTrue(
+            {
+                "problems_problem_id_unique",
+                "user_data_user_id_unique",
+                "quiz_submission_sessions_special_id_unique",
+                "problems_guild_id",
+                "problems_author",
+                "quizzes_quiz_id",
+                "quiz_submissions_quiz_id_user_id",
+            }.issubset(self.indexes())
+        )
+
+    def test_existing_database_file(self):
+        shutil.copy(
+            os.path.join(os.path.dirname(__file__), "..", "..", "..", "MathProblemCache1.db"), self.db_name
+        )
+
+        async def check(cache):
+            try:
+                await cache.start()
+                self.assertEqual(await get_schema_version(cache), SCHEMA_VERSION)
+            finally:
+                await cache.close()
+
+        for _ in range(2):
+            asyncio.run(check(make_cache(self.db_name)))
+
+if __name__ == "__main__":
+    unittest.main()
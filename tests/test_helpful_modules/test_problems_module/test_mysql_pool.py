@@ -0,0 +1,90 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import contextlib
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import MathProblemCache
+from helpful_modules.problems_module.cache.migrations import SCHEMA_VERSION
+
+
+def make_fake_pool():
+    """Make something that looks like an aiomysql pool (but has no server behind it)"""
+    cursor = AsyncMock()
+    cursor.fetchone.return_value = {"version": SCHEMA_VERSION}  # Don't run the migrations
+    cursor.fetchall.return_value = []
+    connection = MagicMock()
+    connection.cursor = AsyncMock(return_value=cursor)
+    connection.commit = AsyncMock()
+    connection.rollback = AsyncMock()
+
+    @contextlib.asynccontextmanager
+    async def acquire():
+        yield connection
+
+    pool = MagicMock()
+    pool.acquire = acquire
+    pool.wait_closed = AsyncMock()
+    return pool, connection
+
+
+class TestMySQLConnectionPool(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.pool, self.connection = make_fake_pool()
+        self.create_pool = AsyncMock(return_value=self.pool)
+        with patch("aiomysql.create_pool", self.create_pool):
+            self.cache = MathProblemCache(
+                mysql_username="user",
+                mysql_password="password",
+                mysql_db_ip="localhost",
+                mysql_db_name="db",
+                use_sqlite=False,
+            )
+
+    async def asyncSetUp(self):
+        with patch("aiomysql.create_pool", self.create_pool):
+            await self.cache.start()
+
+    async def test_pool_is_created_once_and_closed(self):
+        with patch("aiomysql.create_pool", self.create_pool):
+            for _ in range(3):
+                async with self.cache.get_a_connection():
+                    pass
+            await self.cache.close()
+        self.assertEqual(self.create_pool.await_count, 1)  # By start(), and it is kept afterwards
+        self.pool.close.assert_called()
+        self.pool.wait_closed.assert_awaited()
+
+    async def test_commits_on_success_and_rolls_back_on_error(self):
+        with patch("aiomysql.create_pool", self.create_pool):
+            self.connection.commit.reset_mock()
+            async with self.cache.get_a_connection():
+                pass
+            self.connection.commit.assert_awaited_once()
+            with self.assertRaises(ValueError):
+                async with self.cache.get_a_connection():
+                    raise ValueError
+            self.connection.rollback.assert_awaited_once()
+            await self.cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
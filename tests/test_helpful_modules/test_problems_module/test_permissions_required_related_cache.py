@@ -0,0 +1,62 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import os
+import tempfile
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import MathProblemCache, UserData
+
+
+class TestPermissionsRequired(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache = MathProblemCache(
+            mysql_username="",
+            mysql_password="",
+            mysql_db_ip="",
+            mysql_db_name="",
+            use_sqlite=True,
+            db_name=os.path.join(self.tempdir.name, "test.db"),
+            update_cache_by_default_when_requesting=False,
+        )
+
+    async def asyncSetUp(self):
+        await self.cache.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    async def test_permissions_with_user_data(self):
+        lru = self.cache.user_data_lru
+        user_data = UserData(user_id=7, trusted=True, blacklisted=False)
+        meets = self.cache.user_meets_permissions_required_to_use_command
+        self.assertTrue(await meets(7, {"trusted": True, "not_a_privilege": True}, user_data=user_data))  # Ignored
+        self.assertFalse(await meets(7, {"blacklisted": True}, user_data=user_data))
+        self.assertEqual((lru.hits, lru.misses), (0, 0))  # It wasn't looked up
+        self.assertFalse(await meets(7, {"trusted": True}))  # Without it, it is (and 7 has no row)
+        self.assertEqual(lru.misses, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
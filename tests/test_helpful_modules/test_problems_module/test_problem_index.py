@@ -0,0 +1,114 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import os
+import tempfile
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import BaseProblem, MathProblemCache, Q
+from helpful_modules.problems_module.cache.problem_index import AUTHOR, SOLVERS, VOTERS, ProblemIndex
+
+
+class TestProblemIndex(unittest.TestCase):
+    def test_add_and_remove(self):
+        index = ProblemIndex()
+        problem = BaseProblem(question="1+1?", answer="2", id=1, author=5, voters=[6], solvers=[6, 7])
+        index.add(problem)
+        self.assertEqual(index.get(AUTHOR, 5), [problem])
+        self.assertEqual(index.get(VOTERS, 6), [problem])
+        self.assertEqual(index.get(SOLVERS, 7), [problem])
+        self.assertEqual(index.get(VOTERS, 7), [])
+
+        index.add(BaseProblem(question="1+1?", answer="2", id=1, author=8))  # Replaces the problem
+        self.assertEqual(index.get(AUTHOR, 5), [])
+        self.assertEqual(index.get(SOLVERS, 6), [])
+        self.assertEqual(len(index.get(AUTHOR, 8)), 1)
+
+        index.remove(1)
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.get(AUTHOR, 8), [])
+
+
+class TestCachedProblemIndex(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache = MathProblemCache(
+            mysql_username="",
+            mysql_password="",
+            mysql_db_ip="",
+            mysql_db_name="",
+            use_sqlite=True,
+            db_name=os.path.join(self.tempdir.name, "test.db"),
+            update_cache_by_default_when_requesting=False,
+            use_cached_problems=True,
+        )
+
+    async def asyncSetUp(self):
+        await self.cache.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    async def test_index_follows_the_cache(self):
+        await self.cache.add_problems(
+            [
+                BaseProblem(question=f"{i}+{i}?", answer=str(2 * i), id=i, author=i % 3, voters=[10] if i % 2 else [])
+                for i in range(1, 11)
+            ]
+        )
+        await self.cache.update_cache()
+        self.assertEqual(
+            sorted(problem.id for problem in await self.cache.get_problems_by_func(Q(voter_contains=10))), [1, 3, 5, 7, 9]
+        )
+        await self.cache.add_solve(4, 20)
+        await self.cache.remove_vote(3, 10)
+        self.assertEqual([problem.id for problem in await self.cache.get_problems_by_func(Q(solver_contains=20))], [4])
+        self.assertEqual(len(await self.cache.get_problems_by_func(Q(voter_contains=10))), 4)
+
+        await self.cache.delete_all_votes_by_user_id(10)
+        self.assertEqual(await self.cache.get_problems_by_func(Q(voter_contains=10)), [])
+        self.assertTrue(all(10 not in problem.voters for problem in self.cache.problem_index.by_id.values()))
+
+        await self.cache.remove_problem(None, 4)
+        self.assertEqual(await self.cache.get_problems_by_func(Q(solver_contains=20)), [])
+        self.assertEqual(sorted(problem.id for problem in await self.cache.get_problems_by_func(Q(author=1))), [1, 7, 10])
+        await self.cache.update_cache()  # Applying the change log gives the same result
+        self.assertEqual(sorted(self.cache.problem_index.by_id.keys()), [1, 2, 3, 5, 6, 7, 8, 9, 10])
+        self.assertEqual(
+            sorted(problem.id for problem in await self.cache.get_problems_by_func(Q(author=2) & Q(id_in=[2, 8]))), [2, 8]
+        )
+
+    async def test_full_reload_swaps_in_new_problems(self):
+        await self.cache.add_problems([BaseProblem(question="1+1?", answer="2", id=1, author=5)])
+        await self.cache.full_resync()
+        old = await self.cache.get_global_problems()
+        with self.assertRaises(TypeError):
+            old[2] = old[1]  # Read-only
+        self.assertIs(old[1]._cache, self.cache.handle)  # Every problem shares the same reference to the cache
+        await self.cache.full_resync()
+        new = await self.cache.get_global_problems()
+        self.assertIsNot(new[1], old[1])
+        self.assertIs(self.cache.problem_index.by_id[1], new[1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import os
+import tempfile
+import types
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import BaseProblem, MathProblemCache
+
+
+class TestProblemsPage(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache = MathProblemCache(
+            mysql_username="",
+            mysql_password="",
+            mysql_db_ip="",
+            mysql_db_name="",
+            use_sqlite=True,
+            db_name=os.path.join(self.tempdir.name, "test.db"),
+            update_cache_by_default_when_requesting=False,
+        )
+
+    async def asyncSetUp(self):
+        await self.cache.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    async def test_pages(self):
+        await self.cache.add_problems(
+            [
+                BaseProblem(question=f"{i}+{i}?", answer=str(2 * i), id=i, author=5, solvers=[7] if i % 3 == 0 else [])
+                for i in range(10, 0, -1)
+            ]
+        )
+        ids = []
+        after = None
+        while True:
+            page = await self.cache.get_problems_page(None, after, limit=4)
+            if not page:
+                break
+            self.assertLessEqual(len(page), 4)
+            ids.extend(problem.id for problem in page)
+            after = page[-1].id
+        self.assertEqual(ids, list(range(1, 11)))
+
+        page = await self.cache.get_problems_page(None, 2, limit=3, exclude_solved_by=7)
+        self.assertEqual([problem.id for problem in page], [4, 5, 7])
+        self.assertEqual(page[0].solvers, [])
+        self.assertEqual(await self.cache.get_problems_page(12345, None), [])
+        with self.assertRaises(ValueError):
+            await self.cache.get_problems_page(None, None, limit=0)
+
+    async def test_guild_pages(self):
+        guild_id = 123456789012345678
+        await self.cache.add_problems(
+            [
+                BaseProblem(
+                    question=f"{i}+{i}?",
+                    answer=str(2 * i),
+                    id=i,
+                    author=5,
+                    guild_id=guild_id if i % 2 == 0 else None,
+                    solvers=[7] if i == 4 else [],
+                )
+                for i in range(1, 11)
+            ]
+        )
+        ids = []
+        after = None
+        while True:
+            page = await self.cache.get_problems_page(guild_id, after, limit=2)
+            if not page:
+                break
+            self.assertTrue(all(problem.guild_id == guild_id for problem in page))
+            ids.extend(problem.id for problem in page)
+            after = page[-1].id
+        self.assertEqual(ids, [2, 4, 6, 8, 10])
+
+        page = await self.cache.get_problems_page(guild_id, None, limit=2, exclude_solved_by=7)
+        self.assertEqual([problem.id for problem in page], [2, 6])
+        self.assertEqual([problem.id for problem in await self.cache.get_problems_page(None, 7)], [9])
+
+    async def test_fetching_a_guild_with_exactly_one_page_of_problems(self):
+        from cogs.problems_cog import ProblemsCog
+
+        guild_id = 123456789012345678
+        await self.cache.add_problems(
+            [BaseProblem(question=f"{i}+{i}?", answer=str(2 * i), id=i, author=5, guild_id=guild_id) for i in range(1, 4)]
+        )
+        cog = types.SimpleNamespace(cache=self.cache)
+
+        def render(problems):
+            return ",".join(str(problem.id) for problem in problems)
+
+        text, next_key = await ProblemsCog._fetch_problems_page(cog, [guild_id], None, 3, render)
+        self.assertEqual(text, "1,2,3")
+        self.assertIsNone(next_key)  # There isn't an empty page after it
+        text, next_key = await ProblemsCog._fetch_problems_page(cog, [guild_id], None, 2, render)
+        self.assertEqual((text, next_key), ("1,2", (0, 2)))
+        text, next_key = await ProblemsCog._fetch_problems_page(cog, [guild_id], next_key, 2, render)
+        self.assertEqual((text, next_key), ("3", None))
+        text, next_key = await ProblemsCog._fetch_problems_page(cog, [guild_id, None], None, 3, render)
+        self.assertEqual((text, next_key), ("1,2,3", (1, None)))  # The global problems come next
+
+
+if __name__ == "__main__":
+    unittest.main()
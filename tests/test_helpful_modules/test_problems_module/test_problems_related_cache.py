@@ -0,0 +1,120 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import os
+import tempfile
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import BaseProblem, MathProblemCache
+from helpful_modules.problems_module.computational_problem import ComputationalProblem
+from helpful_modules.problems_module.linear_algebra_problem import LinearAlgebraProblem
+
+
+class TestProblemLRU(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache = MathProblemCache(
+            mysql_username="",
+            mysql_password="",
+            mysql_db_ip="",
+            mysql_db_name="",
+            use_sqlite=True,
+            db_name=os.path.join(self.tempdir.name, "test.db"),
+            update_cache_by_default_when_requesting=False,
+        )
+
+    async def asyncSetUp(self):
+        await self.cache.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    async def test_check_answer_reads_the_database_once(self):
+        await self.cache.add_problem(1, BaseProblem(question="1+1?", answer="2", id=1, author=5))
+        lru = self.cache.problem_lru
+        lru.hits = lru.misses = 0
+        await self.cache.get_problem(None, 1)
+        self.assertEqual((lru.hits, lru.misses), (0, 1))
+        self.assertTrue(await self.cache.add_solve(1, 7))  # What /check_answer does when the answer is right
+        self.assertEqual((await self.cache.get_problem(None, 1)).solvers, [7])
+        self.assertTrue(await self.cache.remove_solve(1, 7))
+        self.assertEqual((await self.cache.get_problem(None, 1)).solvers, [])
+        self.assertEqual((lru.hits, lru.misses), (2, 1))
+
+        # What get_problem returns is a copy: changing it doesn't change the cached problem
+        problem = await self.cache.get_problem(None, 1)
+        problem.question = "changed"
+        problem.voters.append(8)
+        self.assertEqual((await self.cache.get_problem(None, 1)).question, "1+1?")
+        self.assertEqual((await self.cache.get_problem(None, 1)).voters, [])
+        (await self.cache.get_problems([1]))[1].solvers.append(9)
+        self.assertEqual((await self.cache.get_problem(None, 1)).solvers, [])
+
+        await self.cache.update_problem(1, BaseProblem(question="1+2?", answer="3", id=1, author=5))
+        self.assertEqual((await self.cache.get_problem(None, 1)).question, "1+2?")
+        await self.cache.remove_problem(None, 1)
+        self.assertNotIn(1, lru)
+
+    async def test_guild_problems_are_loaded(self):
+        await self.cache.add_problems(
+            [
+                BaseProblem(question="1+1?", answer="2", id=problem_id, author=5, guild_id=guild_id)
+                for problem_id, guild_id in ((1, 3), (2, None))
+            ]
+        )
+        problem = await self.cache.get_problem(3, 1)  # Read from the database
+        self.assertEqual(problem.guild_id, 3)
+        await self.cache.cache_all_problems()
+        self.assertEqual(list((await self.cache.get_problems_by_guild_id(3)).keys()), [1])
+
+    async def test_copies_of_subclasses_keep_the_cache(self):
+        await self.cache.add_problems(
+            [
+                ComputationalProblem(question="1/3?", answer="0.333", id=1, author=5, tolerance=0.01),
+                LinearAlgebraProblem(
+                    question="x=1?", answer="1", id=2, author=5, coeffs=[[1]], equal_to=[1]
+                ),
+            ]
+        )
+        for problem_id, problem_type in ((1, ComputationalProblem), (2, LinearAlgebraProblem)):
+            for _ in range(2):  # A miss, then a hit
+                problem = await self.cache.get_problem(None, problem_id)
+                self.assertIsInstance(problem, problem_type)
+                self.assertIs(problem._cache, self.cache.handle)
+            problem = (await self.cache.get_problems([problem_id]))[problem_id]
+            self.assertIs(problem._cache, self.cache.handle)
+
+    async def test_get_problems(self):
+        await self.cache.add_problems(
+            [BaseProblem(question=f"{i}+{i}?", answers=[str(2 * i)], id=i, author=5) for i in range(1, 4)]
+        )
+        await self.cache.add_solve(2, 7)
+        await self.cache.get_problem(None, 3)
+        problems = await self.cache.get_problems([3, 2, 10, 2])
+        self.assertEqual(list(problems.keys()), [3, 2])  # In order, without the problem that doesn't exist
+        self.assertEqual(problems[2].solvers, [7])
+        self.assertIn(2, self.cache.problem_lru)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import os
+import tempfile
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import BaseProblem, MathProblemCache, Q
+from helpful_modules.problems_module.errors import MathProblemsModuleException
+from helpful_modules.problems_module.query import QUIZ_FIELDS
+
+
+class TestQ(unittest.TestCase):
+    def test_to_sql(self):
+        self.assertEqual(Q(author=5).to_sql(), ("author = ?", [5]))
+        self.assertEqual(Q(guild_id=None).to_sql("%s"), ("guild_id IS NULL", []))
+        self.assertEqual(
+            (Q(author=5) | Q(solver_contains=6) & Q(guild_id=7)).to_sql(),
+            (
+                "(author = ?) OR ((problem_id IN (SELECT problem_id FROM problem_solves WHERE user_id = ?)) AND (guild_id = ?))",
+                [5, 6, 7],
+            ),
+        )
+        self.assertEqual((~Q(id_in=[1, 2])).to_sql("%s"), ("NOT (problem_id IN (%s,%s))", [1, 2]))
+        self.assertEqual(Q(author=5).to_sql(fields=QUIZ_FIELDS), ("author = ?", [5]))
+        with self.assertRaises(MathProblemsModuleException):
+            Q(answer="2").to_sql()
+
+    def test_matches(self):
+        problem = BaseProblem(question="1+1?", answer="2", id=1, author=5, voters=[7], solvers=[8])
+        self.assertTrue(Q(author=5, voter_contains=7).matches(problem))
+        self.assertFalse(Q(author=5, solver_contains=7).matches(problem))
+        self.assertTrue((Q(author=6) | Q(solver_contains=8)).matches(problem))
+        self.assertTrue((~Q(id=2))(problem))
+
+    def test_lookup(self):
+        self.assertEqual((Q(guild_id=3) & (Q(author=5) | Q(author=6))).lookup(), ("guild_id", 3))
+        self.assertIsNone((Q(guild_id=3) | Q(author=5)).lookup())
+        self.assertIsNone((~Q(guild_id=3)).lookup())
+
+
+class TestGetProblemsByQ(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache = MathProblemCache(
+            mysql_username="",
+            mysql_password="",
+            mysql_db_ip="",
+            mysql_db_name="",
+            use_sqlite=True,
+            db_name=os.path.join(self.tempdir.name, "test.db"),
+            update_cache_by_default_when_requesting=False,
+        )
+
+    async def asyncSetUp(self):
+        await self.cache.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    async def test_the_database_filters(self):
+        await self.cache.add_problems(
+            [
+                BaseProblem(question="1+1?", answer="2", id=1, author=5, voters=[7], solvers=[8]),
+                BaseProblem(question="2+2?", answer="4", id=2, author=6, voters=[], solvers=[7]),
+                BaseProblem(question="3+3?", answer="6", id=3, author=7, voters=[8], solvers=[]),
+            ]
+        )
+        for q in (Q(voter_contains=7) | Q(solver_contains=7), Q(author=5) | ~Q(id_in=[1, 2, 3]), Q(id=4)):
+            found = await self.cache.get_problems_by_func(q)
+            expected = await self.cache.get_problems_by_func(q.matches, replace_cache=True)  # The slow path
+            self.assertCountEqual([problem.id for problem in found], [problem.id for problem in expected])
+        (problem,) = await self.cache.get_problems_by_func(Q(voter_contains=8))
+        self.assertEqual((problem.id, problem.voters), (3, [8]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import QuizSolvingSession
+from helpful_modules.problems_module.codec import encode_json
+
+
+class QuizzesByIdCache:
+    """Something that has get_quizzes, and counts the calls"""
+
+    def __init__(self, quizzes):
+        self.quizzes = quizzes
+        self.calls = []
+
+    async def get_quizzes(self, quiz_ids):
+        self.calls.append(set(quiz_ids))
+        return {quiz_id: self.quizzes[quiz_id] for quiz_id in quiz_ids if quiz_id in self.quizzes}
+
+
+def make_row(special_id: int, quiz_id: int) -> dict:
+    return {
+        "user_id": 5,
+        "quiz_id": quiz_id,
+        "guild_id": None,
+        "is_finished": 1,
+        "answers": encode_json([]),
+        "start_time": 100,
+        "expire_time": 200,
+        "special_id": special_id,
+        "attempt_num": 1,
+    }
+
+
+class TestQuizSolvingSession(unittest.IsolatedAsyncioTestCase):
+    async def test_quizzes_are_loaded_together(self):
+        cache = QuizzesByIdCache({1: "quiz 1", 2: "quiz 2"})
+        rows = [make_row(special_id, quiz_id) for special_id, quiz_id in enumerate([1, 2, 1, 3])]
+        sessions = await QuizSolvingSession.from_rows(rows, cache=cache)
+        self.assertEqual(cache.calls, [{1, 2, 3}])
+        self.assertEqual([session._quiz for session in sessions], ["quiz 1", "quiz 2", "quiz 1", None])
+        self.assertEqual([session.special_id for session in sessions], [0, 1, 2, 3])
+        self.assertTrue(sessions[0].is_final)
+        self.assertEqual(sessions[0].answers, [])
+
+    async def test_no_rows(self):
+        cache = QuizzesByIdCache({})
+        self.assertEqual(await QuizSolvingSession.from_rows([], cache=cache), [])
+        self.assertEqual(cache.calls, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
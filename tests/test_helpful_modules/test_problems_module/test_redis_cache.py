@@ -0,0 +1,339 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import asyncio
+import unittest
+import unittest.mock
+
+import disnake.ext.commands  # noqa: F401
+import fakeredis
+import orjson
+
+from helpful_modules.problems_module import (
+    BaseProblem,
+    ProblemNotFoundException,
+    Q,
+    RedisCache,
+    RedisClusterNotSupportedException,
+    ThingNotFound,
+    UserData,
+    WriteConflictException,
+)
+from helpful_modules.problems_module.GuildData import GuildData
+from helpful_modules.problems_module.cache_rewrite_with_redis.rediscache import (
+    BLACKLISTED_GUILD_IDS_BUILT,
+    GUILD_DATA,
+    PROBLEMS,
+    USER_DATA,
+    USER_THINGS_INDEX_BUILT,
+    author_problems_key,
+    guild_problems_key,
+    user_things_key,
+)
+from helpful_modules.problems_module.codec import HEADER_JSON, HEADER_MSGPACK, msgpack
+
+NUM_PROBLEMS = 100_000
+NUM_GUILDS = 1000
+
+
+def make_cache(value_codec: str = "json") -> RedisCache:
+    cache = RedisCache("redis://localhost", password="", value_codec=value_codec)
+    cache.redis = fakeredis.aioredis.FakeRedis()
+    return cache
+
+
+def make_problem(problem_id: int) -> BaseProblem:
+    return BaseProblem(
+        question=f"{problem_id}+1?",
+        answers=[str(problem_id + 1)],
+        id=problem_id,
+        guild_id=str(problem_id % NUM_GUILDS),
+        author=problem_id % 7,
+    )
+
+
+class TestRedisCacheIndexes(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache = make_cache()
+        await self.cache.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    async def test_indexes_follow_the_problems(self):
+        await self.cache.add_problems([make_problem(i) for i in range(10)])
+        await self.cache.add_vote(3, 42)
+        problem = await self.cache.get_problem(3, 3)
+        self.assertEqual((problem.question, problem.answers, problem.voters.to_list()), ("3+1?", ["4"], [42]))
+
+        moved = make_problem(3)
+        moved.guild_id, moved.author = "4", 100
+        await self.cache.update_problem(3, moved)
+        self.assertEqual([problem.id for problem in await self.cache.get_all_problems_by_guild(4)], [3, 4])
+        self.assertEqual(await self.cache.redis.zrange(guild_problems_key(3), 0, -1), [])
+        self.assertEqual([problem.id for problem in await self.cache.get_all_problems_by_author(100)], [3])
+        self.assertFalse(await self.cache.redis.sismember(author_problems_key(3), 3))
+
+        await self.cache.remove_problem(3, 4)
+        self.assertEqual([problem.id for problem in await self.cache.get_all_problems_by_func(Q(guild_id="4"))], [4])
+        self.assertEqual(await self.cache.get_all_problems_by_author(100), [])
+        self.assertEqual(await self.cache.get_num_votes(3), 0)
+        self.assertEqual(len(await self.cache.get_all_problems()), 9)
+        self.assertEqual(len(await self.cache.get_all_things()), 9)
+
+    async def test_get_problem_returns_copies(self):
+        await self.cache.add_problems([make_problem(3)])
+        for _ in range(2):  # A miss, then a hit
+            problem = await self.cache.get_problem(3, 3)
+            problem.question = "changed"
+            problem.voters.append(8)
+        problem = await self.cache.get_problem(3, 3)
+        self.assertEqual((problem.question, problem.voters.to_list()), ("3+1?", []))
+
+    async def test_multi_get(self):
+        await self.cache.add_problems([make_problem(i) for i in range(0, 5000, NUM_GUILDS)])
+        await self.cache.add_solve(2000, 7)
+        problems = await self.cache.get_problems([3000, 2000, 1])
+        self.assertEqual(list(problems.keys()), [3000, 2000])
+        self.assertEqual(problems[2000].solvers, [7])
+        page = await self.cache.get_problems_page(0, after_problem_id=0, limit=2, exclude_solved_by=7)
+        self.assertEqual([problem.id for problem in page], [1000, 3000])
+
+        await self.cache.add_user_data(UserData(user_id=7, trusted=True, blacklisted=False))
+        user_data = await self.cache.get_user_data_many([7, 8])
+        self.assertEqual(list(user_data.keys()), [7])
+        self.assertTrue(user_data[7].trusted)
+        self.assertEqual(await self.cache.get_guild_data_many([1, 2]), {})
+
+    async def test_a_write_during_a_read_is_not_undone(self):
+        await self.cache.add_user_data(UserData(user_id=7, trusted=False, blacklisted=False))
+        read = self.cache.get_key
+        release = asyncio.Event()
+
+        async def slow_read(*args):
+            value = await read(*args)
+            await release.wait()  # The user is blacklisted after this read it
+            return value
+
+        self.cache.get_key = slow_read
+        reading = asyncio.create_task(self.cache.get_user_data(7))
+        await asyncio.sleep(0.05)
+        await self.cache.add_user_data(UserData(user_id=7, trusted=False, blacklisted=True))
+        release.set()
+        self.assertFalse((await reading).blacklisted)
+        self.assertTrue((await self.cache.get_user_data(7)).blacklisted)
+
+    async def test_everything_of_a_user_is_deleted(self):
+        await self.cache.add_problems([make_problem(i) for i in range(10)])  # 0 and 7 are made by user 0
+        await self.cache.add_user_data(UserData(user_id=0, trusted=True, blacklisted=False))
+        await self.cache.add_quiz_dict(1, {"id": 1, "authors": [0, 9]})
+        await self.cache.add_vote(3, 0)
+        await self.cache.add_solve(5, 0)
+        await self.cache.add_vote(7, 42)
+        await self.cache.add_solve(2, 42)
+        self.assertEqual(
+            await self.cache.get_all_by_user_id(0),
+            sorted(["Problems:0", "Problems:7", "UserData:0", "Quizzes:1", "ProblemVoters:3", "ProblemSolvers:5"]),
+        )
+
+        await self.cache.del_all_by_user_id(0)
+        self.assertEqual(await self.cache.get_all_by_user_id(0), [])
+        self.assertEqual(sorted(problem.id for problem in await self.cache.get_all_problems()), [1, 2, 3, 4, 5, 6, 8, 9])
+        self.assertEqual(await self.cache.get_all_problems_by_author(0), [])
+        self.assertEqual((await self.cache.get_num_votes(3), await self.cache.get_num_solves(5)), (0, 0))
+        self.assertEqual(await self.cache.get_all_by_user_id(42), ["ProblemSolvers:2"])  # Problem 7 was deleted
+        self.assertEqual(await self.cache.get_all_by_user_id(9), [])
+        with self.assertRaises(ThingNotFound):
+            await self.cache.get_user_data(0)
+
+    async def test_the_index_is_built_for_old_entries(self):
+        await self.cache.add_problems([make_problem(i) for i in range(3)])
+        await self.cache.add_vote(1, 42)
+        await self.cache.redis.delete(user_things_key(0), user_things_key(1), user_things_key(42), USER_THINGS_INDEX_BUILT)
+        await self.cache.start()
+        self.assertEqual(await self.cache.get_all_by_user_id(1), ["Problems:1"])
+        self.assertEqual(await self.cache.get_all_by_user_id(42), ["ProblemVoters:1"])
+
+    async def test_the_blacklisted_guilds_are_found_for_old_guild_data(self):
+        everyone = '{"blacklisted_users": [], "whitelisted_users": [], "roles_needed": [], "permissions_needed": []}'
+        for guild_id in (1, 2):
+            # Written without updating the set of blacklisted guilds, like before it existed
+            guild_data = GuildData(guild_id, guild_id == 2, everyone, everyone, everyone)
+            await self.cache.redis.hset(GUILD_DATA, guild_id, self.cache._encode(guild_data.to_dict(include_cache=False)))
+        self.assertFalse(await self.cache.is_guild_id_blacklisted(2))
+        await self.cache.redis.delete(BLACKLISTED_GUILD_IDS_BUILT)
+        await self.cache.start()
+        self.assertEqual(await self.cache.get_blacklisted_guild_ids(), {2})
+        self.assertTrue(await self.cache.is_guild_id_blacklisted(2))
+        self.assertFalse(await self.cache.is_guild_id_blacklisted(1))
+
+    async def test_concurrent_votes(self):
+        await self.cache.add_problems([make_problem(i) for i in range(3)])
+        problem = await self.cache.get_problem(1, 1)
+        results = await asyncio.gather(
+            *(self.cache.add_vote_and_count(problem, user_id, vote_threshold=10) for user_id in range(20)),
+            return_exceptions=True,
+        )
+        self.assertEqual([result.num_votes for result in results[:10]], list(range(1, 11)))
+        self.assertEqual([result.deleted for result in results[:9]], [False] * 9)
+        # The votes after the 10th one may have been counted before the problem was deleted,
+        # but it is only deleted once, and it doesn't exist anymore after that
+        votes = [result for result in results if not isinstance(result, ProblemNotFoundException)]
+        self.assertEqual(sorted(result.num_votes for result in votes), list(range(1, len(votes) + 1)))
+        self.assertEqual(sum(result.deleted for result in votes), 1)
+        with self.assertRaises(ProblemNotFoundException):
+            await self.cache.add_vote_and_count(problem, 100, vote_threshold=10)
+        self.assertEqual(await self.cache.get_all_problems_by_guild(1), [])
+        self.assertEqual(await self.cache.get_all_by_user_id(1), [])  # Its author
+        self.assertEqual(await self.cache.get_all_by_user_id(3), [])  # One of its voters
+
+        self.assertTrue(await self.cache.add_solve(2, 5))
+        self.assertFalse(await self.cache.add_solve(2, 5))
+        self.assertEqual(await self.cache.remove_vote_and_count(2, 5), (False, 0, False))
+
+        # If the problem isn't where the caller thinks it is, it is deleted from where it is
+        moved = make_problem(2)
+        moved.guild_id = "7"
+        self.assertEqual(await self.cache.add_vote_and_count(moved, 5, vote_threshold=1), (True, 1, True))
+        self.assertEqual(len(await self.cache.get_all_problems()), 1)
+        self.assertEqual(await self.cache.get_all_problems_by_guild(2), [])
+        self.assertEqual(await self.cache.get_all_by_user_id(5), [])
+
+    async def test_concurrent_writes(self):
+        await self.cache.add_problems([make_problem(i) for i in range(3)])
+        moves = []
+        for guild_id in range(10, 20):
+            moved = make_problem(1)
+            moved.guild_id = str(guild_id)
+            moves.append(moved)
+        await asyncio.gather(*(self.cache.update_problem(1, moved) for moved in moves))
+        guild_id = (await self.cache.get_problems([1]))[1].guild_id
+        # The problem is only in the index of the guild it was moved to last
+        self.assertEqual(
+            [guild for guild in range(1, 20) if await self.cache.redis.zscore(guild_problems_key(guild), 1) is not None],
+            [int(guild_id)],
+        )
+
+    async def test_writes_give_up_when_they_keep_conflicting(self):
+        await self.cache.add_problem(1, make_problem(1))
+        attempts = 0
+
+        async def conflicting_write(*args, **kwargs):
+            nonlocal attempts
+            attempts += 1
+            await self.cache.redis.hset(PROBLEMS, 1, f"changed {attempts}")  # Another writer, every time
+            return await real_script(*args, **kwargs)
+
+        real_script = self.cache._check_and_write_script
+        self.cache._check_and_write_script = conflicting_write
+        with unittest.mock.patch("asyncio.sleep") as sleep:
+            with self.assertRaises(WriteConflictException):
+                await self.cache.del_key(PROBLEMS, 1)
+        self.assertEqual(attempts, RedisCache.MAX_WRITE_ATTEMPTS)
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(delays), RedisCache.MAX_WRITE_ATTEMPTS - 1)
+        self.assertTrue(all(0 <= delay <= RedisCache.MAX_WRITE_BACKOFF for delay in delays))
+        self.assertIsNotNone(await self.cache.redis.hget(PROBLEMS, 1))  # Nothing was deleted
+
+    async def test_a_vote_is_retried_if_the_problem_moved(self):
+        await self.cache.add_problems([make_problem(1), make_problem(2)])
+        moved = make_problem(1)
+        moved.guild_id = "5"
+
+        async def move_then_vote(*args, **kwargs):
+            self.cache._add_vote_and_count_script = real_script
+            await self.cache.update_problem(1, moved)  # After the problem was read, before the vote
+            return await real_script(*args, **kwargs)
+
+        real_script = self.cache._add_vote_and_count_script
+        self.cache._add_vote_and_count_script = move_then_vote
+        with unittest.mock.patch("asyncio.sleep"):
+            self.assertEqual(
+                await self.cache.add_vote_and_count(make_problem(1), 3, vote_threshold=1), (True, 1, True)
+            )
+        # It was deleted from the index of the guild it was moved to
+        self.assertEqual(await self.cache.get_all_problems_by_guild(5), [])
+        self.assertEqual(await self.cache.get_all_by_user_id(3), [])
+
+    async def test_nothing_is_added_for_missing_problems(self):
+        with self.assertRaises(ProblemNotFoundException):
+            await self.cache.add_vote(5, 1)
+        with self.assertRaises(ProblemNotFoundException):
+            await self.cache.add_solve(5, 1)
+        self.assertEqual(
+            set(await self.cache.redis.keys("*")),
+            {USER_THINGS_INDEX_BUILT.encode(), BLACKLISTED_GUILD_IDS_BUILT.encode()},
+        )
+        self.assertFalse(await self.cache.remove_solve(5, 1))
+
+    async def test_clusters_are_refused(self):
+        cache = make_cache()
+        cache.redis.info = unittest.mock.AsyncMock(return_value={"cluster_enabled": 1})
+        with self.assertRaises(RedisClusterNotSupportedException):
+            await cache.start()
+        cache.redis.info = unittest.mock.AsyncMock(return_value={"cluster_enabled": 0})
+        await cache.start()
+
+    async def test_votes_without_start(self):
+        cache = make_cache()
+        cache.redis = self.cache.redis
+        await cache.add_problem(1, make_problem(1))
+        self.assertEqual(await cache.add_vote_and_count(make_problem(1), 5, vote_threshold=2), (True, 1, False))
+        self.assertTrue(await cache.add_solve(1, 5))
+
+    async def test_legacy_values(self):
+        user_data = UserData(user_id=7, trusted=True, blacklisted=False)
+        await self.cache.redis.hset(USER_DATA, 7, orjson.dumps(user_data.to_dict()))
+        await self.cache.redis.hset(USER_DATA, 8, str(UserData(user_id=8, trusted=False, blacklisted=True).to_dict()))
+        self.assertTrue((await self.cache.get_user_data(7)).trusted)
+        self.assertTrue((await self.cache.get_user_data(8)).blacklisted)
+
+        await self.cache.start(reencode_legacy_rows=True)
+        self.assertEqual(await self.cache.reencode_legacy_values(), 0)
+        for value in (await self.cache.redis.hgetall(USER_DATA)).values():
+            self.assertTrue(value.startswith(HEADER_JSON))
+        self.cache.user_data_lru.clear()
+        self.assertEqual(set((await self.cache.get_user_data_many([7, 8])).keys()), {7, 8})
+
+    @unittest.skipIf(msgpack is None, "msgpack isn't installed")
+    async def test_the_codec_can_be_changed(self):
+        await self.cache.add_problems([make_problem(i) for i in range(3)])
+        msgpack_cache = make_cache("msgpack")
+        msgpack_cache.redis = self.cache.redis
+        await msgpack_cache.start()
+        await msgpack_cache.add_problems([make_problem(i) for i in range(3, 6)])
+        self.assertTrue((await self.cache.redis.hget(PROBLEMS, 4)).startswith(HEADER_MSGPACK))
+        self.assertEqual(len(await msgpack_cache.get_all_problems()), 6)
+        self.assertEqual(len(await self.cache.get_all_problems()), 6)
+
+    async def test_many_problems(self):
+        await self.cache.add_problems(make_problem(i) for i in range(NUM_PROBLEMS))
+        self.assertEqual(await self.cache.redis.hlen(PROBLEMS), NUM_PROBLEMS)
+        guild_problems = await self.cache.get_all_problems_by_guild(5)
+        self.assertEqual(
+            [problem.id for problem in guild_problems], list(range(5, NUM_PROBLEMS, NUM_GUILDS))
+        )
+        self.assertTrue(all(problem.guild_id == "5" for problem in guild_problems))
+        author_problems = await self.cache.get_all_problems_by_func(Q(author=3) & Q(guild_id="10"))
+        self.assertEqual(
+            [problem.id for problem in author_problems], [i for i in range(10, NUM_PROBLEMS, NUM_GUILDS) if i % 7 == 3]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
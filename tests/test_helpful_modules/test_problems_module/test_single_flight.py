@@ -0,0 +1,132 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import BaseProblem, MathProblemCache
+from helpful_modules.problems_module.cache.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_calls_share_one_call(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+
+        results = await asyncio.gather(*(single_flight.run("load", load) for _ in range(5)))
+        self.assertEqual(results, [1] * 5)
+        self.assertEqual((single_flight.calls, single_flight.joined), (1, 4))
+        self.assertNotIn("load", single_flight)
+        self.assertEqual(await single_flight.run("load", load), 2)  # The next call runs it again
+
+    async def test_exceptions_are_given_to_every_caller(self):
+        single_flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError
+
+        results = await asyncio.gather(*(single_flight.run("fail", fail) for _ in range(3)), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+
+class TestCacheSingleFlight(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache = MathProblemCache(
+            mysql_username="",
+            mysql_password="",
+            mysql_db_ip="",
+            mysql_db_name="",
+            use_sqlite=True,
+            db_name=os.path.join(self.tempdir.name, "test.db"),
+            update_cache_by_default_when_requesting=False,
+        )
+        self.loads = 0
+        load_all_problems = self.cache._load_all_problems
+
+        async def counting_load_all_problems():
+            self.loads += 1
+            return await load_all_problems()
+
+        self.cache._load_all_problems = counting_load_all_problems
+
+    async def asyncSetUp(self):
+        await self.cache.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    async def test_concurrent_reloads_load_once(self):
+        await self.cache.add_problems([BaseProblem(question="1+1?", answer="2", id=1, author=5)])
+        await asyncio.gather(*(self.cache.cache_all_problems() for _ in range(5)))
+        self.assertEqual(self.loads, 1)
+        await asyncio.gather(*(self.cache.update_cache() for _ in range(5)))
+        self.assertEqual(self.loads, 1)  # cache_all_problems already moved the cache to the last change
+        self.assertEqual(list((await self.cache.get_global_problems()).keys()), [1])
+
+    async def test_different_reloads_run_one_at_a_time(self):
+        await self.cache.add_problems([BaseProblem(question="1+1?", answer="2", id=1, author=5)])
+        await asyncio.gather(self.cache.cache_all_problems(), self.cache.update_cache(), self.cache.full_resync())
+        self.assertEqual(self.loads, 1)
+        await self.cache.add_problems([BaseProblem(question="2+2?", answer="4", id=2, author=5)])
+        await asyncio.gather(self.cache.cache_all_problems(), self.cache.update_cache())
+        self.assertEqual(self.loads, 2)  # The update_cache waited for the reload instead of running at the same time
+        await self.cache.update_cache()
+        self.assertEqual(self.loads, 2)  # Nothing changed since the reload
+        self.assertEqual(sorted((await self.cache.get_global_problems()).keys()), [1, 2])
+
+    async def test_stale_while_revalidate(self):
+        await self.cache.add_problems([BaseProblem(question="1+1?", answer="2", id=1, author=5)])
+        await self.cache.cache_all_problems()
+        self.cache.stale_while_revalidate = True
+        await self.cache.add_problems([BaseProblem(question="2+2?", answer="4", id=2, author=5)])
+        await self.cache.cache_all_problems()  # Returns before the reload is done
+        self.assertEqual(list((await self.cache.get_global_problems()).keys()), [1])
+        await self.cache.cache_all_problems()  # Doesn't start another reload
+        while self.cache._RELOAD in self.cache._single_flight:
+            await asyncio.sleep(0.01)
+        self.assertEqual(self.loads, 2)
+        self.assertEqual(sorted((await self.cache.get_global_problems()).keys()), [1, 2])
+
+    async def test_start_warms_in_the_background(self):
+        await self.cache.add_problems([BaseProblem(question="1+1?", answer="2", id=1, author=5)])
+        await self.cache.close()
+        await self.cache.start(warm=True)  # Returns before the problems are loaded
+        self.assertEqual(self.loads, 0)
+        await asyncio.gather(*self.cache._background_tasks)
+        self.assertEqual(self.loads, 1)
+        await self.cache.start(warm=True)  # Already started
+        self.assertEqual(self.cache._background_tasks, set())
+        self.assertEqual(list((await self.cache.get_global_problems()).keys()), [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
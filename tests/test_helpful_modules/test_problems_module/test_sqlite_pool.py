@@ -0,0 +1,95 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+
+from helpful_modules.problems_module.sqlite_pool import SQLiteConnectionPool
+
+
+class TestSQLiteConnectionPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.pool = SQLiteConnectionPool(os.path.join(self.tempdir.name, "test.db"), readers=2)
+        async with self.pool.writer() as conn:
+            await conn.execute("CREATE TABLE things (id INTEGER PRIMARY KEY, name TEXT)")
+
+    async def asyncTearDown(self):
+        await self.pool.close()
+        self.tempdir.cleanup()
+
+    async def test_connections_are_reused(self):
+        for i in range(10):
+            async with self.pool.writer() as conn:
+                await conn.execute("INSERT INTO things (id, name) VALUES (?, ?)", (i, str(i)))
+            async with self.pool.reader() as conn:
+                cursor = await conn.execute("SELECT * FROM things WHERE id = ?", (i,))
+                self.assertEqual(await cursor.fetchall(), [{"id": i, "name": str(i)}])
+        self.assertEqual(self.pool.connections_opened, 3)  # 2 readers and 1 writer
+
+    async def test_writer_rolls_back_on_error(self):
+        with self.assertRaises(RuntimeError):
+            async with self.pool.writer() as conn:
+                await conn.execute("INSERT INTO things (id, name) VALUES (1, 'a')")
+                raise RuntimeError
+        async with self.pool.reader() as conn:
+            cursor = await conn.execute("SELECT * FROM things")
+            self.assertEqual(await cursor.fetchall(), [])
+
+    async def test_reopens_after_close(self):
+        await self.pool.close()
+        self.assertFalse(self.pool.is_open)
+        async with self.pool.reader() as conn:
+            cursor = await conn.execute("SELECT COUNT(*) AS n FROM things")
+            self.assertEqual((await cursor.fetchone())["n"], 0)
+        self.assertTrue(self.pool.is_open)
+
+    async def test_writer_waiting_during_close(self):
+        async with self.pool.writer():
+            closing = asyncio.create_task(self.pool.close())  # Waits for the write lock first
+            await asyncio.sleep(0.01)
+            writing = asyncio.create_task(self._insert(1))
+            await asyncio.sleep(0.01)
+        await closing
+        await writing  # It gets the writer of a new pool, instead of None
+        async with self.pool.reader() as conn:
+            cursor = await conn.execute("SELECT COUNT(*) AS n FROM things")
+            self.assertEqual((await cursor.fetchone())["n"], 1)
+
+    async def _insert(self, thing_id: int):
+        async with self.pool.writer() as conn:
+            await conn.execute("INSERT INTO things (id, name) VALUES (?, ?)", (thing_id, str(thing_id)))
+
+    async def test_close_waits_for_borrowed_readers(self):
+        async with self.pool.reader() as conn:
+            closing = asyncio.create_task(self.pool.close())
+            await asyncio.sleep(0.05)
+            self.assertFalse(closing.done())  # The borrowed reader hasn't come back yet
+            self.assertFalse(self.pool.is_open)
+            cursor = await conn.execute("SELECT COUNT(*) AS n FROM things")  # It still works
+            self.assertEqual((await cursor.fetchone())["n"], 0)
+        await closing
+        async with self.pool.reader() as conn:  # A new pool
+            cursor = await conn.execute("SELECT COUNT(*) AS n FROM things")
+            self.assertEqual((await cursor.fetchone())["n"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import MathProblemCache, UserData
+
+
+class TestUserDataCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.cache = MathProblemCache(
+            mysql_username="",
+            mysql_password="",
+            mysql_db_ip="",
+            mysql_db_name="",
+            use_sqlite=True,
+            db_name=os.path.join(self.tempdir.name, "test.db"),
+            update_cache_by_default_when_requesting=False,
+        )
+
+    async def asyncSetUp(self):
+        await self.cache.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    async def test_user_data(self):
+        lru = self.cache.user_data_lru
+        self.assertFalse((await self.cache.get_user_data(7)).trusted)  # No row: the default is cached too
+        self.assertFalse((await self.cache.get_user_data(7)).trusted)
+        self.assertEqual((lru.hits, lru.misses), (1, 1))
+
+        await self.cache.set_user_data(7, UserData(user_id=7, trusted=True, blacklisted=False))
+        user_data = await self.cache.get_user_data(7)
+        self.assertTrue(user_data.trusted)
+        user_data.trusted = False  # Without set_user_data, this doesn't change anything
+        self.assertTrue((await self.cache.get_user_data(7)).trusted)
+
+        await self.cache.del_user_data(7)
+        self.assertEqual(await self.cache.get_user_data(7, default="nothing"), "nothing")
+
+        # It's cached that 7 has no row, but only one of these inserts it: the other one updates it
+        await asyncio.gather(
+            *(self.cache.set_user_data(7, UserData(user_id=7, trusted=False, blacklisted=True)) for _ in range(2))
+        )
+        self.assertTrue((await self.cache.get_user_data(7)).blacklisted)
+
+    async def test_get_user_data_many(self):
+        await self.cache.set_user_data(7, UserData(user_id=7, trusted=True, blacklisted=False))
+        await self.cache.set_user_data(8, UserData(user_id=8, trusted=False, blacklisted=True))
+        self.cache.user_data_lru.clear()
+        user_data = await self.cache.get_user_data_many([7, 8, 9])
+        self.assertEqual(list(user_data.keys()), [7, 8])
+        self.assertTrue(user_data[7].trusted and user_data[8].blacklisted)
+        self.assertIsNone(self.cache.user_data_lru.get(9, "missing"))  # Like get_user_data, it's cached that 9 has none
+
+    async def test_a_write_during_a_read_is_not_undone(self):
+        await self.cache.set_user_data(7, UserData(user_id=7, trusted=False, blacklisted=False))
+        read = self.cache._get_user_data_from_db
+        release = asyncio.Event()
+
+        async def slow_read(user_id):
+            user_data = await read(user_id)
+            await release.wait()  # The user is blacklisted after this read the row
+            return user_data
+
+        self.cache._get_user_data_from_db = slow_read
+        reading = asyncio.create_task(self.cache.get_user_data(7))
+        await asyncio.sleep(0.05)
+        await self.cache.set_user_data(7, UserData(user_id=7, trusted=False, blacklisted=True))
+        release.set()
+        self.assertFalse((await reading).blacklisted)  # What it read
+        self.assertTrue((await self.cache.get_user_data(7)).blacklisted)  # But it wasn't cached
+
+
+if __name__ == "__main__":
+    unittest.main()
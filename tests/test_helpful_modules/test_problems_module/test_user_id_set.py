@@ -0,0 +1,67 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import copy
+import pickle
+import unittest
+
+from helpful_modules.problems_module.user_id_set import UserIdSet
+
+
+class TestUserIdSet(unittest.TestCase):
+    def test_small_and_large(self):
+        for num_ids in (3, 100):
+            ids = UserIdSet(range(num_ids, 0, -1))
+            self.assertEqual(len(ids), num_ids)
+            self.assertIn(1, ids)
+            self.assertNotIn(0, ids)
+            self.assertNotIn("1", ids)
+            ids.append(0)
+            ids.append(0)  # Already there
+            ids.remove(2)
+            self.assertEqual(len(ids), num_ids)
+            self.assertIn(0, ids)
+            self.assertNotIn(2, ids)
+            with self.assertRaises(ValueError):
+                ids.remove(2)
+            self.assertEqual(ids, [i for i in range(num_ids + 1) if i != 2])
+
+    def test_other_ids(self):
+        ids = UserIdSet([1, 2])
+        ids.append("not an int")
+        ids.append(2**70)
+        self.assertIn("not an int", ids)
+        self.assertIn(2**70, ids)
+        self.assertEqual(ids, {1, 2, "not an int", 2**70})
+        ids.discard("not an int")
+        self.assertEqual(ids, [1, 2, 2**70])
+
+    def test_list_compatibility(self):
+        ids = UserIdSet()
+        self.assertEqual(ids, [])
+        self.assertEqual(repr(ids), "[]")
+        ids.extend([3, 1, 3])
+        self.assertEqual(ids.to_list(), [1, 3])
+        self.assertEqual(pickle.loads(pickle.dumps(ids)), [1, 3])
+        self.assertEqual(copy.deepcopy(ids), [1, 3])
+        ids.clear()
+        self.assertEqual(len(ids), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+This file is part of The Discord Math Problem Bot Repo
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+Author: Samuel Guo (64931063+rf20008@users.noreply.github.com)
+"""
+import asyncio
+import os
+import tempfile
+import unittest
+
+import disnake.ext.commands  # noqa: F401
+
+from helpful_modules.problems_module import BaseProblem, MathProblemCache, ProblemNotFoundException
+
+
+def make_cache(db_name: str) -> MathProblemCache:
+    return MathProblemCache(
+        mysql_username="",
+        mysql_password="",
+        mysql_db_ip="",
+        mysql_db_name="",
+        use_sqlite=True,
+        db_name=db_name,
+        update_cache_by_default_when_requesting=False,
+    )
+
+
+class TestVotesAndSolves(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tempdir.name, "test.db")
+        self.cache = make_cache(self.db_name)
+
+    async def asyncSetUp(self):
+        await self.cache.start()
+
+    async def asyncTearDown(self):
+        await self.cache.close()
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    async def test_votes_are_single_rows(self):
+        await self.cache.add_problem(
+            1, BaseProblem(question="1+1?", answer="2", id=1, author=5, voters=[7], solvers=[8])
+        )
+        self.assertTrue(await self.cache.add_vote(1, 9))
+        self.assertFalse(await self.cache.add_vote(1, 9))
+        self.assertFalse(await self.cache.add_vote(1, 7))
+        self.assertEqual(await self.cache.get_num_votes(1), 2)
+        self.assertTrue(await self.cache.add_solve(1, 9))
+        self.assertFalse(await self.cache.remove_vote(1, 10))
+        self.assertTrue(await self.cache.remove_vote(1, 7))
+
+        problem = await self.cache.get_problem(None, 1)
+        self.assertEqual(problem.voters, [9])
+        self.assertCountEqual(problem.solvers, [8, 9])
+
+        await self.cache.delete_all_solves_by_user_id(9)
+        self.assertEqual(await self.cache.get_num_solves(1), 1)
+        await self.cache.remove_problem(None, 1)
+        self.assertEqual(await self.cache.get_num_votes(1), 0)
+        self.assertEqual(await self.cache.get_num_solves(1), 0)
+
+    async def test_the_problem_is_deleted_at_the_vote_threshold(self):
+        problem = BaseProblem(question="1+1?", answer="2", id=1, author=5, voters=[7])
+        await self.cache.add_problem(1, problem)
+        self.assertEqual(await self.cache.add_vote_and_count(problem, 7, vote_threshold=3), (False, 1, False))
+        self.assertEqual(await self.cache.add_vote_and_count(problem, 8, vote_threshold=3), (True, 2, False))
+        self.assertEqual(await self.cache.remove_vote_and_count(1, 8), (True, 1, False))
+        self.assertEqual(await self.cache.add_vote_and_count(problem, 8, vote_threshold=3), (True, 2, False))
+        self.assertEqual(await self.cache.add_vote_and_count(problem, 9, vote_threshold=3), (True, 3, True))
+        self.assertEqual(await self.cache.get_global_problems(), {})
+        with self.assertRaises(ProblemNotFoundException):
+            await self.cache.add_vote_and_count(problem, 10, vote_threshold=3)
+        self.assertEqual(await self.cache.get_num_votes(1), 0)  # Nothing is added for deleted problems
+
+    async def test_concurrent_votes_delete_the_problem_once(self):
+        problem = BaseProblem(question="1+1?", answer="2", id=1, author=5)
+        await self.cache.add_problem(1, problem)
+        results = await asyncio.gather(
+            *(self.cache.add_vote_and_count(problem, user_id, vote_threshold=3) for user_id in range(6)),
+            return_exceptions=True,
+        )
+        votes = [result for result in results if not isinstance(result, ProblemNotFoundException)]
+        self.assertEqual(sum(result.deleted for result in votes), 1)
+        self.assertEqual([result.num_votes for result in votes], [1, 2, 3])
+        self.assertEqual(await self.cache.get_num_votes(1), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()